@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Per-interval aggregation of per-op records by their real start time.
+
+Ops are assigned to intervals of a fixed width by start timestamp (not by
+summing latencies), counted with numpy.bincount and sorted once by
+(interval, latency) so every percentile of every interval is a single
+fancy-index into the sorted latencies. Per interval:
+
+  ops, ops_per_s, mean, p50, p90, p99, max    (latency in ms in the CSVs)
+
+Intervals with no completed op have ops=0 and empty latency fields.
+
+Outputs (--out-dir, default: next to the input):
+  throughput_per_sec.csv   sec,ops                                  (1 s, as before)
+  latency_per_sec.csv      sec,avg_latency_s,ops,ops_per_s,mean_ms,p50_ms,p90_ms,p99_ms,max_ms
+  latency_per_<w>.csv      t_sec,ops,ops_per_s,mean_ms,...          (other widths, e.g. 100ms, 10s)
+
+    python3 aggregate.py results/x/per_op_latency.csv --widths 0.1,1,10
+    python3 aggregate.py results/x/per_op.col
+"""
+import argparse
+import csv
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+STAT_COLUMNS = ["ops", "ops_per_s", "mean_ms"] + [f"p{q:g}_ms" for q in PERCENTILES] + ["max_ms"]
+
+
+def aggregate(start_ns, lat, width_s: float = 1.0, t0_ns: Optional[int] = None, ok=None,
+              percentiles: Sequence[float] = PERCENTILES) -> Dict[str, np.ndarray]:
+    """
+    Bin ops by start time into intervals of width_s seconds from t0_ns
+    (default: first start). `lat` may be in any unit; NaN or ok == 0 marks a
+    failed op (not counted). Returns arrays of one entry per interval:
+    t_s (interval start, s), ops, ops_per_s, mean, max and p<q> per percentile
+    (nearest-rank; NaN for empty intervals).
+    """
+    start = np.asarray(start_ns, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.float64)
+    good = np.isfinite(lat)
+    if ok is not None:
+        good &= np.asarray(ok, dtype=bool)
+    start, lat = start[good], lat[good]
+    if start.size == 0:
+        empty = np.zeros(0)
+        return {"t_s": empty, "ops": empty.astype(np.int64), "ops_per_s": empty, "mean": empty, "max": empty,
+                **{f"p{q:g}": empty for q in percentiles}}
+    if t0_ns is None:
+        t0_ns = int(start.min())
+    width_ns = int(round(width_s * 1e9))
+    b = np.maximum((start - t0_ns) // width_ns, 0)      # ops before t0 go to the first interval
+
+    n = np.bincount(b)
+    nb = n.size
+    total = np.bincount(b, weights=lat, minlength=nb)
+    order = np.lexsort((lat, b))                        # by interval, then latency
+    s = lat[order]
+    first = np.concatenate(([0], np.cumsum(n)[:-1]))
+    has = n > 0
+    out = {"t_s": np.arange(nb) * width_s, "ops": n, "ops_per_s": n / width_s}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["mean"] = np.where(has, total / n, np.nan)
+    last = first + n - 1
+    out["max"] = np.where(has, s[np.where(has, last, 0)], np.nan)
+    for q in percentiles:
+        rank = np.maximum(np.ceil(q / 100.0 * n).astype(np.int64) - 1, 0)
+        idx = np.where(has, first + rank, 0)
+        out[f"p{q:g}"] = np.where(has, s[idx], np.nan)
+    return out
+
+
+def width_label(width_s: float) -> str:
+    """0.1 -> '100ms', 1 -> 'sec', 10 -> '10s'."""
+    if width_s == 1:
+        return "sec"
+    if width_s < 1:
+        return f"{width_s * 1000:g}ms"
+    return f"{width_s:g}s"
+
+
+def _fmt(v, spec):
+    return "" if not np.isfinite(v) else format(v, spec)
+
+
+def write_stats(path: str, agg: Dict[str, np.ndarray], lat_scale_ms: float, time_col: str = "t_sec",
+                legacy_avg: bool = False):
+    """One row per interval; lat_scale_ms converts `lat` units to ms."""
+    qs = [k for k in agg if k.startswith("p")]
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        head = [time_col] + (["avg_latency_s"] if legacy_avg else []) + ["ops", "ops_per_s", "mean_ms"]
+        w.writerow(head + [f"{k}_ms" for k in qs] + ["max_ms"])
+        for i in range(agg["ops"].size):
+            t = agg["t_s"][i]
+            row = [int(t) if time_col == "sec" else f"{t:g}"]
+            if legacy_avg:
+                row.append(_fmt(agg["mean"][i] * lat_scale_ms / 1000.0, ".9f") or "NaN")
+            row += [int(agg["ops"][i]), f"{agg['ops_per_s'][i]:g}", _fmt(agg["mean"][i] * lat_scale_ms, ".3f")]
+            row += [_fmt(agg[k][i] * lat_scale_ms, ".3f") for k in qs]
+            row.append(_fmt(agg["max"][i] * lat_scale_ms, ".3f"))
+            w.writerow(row)
+
+
+def write_outputs(out_dir: str, start_ns, lat, ok=None, t0_ns: Optional[int] = None, lat_scale_ms: float = 1e-6,
+                  widths: Sequence[float] = (1.0,)):
+    """
+    throughput_per_sec.csv + latency_per_sec.csv (1 s, legacy columns kept
+    first) and latency_per_<w>.csv for every other width. Default latency
+    unit is ns (lat_scale_ms=1e-6).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for width in sorted(set(widths) | {1.0}):
+        agg = aggregate(start_ns, lat, width, t0_ns, ok)
+        if width == 1:
+            thr = os.path.join(out_dir, "throughput_per_sec.csv")
+            with open(thr, "w", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["sec", "ops"])
+                w.writerows(zip(agg["t_s"].astype(int).tolist(), agg["ops"].tolist()))
+            path = os.path.join(out_dir, "latency_per_sec.csv")
+            write_stats(path, agg, lat_scale_ms, time_col="sec", legacy_avg=True)
+            written += [thr, path]
+        else:
+            path = os.path.join(out_dir, f"latency_per_{width_label(width)}.csv")
+            write_stats(path, agg, lat_scale_ms)
+            written.append(path)
+    return written
+
+
+def parse_widths(text: str):
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    from analysis import Run
+    ap = argparse.ArgumentParser(description="Per-interval ops/s and latency percentiles by op start time")
+    ap.add_argument("src", help="per_op_latency.csv (with start_unix_ns), per_op.col/ or latency_data*.csv")
+    ap.add_argument("--widths", default="1", help="interval widths in seconds, e.g. 0.1,1,10")
+    ap.add_argument("--out-dir", help="default: directory of src")
+    args = ap.parse_args(argv)
+
+    ops = Run(args.src).ops()
+    start_ms, lat_ms = ops["start_ms"], ops["latency_ms"]
+    if not np.isfinite(start_ms).any():
+        ap.error(f"{args.src}: no per-op start timestamps (start_unix_ns / timestamp_ms)")
+    known = np.isfinite(start_ms)
+    start_ns = np.round(start_ms[known] * 1e6).astype(np.int64)
+    out_dir = args.out_dir or os.path.dirname(os.path.abspath(args.src.rstrip("/")))
+    for p in write_outputs(out_dir, start_ns, lat_ms[known], lat_scale_ms=1.0, widths=parse_widths(args.widths)):
+        print(f"Saved {p}")
+
+
+if __name__ == "__main__":
+    main()
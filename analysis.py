@@ -0,0 +1,610 @@
+"""
+Shared loading and analysis for the plotting scripts.
+
+A Run wraps one result file (per_op_latency*.csv, per_op.col/,
+latency_data*.csv, latency_x*ms.log, throughput_per_sec*.csv or
+latency_per_sec*.csv). Columns are parsed on first use and derived series
+(per-second ops / latency, ECDF) are computed on demand; both are kept in
+a two-level cache:
+
+  memory  dict keyed by (content digest, item name), shared by all Runs
+  disk    <cache dir>/data/<digest>/<item>.npz   (plain arrays, no pickle)
+
+The digest is a BLAKE2 hash of the file contents (of every file for a
+.col directory). It is only recomputed when the file's size or mtime
+changed, so re-plotting a sweep after changing a figure option reads a
+few stat() results and small .npz files instead of re-parsing the CSVs.
+Smoothing and axis options are applied by the caller and never cached.
+
+Cache dir: $FSDELAY_CACHE_DIR, default ~/.cache/fsdelay-analysis
+(FSDELAY_CACHE_DIR=off disables the disk level). The disk level is kept
+under $FSDELAY_CACHE_MAX_MB (default 2048): when a new entry takes it over
+the cap, the least recently used digests are removed (a hit refreshes its
+entry). Entries can also be dropped by age, or all at once:
+
+    from analysis import Run, find_files, smooth, to_ms_label
+    for run in map(Run, find_files("per_op_latency_*.csv")):
+        xs, ys = run.ecdf()
+
+    python3 analysis.py cache                     # size of the disk cache
+    python3 analysis.py cache --max-age-days 30   # drop entries unused for 30 days
+    python3 analysis.py cache --clear
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import catalog
+import oprec
+import sysmon
+from fault_timeline import find_events, read_events, fault_boundaries
+from raft_monitor import find_status, read_status, raft_boundaries
+
+CACHE_VERSION = 1
+TIME_COLUMNS = ["t_sec", "sec", "time", "second"]
+OPS_COLUMNS = ["ops", "throughput", "qps"]
+LATENCY_METRICS = ["p50_ms", "median_ms", "latency_ms", "avg_ms", "mean_ms"]
+LABEL_PREFIXES = ["per_op_latency_", "throughput_per_sec_", "latency_per_sec_", "latency_data_", "latency_"]
+
+
+# ===================== helpers shared by the scripts =====================
+
+def to_ms_label(text: str) -> str:
+    """
+    Find '<number><unit>' in text and render it as 'X ms'.
+    Units: us/µs, ms, s. Text without such a pattern is returned unchanged.
+    """
+    m = re.search(r'(?i)(\d+(?:\.\d+)?)\s*(µs|us|ms|s)\b', text)
+    if not m:
+        return text
+    val = float(m.group(1))
+    unit = m.group(2).lower()
+    if unit in ('µs', 'us'):
+        ms = val / 1000.0
+    elif unit == 'ms':
+        ms = val
+    else:
+        ms = val * 1000.0
+    if abs(ms - round(ms)) < 1e-9:
+        return f"{int(round(ms))} ms"
+    s = f"{ms:.3f}" if ms < 1 else f"{ms:.2f}"
+    s = s.rstrip('0').rstrip('.')
+    return f"{s} ms"
+
+
+def find_files(*patterns: str) -> List[str]:
+    """
+    Sorted matches of each pattern, in pattern order, without duplicates.
+    A pattern 'catalog:<query>' selects runs from the catalog instead
+    (catalog.py; e.g. 'catalog:mode=delay leader=etcd2 delay_ms>=10'),
+    in the catalog's delay order.
+    """
+    out, seen = [], set()
+    for pat in patterns:
+        if pat.startswith(catalog.QUERY_PREFIX):
+            matches = catalog.find(pat[len(catalog.QUERY_PREFIX):])
+        else:
+            matches = sorted(glob.glob(pat))
+        for p in matches:
+            if p not in seen:
+                seen.add(p)
+                out.append(p)
+    return out
+
+
+def label_from_path(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+    if stem == "per_op" or stem == "per_op_latency":          # results/<run>/per_op_latency.csv
+        return os.path.basename(os.path.dirname(os.path.abspath(path)))
+    for prefix in LABEL_PREFIXES:
+        if stem.startswith(prefix):
+            return stem[len(prefix):]
+    return stem
+
+
+def pick_column(df: pd.DataFrame, candidates, exclude=()) -> Optional[str]:
+    for c in candidates:
+        if c in df.columns and c not in exclude:
+            return c
+    return None
+
+
+def pick_time_and_metric_columns(df: pd.DataFrame, metrics=LATENCY_METRICS):
+    """(time column, metric column); with exactly two columns the other one is the metric."""
+    tcol = pick_column(df, TIME_COLUMNS)
+    if tcol is None:
+        raise ValueError("no time column (t_sec/sec/time/second)")
+    mcol = pick_column(df, metrics, exclude=(tcol,))
+    if mcol is None and len(df.columns) == 2:
+        mcol = [c for c in df.columns if c != tcol][0]
+    if mcol is None:
+        raise ValueError(f"no metric column among {list(metrics)}")
+    return tcol, mcol
+
+
+def fill_seconds(df: pd.DataFrame, value: str, fill: str = "zero") -> pd.DataFrame:
+    """
+    Reindex t_sec to every second between min and max. Missing seconds get
+    0 (fill='zero', counts) or are interpolated (fill='interpolate', levels).
+    """
+    if df.empty:
+        return df
+    full_idx = pd.RangeIndex(int(df["t_sec"].min()), int(df["t_sec"].max()) + 1)
+    df = df.set_index("t_sec")
+    if fill == "zero":
+        df = df.reindex(full_idx, fill_value=0)
+    else:
+        df = df.reindex(full_idx)
+        df[value] = df[value].interpolate(limit_direction="both")
+    return df.rename_axis("t_sec").reset_index()
+
+
+def smooth(series: pd.Series, window: int, how: str = "mean") -> pd.Series:
+    """Centered rolling mean (or median) over `window` samples."""
+    roll = series.rolling(window=max(1, int(window)), center=True, min_periods=1)
+    return roll.median() if how == "median" else roll.mean()
+
+
+def ecdf(values: np.ndarray):
+    """(sorted values, cumulative fraction) of an array."""
+    if values.size == 0:
+        return np.array([]), np.array([])
+    xs = np.sort(values)
+    return xs, np.arange(1, xs.size + 1, dtype=float) / xs.size
+
+
+# ===================== cache =====================
+
+def _default_cache_dir() -> Optional[str]:
+    d = os.environ.get("FSDELAY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fsdelay-analysis"))
+    return None if d.lower() in ("", "off", "0", "none") else d
+
+
+def _default_cache_max_bytes() -> int:
+    return int(float(os.environ.get("FSDELAY_CACHE_MAX_MB", "2048")) * (1 << 20))
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for dirpath, _dirs, files in os.walk(path):
+        for n in files:
+            try:
+                total += os.stat(os.path.join(dirpath, n)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _stat_key(path: str):
+    """(size, mtime_ns) of a file, or of every file in a directory."""
+    if os.path.isdir(path):
+        out = []
+        for name in sorted(os.listdir(path)):
+            st = os.stat(os.path.join(path, name))
+            out.append([name, st.st_size, st.st_mtime_ns])
+        return out
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _content_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    files = [os.path.join(path, n) for n in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for p in files:
+        h.update(os.path.basename(p).encode() + b"\0")
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+class Cache:
+    """Memory + disk cache of named array dicts per file content."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root
+        self.max_bytes = _default_cache_max_bytes() if max_bytes is None else max_bytes
+        self.mem: Dict[tuple, Dict[str, np.ndarray]] = {}
+        self._digests: Dict[str, tuple] = {}       # abspath -> (stat key, digest)
+        self._disk_bytes = None                    # size of data/, scanned at the first write
+        self.hits = self.misses = 0
+
+    def _stat_file(self, path):
+        return os.path.join(self.root, "stat", hashlib.blake2b(path.encode(), digest_size=16).hexdigest() + ".json")
+
+    def digest(self, path: str) -> str:
+        """Content digest, recomputed only when size/mtime changed."""
+        path = os.path.abspath(path)
+        key = _stat_key(path)
+        known = self._digests.get(path)
+        if known is None and self.root:
+            try:
+                with open(self._stat_file(path)) as f:
+                    d = json.load(f)
+                known = (d["stat"], d["digest"])
+            except (OSError, ValueError, KeyError):
+                known = None
+        if known is not None and known[0] == key:
+            self._digests[path] = known
+            return known[1]
+        digest = f"v{CACHE_VERSION}-{_content_digest(path)}"
+        self._digests[path] = (key, digest)
+        if self.root:
+            _atomic_write(self._stat_file(path), json.dumps({"path": path, "stat": key, "digest": digest}).encode())
+        return digest
+
+    def get(self, path: str, name: str, build) -> Dict[str, np.ndarray]:
+        """Arrays for item `name` of `path`; build() -> {str: ndarray} on a miss."""
+        digest = self.digest(path)
+        k = (digest, name)
+        if k in self.mem:
+            self.hits += 1
+            return self.mem[k]
+        fn = os.path.join(self.root, "data", digest, re.sub(r"[^\w.=-]", "_", name) + ".npz") if self.root else None
+        if fn and os.path.exists(fn):
+            try:
+                with np.load(fn, allow_pickle=False) as z:
+                    arrays = {n: z[n] for n in z.files}
+                os.utime(os.path.dirname(fn))          # recently used: pruned last
+                self.mem[k] = arrays
+                self.hits += 1
+                return arrays
+            except (OSError, ValueError):
+                pass
+        self.misses += 1
+        arrays = {n: _plain(v) for n, v in build().items()}
+        self.mem[k] = arrays
+        if fn:
+            os.makedirs(os.path.dirname(fn), exist_ok=True)
+            tmp = f"{fn}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, fn)
+            self._account(os.path.getsize(fn), keep=digest)
+        return arrays
+
+    def _account(self, nbytes: int, keep: str):
+        if self._disk_bytes is None:
+            self._disk_bytes = _tree_size(os.path.join(self.root, "data"))
+        else:
+            self._disk_bytes += nbytes
+        if self.max_bytes and self._disk_bytes > self.max_bytes:
+            self.prune(max_bytes=self.max_bytes, keep=(keep,))
+
+    def entries(self) -> List[tuple]:
+        """(last use, bytes, digest) of every disk entry, least recently used first."""
+        data = os.path.join(self.root, "data") if self.root else None
+        if not data or not os.path.isdir(data):
+            return []
+        out = []
+        for e in os.scandir(data):
+            if e.is_dir():
+                out.append((e.stat().st_mtime, _tree_size(e.path), e.name))
+        return sorted(out)
+
+    def prune(self, max_bytes: Optional[int] = None, max_age_s: Optional[float] = None, keep=()) -> dict:
+        """
+        Remove disk entries (data/<digest>/) unused for max_age_s, then the
+        least recently used until data/ is under max_bytes; stat/ records of
+        removed digests or vanished files go too. Returns counts and sizes.
+        """
+        if not self.root:
+            return {"removed": 0, "freed": 0, "bytes": 0}
+        entries = self.entries()
+        total = sum(b for _, b, _ in entries)
+        now = time.time()
+        removed = freed = 0
+        gone = set()
+        for used, nbytes, digest in entries:
+            old = max_age_s is not None and now - used > max_age_s
+            big = max_bytes is not None and total > max_bytes
+            if digest in keep or not (old or big):
+                continue
+            shutil.rmtree(os.path.join(self.root, "data", digest), ignore_errors=True)
+            total -= nbytes
+            freed += nbytes
+            removed += 1
+            gone.add(digest)
+        stat_dir = os.path.join(self.root, "stat")
+        if os.path.isdir(stat_dir):
+            for e in os.scandir(stat_dir):
+                try:
+                    with open(e.path) as f:
+                        d = json.load(f)
+                    stale = d["digest"] in gone or not os.path.exists(d["path"])
+                except (OSError, ValueError, KeyError):
+                    stale = True
+                if stale:
+                    os.unlink(e.path)
+        self._disk_bytes = total
+        self.mem = {k: v for k, v in self.mem.items() if k[0] not in gone}
+        return {"removed": removed, "freed": freed, "bytes": total}
+
+    def clear(self):
+        """Drop the whole disk level (data/ and stat/) and the memory level."""
+        if self.root:
+            for sub in ("data", "stat"):
+                shutil.rmtree(os.path.join(self.root, sub), ignore_errors=True)
+        self._disk_bytes = 0
+        self._digests.clear()
+        self.mem.clear()
+
+    def clear_memory(self):
+        self.mem.clear()
+
+
+def _plain(v) -> np.ndarray:
+    """Object arrays (strings from pandas) as fixed-width unicode, so .npz needs no pickle."""
+    v = np.asarray(v)
+    return v.astype(str) if v.dtype == object else v
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_CACHE = None
+
+
+def default_cache() -> Cache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = Cache(_default_cache_dir())
+    return _CACHE
+
+
+# ===================== runs =====================
+
+def detect_kind(path: str) -> str:
+    """'col', 'per_sec', 'log' or 'ops' (per-op CSV: per_op_latency / latency_data)."""
+    if oprec.is_opcol(path):
+        return "col"
+    base = os.path.basename(path)
+    if base.endswith(".log"):
+        return "log"
+    if base.startswith(("throughput_per_sec", "latency_per_sec")):
+        return "per_sec"
+    return "ops"
+
+
+def _frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame({k: v for k, v in arrays.items() if v.ndim == 1 and k != "phase_labels"})
+
+
+class Run:
+    """
+    One result file. Everything is loaded lazily through the cache:
+
+      ops()              per-op arrays: start_ms (NaN if unknown), latency_ms (NaN on error),
+                         phase codes (+ 'phase_labels'), optional corrected_ms / queue_ms
+      stats(width_s)     DataFrame t_sec, ops, ops_per_s, mean, p50, p90, p99, max per interval
+      per_sec_ops()      DataFrame t_sec, ops         (seconds since the first op, gaps = 0)
+      per_sec_latency()  DataFrame t_sec, lat         (ms; gaps interpolated)
+      latencies_ms()     latencies of successful ops
+      ecdf()             (xs, ys) of latencies_ms()
+      fault_marks()      [(t_sec, 'start'|'end'|'change')] from fault_events.csv
+      fault_start_sec()  first fault start (events file, else first non-baseline phase;
+                         None without a baseline -> fault boundary)
+      raft_marks()       [(t_sec, 'leader'|'term'|'no_leader')] from raft_status.csv
+      sysmon(width_s)    DataFrame t_sec + mean system rates per interval from sysmon.bin
+    """
+
+    def __init__(self, path: str, cache: Optional[Cache] = None):
+        self.path = path
+        self.kind = detect_kind(path)
+        self.cache = cache or default_cache()
+        self.label = label_from_path(path)
+
+    def __repr__(self):
+        return f"Run({self.path!r}, kind={self.kind!r})"
+
+    def _get(self, name, build):
+        return self.cache.get(self.path, name, build)
+
+    # ---------- raw columns ----------
+
+    def ops(self) -> Dict[str, np.ndarray]:
+        if self.kind == "per_sec":
+            raise ValueError(f"{self.path}: per-second file has no per-op data")
+        if self.kind == "col":
+            return self._get("ops", self._load_col)
+        if self.kind == "log":
+            return self._get("ops", self._load_log)
+        return self._get("ops", self._load_csv)
+
+    def _load_col(self):
+        t = oprec.open_ops(self.path)
+        lat = t["latency_ns"] / 1e6
+        lat[t["status"] != oprec.STATUS_OK] = np.nan
+        return {"start_ms": t["start_ns"] / 1e6, "latency_ms": lat,
+                "phase": np.asarray(t["phase"], dtype=np.int16),
+                "phase_labels": np.array(t.labels("phase"))}
+
+    def _load_log(self):
+        ts, lat = [], []
+        with open(self.path) as f:
+            for line in f:
+                parts = line.strip().split(",")
+                if len(parts) < 2 or not parts[0].isdigit():
+                    continue
+                ts.append(int(parts[0]))
+                try:
+                    lat.append(float(parts[1]))
+                except ValueError:
+                    lat.append(np.nan)
+        if not ts:
+            raise ValueError(f"{self.path}: no valid timestamps")
+        return {"start_ms": np.array(ts, dtype=np.float64), "latency_ms": np.array(lat, dtype=np.float64),
+                "phase": np.zeros(len(ts), dtype=np.int16), "phase_labels": np.array(["baseline"])}
+
+    def _load_csv(self):
+        df = pd.read_csv(self.path)
+        num = lambda c, scale: pd.to_numeric(df[c], errors="coerce").to_numpy(np.float64) * scale
+        out = {}
+        if "seconds" in df.columns:
+            out["latency_ms"] = num("seconds", 1e3)
+        elif "latency_ms" in df.columns:
+            out["latency_ms"] = num("latency_ms", 1.0)
+        else:
+            raise ValueError(f"{self.path}: need a 'seconds' or 'latency_ms' column")
+        if "start_unix_ns" in df.columns:
+            out["start_ms"] = num("start_unix_ns", 1e-6)
+        elif "timestamp_ms" in df.columns:
+            out["start_ms"] = num("timestamp_ms", 1.0)
+        else:
+            out["start_ms"] = np.full(len(df), np.nan)
+        for col, name, scale in (("corrected_seconds", "corrected_ms", 1e3), ("queue_seconds", "queue_ms", 1e3),
+                                 ("corrected_latency_ms", "corrected_ms", 1.0), ("queue_ms", "queue_ms", 1.0)):
+            if col in df.columns:
+                out[name] = num(col, scale)
+        if "phase" in df.columns:
+            labels, codes = np.unique(df["phase"].astype(str).to_numpy(), return_inverse=True)
+            out["phase"], out["phase_labels"] = codes.astype(np.int16), labels
+        else:
+            out["phase"], out["phase_labels"] = np.zeros(len(df), dtype=np.int16), np.array(["baseline"])
+        return out
+
+    def table(self) -> pd.DataFrame:
+        """The per-second CSV itself (per_sec runs only)."""
+        if self.kind != "per_sec":
+            raise ValueError(f"{self.path}: not a per-second file")
+        return _frame(self._get("table", lambda: {c: s.to_numpy() for c, s in pd.read_csv(self.path).items()}))
+
+    # ---------- derived series ----------
+
+    def t0_ms(self) -> float:
+        start = self.ops()["start_ms"]
+        if not np.isfinite(start).any():
+            raise ValueError(f"{self.path}: no per-op start timestamps")
+        return float(np.nanmin(start))
+
+    def stats(self, width_s: float = 1.0) -> pd.DataFrame:
+        """
+        Per-interval stats by op start time (aggregate.py): t_sec, ops,
+        ops_per_s, mean, p50, p90, p99, max (latency in ms, NaN if empty).
+        """
+        def build():
+            o = self.ops()
+            known = np.isfinite(o["start_ms"])
+            start_ns = np.round((o["start_ms"][known] - self.t0_ms()) * 1e6).astype(np.int64)
+            a = aggregate.aggregate(start_ns, o["latency_ms"][known], width_s, t0_ns=0)
+            a["t_sec"] = a.pop("t_s")
+            return a
+        return _frame(self._get(f"stats.{width_s:g}", build))
+
+    def per_sec_ops(self) -> pd.DataFrame:
+        if self.kind == "per_sec":
+            df = self.table()
+            tcol, vcol = pick_time_and_metric_columns(df, OPS_COLUMNS)
+            s = pd.DataFrame({"t_sec": df[tcol].astype(int), "ops": df[vcol].astype(float)})
+            return fill_seconds(s, "ops")
+        st = self.stats(1.0)
+        return pd.DataFrame({"t_sec": st["t_sec"].astype(int), "ops": st["ops"].astype(float)})
+
+    def per_sec_latency(self, stat: str = "mean", metrics=LATENCY_METRICS) -> pd.DataFrame:
+        """
+        Latency per second (ms); stat is 'mean', 'p50', 'p90', 'p99' or 'max'.
+        Per-second files use the first of `metrics` they contain.
+        """
+        if self.kind == "per_sec":
+            df = self.table()
+            tcol, mcol = pick_time_and_metric_columns(df, metrics)
+            s = pd.DataFrame({"t_sec": df[tcol].astype(int), "lat": pd.to_numeric(df[mcol], errors="coerce")})
+            return fill_seconds(s, "lat", fill="interpolate")
+        st = self.stats(1.0)
+        df = pd.DataFrame({"t_sec": st["t_sec"].astype(int), "lat": st[stat]})
+        return fill_seconds(df, "lat", fill="interpolate")
+
+    def latencies_ms(self) -> np.ndarray:
+        lat = self.ops()["latency_ms"]
+        return lat[np.isfinite(lat)]
+
+    def ecdf(self):
+        a = self._get("ecdf", lambda: dict(zip(("xs", "ys"), ecdf(self.latencies_ms()))))
+        return a["xs"], a["ys"]
+
+    # ---------- fault boundaries ----------
+
+    def fault_marks(self):
+        ev = find_events(self.path)
+        if not ev or self.kind == "per_sec":
+            return []
+        return fault_boundaries(read_events(ev), self.t0_ms())
+
+    def raft_marks(self):
+        st = find_status(self.path)
+        if not st or self.kind == "per_sec":
+            return []
+        return raft_boundaries(read_status(st), self.t0_ms())
+
+    def sysmon(self, width_s: float = 1.0) -> Optional[pd.DataFrame]:
+        path = sysmon.find_samples(self.path)
+        if not path or self.kind == "per_sec":
+            return None
+        return sysmon.bucket(sysmon.rates(sysmon.read_samples(path)), self.t0_ms(), width_s)
+
+    def fault_start_sec(self) -> Optional[float]:
+        starts = [t for t, kind in self.fault_marks() if kind == "start"]
+        if starts:
+            return starts[0]
+        if self.kind == "per_sec":
+            return None
+        o = self.ops()
+        base = np.flatnonzero(o["phase_labels"] == "baseline")
+        if not base.size:                   # no baseline phase: no baseline -> fault boundary
+            return None
+        fault = o["phase"] != base[0]
+        if fault.all() or not fault.any() or not np.isfinite(o["start_ms"][fault]).any():
+            return None
+        return (float(np.nanmin(o["start_ms"][fault])) - self.t0_ms()) / 1000.0
+
+
+def load_runs(*patterns: str, cache: Optional[Cache] = None) -> List[Run]:
+    return [Run(p, cache) for p in find_files(*patterns)]
+
+
+# ===================== CLI =====================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Analysis cache maintenance")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("cache", help="show, prune or clear the disk cache")
+    p.add_argument("--dir", default=_default_cache_dir(), help="cache dir (default $FSDELAY_CACHE_DIR)")
+    p.add_argument("--max-mb", type=float, help="prune least recently used entries down to this size")
+    p.add_argument("--max-age-days", type=float, help="drop entries not used for this many days")
+    p.add_argument("--clear", action="store_true", help="remove every cached entry")
+    args = ap.parse_args(argv)
+
+    if not args.dir:
+        raise SystemExit("disk cache is off (FSDELAY_CACHE_DIR)")
+    c = Cache(args.dir, max_bytes=0)
+    if args.clear:
+        c.clear()
+        print(f"[cache] {args.dir}: cleared")
+        return
+    if args.max_mb is not None or args.max_age_days is not None:
+        r = c.prune(max_bytes=None if args.max_mb is None else int(args.max_mb * (1 << 20)),
+                    max_age_s=None if args.max_age_days is None else args.max_age_days * 86400)
+        print(f"[cache] removed {r['removed']} entr{'y' if r['removed'] == 1 else 'ies'} "
+              f"({r['freed'] / (1 << 20):.1f} MB)")
+    entries = c.entries()
+    print(f"[cache] {args.dir}: {len(entries)} entries, {sum(b for _, b, _ in entries) / (1 << 20):.1f} MB "
+          f"(cap {_default_cache_max_bytes() / (1 << 20):.0f} MB, FSDELAY_CACHE_MAX_MB)")
+
+
+if __name__ == "__main__":
+    main()
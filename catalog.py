@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Run manifests and a SQLite catalog of them, so runs are selected by their
+parameters instead of by globbing file names and parsing delays out of
+them.
+
+Every run directory gets a run.json (write_manifest) next to its data:
+
+  {"schema": 1, "run_id": "<dir name>", "created_unix": ..., "host": ...,
+   "git_rev": ...,
+   "params":  {"kind": "etcd"|"io"|"sim", "mode": ..., "delay_us": ...,
+               "leader": ..., "methods": ..., "regex": ..., "ops": ...,
+               "concurrency": ..., ...any other key},
+   "summary": {"ok", "fail", "wall_s", "throughput", "p50_ms", "p99_ms", ...},
+   "files":   {"per_op": "per_op.col", "hlog": "latency.hlog", ...}}
+
+`index` walks result trees and loads changed manifests (by mtime/size;
+data files are never opened) into <db>: one row per run with the common
+parameters and summary numbers as indexed columns, plus every parameter
+in a key/value table for the rest. Paths are stored relative to the
+database, so a results tree can be moved with its catalog.
+
+Queries are terms `key OP value` (spaces around OP are fine) with OP one of
+= != < <= > >= ~ (glob), separated by spaces, ',' or 'and'; delay_ms is
+delay_us / 1000; unknown keys match params:
+
+    python3 catalog.py index results io_bench_results
+    python3 catalog.py query "mode=delay leader=etcd2 delay_ms>=10"
+    python3 catalog.py query "kind=etcd concurrency>=8" --files      # data paths only
+    python3 catalog.py manifest results/x --param mode=delay --param delay_us=10000 --summarize
+    python3 catalog.py backfill results           # run.json for old run dirs, from their names
+
+Analysis and plotting take a query wherever they take file patterns:
+find_files("catalog:mode=delay leader=etcd2 delay_ms>=10").
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+RUN_MANIFEST = "run.json"
+SCHEMA = 1
+DEFAULT_DB = os.environ.get("FSDELAY_CATALOG", os.path.join("results", "catalog.sqlite"))
+QUERY_PREFIX = "catalog:"
+
+PARAM_COLUMNS = {"kind": "TEXT", "mode": "TEXT", "leader": "TEXT", "delay_us": "REAL", "methods": "TEXT",
+                 "regex": "TEXT", "ops": "INTEGER", "concurrency": "INTEGER", "rate": "REAL", "arrival": "TEXT",
+                 "sweep": "TEXT", "rep": "INTEGER"}
+RUN_COLUMNS = {"run_id": "TEXT", "created_unix": "REAL", "host": "TEXT", "git_rev": "TEXT"}
+SUMMARY_COLUMNS = {"ok": "INTEGER", "fail": "INTEGER", "wall_s": "REAL", "throughput": "REAL", "p50_ms": "REAL",
+                   "p99_ms": "REAL", "p999_ms": "REAL", "leader_changes": "INTEGER"}
+INDEXED = [("kind", "mode", "leader", "delay_us"), ("delay_us",), ("leader",), ("concurrency",), ("ops",),
+           ("created_unix",), ("sweep",)]
+# role -> file name, in the order analysis prefers them as "the" data file of a run
+DATA_FILES = [("per_op", "per_op.col"), ("per_op_csv", "per_op_latency.csv"), ("io_col", "latency_data.col"),
+              ("io_csv", "latency_data.csv")]
+OTHER_FILES = [("hlog", "latency.hlog"), ("throughput_per_sec", "throughput_per_sec.csv"),
+               ("latency_per_sec", "latency_per_sec.csv"), ("raft", "raft_status.csv"),
+               ("faults", "fault_events.csv"), ("sysmon", "sysmon.bin"), ("sim", "sim.json"),
+               ("per_type", "per_op_type.csv"), ("ramp", "ramp.csv"), ("topology", "fault_topology.json"),
+               ("convergence", "convergence.csv")]
+
+_GIT_REV = None
+
+
+def git_rev() -> str:
+    """`git describe --always --dirty` of this checkout ('' outside git)."""
+    global _GIT_REV
+    if _GIT_REV is None:
+        try:
+            r = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                               timeout=10, cwd=os.path.dirname(os.path.abspath(__file__)))
+            _GIT_REV = r.stdout.strip() if r.returncode == 0 else ""
+        except (OSError, subprocess.TimeoutExpired):
+            _GIT_REV = ""
+    return _GIT_REV
+
+
+def _number(v):
+    if isinstance(v, str):
+        for conv in (int, float):
+            try:
+                return conv(v)
+            except ValueError:
+                pass
+    return v
+
+
+def parse_params(items) -> dict:
+    """['mode=delay', 'delay_us=10000'] -> {'mode': 'delay', 'delay_us': 10000}."""
+    out = {}
+    for item in items or ():
+        if "=" not in item:
+            raise ValueError(f"bad param {item!r} (want key=value)")
+        k, v = item.split("=", 1)
+        out[k.strip()] = _number(v.strip())
+    return out
+
+
+# ===================== manifests =====================
+
+def read_manifest(run_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(run_dir, RUN_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def detect_files(run_dir: str) -> Dict[str, str]:
+    return {role: name for role, name in DATA_FILES + OTHER_FILES if os.path.exists(os.path.join(run_dir, name))}
+
+
+def write_manifest(run_dir: str, params: dict = None, summary: dict = None, files: dict = None, **fields) -> dict:
+    """
+    Create or update <run_dir>/run.json: params and summary are merged
+    into what is there, files default to the known outputs present, other
+    keyword arguments override top-level fields (created_unix, host, ...).
+    """
+    m = read_manifest(run_dir) or {}
+    m.update(fields)
+    m.setdefault("schema", SCHEMA)
+    m.setdefault("run_id", os.path.basename(os.path.abspath(run_dir)))
+    m.setdefault("created_unix", time.time())
+    m.setdefault("host", socket.gethostname())
+    m.setdefault("git_rev", git_rev())
+    m["params"] = dict(m.get("params", {}), **(params or {}))
+    m["summary"] = dict(m.get("summary", {}), **(summary or {}))
+    m["files"] = files if files is not None else detect_files(run_dir)
+    os.makedirs(run_dir, exist_ok=True)
+    tmp = os.path.join(run_dir, RUN_MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(m, f, indent=1, default=str)
+    os.replace(tmp, os.path.join(run_dir, RUN_MANIFEST))
+    return m
+
+
+def summarize_run(run_dir: str) -> dict:
+    """Counts, wall time, throughput and percentiles from the run's per-op data."""
+    import numpy as np
+    from analysis import Run
+    files = detect_files(run_dir)
+    data = next((os.path.join(run_dir, files[r]) for r, _ in DATA_FILES if r in files), None)
+    out = {}
+    if data is not None:
+        o = Run(data).ops()
+        lat, start = o["latency_ms"], o["start_ms"]
+        ok = np.isfinite(lat)
+        out.update(ok=int(ok.sum()), fail=int((~ok).sum()))
+        if ok.any() and np.isfinite(start).any():
+            wall = float(np.nanmax(start[ok] + lat[ok]) - np.nanmin(start)) / 1000.0
+            out.update(wall_s=wall, throughput=int(ok.sum()) / wall if wall > 0 else 0.0)
+        if ok.any():
+            out.update(zip(("p50_ms", "p99_ms", "p999_ms"), map(float, np.percentile(lat[ok], (50, 99, 99.9)))))
+    return out
+
+
+def data_file(run_dir: str, files: dict) -> Optional[str]:
+    """The file analysis should read for this run (per_op.col first)."""
+    for role, _ in DATA_FILES:
+        if role in files:
+            return os.path.join(run_dir, files[role])
+    return None
+
+
+LEGACY_DIR = re.compile(r"^(?P<ts>\d{8}_\d{6})_(?P<prefix>.+?)_(?P<mode>baseline|delay|timeline)_(?P<leader>[^_]+)"
+                        r"(?:_(?P<delay>\d+)us)?$")
+LEGACY_IO_DIR = re.compile(r"^(?P<ts>\d{8}_\d{6})_fs-delay-(?P<delay>\d+(?:\.\d+)?)ms$")
+
+
+def legacy_params(run_dir: str) -> Optional[dict]:
+    """Parameters of a run dir written before manifests, from its name (run_etcd_fsdelay.sh / run_io_benchmark.sh)."""
+    name = os.path.basename(os.path.abspath(run_dir))
+    m = LEGACY_DIR.match(name)
+    if m:
+        p = {"kind": "etcd", "mode": m["mode"], "leader": m["leader"], "prefix": m["prefix"]}
+        if m["delay"] is not None:
+            p["delay_us"] = int(m["delay"])
+        elif m["mode"] == "baseline":
+            p["delay_us"] = 0
+    else:
+        m = LEGACY_IO_DIR.match(name)
+        if not m:
+            return None
+        p = {"kind": "io", "mode": "delay", "delay_us": float(m["delay"]) * 1000}
+    p["created_unix"] = time.mktime(time.strptime(m["ts"], "%Y%m%d_%H%M%S"))
+    return p
+
+
+# ===================== catalog =====================
+
+def _walk_manifests(root: str):
+    """Directories under root holding a run.json (.col directories are not entered)."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            entries = list(os.scandir(d))
+        except OSError:
+            continue
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                if not e.name.endswith(".col"):
+                    stack.append(e.path)
+            elif e.name == RUN_MANIFEST:
+                st = e.stat()
+                yield d, st.st_mtime_ns, st.st_size
+
+
+QUERY_SYNTAX = "key=value, key>=value, key<value, key!=value, key~glob; terms joined by spaces, ',' or 'and'"
+_SEP = re.compile(r"(?:\s+|,|and\b)*", re.I)
+_TERM = re.compile(r"([A-Za-z_][\w.]*)\s*(>=|<=|!=|=|>|<|~)\s*('[^']*'|\"[^\"]*\"|[^\s,=<>!~][^\s,]*)")
+
+
+def _terms(query: str) -> List[Tuple[str, str, str]]:
+    """Split on the operators, so 'delay_ms >= 5' and 'delay_ms>=5' are the same term."""
+    out, pos = [], 0
+    while True:
+        pos = _SEP.match(query, pos).end()
+        if pos >= len(query):
+            return out
+        m = _TERM.match(query, pos)
+        if not m:
+            raise ValueError(f"bad query term at {query[pos:]!r} (want {QUERY_SYNTAX})")
+        out.append(m.groups())
+        pos = m.end()
+
+
+def compile_query(query: str) -> Tuple[str, list]:
+    """'mode=delay leader=etcd2 delay_ms>=10' -> (SQL WHERE clause, args)."""
+    clauses, args = [], []
+    columns = dict(PARAM_COLUMNS, **RUN_COLUMNS, **SUMMARY_COLUMNS)
+    for key, op, value in _terms(query):
+        v = _number(value.strip("'\""))
+        scale = 1
+        if key == "delay_ms":
+            key, scale = "delay_us", 1000
+            v = v * scale if isinstance(v, (int, float)) else v
+        sql_op = "GLOB" if op == "~" else op
+        if key in columns:
+            clauses.append(f"runs.{key} {sql_op} ?")
+            args.append(v)
+        else:
+            col = "num" if isinstance(v, (int, float)) and op != "~" else "value"
+            clauses.append(f"EXISTS (SELECT 1 FROM params p WHERE p.run = runs.id AND p.key = ? AND p.{col} {sql_op} ?)")
+            args.extend([key, v if col == "num" else str(value.strip("'\""))])
+    return (" AND ".join(clauses) or "1"), args
+
+
+class Catalog:
+    """SQLite index of run manifests (one row per run directory)."""
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        self.base = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.base, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        cols = ", ".join(f"{k} {t}" for k, t in dict(RUN_COLUMNS, **PARAM_COLUMNS, **SUMMARY_COLUMNS).items())
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, dir TEXT UNIQUE NOT NULL, mtime_ns INTEGER, size INTEGER,
+                {cols}, data TEXT, manifest TEXT);
+            CREATE TABLE IF NOT EXISTS params (
+                run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE, key TEXT NOT NULL, value TEXT, num REAL);
+            CREATE INDEX IF NOT EXISTS params_num ON params(key, num);
+            CREATE INDEX IF NOT EXISTS params_value ON params(key, value);
+            CREATE INDEX IF NOT EXISTS params_run ON params(run);
+        """)
+        for cols_ in INDEXED:
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS runs_{'_'.join(cols_)} ON runs({', '.join(cols_)})")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.base)
+
+    def _abs(self, rel: str) -> str:
+        return os.path.relpath(os.path.normpath(os.path.join(self.base, rel)))
+
+    def _load(self, run_dir: str, mtime_ns: int, size: int, m: dict):
+        params, summary = m.get("params", {}), m.get("summary", {})
+        row = {"dir": self._rel(run_dir), "mtime_ns": mtime_ns, "size": size,
+               **{k: m.get(k) for k in RUN_COLUMNS}, **{k: params.get(k) for k in PARAM_COLUMNS},
+               **{k: summary.get(k) for k in SUMMARY_COLUMNS}}
+        data = data_file(run_dir, m.get("files") or {})
+        row["data"] = self._rel(data) if data else None
+        row["manifest"] = json.dumps(m)
+        keys = list(row)
+        self.db.execute(
+            f"INSERT INTO runs ({', '.join(keys)}) VALUES ({', '.join('?' * len(keys))}) "
+            f"ON CONFLICT(dir) DO UPDATE SET {', '.join(f'{k}=excluded.{k}' for k in keys if k != 'dir')}",
+            [row[k] for k in keys])
+        run_id = self.db.execute("SELECT id FROM runs WHERE dir = ?", (row["dir"],)).fetchone()[0]
+        self.db.execute("DELETE FROM params WHERE run = ?", (run_id,))
+        self.db.executemany("INSERT INTO params (run, key, value, num) VALUES (?, ?, ?, ?)",
+                            [(run_id, k, str(v), v if isinstance(v, (int, float)) and not isinstance(v, bool)
+                              else None) for k, v in params.items() if v is not None])
+
+    def index(self, roots: List[str]) -> dict:
+        """
+        Load new or changed run.json files under roots and drop runs whose
+        manifest disappeared. Returns counts {added, updated, removed, unchanged}.
+        """
+        counts = dict(added=0, updated=0, removed=0, unchanged=0)
+        known = {r["dir"]: (r["mtime_ns"], r["size"]) for r in self.db.execute("SELECT dir, mtime_ns, size FROM runs")}
+        seen = set()
+        with self.db:
+            for root in roots:
+                rel_root = self._rel(root)
+                for d, mtime_ns, size in _walk_manifests(root):
+                    rel = self._rel(d)
+                    seen.add(rel)
+                    if known.get(rel) == (mtime_ns, size):
+                        counts["unchanged"] += 1
+                        continue
+                    m = read_manifest(d)
+                    if m is None:
+                        continue
+                    self._load(d, mtime_ns, size, m)
+                    counts["updated" if rel in known else "added"] += 1
+                gone = [k for k in known if k not in seen and
+                        (rel_root == "." or k == rel_root or k.startswith(rel_root + os.sep))]
+                self.db.executemany("DELETE FROM runs WHERE dir = ?", [(k,) for k in gone])
+                counts["removed"] += len(gone)
+        return counts
+
+    def select(self, query: str = "", order: str = "delay_us, created_unix") -> List[dict]:
+        """Runs matching the query: manifest columns plus 'dir' and 'data' as paths relative to the cwd."""
+        if not re.fullmatch(r"\s*\w+(\s+(asc|desc))?(\s*,\s*\w+(\s+(asc|desc))?)*\s*", order, re.I):
+            raise ValueError(f"bad order {order!r} (want 'col [asc|desc], ...')")
+        where, args = compile_query(query)
+        rows = self.db.execute(f"SELECT * FROM runs WHERE {where} ORDER BY {order}", args).fetchall()
+        out = []
+        for r in rows:
+            d = dict(r)
+            d["dir"] = self._abs(d["dir"])
+            d["data"] = self._abs(d["data"]) if d["data"] else None
+            d["manifest"] = json.loads(d["manifest"])
+            out.append(d)
+        return out
+
+
+def find(query: str, db: str = DEFAULT_DB) -> List[str]:
+    """Data files of the runs matching query (used by analysis.find_files for 'catalog:' patterns)."""
+    if not os.path.exists(db):
+        raise FileNotFoundError(f"{db}: no catalog (run: python3 catalog.py index <results dirs>)")
+    with Catalog(db) as c:
+        return [r["data"] for r in c.select(query) if r["data"]]
+
+
+def index_runs(roots: List[str], db: str = DEFAULT_DB) -> dict:
+    with Catalog(db) as c:
+        return c.index([r for r in roots if os.path.isdir(r)])
+
+
+# ===================== CLI =====================
+
+def cmd_manifest(args):
+    params = parse_params(args.param)
+    if args.kind:
+        params["kind"] = args.kind
+    summary = summarize_run(args.run_dir) if args.summarize else None
+    m = write_manifest(args.run_dir, params, summary)
+    print(f"Saved run manifest       : {os.path.join(args.run_dir, RUN_MANIFEST)} "
+          f"({len(m['params'])} params, {len(m['summary'])} summary fields)")
+
+
+def cmd_index(args):
+    t = time.perf_counter()
+    c = index_runs(args.roots, args.db)
+    print(f"[catalog] {args.db}: +{c['added']} ~{c['updated']} -{c['removed']} ={c['unchanged']} "
+          f"({time.perf_counter() - t:.2f}s)")
+
+
+def cmd_query(args):
+    with Catalog(args.db) as c:
+        try:
+            rows = c.select(args.query, args.order)
+        except ValueError as e:
+            raise SystemExit(f"[catalog] query: {e}")
+    if args.files:
+        for r in rows:
+            if r["data"]:
+                print(r["data"])
+        return
+    cols = args.columns.split(",")
+    print("  ".join(f"{c:>12}" for c in cols) + "  dir")
+    for r in rows:
+        vals = [r.get(c, r["manifest"].get("params", {}).get(c)) for c in cols]
+        print("  ".join(f"{v:>12.6g}" if isinstance(v, float) else f"{'' if v is None else v!s:>12}" for v in vals)
+              + f"  {r['dir']}")
+    print(f"{len(rows)} run(s)", file=sys.stderr)
+
+
+def cmd_backfill(args):
+    n = 0
+    for root in args.roots:
+        for e in sorted(os.scandir(root), key=lambda e: e.name):
+            if not e.is_dir() or read_manifest(e.path) is not None:
+                continue
+            p = legacy_params(e.path)
+            if p is None or not detect_files(e.path):
+                continue
+            created = p.pop("created_unix")
+            summary = summarize_run(e.path) if args.summarize else None
+            write_manifest(e.path, p, summary, created_unix=created, git_rev="")
+            n += 1
+    print(f"[catalog] wrote {n} manifest(s)")
+    if n and not args.no_index:
+        cmd_index(argparse.Namespace(roots=args.roots, db=args.db))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run manifests and a SQLite catalog to select runs by parameters")
+    ap.add_argument("--db", default=DEFAULT_DB, help="catalog database (default $FSDELAY_CATALOG or %(default)s)")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("manifest", help="write / update a run's run.json")
+    p.add_argument("run_dir")
+    p.add_argument("--kind", choices=["etcd", "io", "sim"])
+    p.add_argument("--param", action="append", default=[], metavar="KEY=VALUE")
+    p.add_argument("--summarize", action="store_true", help="add summary numbers from the run's data")
+    p.set_defaults(fn=cmd_manifest)
+    p = sp.add_parser("index", help="load new / changed manifests into the catalog")
+    p.add_argument("roots", nargs="*", default=["results", "io_bench_results"])
+    p.set_defaults(fn=cmd_index)
+    p = sp.add_parser("query", help="list runs matching a query")
+    p.add_argument("query", nargs="?", default="")
+    p.add_argument("--order", default="delay_us, created_unix")
+    p.add_argument("--columns", default="kind,mode,leader,delay_us,ops,concurrency,throughput,p99_ms")
+    p.add_argument("--files", action="store_true", help="print the data file of each run only")
+    p.set_defaults(fn=cmd_query)
+    p = sp.add_parser("backfill", help="run.json for run dirs written before manifests (parsed from names)")
+    p.add_argument("roots", nargs="*", default=["results", "io_bench_results"])
+    p.add_argument("--summarize", action="store_true")
+    p.add_argument("--no-index", action="store_true")
+    p.set_defaults(fn=cmd_backfill)
+    args = ap.parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
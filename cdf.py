@@ -1,106 +1,98 @@
-import glob, os, re
-import numpy as np
-import pandas as pd
+import os
 import matplotlib.pyplot as plt
 
+from analysis import Run, find_files, to_ms_label
+from qsketch import merge_all, sketch_for
+from render import lttb, pixel_width
+
 # =================== Konfigurasi ===================
 FILE_PATTERN = "per_op_latency_*.csv"  # contoh: per_op_latency_1000us.csv
+COL_PATTERN = "per_op_latency_*.col"   # direktori biner hasil oprec.py convert
+# Pola juga bisa query katalog (catalog.py), mis. FILE_PATTERN = "catalog:mode=delay leader=etcd2 delay_ms>=10"
 X_UNIT_MS = True                       # True: tampilkan dalam milidetik; False: detik
 USE_LOG_X = False                      # True untuk skala log (bagus jika tail lebar)
 FIGSIZE = (12, 6)
 TITLE = "Latency CDF by Delay Configuration"
 X_LABEL = "Latency (ms)" if X_UNIT_MS else "Latency (s)"
 Y_LABEL = "CDF (fraction ≤ x)"
+USE_SKETCH = False                     # True: CDF dari DDSketch (memori konstan, galat relatif ≤ SKETCH_ALPHA)
+SKETCH_ALPHA = 0.01
+MERGE_SAME_LABEL = False               # True: gabungkan run dengan label sama (repetisi) jadi satu kurva
 # ===================================================
 
-def to_ms_label(text: str) -> str:
-    """
-    Cari pola '<angka><unit>' pada text dan konversi ke 'X ms'.
-    Unit didukung: us/µs, ms, s. Jika tak ditemukan, kembalikan text asli.
-    """
-    m = re.search(r'(?i)(\d+(?:\.\d+)?)\s*(µs|us|ms|s)\b', text)
-    if not m:
-        return text
-    val = float(m.group(1))
-    unit = m.group(2).lower()
+def collect_runs():
+    """Run per konfigurasi; direktori .col menggantikan CSV dengan nama yang sama."""
+    by_stem = {os.path.splitext(p)[0]: p for p in find_files(FILE_PATTERN)}
+    by_stem.update({os.path.splitext(p)[0]: p for p in find_files(COL_PATTERN)})
+    return [Run(p) for p in sorted(by_stem.values())]
 
-    if unit in ('µs', 'us'):
-        ms = val / 1000.0
-    elif unit == 'ms':
-        ms = val
-    elif unit == 's':
-        ms = val * 1000.0
-    else:
-        return text
+def main():
+    runs = collect_runs()
+    if not runs:
+        raise SystemExit(f"Tidak ada file yang cocok: {FILE_PATTERN} / {COL_PATTERN}")
 
-    # Format rapi
-    if abs(ms - round(ms)) < 1e-9:
-        return f"{int(round(ms))} ms"
-    s = f"{ms:.3f}" if ms < 1 else f"{ms:.2f}"
-    s = s.rstrip('0').rstrip('.')
-    return f"{s} ms"
+    plt.figure(figsize=FIGSIZE)
 
-def load_latencies_ms(path: str) -> np.ndarray:
-    """
-    Baca CSV dengan kolom: 'seconds' (float) dan 'op' (opsional).
-    Return array latency dalam ms (jika X_UNIT_MS=True) atau s.
-    """
-    df = pd.read_csv(path)
-    if "seconds" not in df.columns:
-        raise ValueError(f"{path}: kolom 'seconds' tidak ditemukan.")
-    lat_s = df["seconds"].dropna().astype(float).values
-    if X_UNIT_MS:
-        return lat_s * 1000.0
-    return lat_s
+    if USE_SKETCH:
+        plot_sketches(runs)
+        finish()
+        return
 
-def ecdf(values: np.ndarray):
+    # Plot setiap file sebagai satu garis CDF (ECDF di-cache per isi file)
+    for run in runs:
+        try:
+            xs, ys = run.ecdf()
+            if xs.size == 0:
+                print(f"Skip {os.path.basename(run.path)}: tidak ada data.")
+                continue
+            if not X_UNIT_MS:
+                xs = xs / 1000.0
+            xs, ys = lttb(xs, ys, pixel_width(FIGSIZE))   # bentuk kurva tetap, titik ~ lebar piksel
+            plt.plot(xs, ys, linewidth=2, alpha=0.95, label=to_ms_label(run.label))
+        except Exception as e:
+            print(f"Skip {run.path}: {e}")
+    finish()
+
+def plot_sketches(runs):
     """
-    Hitung Empirical CDF.
-    Returns:
-      xs: nilai latency terurut
-      ys: proporsi kumulatif (0..1)
+    CDF dari sketch per run (<run>.ddsk, dibuat sekali secara streaming lalu
+    dipakai ulang). Sketch dengan label sama bisa di-merge tanpa menggabung
+    data mentah; nilai kuantil dijamin dalam ±SKETCH_ALPHA relatif.
     """
-    if values.size == 0:
-        return np.array([]), np.array([])
-    xs = np.sort(values)
-    n = xs.size
-    ys = np.arange(1, n + 1, dtype=float) / n
-    return xs, ys
-
-# Kumpulkan file
-files = sorted(glob.glob(FILE_PATTERN))
-if not files:
-    raise SystemExit(f"Tidak ada file yang cocok: {FILE_PATTERN}")
-
-plt.figure(figsize=FIGSIZE)
-
-# Plot setiap file sebagai satu garis CDF
-for path in files:
-    try:
-        lat = load_latencies_ms(path)
-        xs, ys = ecdf(lat)
+    groups = {}
+    for run in runs:
+        label = to_ms_label(run.label)
+        key = label if MERGE_SAME_LABEL else run.path
+        try:
+            groups.setdefault(key, (label, []))[1].append(sketch_for(run.path, SKETCH_ALPHA))
+        except Exception as e:
+            print(f"Skip {run.path}: {e}")
+    for label, sketches in groups.values():
+        sk = merge_all(sketches, SKETCH_ALPHA)
+        xs, ys = sk.cdf()
         if xs.size == 0:
-            print(f"Skip {os.path.basename(path)}: tidak ada data.")
             continue
+        if not X_UNIT_MS:
+            xs = xs / 1000.0
+        n = f" ×{len(sketches)}" if len(sketches) > 1 else ""
+        plt.plot(xs, ys, linewidth=2, alpha=0.95, label=f"{label}{n}")
 
-        raw_label = os.path.splitext(os.path.basename(path))[0].replace("per_op_latency_", "")
-        label = to_ms_label(raw_label)
-        plt.plot(xs, ys, linewidth=2, alpha=0.95, label=label)
-    except Exception as e:
-        print(f"Skip {path}: {e}")
+def finish():
+    # Estetika & keterbacaan
+    plt.title(TITLE, fontsize=15)
+    plt.xlabel(X_LABEL)
+    plt.ylabel(Y_LABEL)
+    plt.grid(True, linestyle="--", alpha=0.35)
 
-# Estetika & keterbacaan
-plt.title(TITLE, fontsize=15)
-plt.xlabel(X_LABEL)
-plt.ylabel(Y_LABEL)
-plt.grid(True, linestyle="--", alpha=0.35)
+    # Legend di luar area plot supaya tidak menutupi kurva
+    plt.legend(title="Delay (ms)", frameon=True, loc="center left", bbox_to_anchor=(1.02, 0.5))
 
-# Legend di luar area plot supaya tidak menutupi kurva
-plt.legend(title="Delay (ms)", frameon=True, loc="center left", bbox_to_anchor=(1.02, 0.5))
+    # Opsi log-scale untuk X
+    if USE_LOG_X:
+        plt.xscale("log")  # nilai 0 akan di-clip otomatis oleh matplotlib
 
-# Opsi log-scale untuk X
-if USE_LOG_X:
-    plt.xscale("log")  # nilai 0 akan di-clip otomatis oleh matplotlib
+    plt.tight_layout()
+    plt.show()
 
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -1,106 +1,88 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import glob, os, re
+import os
 import numpy as np
+import matplotlib.pyplot as plt
+
+from analysis import Run, find_files, to_ms_label
+from qsketch import sketch_for
+from render import lttb, minmax_downsample, pixel_width
 
 
 FILE_PATTERN = "per_op_latency_*.csv"   # match this into your file name
+# or select runs from the catalog (catalog.py): "catalog:mode=delay leader=etcd2 delay_ms>=10"
 FIGSIZE = (12, 6)
-
-
-def to_ms_label(text: str) -> str:
-    """
-    Ambil pola '<angka><unit>' dari text dan konversi ke 'X ms'.
-    Unit didukung: us/µs, ms, s. Jika tidak ketemu, kembalikan text asli.
-    """
-    m = re.search(r'(?i)(\d+(?:\.\d+)?)\s*(µs|us|ms|s)\b', text)
-    if not m:
-        return text
-    val = float(m.group(1))
-    unit = m.group(2).lower()
-
-    if unit in ('µs', 'us'):
-        ms = val / 1000.0
-    elif unit == 'ms':
-        ms = val
-    elif unit == 's':
-        ms = val * 1000.0
-    else:
-        return text
-
-    if abs(ms - round(ms)) < 1e-9:
-        return f"{int(round(ms))} ms"
-    s = f"{ms:.3f}" if ms < 1 else f"{ms:.2f}"
-    s = s.rstrip('0').rstrip('.')
-    return f"{s} ms"
-
-# take all the csv file by pattern
-files = sorted(glob.glob(FILE_PATTERN))
-if not files:
-    raise SystemExit(f"Tidak ada file cocok pola: {FILE_PATTERN}")
-
-colors = plt.cm.tab10.colors
-
-# line plot
-plt.figure(figsize=FIGSIZE)
-for i, path in enumerate(files):
-    df = pd.read_csv(path)
-    if not {"op", "seconds"}.issubset(df.columns):
-        print(f"Skip {os.path.basename(path)}: kolom 'op' atau 'seconds' tidak ada.")
-        continue
-    raw_label = os.path.splitext(os.path.basename(path))[0].replace("per_op_latency_", "")
-    label = to_ms_label(raw_label)
-
-    plt.plot(
-        df["op"],
-        df["seconds"] * 1000.0,  # konversi ke ms
-        label=label,
-        color=colors[i % len(colors)],
-        linewidth=1.5,
-        alpha=0.9
-    )
-
-plt.title("Latency per Operation (Line Plot)", fontsize=14)
-plt.xlabel("Operation #")
-plt.ylabel("Latency (ms)")
-plt.grid(True, linestyle="--", alpha=0.5)
-plt.legend(title="Delay (ms)")
-plt.tight_layout()
-plt.show()
-
-# cdf plot
-plt.figure(figsize=FIGSIZE)
-for i, path in enumerate(files):
-    df = pd.read_csv(path)
-    if "seconds" not in df.columns:
-        print(f"Skip {os.path.basename(path)}: kolom 'seconds' tidak ada.")
-        continue
-
-    lat_ms = df["seconds"].astype(float) * 1000.0
-    lat_ms = lat_ms.dropna().values
-    if lat_ms.size == 0:
-        print(f"Skip {os.path.basename(path)}: tidak ada data latency.")
-        continue
-
-    sorted_lat = np.sort(lat_ms)
-    cdf = np.arange(1, len(sorted_lat) + 1, dtype=float) / len(sorted_lat)
-
-    raw_label = os.path.splitext(os.path.basename(path))[0].replace("per_op_latency_", "")
-    label = to_ms_label(raw_label)
-
-    plt.plot(
-        sorted_lat,
-        cdf,
-        label=label,
-        color=colors[i % len(colors)],
-        linewidth=1.5,
-        alpha=0.9
-    )
-
-plt.title("Latency CDF", fontsize=14)
-plt.xlabel("Latency (ms)")
-plt.ylabel("Cumulative Probability")
-plt.grid(True, linestyle="--", alpha=0.5)
-plt.legend(title="Delay (ms)", loc="lower right")
-plt.tight_layout()
-plt.show()
+USE_SKETCH = False                      # True: CDF from the run's DDSketch (constant memory, 1% relative error)
+
+
+def plot_line(runs, colors):
+    """Latency per operation (op # di sumbu X)."""
+    plt.figure(figsize=FIGSIZE)
+    for i, run in enumerate(runs):
+        try:
+            lat_ms = run.ops()["latency_ms"]
+        except Exception as e:
+            print(f"Skip {os.path.basename(run.path)}: {e}")
+            continue
+        # min/max per kolom piksel: jumlah titik ~ lebar figure, bukan jumlah op
+        x, y = minmax_downsample(np.arange(1, lat_ms.size + 1), lat_ms, pixel_width(plt.gcf()))
+        plt.plot(
+            x,
+            y,
+            label=to_ms_label(run.label),
+            color=colors[i % len(colors)],
+            linewidth=1.5,
+            alpha=0.9
+        )
+
+    plt.title("Latency per Operation (Line Plot)", fontsize=14)
+    plt.xlabel("Operation #")
+    plt.ylabel("Latency (ms)")
+    plt.grid(True, linestyle="--", alpha=0.5)
+    plt.legend(title="Delay (ms)")
+    plt.tight_layout()
+    plt.show()
+
+
+def plot_cdf(runs, colors):
+    plt.figure(figsize=FIGSIZE)
+    for i, run in enumerate(runs):
+        try:
+            sorted_lat, cdf = sketch_for(run.path).cdf() if USE_SKETCH else run.ecdf()
+        except Exception as e:
+            print(f"Skip {os.path.basename(run.path)}: {e}")
+            continue
+        if sorted_lat.size == 0:
+            print(f"Skip {os.path.basename(run.path)}: tidak ada data latency.")
+            continue
+
+        x, y = lttb(sorted_lat, cdf, pixel_width(plt.gcf()))
+        plt.plot(
+            x,
+            y,
+            label=to_ms_label(run.label),
+            color=colors[i % len(colors)],
+            linewidth=1.5,
+            alpha=0.9
+        )
+
+    plt.title("Latency CDF", fontsize=14)
+    plt.xlabel("Latency (ms)")
+    plt.ylabel("Cumulative Probability")
+    plt.grid(True, linestyle="--", alpha=0.5)
+    plt.legend(title="Delay (ms)", loc="lower right")
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    # take all the csv file by pattern
+    runs = [Run(p) for p in find_files(FILE_PATTERN)]
+    if not runs:
+        raise SystemExit(f"Tidak ada file cocok pola: {FILE_PATTERN}")
+
+    colors = plt.cm.tab10.colors
+    plot_line(runs, colors)
+    plot_cdf(runs, colors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Change-point detection on per-second throughput / latency series, and the
+degradation and recovery times derived from it.
+
+Segmentation is PELT (pruned exact linear time) with a Gaussian
+change-in-mean cost computed from cumulative sums, so every step is one
+vectorized evaluation over the surviving candidates. The penalty is
+penalty * sigma**2 * log(n) with sigma estimated robustly from the first
+differences (MAD), so it adapts to each series' noise. Latency is
+segmented on log scale (multiplicative noise).
+
+From the segments (levels = per-segment medians):
+
+  baseline_level     level before the known fault start, else of the first segment
+  onset_s            start of the first segment that deviates from the baseline
+                     by more than max(rel_band * baseline, 3 sigma) in the
+                     "worse" direction (lower throughput / higher latency)
+  degraded_level     level of the longest segment of the degraded stretch
+  time_to_degrade_s  onset -> first second the series (3 s rolling median)
+                     covers 90% of the distance from baseline to degraded level
+  recovered_s        first second after the fault end (known, else after the
+                     degraded stretch) from which the series stays within the
+                     band around the baseline for `hold_s` seconds
+  time_to_recover_s  fault end -> recovered_s (known fault end only)
+  detect_lag_s       onset_s - known fault start
+
+Known fault boundaries come from fault_events.csv (analysis.Run.fault_marks),
+else the phase column;
+without them everything is inferred from the series alone.
+
+    python3 changepoint.py 'results/sweep_paper/*/per_op.col' --out changes.csv --jobs 4
+    python3 changepoint.py latency_data_fs-delay-100ms.csv --series throughput
+"""
+import argparse
+import csv
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List, Sequence
+
+import numpy as np
+
+DEFAULT_PENALTY = 3.0
+MIN_SIZE = 3
+REL_BAND = 0.10
+HOLD_S = 5
+SETTLE = 0.9
+FIELDS = ["run", "series", "n_changes", "change_points_s", "baseline_level", "degraded_level",
+          "fault_start_s", "onset_s", "detect_lag_s", "time_to_degrade_s", "fault_end_s",
+          "recovered_s", "time_to_recover_s", "degraded_for_s"]
+
+
+@dataclass
+class Changes:
+    series: str
+    t: np.ndarray = field(repr=False)
+    change_points_s: List[float]
+    levels: List[float]
+    baseline_level: float = math.nan
+    degraded_level: float = math.nan
+    fault_start_s: float = math.nan
+    onset_s: float = math.nan
+    detect_lag_s: float = math.nan
+    time_to_degrade_s: float = math.nan
+    fault_end_s: float = math.nan
+    recovered_s: float = math.nan
+    time_to_recover_s: float = math.nan
+    degraded_for_s: float = math.nan
+
+    def row(self, run: str = "") -> dict:
+        d = asdict(self)
+        d.pop("t")
+        d.pop("levels")
+        d["run"] = run
+        d["n_changes"] = len(self.change_points_s)
+        d["change_points_s"] = ";".join(f"{c:g}" for c in self.change_points_s)
+        return d
+
+
+# ===================== segmentation =====================
+
+def robust_sigma(x: np.ndarray) -> float:
+    d = np.diff(x)
+    if d.size == 0:
+        return 0.0
+    return float(np.median(np.abs(d - np.median(d))) / (0.6745 * math.sqrt(2)))
+
+
+def pelt(x: np.ndarray, penalty: float, min_size: int = MIN_SIZE) -> np.ndarray:
+    """Change points (indices where a new segment starts) minimising L2 cost + penalty per change."""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.size
+    if n < 2 * min_size:
+        return np.zeros(0, dtype=np.int64)
+    s1 = np.r_[0.0, np.cumsum(x)]
+    s2 = np.r_[0.0, np.cumsum(x * x)]
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    # candidates are kept sorted, so the ones too recent to close a segment are a suffix
+    cands = np.array([0], dtype=np.int64)
+    pending = []
+    for t in range(min_size, n + 1):
+        s = cands
+        cost = (s2[t] - s2[s]) - (s1[t] - s1[s]) ** 2 / (t - s)
+        total = F[s] + cost
+        i = int(total.argmin())
+        F[t] = total[i] + penalty
+        last[t] = s[i]
+        # prune candidates that can never be optimal again; t - min_size + 1 becomes usable next step
+        pending.append(t)
+        cands = np.append(s[total <= F[t]], pending.pop(0)) if len(pending) >= min_size else s[total <= F[t]]
+    cps = []
+    t = n
+    while t > 0:
+        t = int(last[t])
+        if t > 0:
+            cps.append(t)
+    return np.array(cps[::-1], dtype=np.int64)
+
+
+def segment(x: np.ndarray, penalty: float = DEFAULT_PENALTY, min_size: int = MIN_SIZE):
+    """(change point indices, per-segment medians, sigma)."""
+    sigma = robust_sigma(x)
+    scale = sigma if sigma > 0 else max(1e-9, 1e-6 * float(np.abs(x).mean() or 1.0))
+    cps = pelt(x, penalty * scale ** 2 * math.log(max(x.size, 2)), min_size)
+    edges = np.r_[0, cps, x.size]
+    levels = np.array([np.median(x[a:b]) for a, b in zip(edges[:-1], edges[1:])])
+    return cps, levels, sigma
+
+
+def rolling_median(x: np.ndarray, window: int = 3) -> np.ndarray:
+    if window <= 1 or x.size < window:
+        return x
+    pad = window // 2
+    xp = np.pad(x, pad, mode="edge")
+    return np.median(np.lib.stride_tricks.sliding_window_view(xp, window), axis=1)[:x.size]
+
+
+# ===================== degradation / recovery =====================
+
+def analyze(t, x, series: str = "throughput", marks: Sequence = (), penalty: float = DEFAULT_PENALTY,
+            min_size: int = MIN_SIZE, rel_band: float = REL_BAND, hold_s: int = HOLD_S) -> Changes:
+    """
+    t: seconds (consecutive), x: value per second (NaN gaps are interpolated).
+    series 'throughput' degrades downwards, anything else (latency) upwards and
+    is segmented on log scale. marks: [(t_sec, 'start'|'end'|'change')].
+    """
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    ok = np.isfinite(x)
+    if ok.sum() < 2 * min_size:
+        return Changes(series, t, [], [])
+    if not ok.all():
+        x = np.interp(np.arange(x.size), np.flatnonzero(ok), x[ok])
+    up = series != "throughput"
+    y = np.log(np.maximum(x, 1e-9)) if up else x
+    sign = 1.0 if up else -1.0
+    cps, levels, sigma = segment(y, penalty, min_size)
+    edges = np.r_[0, cps, y.size]
+    to_x = np.exp if up else (lambda v: v)
+    res = Changes(series, t, [float(t[c]) for c in cps], [float(to_x(v)) for v in levels])
+
+    starts = [m[0] for m in marks if m[1] == "start"]
+    res.fault_start_s = float(starts[0]) if starts else math.nan
+    before = t < res.fault_start_s if starts else np.zeros(t.size, dtype=bool)
+    base = float(np.median(y[before])) if before.sum() >= min_size else float(levels[0])
+    band = max(rel_band * abs(base) if not up else math.log1p(rel_band), 3 * sigma)
+    res.baseline_level = float(to_x(base))
+
+    # first degraded segment (at/after the known fault start, with a little slack)
+    worse = sign * (levels - base) > band
+    t_min = res.fault_start_s - 2 * min_size if starts else -math.inf
+    cand = [i for i in range(levels.size) if worse[i] and t[edges[i]] >= t_min]
+    if not cand:
+        return res
+    first = cand[0]
+    last = first
+    while last + 1 < levels.size and abs(levels[last + 1] - base) > band:
+        last += 1
+    region = range(first, last + 1)
+    longest = max(region, key=lambda i: edges[i + 1] - edges[i])
+    steady = float(levels[longest])
+    res.onset_s = float(t[edges[first]])
+    res.degraded_level = float(to_x(steady))
+    if starts:
+        res.detect_lag_s = res.onset_s - res.fault_start_s
+
+    sm = rolling_median(y, 3)
+    i0, i1 = edges[first], edges[last + 1]
+    reached = np.flatnonzero(sign * (sm[i0:i1] - base) >= SETTLE * sign * (steady - base))
+    if reached.size:
+        res.time_to_degrade_s = float(t[i0 + reached[0]] - res.onset_s)
+
+    ends = [m[0] for m in marks if m[1] == "end" and m[0] >= res.fault_start_s - 1e-9] if starts else []
+    res.fault_end_s = float(ends[0]) if ends else math.nan
+    ref = int(np.searchsorted(t, res.fault_end_s)) if ends else i1
+    inside = np.abs(sm - base) <= band
+    # first index >= ref from which `hold_s` consecutive seconds are within the band
+    run_len = np.zeros(inside.size + 1, dtype=np.int64)
+    for k in range(inside.size - 1, -1, -1):
+        run_len[k] = run_len[k + 1] + 1 if inside[k] else 0
+    need = min(hold_s, max(inside.size - ref, 1))
+    good = np.flatnonzero(run_len[ref:-1] >= need)
+    if good.size:
+        res.recovered_s = float(t[ref + good[0]])
+        res.degraded_for_s = res.recovered_s - res.onset_s
+        if ends:
+            res.time_to_recover_s = res.recovered_s - res.fault_end_s
+    return res
+
+
+def run_marks(run) -> list:
+    """
+    Known fault boundaries of a run: the logged transitions, else the
+    first non-baseline row of the phase column as the fault start.
+    """
+    try:
+        marks = run.fault_marks()
+    except ValueError:
+        marks = []
+    if not any(kind == "start" for _, kind in marks):
+        fs = run.fault_start_sec()
+        if fs is not None:
+            marks = [(fs, "start")] + list(marks)
+    return marks
+
+
+def analyze_run(path: str, series=("throughput", "latency"), latency_stat: str = "p50", **kw) -> List[Changes]:
+    """Changes of one result file's per-second throughput and latency."""
+    from analysis import Run
+    run = Run(path)
+    marks = run_marks(run)
+    out = []
+    for s in series:
+        if s == "throughput":
+            df = run.per_sec_ops()
+            out.append(analyze(df["t_sec"] - df["t_sec"].min(), df["ops"], "throughput", marks, **kw))
+        else:
+            df = run.per_sec_latency(stat=latency_stat, metrics=[f"{latency_stat}_ms"])
+            out.append(analyze(df["t_sec"] - df["t_sec"].min(), df["lat"], "latency", marks, **kw))
+    return out
+
+
+def _rows_of(path: str, series, latency_stat, kw) -> List[dict]:
+    from analysis import label_from_path
+    return [c.row(label_from_path(path)) for c in analyze_run(path, series, latency_stat, **kw)]
+
+
+# ===================== plot annotations =====================
+
+def annotate(ax, ch: Changes, color=None, label: bool = True):
+    """Onset/recovery lines, shaded degraded stretch and its steady level on an existing axis."""
+    if math.isnan(ch.onset_s):
+        return
+    end = ch.recovered_s if not math.isnan(ch.recovered_s) else float(ch.t[-1]) if ch.t.size else ch.onset_s
+    ax.axvspan(ch.onset_s, end, color=color, alpha=0.08, linewidth=0)
+    ax.axvline(ch.onset_s, color=color, linestyle=(0, (1, 1)), linewidth=1.2, alpha=0.9)
+    if not math.isnan(ch.recovered_s):
+        ax.axvline(ch.recovered_s, color=color, linestyle=(0, (3, 1, 1, 1)), linewidth=1.2, alpha=0.9)
+    ax.hlines(ch.degraded_level, ch.onset_s, end, colors=color, linestyles="dashed", linewidth=1.0, alpha=0.7)
+    if label:
+        txt = f"onset {ch.onset_s:g}s"
+        if not math.isnan(ch.time_to_degrade_s):
+            txt += f", degrade {ch.time_to_degrade_s:g}s"
+        if not math.isnan(ch.time_to_recover_s):
+            txt += f", recover {ch.time_to_recover_s:g}s"
+        elif not math.isnan(ch.recovered_s):
+            txt += f", back at {ch.recovered_s:g}s"
+        ax.annotate(txt, (ch.onset_s, ch.degraded_level), xytext=(4, 4), textcoords="offset points",
+                    fontsize=8, color=color)
+
+
+# ===================== CLI =====================
+
+def _fmt(v):
+    if isinstance(v, float):
+        return "" if math.isnan(v) else f"{v:.6g}"
+    return v
+
+
+def main(argv=None):
+    from analysis import find_files
+    ap = argparse.ArgumentParser(description="Fault onset / degradation / recovery from per-second series")
+    ap.add_argument("patterns", nargs="+", help="result files / .col dirs (globs)")
+    ap.add_argument("--series", default="throughput,latency")
+    ap.add_argument("--latency-stat", default="p50", help="per-second latency statistic (mean, p50, p99, ...)")
+    ap.add_argument("--penalty", type=float, default=DEFAULT_PENALTY, help="x sigma^2 log n per change")
+    ap.add_argument("--min-size", type=int, default=MIN_SIZE, help="shortest segment (seconds)")
+    ap.add_argument("--band", type=float, default=REL_BAND, help="relative deviation that counts as degraded")
+    ap.add_argument("--hold", type=int, default=HOLD_S, help="seconds back in band to count as recovered")
+    ap.add_argument("--jobs", type=int, default=1)
+    ap.add_argument("--out", help="CSV (default stdout)")
+    args = ap.parse_args(argv)
+
+    paths = find_files(*args.patterns)
+    if not paths:
+        raise SystemExit(f"No files match: {' '.join(args.patterns)}")
+    series = [s for s in args.series.split(",") if s]
+    kw = {"penalty": args.penalty, "min_size": args.min_size, "rel_band": args.band, "hold_s": args.hold}
+    rows = []
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futs = [pool.submit(_rows_of, p, series, args.latency_stat, kw) for p in paths]
+            for p, f in zip(paths, futs):
+                try:
+                    rows += f.result()
+                except Exception as e:
+                    print(f"Skip {p}: {e}", file=sys.stderr)
+    else:
+        for p in paths:
+            try:
+                rows += _rows_of(p, series, args.latency_stat, kw)
+            except Exception as e:
+                print(f"Skip {p}: {e}", file=sys.stderr)
+    f = open(args.out, "w", newline="") if args.out else sys.stdout
+    try:
+        w = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: _fmt(r.get(k, "")) for k in FIELDS})
+    finally:
+        if args.out:
+            f.close()
+            print(f"Saved {args.out} ({len(rows)} rows)")
+
+
+if __name__ == "__main__":
+    main()
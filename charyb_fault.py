@@ -1,82 +1,328 @@
+#!/usr/bin/env python3
 # Nama file: charyb_fault.py
-import sys
-import os
-import errno
+"""
+Client for charybdefs fault injection over Thrift.
+
+Can be used in two ways:
 
-# --- INI BAGIAN UTAMA PERBAIKAN ---
-# Kita menggunakan path absolut yang pasti benar, tidak peduli dari mana skrip dijalankan.
-# os.path.expanduser('~') akan secara otomatis diganti dengan /home/cc (atau home dir Anda)
-CHARYBDEFS_GEN_PY_PATH = os.path.expanduser('~/charybdefs/gen-py')
+  * as a CLI (used by run_etcd_fsdelay.sh / run_io_benchmark.sh):
+        python3 charyb_fault.py clear --host 127.0.0.1 --port 9090
+        python3 charyb_fault.py delay --delay-us 300000 --methods fsync,fdatasync --regex '(^|.*/)member/wal/.*'
+        python3 charyb_fault.py plan faults.json
+        python3 charyb_fault.py --delay <us> | --sync-delay <us> | --clear      (old style, still works)
 
-# Periksa apakah path tersebut ada
-if not os.path.isdir(CHARYBDEFS_GEN_PY_PATH):
-    print(f"FATAL: Direktori library CharybdeFS tidak ditemukan di: {CHARYBDEFS_GEN_PY_PATH}")
-    print("Pastikan Anda sudah menjalankan 'thrift -r --gen py server.thrift' di dalam direktori 'charybdefs'.")
-    sys.exit(1)
+  * as a library, keeping one connection open for a whole sweep:
+        from charyb_fault import CharybClient, FaultSpec
+        with CharybClient() as c:
+            c.apply_plan([FaultSpec(["fsync", "fdatasync"], delay_us=10000, regex=WAL_REGEX)])
+            ...
+            c.clear()
+
+charybdefs expresses the fault probability in 1/100000; FaultSpec takes
+prob_permil (1000 = 100%) and converts it.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
 
-# Tambahkan path ini ke daftar pencarian modul Python
-if CHARYBDEFS_GEN_PY_PATH not in sys.path:
+# Generated Thrift stubs ('server' module) live in charybdefs/gen-py.
+CHARYBDEFS_GEN_PY_PATH = os.path.expanduser(os.environ.get("CHARYBDEFS_GEN_PY", "~/charybdefs/gen-py"))
+if os.path.isdir(CHARYBDEFS_GEN_PY_PATH) and CHARYBDEFS_GEN_PY_PATH not in sys.path:
     sys.path.insert(0, CHARYBDEFS_GEN_PY_PATH)
 
-# Sekarang, kita coba import
-try:
-    from thrift.transport import TSocket, TTransport
-    from thrift.protocol import TBinaryProtocol
-    from server import server
-except ImportError as e:
-    print(f"FATAL: Gagal mengimpor library yang dibutuhkan. Error: {e}")
-    print(f"Path yang digunakan: {CHARYBDEFS_GEN_PY_PATH}")
-    sys.exit(1)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9090
+WAL_REGEX = r"(^|.*/)member/wal/.*"
+WAL_METHODS = ["open", "create", "write", "write_buf", "fsync", "fdatasync", "fsyncdir", "flush"]
+SYNC_METHODS = ["fsync", "fdatasync", "fsyncdir"]
+PROB_SCALE = 100000          # charybdefs: probability 100000 == 100%
 
+_thrift = None
 
-def connect_client():
+
+def load_thrift():
+    """
+    Import the Thrift runtime and the charybdefs 'server' stubs once.
+    Returns a namespace-like dict; raises ImportError with a hint if missing.
+    """
+    global _thrift
+    if _thrift is not None:
+        return _thrift
     try:
-        transport = TSocket.TSocket('127.0.0.1', 9090)
-        transport = TTransport.TBufferedTransport(transport)
-        protocol = TBinaryProtocol.TBinaryProtocol(transport)
-        client = server.Client(protocol)
+        from thrift.Thrift import TApplicationException, TException
+        from thrift.transport import TSocket, TTransport
+        from thrift.protocol import TBinaryProtocol
+        from server import server
+    except ImportError as e:
+        raise ImportError(
+            f"{e}. Thrift stubs not found in {CHARYBDEFS_GEN_PY_PATH}; run "
+            f"'thrift -r --gen py server.thrift' inside charybdefs or set CHARYBDEFS_GEN_PY."
+        ) from e
+    _thrift = {
+        "TException": TException,
+        "TApplicationException": TApplicationException,
+        "TTransportException": TTransport.TTransportException,
+        "TSocket": TSocket,
+        "TTransport": TTransport,
+        "TBinaryProtocol": TBinaryProtocol,
+        "server": server,
+    }
+    return _thrift
+
+
+def parse_methods(text: str) -> List[str]:
+    return [m.strip() for m in text.split(",") if m.strip()]
+
+
+@dataclass
+class FaultSpec:
+    """
+    One set_fault entry. methods=None means every syscall (set_all_fault).
+    """
+    methods: Optional[List[str]] = None
+    delay_us: int = 0
+    prob_permil: int = 1000
+    regex: str = ""
+    err_no: int = 0
+    random: bool = False
+    kill_caller: bool = False
+    auto_delay: bool = False
+
+    @property
+    def probability(self) -> int:
+        return int(round(self.prob_permil * PROB_SCALE / 1000))
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FaultSpec":
+        d = dict(d)
+        if isinstance(d.get("methods"), str):
+            d["methods"] = parse_methods(d["methods"])
+        return cls(**d)
+
+    def describe(self) -> str:
+        which = ",".join(self.methods) if self.methods else "ALL"
+        return f"delay={self.delay_us}us methods={which} prob={self.prob_permil}/1000 regex='{self.regex}'"
+
+
+def load_plan(path: str) -> List[FaultSpec]:
+    """
+    Read a fault plan from JSON: either a list of entries or {"faults": [...]}.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("faults", [])
+    return [FaultSpec.from_dict(d) for d in data]
+
+
+@dataclass
+class RpcTiming:
+    method: str
+    start_ns: int
+    dur_ns: int
+    attempts: int
+    ok: bool
+
+
+@dataclass
+class CharybClient:
+    """
+    Long-lived charybdefs RPC client.
+
+    One TCP connection is opened lazily and reused; on a transport error the
+    call is retried on a fresh connection (up to `retries` times). Errors
+    reported by the server (TApplicationException) are raised at once. Every
+    RPC is timed with perf_counter_ns and appended to `timings`.
+    """
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT
+    timeout_s: float = 5.0
+    retries: int = 3
+    backoff_s: float = 0.2
+    timings: List[RpcTiming] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._transport = None
+        self._client = None
+
+    # --- connection ---------------------------------------------------
+    def connect(self):
+        t = load_thrift()
+        sock = t["TSocket"].TSocket(self.host, int(self.port))
+        sock.setTimeout(int(self.timeout_s * 1000))
+        transport = t["TTransport"].TBufferedTransport(sock)
+        protocol = t["TBinaryProtocol"].TBinaryProtocol(transport)
         transport.open()
-        return client, transport
-    except TTransport.TException as e:
-        print(f"Error: Tidak bisa terhubung ke charybdefs di port 9090. Pastikan charybdefs sudah berjalan.")
-        print(f"Detail: {e}")
-        sys.exit(1)
+        self._transport = transport
+        self._client = t["server"].Client(protocol)
+        return self
+
+    def close(self):
+        if self._transport is not None:
+            try:
+                self._transport.close()
+            except Exception:
+                pass
+        self._transport = None
+        self._client = None
+
+    @property
+    def connected(self) -> bool:
+        return self._transport is not None and self._transport.isOpen()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, method: str, *args):
+        t = load_thrift()
+        with self._lock:
+            start = time.perf_counter_ns()
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    if not self.connected:
+                        self.connect()
+                    result = getattr(self._client, method)(*args)
+                    self.timings.append(RpcTiming(method, start, time.perf_counter_ns() - start, attempt, True))
+                    return result
+                except (t["TTransportException"], OSError, EOFError):
+                    self.close()
+                    if attempt > self.retries:
+                        self.timings.append(RpcTiming(method, start, time.perf_counter_ns() - start, attempt, False))
+                        raise
+                    time.sleep(self.backoff_s * attempt)
+                except t["TException"] as e:
+                    # server-side error (TApplicationException: unknown method, bad args, ...):
+                    # the same call would fail again, so report it at once
+                    self.timings.append(RpcTiming(method, start, time.perf_counter_ns() - start, attempt, False))
+                    if not isinstance(e, t["TApplicationException"]):
+                        self.close()            # protocol error: the stream may be out of sync
+                    raise
+
+    # --- fault API ------------------------------------------------------
+    def set_fault(self, spec: FaultSpec):
+        if spec.methods:
+            self._call("set_fault", list(spec.methods), spec.random, spec.err_no, spec.probability,
+                       spec.regex, spec.kill_caller, spec.delay_us, spec.auto_delay)
+        else:
+            self._call("set_all_fault", spec.random, spec.err_no, spec.probability,
+                       spec.regex, spec.kill_caller, spec.delay_us, spec.auto_delay)
+
+    def clear(self):
+        self._call("clear_all_faults")
+
+    def apply_plan(self, plan: List[FaultSpec], clear_first: bool = True) -> int:
+        """
+        Apply a whole fault plan (several set_fault entries) on the open
+        connection. Returns the elapsed time in ns.
+        """
+        start = time.perf_counter_ns()
+        if clear_first:
+            self.clear()
+        for spec in plan:
+            self.set_fault(spec)
+        return time.perf_counter_ns() - start
+
+    def timing_summary(self) -> str:
+        if not self.timings:
+            return "no RPCs"
+        durs = sorted(t.dur_ns for t in self.timings)
+        return (f"{len(durs)} RPCs, min={durs[0] / 1e3:.1f}us "
+                f"median={durs[len(durs) // 2] / 1e3:.1f}us max={durs[-1] / 1e3:.1f}us")
 
-def main():
-    if len(sys.argv) < 2 or sys.argv[1] not in ['--delay', '--sync-delay', '--clear']:
-        print("Usage: python3 charyb_fault.py --delay <us> | --sync-delay <us> | --clear")
+
+def connect_client(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> CharybClient:
+    """Open a CharybClient (kept for callers of the old helper)."""
+    return CharybClient(host, port).connect()
+
+
+# ===================== CLI =====================
+
+def _legacy_main(argv):
+    """Old interface: --delay <us> | --sync-delay <us> | --clear"""
+    command = argv[0]
+    if command != "--clear" and len(argv) != 2:
+        print(f"Error: Argumen delay_microseconds dibutuhkan untuk {command}.")
         sys.exit(1)
+    if command == "--clear":
+        plan = None
+    elif command == "--sync-delay":
+        plan = [FaultSpec(SYNC_METHODS, delay_us=int(argv[1]))]
+    else:  # --delay
+        plan = [FaultSpec(None, delay_us=int(argv[1]))]
+    return plan
 
-    client, transport = connect_client()
-    command = sys.argv[1]
 
-    try:
-        if command == '--clear':
-            print("[FAULT INJECTOR] Menghapus semua fault...")
-            client.clear_all_faults()
-            print("[FAULT INJECTOR] Fault berhasil dihapus.")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    ap = argparse.ArgumentParser(description="Control charybdefs faults via Thrift")
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", default=DEFAULT_PORT, type=int)
+    ap.add_argument("--timings", action="store_true", help="print RPC timings")
+    # the same options are accepted after the subcommand (`clear --host ... --port ...`)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--host", default=argparse.SUPPRESS)
+    common.add_argument("--port", default=argparse.SUPPRESS, type=int)
+    common.add_argument("--timings", action="store_true", default=argparse.SUPPRESS)
 
-        elif command == '--delay' or command == '--sync-delay':
-            if len(sys.argv) != 3:
-                print(f"Error: Argumen delay_microseconds dibutuhkan untuk {command}.")
-                sys.exit(1)
+    if argv and argv[0] in ("--delay", "--sync-delay", "--clear"):
+        plan = _legacy_main(argv)
+        args = ap.parse_args([])
+    else:
+        sp = ap.add_subparsers(dest="cmd", required=True)
+        sp.add_parser("clear", parents=[common], help="clear all faults")
 
-            delay_us = int(sys.argv[2])
+        p1 = sp.add_parser("delay", parents=[common], help="inject a delay fault")
+        p1.add_argument("--methods", default=",".join(SYNC_METHODS), help="comma list, or 'all'")
+        p1.add_argument("--regex", default=WAL_REGEX)
+        p1.add_argument("--prob-permil", default=1000, type=int)  # 1000 = 100%
+        p1.add_argument("--delay-us", required=True, type=int)
 
-            if command == '--sync-delay':
-                methods_to_fault = ['fsync', 'fdatasync', 'fsyncdir']
-                print(f"[FAULT INJECTOR] Menginjeksi delay {delay_us}us HANYA pada: {methods_to_fault}")
-                client.set_fault(methods_to_fault, False, 0, 100000, "", False, delay_us, False)
-            else: # --delay
-                print(f"[FAULT INJECTOR] Menginjeksi delay {delay_us}us pada SEMUA syscall...")
-                client.set_all_fault(False, 0, 100000, "", False, delay_us, False)
+        p2 = sp.add_parser("plan", parents=[common], help="apply a JSON fault plan (list of set_fault entries)")
+        p2.add_argument("file")
 
-            print(f"[FAULT INJECTOR] Injeksi fault berhasil.")
+        args = ap.parse_args(argv)
+        if args.cmd == "clear":
+            plan = None
+        elif args.cmd == "delay":
+            methods = None if args.methods.strip().lower() == "all" else parse_methods(args.methods)
+            plan = [FaultSpec(methods, args.delay_us, args.prob_permil, args.regex)]
+        else:
+            plan = load_plan(args.file)
 
+    client = CharybClient(args.host, args.port)
+    try:
+        if plan is None:
+            client.clear()
+            print("[FAULT INJECTOR] Charybdefs: CLEARED all faults")
+        else:
+            client.apply_plan(plan)
+            for spec in plan:
+                print(f"[FAULT INJECTOR] Charybdefs: injected {spec.describe()}")
+    except ImportError as e:
+        print(f"FATAL: Gagal mengimpor library yang dibutuhkan. Error: {e}")
+        sys.exit(1)
     except Exception as e:
-        print(f"Terjadi error saat berkomunikasi dengan charybdefs: {e}")
+        print(f"Error: Tidak bisa berkomunikasi dengan charybdefs di {args.host}:{args.port}. "
+              f"Pastikan charybdefs sudah berjalan.")
+        print(f"Detail: {e}")
+        sys.exit(1)
     finally:
-        transport.close()
+        client.close()
+    if args.timings:
+        print(f"[FAULT INJECTOR] {client.timing_summary()}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
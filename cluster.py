@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+K independent 3-node etcd clusters on one host, for parallel sweeps.
+
+Instance i gets its own
+  compose project   fsdelay<i>           (own network; containers <project>-etcd0..2)
+  data dirs         <raw_root>/<project>/etcdN
+  FUSE mount        <mount_root>/<project>/<node>  per slow node (charybdefs, shadows its raw dir)
+  charybdefs RPC    charyb_base_port + i + K*j     for the j-th of --slow-nodes (default: etcd2 only)
+  client ports      host_base_port + 10*i + N      (etcd N's JSON gateway)
+  cpuset            optional, --cpus-per-instance cores per instance (containers + charybdefs)
+
+Instance 0 keeps the layout of docker-compose-etcd.yml (containers etcd0..2,
+/data/raw/etcdN, /mnt/slowfs/etcd2, port 9090, 23790..2), so existing scripts
+keep working against it.
+
+With --slow-nodes etcd0,etcd1,etcd2 every node gets its own charybdefs mount
+and RPC port, so topology.py can slow down followers, a quorum subset, or
+each node by a different amount.
+
+Stock charybdefs listens on port 9090 only. Running more than one instance
+needs a build that reads the port from $CHARYBDEFS_PORT (exported by `up`)
+or a charybdefs_cmd that passes {port} to a fork that takes it as an option.
+
+    python3 cluster.py plan -k 4 --cpus-per-instance 6      # writes clusters/instances.json + compose files
+    python3 cluster.py plan -k 1 --slow-nodes etcd0,etcd1,etcd2
+    python3 cluster.py up                                   # mkdirs, charybdefs mounts, docker compose up
+    python3 cluster.py status
+    python3 sweep.py sweep_paper.json --instances clusters/instances.json
+    python3 cluster.py down
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from etcd_client import find_leader
+
+STATE_DIR = "clusters"
+INSTANCES_FILE = "instances.json"
+ETCD_IMAGE = "gcr.io/etcd-development/etcd:v3.6.2"
+SLOW_NODE = "etcd2"
+NODES = ("etcd0", "etcd1", "etcd2")
+CHARYBDEFS_CMD = ("sudo env CHARYBDEFS_PORT={port} {bin} -f {mount} "
+                  "-omodules=subdir,subdir={raw} -oallow_other,nonempty")
+
+
+@dataclass
+class Instance:
+    index: int
+    project: str
+    endpoints: List[str]                   # host URLs of etcd0..2
+    charyb_host: str = "127.0.0.1"
+    charyb_port: int = 9090
+    raw_dirs: List[str] = field(default_factory=list)     # host data dir per node (slow node: the raw side)
+    mount: str = ""                        # charybdefs mount of the (first) slow node
+    containers: List[str] = field(default_factory=lambda: list(NODES))
+    cpuset: str = ""
+    compose_file: str = ""
+    verify_path: str = ""
+    slow_nodes: List[str] = field(default_factory=lambda: [SLOW_NODE])
+    charyb_ports: List[int] = field(default_factory=list)  # per slow node; empty = [charyb_port]
+    mounts: List[str] = field(default_factory=list)        # per slow node; empty = [mount]
+
+    @property
+    def tag(self) -> str:
+        return f"i{self.index}"
+
+    def container_of(self, endpoint: str) -> str:
+        return self.containers[self.endpoints.index(endpoint)]
+
+    def endpoint_of(self, name: str) -> str:
+        """'etcd2' -> endpoint of node 2 (like name_to_host_endpoint in run_etcd_fsdelay.sh)."""
+        return self.endpoints[int("".join(ch for ch in name if ch.isdigit()))]
+
+    def node_of(self, endpoint: str) -> str:
+        return NODES[self.endpoints.index(endpoint)]
+
+    def slow(self):
+        """[(node, charybdefs port, mount)] for every node whose data dir is behind charybdefs."""
+        return list(zip(self.slow_nodes, self.charyb_ports or [self.charyb_port], self.mounts or [self.mount]))
+
+    def charyb_targets(self) -> Dict[str, Tuple[str, int]]:
+        return {n: (self.charyb_host, port) for n, port, _m in self.slow()}
+
+
+def default_instance(endpoints, charyb_host="127.0.0.1", charyb_port=9090, verify_path="",
+                     charyb_ports: Optional[Dict[str, int]] = None) -> Instance:
+    """
+    The single cluster of docker-compose-etcd.yml; charyb_ports ({node: port})
+    when more nodes than etcd2 are behind charybdefs.
+    """
+    ports = charyb_ports or {SLOW_NODE: charyb_port}
+    slow = sorted((n for n in NODES if n in ports), key=lambda n: (n != SLOW_NODE, n))
+    return Instance(0, "default", list(endpoints), charyb_host, ports[slow[0]],
+                    raw_dirs=[f"/data/raw/{n}" for n in NODES], mount=f"/mnt/slowfs/{slow[0]}",
+                    compose_file="docker-compose-etcd.yml", verify_path=verify_path or "",
+                    slow_nodes=slow, charyb_ports=[ports[n] for n in slow],
+                    mounts=[f"/mnt/slowfs/{n}" for n in slow])
+
+
+def make_instances(k: int, state_dir: str = STATE_DIR, raw_root: str = "/data/raw", mount_root: str = "/mnt/slowfs",
+                   charyb_base_port: int = 9090, host_base_port: int = 23790, cpus_per_instance: int = 0,
+                   first_cpu: int = 0, verify: bool = True, slow_nodes=(SLOW_NODE,)) -> List[Instance]:
+    slow = sorted((n for n in NODES if n in slow_nodes), key=lambda n: (n != SLOW_NODE, n))   # etcd2 keeps its port
+    if not slow or len(slow) != len(set(slow_nodes)):
+        raise ValueError(f"slow nodes must be among {', '.join(NODES)}: {', '.join(slow_nodes)}")
+    out = []
+    for i in range(k):
+        if i == 0:
+            prefix, raw, mnt = "", raw_root, mount_root
+        else:
+            prefix = f"fsdelay{i}-"
+            raw, mnt = os.path.join(raw_root, f"fsdelay{i}"), os.path.join(mount_root, f"fsdelay{i}")
+        cpuset = ""
+        if cpus_per_instance:
+            lo = first_cpu + i * cpus_per_instance
+            cpuset = f"{lo}-{lo + cpus_per_instance - 1}"
+        mounts = [os.path.join(mnt, n) for n in slow]
+        ports = [charyb_base_port + i + k * j for j in range(len(slow))]
+        out.append(Instance(
+            index=i, project=f"fsdelay{i}",
+            endpoints=[f"http://127.0.0.1:{host_base_port + 10 * i + n}" for n in range(len(NODES))],
+            charyb_port=ports[0],
+            raw_dirs=[os.path.join(raw, n) for n in NODES],
+            mount=mounts[0],
+            containers=[prefix + n for n in NODES],
+            cpuset=cpuset,
+            compose_file=os.path.join(state_dir, f"fsdelay{i}.yml"),
+            verify_path=os.path.join(mounts[0], "member", "wal", "_probe") if verify else "",
+            slow_nodes=slow, charyb_ports=ports, mounts=mounts,
+        ))
+    return out
+
+
+def compose_yaml(inst: Instance) -> str:
+    """Compose file for one instance (same shape as docker-compose-etcd.yml)."""
+    cluster = ",".join(f"{n}=http://{n}:2380" for n in NODES)
+    mounts = {node: m for node, _port, m in inst.slow()}
+    lines = ["services:"]
+    for n, name in enumerate(NODES):
+        host_port = inst.endpoints[n].rsplit(":", 1)[1]
+        data = mounts.get(name, inst.raw_dirs[n])
+        lines += [
+            f"  {name}:",
+            f"    image: {ETCD_IMAGE}",
+            f"    container_name: {inst.containers[n]}",
+            f"    hostname: {name}",
+        ]
+        if inst.cpuset:
+            lines.append(f'    cpuset: "{inst.cpuset}"')
+        lines += [
+            "    ports:",
+            f'      - "127.0.0.1:{host_port}:2379"',
+            "    volumes:",
+            f"      - {data}:/etcd-data{n}",
+            "    command: >",
+            "      /usr/local/bin/etcd",
+            f"      --name {name}",
+            f"      --data-dir /etcd-data{n}",
+            "      --listen-client-urls http://0.0.0.0:2379",
+            "      --listen-peer-urls http://0.0.0.0:2380",
+            f"      --initial-advertise-peer-urls http://{name}:2380",
+            f"      --advertise-client-urls http://{name}:2379",
+            f"      --initial-cluster {cluster}",
+            "      --initial-cluster-state new",
+            "    restart: unless-stopped",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def save_instances(instances: List[Instance], state_dir: str = STATE_DIR) -> str:
+    os.makedirs(state_dir, exist_ok=True)
+    for inst in instances:
+        if inst.compose_file.startswith(state_dir):
+            with open(inst.compose_file, "w") as f:
+                f.write(compose_yaml(inst))
+    path = os.path.join(state_dir, INSTANCES_FILE)
+    with open(path, "w") as f:
+        json.dump([asdict(i) for i in instances], f, indent=1)
+    return path
+
+
+def load_instances(path: str) -> List[Instance]:
+    with open(path) as f:
+        return [Instance(**d) for d in json.load(f)]
+
+
+# ===================== lifecycle =====================
+
+def port_open(host: str, port: int, timeout_s: float = 0.5) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s):
+            return True
+    except OSError:
+        return False
+
+
+def _stem(inst, node):
+    """charybdefs_<project> for etcd2 (as before), charybdefs_<project>_<node> for other slow nodes."""
+    return f"charybdefs_{inst.project}" if node == SLOW_NODE else f"charybdefs_{inst.project}_{node}"
+
+
+def _pid_file(state_dir, inst, node=SLOW_NODE):
+    return os.path.join(state_dir, _stem(inst, node) + ".pid")
+
+
+def start_charybdefs(inst: Instance, state_dir: str, cmd: str, binary: str, wait_s: float = 15.0):
+    """One charybdefs per slow node, each on its own mount and RPC port."""
+    for node, port, mount in inst.slow():
+        _start_one(inst, node, port, mount, state_dir, cmd, binary, wait_s)
+
+
+def _start_one(inst, node, port, mount, state_dir, cmd, binary, wait_s):
+    tag = f"{inst.project}/{node}"
+    if port_open(inst.charyb_host, port):
+        print(f"[{tag}] charybdefs already listening on :{port}")
+        return
+    raw_slow = inst.raw_dirs[NODES.index(node)]
+    argv = shlex.split(cmd.format(port=port, bin=binary, mount=mount, raw=raw_slow))
+    if inst.cpuset:
+        argv = ["taskset", "-c", inst.cpuset] + argv
+    log_path = os.path.join(state_dir, _stem(inst, node) + ".log")
+    log = open(log_path, "ab")
+    env = dict(os.environ, CHARYBDEFS_PORT=str(port))
+    p = subprocess.Popen(argv, stdout=log, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+    with open(_pid_file(state_dir, inst, node), "w") as f:
+        f.write(str(p.pid))
+    deadline = time.monotonic() + wait_s
+    while time.monotonic() < deadline:
+        if port_open(inst.charyb_host, port):
+            print(f"[{tag}] charybdefs on :{port} (pid {p.pid}) {mount}")
+            return
+        if p.poll() is not None:
+            break
+        time.sleep(0.2)
+    raise SystemExit(f"[{tag}] charybdefs did not open :{port} (see {log_path})")
+
+
+def stop_charybdefs(inst: Instance, state_dir: str):
+    for node, _port, mount in inst.slow():
+        pf = _pid_file(state_dir, inst, node)
+        if os.path.exists(pf):
+            with open(pf) as f:
+                pid = int(f.read().strip() or 0)
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+            os.remove(pf)
+        subprocess.run(["sudo", "umount", mount], stderr=subprocess.DEVNULL)
+
+
+def compose(inst: Instance, *args):
+    return subprocess.run(["docker", "compose", "-p", inst.project, "-f", inst.compose_file, *args], check=False)
+
+
+def up(instances: List[Instance], state_dir: str, cmd: str, binary: str):
+    for inst in instances:
+        for d in inst.raw_dirs + [m for _n, _p, m in inst.slow()]:
+            os.makedirs(d, exist_ok=True)
+        start_charybdefs(inst, state_dir, cmd, binary)
+        compose(inst, "up", "-d")
+
+
+def down(instances: List[Instance], state_dir: str):
+    for inst in instances:
+        compose(inst, "down", "-v")
+        stop_charybdefs(inst, state_dir)
+
+
+async def status(instances: List[Instance]):
+    for inst in instances:
+        leader, _lid, ids = await find_leader(inst.endpoints)
+        ch = " ".join(f"{node}:{port}={'up' if port_open(inst.charyb_host, port) else 'DOWN'}"
+                      for node, port, _m in inst.slow())
+        lname = inst.container_of(leader) if leader else "none"
+        print(f"{inst.tag} {inst.project:<10} members={len(ids)}/{len(inst.endpoints)} leader={lname:<16} "
+              f"charybdefs {ch} cpuset={inst.cpuset or '-'}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bring up K independent etcd+charybdefs instances")
+    ap.add_argument("--state-dir", default=STATE_DIR)
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("plan", help="write instances.json and one compose file per instance")
+    p.add_argument("-k", "--instances", type=int, required=True)
+    p.add_argument("--raw-root", default="/data/raw")
+    p.add_argument("--mount-root", default="/mnt/slowfs")
+    p.add_argument("--charyb-base-port", type=int, default=9090)
+    p.add_argument("--host-base-port", type=int, default=23790)
+    p.add_argument("--cpus-per-instance", type=int, default=0, help="pin each instance to its own cores (0 = off)")
+    p.add_argument("--first-cpu", type=int, default=0)
+    p.add_argument("--no-verify", action="store_true", help="no host-side WAL fsync probe in sweeps")
+    p.add_argument("--slow-nodes", default=SLOW_NODE,
+                   help="nodes whose data dir is behind its own charybdefs (comma list, e.g. etcd0,etcd1,etcd2)")
+    for name in ("up", "down", "status"):
+        p = sp.add_parser(name)
+        if name == "up":
+            p.add_argument("--charybdefs-bin", default=os.path.expanduser("~/charybdefs/charybdefs"))
+            p.add_argument("--charybdefs-cmd", default=CHARYBDEFS_CMD,
+                           help="command template ({bin} {mount} {raw} {port})")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "plan":
+        try:
+            insts = make_instances(args.instances, args.state_dir, args.raw_root, args.mount_root,
+                                   args.charyb_base_port, args.host_base_port, args.cpus_per_instance,
+                                   args.first_cpu, not args.no_verify,
+                                   [n.strip() for n in args.slow_nodes.split(",") if n.strip()])
+        except ValueError as e:
+            ap.error(str(e))
+        path = save_instances(insts, args.state_dir)
+        for inst in insts:
+            ch = " ".join(f"{node}:{port}" for node, port, _m in inst.slow())
+            print(f"{inst.tag} {inst.project}: {inst.endpoints[0]}.. charybdefs {ch} "
+                  f"cpuset={inst.cpuset or '-'}  {inst.compose_file}")
+        print(f"Saved {path}")
+        return
+    insts = load_instances(os.path.join(args.state_dir, INSTANCES_FILE))
+    if args.cmd == "up":
+        up(insts, args.state_dir, args.charybdefs_cmd, args.charybdefs_bin)
+    elif args.cmd == "down":
+        down(insts, args.state_dir)
+    else:
+        asyncio.run(status(insts))
+
+
+if __name__ == "__main__":
+    main()
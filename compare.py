@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Baseline-vs-delay comparison with bootstrap confidence intervals.
+
+Runs are grouped by injected delay (sweep manifest, or the '<n>us' in the
+run label; 'baseline' / no number = 0). For every group the bootstrap
+estimates throughput, p50, p99 and p99.9 with a confidence interval, and
+every delay group is compared with the baseline group:
+
+  latency    two-level (hierarchical) bootstrap: resample the group's runs
+             with replacement, then resample each chosen run's ops. Ops are
+             not resampled one by one: a run is its DDSketch histogram
+             (qsketch.py) and resampling n ops is one multinomial draw over
+             its buckets, so a batch of resamples is a (batch, runs, buckets)
+             array and the cost does not depend on the op count. Quantiles
+             carry the sketch's relative resolution (alpha, default 1%).
+  throughput mean of per-run ok ops / wall time, runs resampled with
+             replacement; with a single run, the per-second ops of that run
+             are resampled instead (within-run only, CIs are optimistic).
+
+A difference is the baseline's bootstrap distribution subtracted from the
+group's (independent resamples). p_value is two-sided (share of the
+difference distribution on the other side of 0), adjusted with Holm over
+all rows of the table; significant = adjusted p < 1 - level. 'slower' means
+higher latency or lower throughput than the baseline.
+
+    python3 compare.py results/sweep_paper                       # sweep dir -> compare.csv in it
+    python3 compare.py 'results/*_etcd_fsdelay_*/per_op_latency.csv' --out compare.csv
+    python3 compare.py io_bench_results/raw.csv --by-phase        # baseline vs fault phase of one file
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import oprec
+import qsketch
+from analysis import Run, find_files, label_from_path
+
+METRICS = ("throughput", "p50_ms", "p99_ms", "p999_ms")
+QUANTILES = {"p50_ms": 50.0, "p99_ms": 99.0, "p999_ms": 99.9}
+FIELDS = ["group", "delay_us", "metric", "runs", "ops", "estimate", "ci_lo", "ci_hi",
+          "baseline", "base_ci_lo", "base_ci_hi", "diff", "diff_lo", "diff_hi", "ratio",
+          "p_value", "p_holm", "significant", "direction"]
+DELAY_RE = re.compile(r"(\d+)us\b")
+BASELINE = "baseline"
+BATCH = 128
+
+
+@dataclass
+class Sample:
+    """One run (or one phase of a run)."""
+    name: str
+    group: str                      # "baseline", "<delay>us" or a phase label
+    delay_us: int
+    sketch: qsketch.DDSketch
+    throughput: float
+    per_sec: np.ndarray = field(default_factory=lambda: np.zeros(0))
+
+
+@dataclass
+class Group:
+    name: str
+    delay_us: int
+    samples: List[Sample]
+
+
+# ===================== loading =====================
+
+def delay_of(label: str) -> int:
+    m = DELAY_RE.findall(label)
+    return int(m[-1]) if m else 0
+
+
+def group_of(delay_us: int) -> str:
+    return BASELINE if delay_us == 0 else f"{delay_us}us"
+
+
+def _throughput(start_ms: np.ndarray, lat_ms: np.ndarray) -> float:
+    ok = np.isfinite(lat_ms) & np.isfinite(start_ms)
+    if not ok.any():
+        return float("nan")
+    wall_s = (np.max(start_ms[ok] + lat_ms[ok]) - np.min(start_ms[ok])) / 1000.0
+    return float(ok.sum() / wall_s) if wall_s > 0 else float("nan")
+
+
+def sample_of(path: str, delay_us: Optional[int] = None, alpha: float = qsketch.DEFAULT_ALPHA) -> Sample:
+    run = Run(path)
+    o = run.ops()
+    try:
+        per_sec = run.per_sec_ops()["ops"].to_numpy(np.float64)
+    except ValueError:
+        per_sec = np.zeros(0)
+    d = delay_of(run.label) if delay_us is None else delay_us
+    return Sample(run.label, group_of(d), d, qsketch.sketch_for(path, alpha),
+                  _throughput(o["start_ms"], o["latency_ms"]), per_sec)
+
+
+def samples_by_phase(path: str, alpha: float = qsketch.DEFAULT_ALPHA) -> List[Sample]:
+    """One Sample per phase of a per-op file (group = phase label; 'baseline' is the reference)."""
+    run = Run(path)
+    o = run.ops()
+    out = []
+    for i, label in enumerate(o["phase_labels"]):
+        label = str(label)
+        m = o["phase"] == i
+        if not m.any():
+            continue
+        sk = qsketch.DDSketch(alpha).add_many(o["latency_ms"][m])
+        start = o["start_ms"][m]
+        per_sec = np.zeros(0)
+        if np.isfinite(start).any():
+            sec = np.floor((start[np.isfinite(start)] - np.nanmin(start)) / 1000.0).astype(np.int64)
+            per_sec = np.bincount(sec).astype(np.float64)
+        out.append(Sample(f"{run.label}:{label}", label, delay_of(label), sk,
+                          _throughput(start, o["latency_ms"][m]), per_sec))
+    return out
+
+
+def samples_of_sweep(sweep_dir: str, alpha: float = qsketch.DEFAULT_ALPHA) -> List[Sample]:
+    with open(os.path.join(sweep_dir, "manifest.json")) as f:
+        points = json.load(f)["points"]
+    out = []
+    for key, p in points.items():
+        if p.get("state") != "done":
+            continue
+        col = os.path.join(p["run_dir"], oprec.DEFAULT_DIR)
+        per_sec = np.zeros(0)
+        thr = os.path.join(p["run_dir"], "throughput_per_sec.csv")
+        if os.path.exists(thr):
+            per_sec = np.loadtxt(thr, delimiter=",", skiprows=1, ndmin=2)[:, 1].astype(np.float64)
+        d = int(p["delay_us"])
+        out.append(Sample(key, group_of(d), d, qsketch.sketch_for(col, alpha),
+                          float(p["summary"]["throughput"]), per_sec))
+    return out
+
+
+def group_samples(samples: List[Sample]) -> Dict[str, Group]:
+    """Groups in order: baseline first, then by delay, then by name."""
+    groups: Dict[str, Group] = {}
+    for s in samples:
+        groups.setdefault(s.group, Group(s.group, s.delay_us, [])).samples.append(s)
+    key = lambda g: (g.name != BASELINE, g.delay_us, g.name)
+    return {g.name: g for g in sorted(groups.values(), key=key)}
+
+
+# ===================== bootstrap =====================
+
+def _histograms(samples: List[Sample]):
+    """(counts R x K, bucket values K) of the samples' sketches on one key grid (+ a zero bucket)."""
+    sks = [s.sketch for s in samples if s.sketch.count]
+    if not sks:
+        return np.zeros((0, 1), dtype=np.int64), np.zeros(1)
+    used = [sk for sk in sks if sk.counts.size] or sks
+    lo = min(sk.offset for sk in used)
+    hi = max(sk.offset + max(sk.counts.size, 1) - 1 for sk in used)
+    counts = np.zeros((len(sks), hi - lo + 2), dtype=np.int64)
+    for r, sk in enumerate(sks):
+        counts[r, 0] = sk.zeros
+        if sk.counts.size:
+            counts[r, 1 + sk.offset - lo:1 + sk.offset - lo + sk.counts.size] = sk.counts
+    values = np.r_[0.0, sks[0].value_of(np.arange(lo, hi + 1))]
+    return counts, values
+
+
+def bootstrap_group(samples: List[Sample], n_boot: int, seed) -> Dict[str, np.ndarray]:
+    """Bootstrap distributions (n_boot,) of every metric for one group."""
+    rng = np.random.default_rng(seed)
+    out = {}
+    thr = np.array([s.throughput for s in samples], dtype=np.float64)
+    thr = thr[np.isfinite(thr)]
+    if thr.size > 1:
+        out["throughput"] = thr[rng.integers(0, thr.size, (n_boot, thr.size))].mean(axis=1)
+    elif samples and samples[0].per_sec.size > 1:
+        v = samples[0].per_sec
+        out["throughput"] = np.concatenate([v[rng.integers(0, v.size, (min(BATCH, n_boot - i), v.size))].mean(1)
+                                            for i in range(0, n_boot, BATCH)])
+    else:
+        out["throughput"] = np.full(n_boot, thr[0] if thr.size else np.nan)
+
+    counts, values = _histograms(samples)
+    R = counts.shape[0]
+    qs = np.array([QUANTILES[m] for m in QUANTILES])
+    lat = np.full((n_boot, qs.size), np.nan)
+    if R:
+        n = counts.sum(axis=1)
+        p = counts / n[:, None]
+        for s in range(0, n_boot, BATCH):
+            b = min(BATCH, n_boot - s)
+            runs = rng.integers(0, R, (b, R)) if R > 1 else np.zeros((b, 1), dtype=np.int64)
+            pooled = rng.multinomial(n[runs], p[runs]).sum(axis=1)         # (b, K)
+            cum = np.cumsum(pooled, axis=1)
+            rank = np.maximum(np.ceil(qs[None, :] / 100.0 * cum[:, -1:]), 1)   # (b, nq)
+            idx = (cum[:, None, :] >= rank[:, :, None]).argmax(axis=2)
+            lat[s:s + b] = values[idx]
+    for j, m in enumerate(QUANTILES):
+        out[m] = lat[:, j]
+    return out
+
+
+def point_estimates(samples: List[Sample]) -> Dict[str, float]:
+    thr = np.array([s.throughput for s in samples], dtype=np.float64)
+    pooled = qsketch.merge_all((s.sketch for s in samples), samples[0].sketch.alpha)
+    est = {"throughput": float(np.nanmean(thr)) if np.isfinite(thr).any() else float("nan")}
+    for m, q in QUANTILES.items():
+        est[m] = pooled.quantile(q)
+    return est
+
+
+def holm(p: np.ndarray) -> np.ndarray:
+    """Holm-Bonferroni adjusted p-values."""
+    p = np.asarray(p, dtype=np.float64)
+    ok = np.isfinite(p)
+    out = np.full(p.shape, np.nan)
+    if not ok.any():
+        return out
+    pv = p[ok]
+    order = np.argsort(pv)
+    m = pv.size
+    adj = np.maximum.accumulate((m - np.arange(m)) * pv[order])
+    res = np.empty(m)
+    res[order] = np.minimum(adj, 1.0)
+    out[ok] = res
+    return out
+
+
+def compare(groups: Dict[str, Group], n_boot: int = 2000, level: float = 0.95, seed: int = 0,
+            jobs: int = 1) -> List[dict]:
+    """One row per (group, metric); differences against the baseline group."""
+    seeds = np.random.SeedSequence(seed).spawn(len(groups))
+    items = list(groups.values())
+    if jobs > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            boots = list(pool.map(bootstrap_group, [g.samples for g in items], [n_boot] * len(items), seeds))
+    else:
+        boots = [bootstrap_group(g.samples, n_boot, s) for g, s in zip(items, seeds)]
+    boot = {g.name: b for g, b in zip(items, boots)}
+    est = {g.name: point_estimates(g.samples) for g in items}
+    lo_q, hi_q = 100 * (1 - level) / 2, 100 * (1 + level) / 2
+    base = boot.get(BASELINE)
+
+    rows = []
+    for g in items:
+        for m in METRICS:
+            b = boot[g.name][m]
+            ci = np.nanpercentile(b, [lo_q, hi_q]) if np.isfinite(b).any() else (np.nan, np.nan)
+            row = {"group": g.name, "delay_us": g.delay_us, "metric": m, "runs": len(g.samples),
+                   "ops": int(sum(s.sketch.count for s in g.samples)), "estimate": est[g.name][m],
+                   "ci_lo": ci[0], "ci_hi": ci[1]}
+            if base is not None and g.name != BASELINE:
+                bb = base[m]
+                d = b - bb
+                e0 = est[BASELINE][m]
+                dci = np.nanpercentile(d, [lo_q, hi_q]) if np.isfinite(d).any() else (np.nan, np.nan)
+                fin = d[np.isfinite(d)]
+                p = min(1.0, 2 * min((fin <= 0).mean(), (fin >= 0).mean())) if fin.size else np.nan
+                if fin.size:
+                    p = max(p, 1.0 / fin.size)
+                bci = np.nanpercentile(bb, [lo_q, hi_q]) if np.isfinite(bb).any() else (np.nan, np.nan)
+                diff = row["estimate"] - e0
+                row.update({"baseline": e0, "base_ci_lo": bci[0], "base_ci_hi": bci[1], "diff": diff,
+                            "diff_lo": dci[0], "diff_hi": dci[1],
+                            "ratio": row["estimate"] / e0 if e0 else np.nan, "p_value": p})
+                worse = diff < 0 if m == "throughput" else diff > 0
+                row["direction"] = "slower" if worse else "faster"
+            rows.append(row)
+
+    pv = np.array([r.get("p_value", np.nan) for r in rows])
+    for r, ph in zip(rows, holm(pv)):
+        if np.isfinite(ph):
+            r["p_holm"] = ph
+            r["significant"] = bool(ph < 1 - level)
+    return rows
+
+
+# ===================== output =====================
+
+def _fmt(v):
+    if isinstance(v, (bool, np.bool_)):
+        return int(v)
+    if isinstance(v, (float, np.floating)):
+        return "" if not np.isfinite(v) else f"{v:.6g}"
+    return v
+
+
+def write_table(rows: List[dict], path: Optional[str]):
+    f = open(path, "w", newline="") if path else sys.stdout
+    try:
+        w = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: _fmt(r.get(k, "")) for k in FIELDS})
+    finally:
+        if path:
+            f.close()
+
+
+def print_summary(rows: List[dict], level: float):
+    print(f"{'group':>10} {'metric':>10} {'runs':>4} {'estimate':>12} {f'{level:.0%} CI':>25} "
+          f"{'vs baseline':>12} {'p(holm)':>8}")
+    for r in rows:
+        ci = f"[{_fmt(r['ci_lo'])}, {_fmt(r['ci_hi'])}]"
+        vs = f"{r['ratio']:.3f}x" if np.isfinite(r.get("ratio", np.nan)) else ""
+        flag = "  SLOWER" if r.get("significant") and r.get("direction") == "slower" else (
+            "  faster" if r.get("significant") else "")
+        ph = f"{r['p_holm']:.4f}" if "p_holm" in r else ""
+        print(f"{r['group']:>10} {r['metric']:>10} {r['runs']:>4} {_fmt(r['estimate']):>12} {ci:>25} "
+              f"{vs:>12} {ph:>8}{flag}")
+
+
+def compare_sweep(sweep_dir: str, n_boot: int = 2000, level: float = 0.95, seed: int = 0) -> Optional[str]:
+    """compare.csv for a finished sweep dir (None without a baseline group)."""
+    groups = group_samples(samples_of_sweep(sweep_dir))
+    if BASELINE not in groups or len(groups) < 2:
+        return None
+    path = os.path.join(sweep_dir, "compare.csv")
+    write_table(compare(groups, n_boot, level, seed), path)
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bootstrap CIs and significance of delay vs baseline")
+    ap.add_argument("inputs", nargs="+", help="a sweep dir (manifest.json) or result files / .col dirs (globs)")
+    ap.add_argument("--by-phase", action="store_true", help="compare the phases inside each file")
+    ap.add_argument("--boot", type=int, default=2000, help="bootstrap resamples (default 2000)")
+    ap.add_argument("--level", type=float, default=0.95, help="confidence level (default 0.95)")
+    ap.add_argument("--alpha", type=float, default=qsketch.DEFAULT_ALPHA, help="sketch relative accuracy")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--jobs", type=int, default=1, help="processes (one group per task)")
+    ap.add_argument("--out", help="CSV path (default: <sweep dir>/compare.csv, or stdout for files)")
+    ap.add_argument("--json", action="store_true", help="write JSON rows instead of CSV")
+    args = ap.parse_args(argv)
+
+    out = args.out
+    if len(args.inputs) == 1 and os.path.exists(os.path.join(args.inputs[0], "manifest.json")):
+        samples = samples_of_sweep(args.inputs[0], args.alpha)
+        out = out or os.path.join(args.inputs[0], "compare.csv")
+    else:
+        paths = find_files(*args.inputs)
+        if not paths:
+            raise SystemExit(f"No files match: {' '.join(args.inputs)}")
+        samples = []
+        for p in paths:
+            try:
+                samples += samples_by_phase(p, args.alpha) if args.by_phase else [sample_of(p, alpha=args.alpha)]
+            except (OSError, ValueError) as e:
+                print(f"Skip {label_from_path(p)}: {e}", file=sys.stderr)
+    groups = group_samples(samples)
+    if BASELINE not in groups:
+        print("[compare] no baseline group (delay 0 / phase 'baseline'); CIs only", file=sys.stderr)
+    rows = compare(groups, args.boot, args.level, args.seed, args.jobs)
+    if args.json:
+        text = json.dumps([{k: _fmt(r.get(k, "")) for k in FIELDS} for r in rows], indent=1)
+        if out:
+            with open(out, "w") as f:
+                f.write(text)
+        else:
+            print(text)
+    else:
+        write_table(rows, out)
+    if out:
+        print_summary(rows, args.level)
+        print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Adaptive run length: stop a workload once its results are precise enough.
+
+A fixed op count is wrong at both ends of a delay sweep: at 1 s per op a
+1000-op run takes 16 minutes, at 1 us 200 ops are too few for a stable p99.
+With a stop rule the driver's --ops becomes a budget and the run ends as
+soon as every criterion holds:
+
+  p99=5%      the 95% confidence interval of p99 is within +-5% of p99
+              (any percentile: p50, p90, p99.9, ...; several may be given)
+  tput=N      per-second throughput has been stationary for the last N windows
+              (coefficient of variation <= tol + 1/sqrt(ops per window), as ramp.py)
+
+Other settings: ci (confidence, 0.95), tol (0.05), warmup (auto, or seconds;
+0 = none), min_ops (200) and max_s (wall-clock cap, 0 = none).
+
+Convergence is checked once per histogram interval (1 s) on the per-second
+HDR histograms the drivers already record (IntervalRecorder.on_interval),
+so there is no extra work per op. The warmup is found with MSER (the
+truncation point that minimises the standard error of the remaining
+per-window mean latencies) and excluded from the checks and from the
+reported percentiles; the per-op files still hold every op. The percentile
+CI is the distribution-free binomial order-statistic interval, which
+assumes independent latencies; closed-loop ops are correlated, so pair a
+tight quantile target with tput=N.
+
+Every check is a row of convergence.csv (window, ops, warmup, post-warmup
+percentiles and their CI half-widths, converged); the last row has the
+stop reason: converged, budget (--ops used up) or max_s.
+
+    python3 etcd_driver.py --endpoint ... --ops 20000 --until p99=5%,tput=5 --out-dir results/x
+    python3 io_bench.py --file /mnt/slowfs/test.dat --ops 5000 --until p99=5% --out latency_data.csv
+    python3 converge.py show results/x
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field, fields
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+
+from hdr_hist import HdrHistogram, IntervalRecorder, merge_all
+
+CONVERGE_CSV = "convergence.csv"
+MIN_WINDOWS = 4                     # auto warmup: never decide on fewer non-empty windows
+_QUANTILE = re.compile(r"p(\d+(?:\.\d+)?)$")
+
+
+def _fraction(text: str) -> float:
+    """'5%' or '0.05' -> 0.05."""
+    text = str(text).strip()
+    return float(text[:-1]) / 100 if text.endswith("%") else float(text)
+
+
+@dataclass
+class StopRule:
+    quantiles: Dict[float, float] = field(default_factory=dict)   # percentile -> max relative CI half-width
+    stationary: int = 0                 # throughput stationary for this many windows (0 = not required)
+    tol: float = 0.05
+    ci: float = 0.95
+    warmup: object = "auto"             # "auto" (MSER) or seconds to drop
+    min_ops: int = 200
+    max_s: float = 0.0
+
+    @classmethod
+    def parse(cls, value) -> "StopRule":
+        """Inline "p99=5%,tput=5,warmup=auto", JSON text, or a dict with the same keys."""
+        if isinstance(value, StopRule):
+            return value
+        if isinstance(value, str):
+            text = value.strip()
+            if text.startswith("{"):
+                d = json.loads(text)
+            else:
+                d = {}
+                for part in filter(None, (p.strip() for p in text.split(","))):
+                    k, sep, v = part.partition("=")
+                    if not sep:
+                        raise ValueError(f"until: expected key=value, got {part!r}")
+                    d[k.strip()] = v.strip()
+        else:
+            d = dict(value)
+        kw, qs = {}, {}
+        names = {f.name for f in fields(cls)} - {"quantiles"}
+        for k, v in d.items():
+            m = _QUANTILE.match(k)
+            if m:
+                qs[float(m.group(1))] = _fraction(v)
+            elif k in ("tput", "stationary"):
+                kw["stationary"] = int(v)
+            elif k == "quantiles":
+                qs.update({float(q): _fraction(t) for q, t in v.items()})
+            elif k in names:
+                kw[k] = v
+            else:
+                raise ValueError(f"until: unknown setting {k!r}")
+        rule = cls(quantiles=qs, **kw)
+        rule.tol, rule.ci = _fraction(rule.tol), _fraction(rule.ci)
+        rule.min_ops, rule.max_s = int(rule.min_ops), float(rule.max_s)
+        if str(rule.warmup).lower() in ("auto", "mser"):
+            rule.warmup = "auto"
+        else:
+            rule.warmup = float(rule.warmup)
+        if not rule.quantiles and not rule.stationary:
+            raise ValueError("until: give a percentile target (p99=5%) and/or tput=<windows>")
+        if not 0 < rule.ci < 1 or any(not 0 < q < 100 or t <= 0 for q, t in rule.quantiles.items()):
+            raise ValueError("until: ci in (0, 1), percentiles in (0, 100), targets > 0")
+        return rule
+
+    def describe(self) -> str:
+        parts = [f"p{q:g}={t * 100:g}%" for q, t in sorted(self.quantiles.items())]
+        if self.stationary:
+            parts.append(f"tput={self.stationary}")
+        for f in fields(self):
+            if f.name not in ("quantiles", "stationary") and getattr(self, f.name) != f.default:
+                parts.append(f"{f.name}={getattr(self, f.name):g}" if isinstance(getattr(self, f.name), float)
+                             else f"{f.name}={getattr(self, f.name)}")
+        return ",".join(parts)
+
+    def argv(self) -> list:
+        return ["--until", self.describe()]
+
+
+def stop_rule_arg(text: str) -> StopRule:
+    """argparse type for --until."""
+    try:
+        return StopRule.parse(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_arguments(ap: argparse.ArgumentParser):
+    ap.add_argument("--until", type=stop_rule_arg, metavar="RULE",
+                    help="stop when precise enough, --ops is then the budget (converge.py): "
+                         "e.g. p99=5%%,tput=5,warmup=auto,min_ops=200,max_s=600")
+
+
+# ===================== statistics =====================
+
+def mser(x: np.ndarray) -> int:
+    """MSER truncation point: argmin over d <= n/2 of SSE(x[d:]) / (n - d)^2."""
+    n = x.size
+    s1 = np.cumsum(x[::-1])[::-1]
+    s2 = np.cumsum((x * x)[::-1])[::-1]
+    m = n - np.arange(n)
+    stat = (s2 - s1 * s1 / m) / (m * m)
+    return int(np.argmin(stat[: n // 2 + 1]))
+
+
+def quantile_ci(h: HdrHistogram, q: float, z: float):
+    """(low, estimate, high) of percentile q; high is inf while too few values are above it."""
+    n = h.total
+    p = q / 100.0
+    sd = math.sqrt(n * p * (1 - p))
+    lo_rank, hi_rank = math.floor(n * p - z * sd), math.ceil(n * p + z * sd)
+    est = h.percentile(q)
+    if hi_rank > n:
+        return math.nan, est, math.inf
+    lo = h.percentile(100.0 * max(lo_rank, 1) / n)
+    hi = h.percentile(100.0 * hi_rank / n)
+    return lo, est, hi
+
+
+def stationary(counts, tol: float) -> Optional[float]:
+    """Coefficient of variation of the window counts if it passes ramp.py's test, else None."""
+    last = np.asarray(counts, dtype=np.float64)
+    mean = last.mean()
+    if mean <= 0:
+        return None
+    cv = float(last.std() / mean)
+    return cv if cv <= tol + 1.0 / math.sqrt(mean) else None
+
+
+# ===================== incremental check =====================
+
+class Convergence:
+    """
+    Consumes the finished intervals of an IntervalRecorder (attach()) and
+    decides when the run may stop; stop() is what the op loop polls.
+    """
+
+    def __init__(self, rule: StopRule, interval_ns: int = 1_000_000_000):
+        self.rule = rule
+        self.interval_ns = int(interval_ns)
+        self.z = NormalDist().inv_cdf((1 + rule.ci) / 2)
+        self.total = None                    # all finished windows
+        self.sparse = []                     # per window: (bucket index, count) or None if empty
+        self.counts = []                     # ok ops per window
+        self.means = []                      # mean latency per window (ns)
+        self.rows = []
+        self.done = False
+        self.warmup_windows = None
+        self._last_warmup = None
+        self.reason = ""
+        self.deadline_ns = None
+
+    def attach(self, rec: IntervalRecorder, start_perf_ns: Optional[int] = None) -> "Convergence":
+        """start_perf_ns: perf_counter_ns() origin of max_s when rec runs on another clock."""
+        rec.on_interval = self.on_interval
+        if self.rule.max_s:
+            start = rec.t0_perf_ns if start_perf_ns is None else start_perf_ns
+            self.deadline_ns = start + int(self.rule.max_s * 1e9)
+        return self
+
+    def stop(self) -> bool:
+        return self.done or (self.deadline_ns is not None and time.perf_counter_ns() >= self.deadline_ns)
+
+    def on_interval(self, k: int, hist: HdrHistogram):
+        while len(self.counts) < k:          # windows without a completed op
+            self.sparse.append(None)
+            self.counts.append(0)
+            self.means.append(math.nan)
+        nz = np.flatnonzero(hist.counts)
+        self.sparse.append((nz, hist.counts[nz].copy()))
+        self.counts.append(hist.total)
+        self.means.append(hist.mean())
+        if self.total is None:
+            self.total = HdrHistogram(hist.lowest, hist.highest, hist.sigfig)
+        self.total.merge(hist)
+        self.rows.append(self._check(k, hist.total))
+
+    def _warmup(self) -> Optional[int]:
+        """Number of leading windows to drop, None while the warmup is not over."""
+        if self.done:
+            return self.warmup_windows
+        w = len(self.counts)
+        if self.rule.warmup != "auto":
+            d = math.ceil(self.rule.warmup * 1e9 / self.interval_ns)
+            return d if d < w else None
+        idx = [j for j in range(w) if self.counts[j]]
+        if len(idx) < MIN_WINDOWS:
+            return None
+        d = mser(np.asarray([self.means[j] for j in idx]))
+        if d < len(idx) // 2:
+            self._last_warmup = idx[d]
+        return self._last_warmup          # a cut at the n/2 limit keeps the previous decision
+
+    def post_warmup(self, d: Optional[int] = None) -> HdrHistogram:
+        """Histogram of all finished windows after the first d (default: the warmup)."""
+        d = self.warmup_windows if d is None else d
+        h = self.total.copy() if self.total is not None else HdrHistogram()
+        for s in self.sparse[: d or 0]:
+            if s is not None:
+                h.counts[s[0]] -= s[1]
+                h.total -= int(s[1].sum())
+        return h
+
+    def _check(self, k: int, window_ops: int) -> dict:
+        rule = self.rule
+        d = self._warmup()
+        ops = int(sum(self.counts))
+        row = {"window": k, "t_s": round((k + 1) * self.interval_ns / 1e9, 3), "ops": ops,
+               "window_ops": window_ops, "mean_ms": self.means[-1] / 1e6,
+               "warmup_windows": "" if d is None else d,
+               "warmup_ops": "" if d is None else int(sum(self.counts[:d]))}
+        ok = d is not None and ops >= rule.min_ops
+        post = self.post_warmup(d) if d is not None else None
+        row["post_ops"] = post.total if post is not None else ""
+        for q, target in sorted(rule.quantiles.items()):
+            hw = math.inf
+            est = math.nan
+            if post is not None and post.total:
+                lo, est, hi = quantile_ci(post, q, self.z)
+                hw = (hi - lo) / 2 / est if est > 0 and math.isfinite(hi) else math.inf
+            row[f"p{q:g}_ms"] = est / 1e6
+            row[f"p{q:g}_hw"] = hw
+            ok = ok and hw <= target
+        if rule.stationary:
+            cv = None
+            if d is not None and len(self.counts) - d >= rule.stationary:
+                cv = stationary(self.counts[-rule.stationary:], rule.tol)
+            row["tput_cv"] = "" if cv is None else cv
+            ok = ok and cv is not None
+        if ok and not self.done:
+            self.done, self.warmup_windows = True, d
+        row["converged"] = int(self.done)
+        return row
+
+    def finish(self) -> str:
+        """Stop reason once the op loop has ended: converged, max_s or budget."""
+        if self.done:
+            self.reason = "converged"
+        elif self.deadline_ns is not None and time.perf_counter_ns() >= self.deadline_ns:
+            self.reason = "max_s"
+        else:
+            self.reason = "budget"
+        if self.warmup_windows is None and self.rows and self.rows[-1]["warmup_windows"] != "":
+            self.warmup_windows = self.rows[-1]["warmup_windows"]
+        if self.rows:
+            self.rows[-1]["stop"] = self.reason
+        return self.reason
+
+    def summary(self) -> dict:
+        return summarize(self.rows, self.interval_ns)
+
+
+# ===================== files =====================
+
+def write_csv(path: str, rows) -> str:
+    """convergence.csv in a run dir (or at path if it ends in .csv)."""
+    if not path.endswith(".csv"):
+        path = os.path.join(path, CONVERGE_CSV)
+    keys = []
+    for r in rows:
+        keys += [k for k in r if k not in keys]
+    if "stop" in keys:
+        keys.remove("stop")
+        keys.append("stop")
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=keys)
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: (f"{v:.6g}" if isinstance(v, float) else v) for k, v in r.items()})
+    return path
+
+
+def read_csv(path: str) -> list:
+    if not path.endswith(".csv"):
+        path = os.path.join(path, CONVERGE_CSV)
+    out = []
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            out.append({k: (v if k == "stop" or v == "" else float(v)) for k, v in r.items()})
+    return out
+
+
+def summarize(rows, interval_ns: int = 1_000_000_000) -> dict:
+    """converged, stop_reason, warmup_s / warmup_ops, ops_to_converge and the final CI half-widths."""
+    if not rows:
+        return {}
+    last = rows[-1]
+    warm = last.get("warmup_windows", "")
+    out = {"converged": int(last["converged"]), "stop_reason": last.get("stop", ""),
+           "warmup_s": None if warm == "" else warm * interval_ns / 1e9,
+           "warmup_ops": None if warm == "" else int(last["warmup_ops"]),
+           "ops_to_converge": next((int(r["ops"]) for r in rows if r["converged"]), None)}
+    for k, v in last.items():
+        if k.endswith("_hw"):
+            out[k.replace("_hw", "_ci_hw")] = v if v != "" else None
+    return out
+
+
+def post_warmup(hlog: dict, warmup_s: Optional[float]) -> HdrHistogram:
+    """Merge the intervals of a read_log() dict that start after the warmup."""
+    cut = hlog["t0_perf_ns"] + int((warmup_s or 0) * 1e9)
+    return merge_all(h for start, _end, h in hlog["intervals"] if start >= cut)
+
+
+def format_summary(s: dict) -> str:
+    cis = "  ".join(f"{k.replace('_ci_hw', '')}=±{v * 100:.1f}%" for k, v in s.items()
+                    if k.endswith("_ci_hw") and v is not None and math.isfinite(v))
+    warm = "not detected" if s["warmup_s"] is None else f"{s['warmup_s']:g}s / {s['warmup_ops']} ops"
+    when = f" at {s['ops_to_converge']} ops" if s["ops_to_converge"] else ""
+    return f"  stop={s['stop_reason']}{when}  warmup={warm}  {cis}".rstrip()
+
+
+# ===================== CLI =====================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Adaptive run length: inspect convergence.csv")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("show", help="print the convergence checks of a run")
+    p.add_argument("run_dir")
+    p.add_argument("--all", action="store_true", help="every window, not only the last 10")
+    p = sp.add_parser("rule", help="parse and print a stop rule")
+    p.add_argument("rule", type=stop_rule_arg)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "rule":
+        print(args.rule.describe())
+        print(json.dumps(asdict(args.rule)))
+        return
+    rows = read_csv(args.run_dir)
+    for r in rows if args.all else rows[-10:]:
+        print("  " + "  ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items()))
+    print(format_summary(summarize(rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,88 @@
-import os, glob
-import pandas as pd
 import matplotlib.pyplot as plt
-from math import floor
+from math import floor, isnan
+
+import changepoint
+from analysis import Run, find_files, smooth
 
 # configuration
 # use one of the patterns below (or both):
 CSV_PATTERN = "latency_data_*.csv"     # e.g., latency_data_fs-delay-100ms.csv
 LOG_PATTERN = "latency_x*ms.log"       # e.g., latency_x100ms.log
+# either pattern may be a catalog query instead (catalog.py), e.g. "catalog:kind=io delay_ms>=10"
 
 SMOOTH_WINDOW_SEC = 3                  # rolling avg (seconds)
+DETECT_CHANGES = True                  # change points: onset, time to degrade / recover (changepoint.py)
 FAULT_START_OVERRIDE = None            # set a second value to force the vertical line position, or None
 FIGSIZE = (14, 6)
 TITLE = "Filesystem Delay Injection: Throughput vs Time"
 
-def load_from_csv(path: str):
-    """CSV with columns: timestamp_ms, latency_ms, phase (baseline/fault)."""
-    df = pd.read_csv(path)
-    if "timestamp_ms" not in df.columns:
-        raise ValueError(f"{path}: 'timestamp_ms' column not found.")
-    t0 = df["timestamp_ms"].min()
-    df["t_sec"] = (df["timestamp_ms"] - t0) // 1000
-
-    # Per-second 
-    per_sec = df.groupby("t_sec").size().rename("ops").reset_index()
-
-    # Fill missing seconds
-    full_idx = pd.RangeIndex(per_sec["t_sec"].min(), per_sec["t_sec"].max() + 1)
-    per_sec = per_sec.set_index("t_sec").reindex(full_idx, fill_value=0).rename_axis("t_sec").reset_index()
-
-    # Smoothing
-    per_sec["ops_smooth"] = per_sec["ops"].rolling(window=SMOOTH_WINDOW_SEC,
-                                                   center=True, min_periods=1).mean()
-
-    # Estimate fault start if there is any row with phase != baseline
-    fault_start = None
-    if "phase" in df.columns:
-        fault_rows = df[df["phase"] != "baseline"]
-        if not fault_rows.empty:
-            fault_start = floor(((fault_rows["timestamp_ms"].min() - t0) / 1000.0))
-
-    label = os.path.splitext(os.path.basename(path))[0].replace("latency_data_", "")
-    return per_sec, fault_start, label
+MARK_STYLE = {"start": "--", "end": ":", "change": "-."}
 
-def load_from_log(path: str):
-    """Log with lines like 'timestamp_ms,...' (as in your reference)."""
-    timestamps = []
-    with open(path, "r") as f:
-        for line in f:
-            if "," not in line:
-                continue
-            ts = line.strip().split(",")[0]
-            if ts.isdigit():
-                timestamps.append(int(ts))
 
-    if not timestamps:
-        raise ValueError(f"{path}: no valid timestamps found.")
+def load_run(run: Run):
+    """
+    Ops per second (missing seconds filled with 0, rolling mean) from a
+    CSV with timestamp_ms, latency_ms, phase or a log with 'timestamp_ms,...'
+    lines. Fault boundaries: prefer the transitions logged by
+    fault_timeline.py, otherwise the first row with phase != baseline
+    (unknown for a plain log).
+    """
+    per_sec = run.per_sec_ops()
+    per_sec["ops_smooth"] = smooth(per_sec["ops"], SMOOTH_WINDOW_SEC)
+    fs = run.fault_start_sec()
+    return per_sec, (floor(fs) if fs is not None else None), run.label
 
-    s = pd.Series(timestamps)
-    t0 = s.min()
-    t_sec = (s - t0) // 1000
-    per_sec = t_sec.value_counts().sort_index().rename("ops").reset_index()
-    per_sec = per_sec.rename(columns={"index": "t_sec"})
 
-    full_idx = pd.RangeIndex(per_sec["t_sec"].min(), per_sec["t_sec"].max() + 1)
-    per_sec = per_sec.set_index("t_sec").reindex(full_idx, fill_value=0).rename_axis("t_sec").reset_index()
+def main():
+    # Collect files
+    files = find_files(CSV_PATTERN, LOG_PATTERN)
+    if not files:
+        raise SystemExit("No files match the pattern. Check CSV_PATTERN/LOG_PATTERN.")
 
-    per_sec["ops_smooth"] = per_sec["ops"].rolling(window=SMOOTH_WINDOW_SEC,
-                                                   center=True, min_periods=1).mean()
+    plt.figure(figsize=FIGSIZE)
 
-    label = os.path.splitext(os.path.basename(path))[0].replace("latency_", "")
-    return per_sec, None, label  # fault_start is unknown from a plain log
-
-# Collect files
-files = sorted(glob.glob(CSV_PATTERN)) + sorted(glob.glob(LOG_PATTERN))
-if not files:
-    raise SystemExit("No files match the pattern. Check CSV_PATTERN/LOG_PATTERN.")
-
-plt.figure(figsize=FIGSIZE)
-
-fault_candidates = []
-for path in files:
-    try:
-        if path.endswith(".csv"):
-            per_sec, fs, label = load_from_csv(path)
+    fault_candidates = []
+    for path in files:
+        try:
+            run = Run(path)
+            per_sec, fs, label = load_run(run)
             if fs is not None:
                 fault_candidates.append(fs)
-        else:
-            per_sec, fs, label = load_from_log(path)
-        plt.plot(per_sec["t_sec"], per_sec["ops_smooth"], linewidth=1.8, label=label)
-    except Exception as e:
-        print(f"Skip {path}: {e}")
-
-# Vertical line for Fault Start
-if FAULT_START_OVERRIDE is not None:
-    fs = FAULT_START_OVERRIDE
-elif fault_candidates:
-    # use median for stability if files differ slightly
-    fault_candidates.sort()
-    fs = fault_candidates[len(fault_candidates)//2]
-else:
-    fs = None
-
-if fs is not None:
-    plt.axvline(fs, linestyle="--", linewidth=1.5, label="Fault Start")
-
-# Styling
-plt.title(TITLE)
-plt.xlabel("Time (seconds)")
-plt.ylabel("Throughput (ops/sec)")
-plt.grid(True, linestyle="--", alpha=0.5)
-plt.legend(title="Delay Config")
-plt.tight_layout()
-plt.show()
+            line, = plt.plot(per_sec["t_sec"], per_sec["ops_smooth"], linewidth=1.8, label=label)
+            # detected onset, degraded level and recovery, on the raw series
+            if DETECT_CHANGES:
+                ch = changepoint.analyze(per_sec["t_sec"], per_sec["ops"], "throughput", changepoint.run_marks(run))
+                changepoint.annotate(plt.gca(), ch, color=line.get_color())
+                if fs is None and not isnan(ch.onset_s):
+                    fault_candidates.append(floor(ch.onset_s))
+            # every recorded fault transition, in the series' color
+            for t_mark, kind in run.fault_marks():
+                plt.axvline(t_mark, color=line.get_color(), linestyle=MARK_STYLE[kind], linewidth=1.2, alpha=0.8)
+        except Exception as e:
+            print(f"Skip {path}: {e}")
+
+    # Vertical line for Fault Start
+    if FAULT_START_OVERRIDE is not None:
+        fs = FAULT_START_OVERRIDE
+    elif fault_candidates:
+        # use median for stability if files differ slightly
+        fault_candidates.sort()
+        fs = fault_candidates[len(fault_candidates)//2]
+    else:
+        fs = None
+
+    if fs is not None:
+        plt.axvline(fs, linestyle="--", linewidth=1.5, label="Fault Start")
+
+    # Styling
+    plt.title(TITLE)
+    plt.xlabel("Time (seconds)")
+    plt.ylabel("Throughput (ops/sec)")
+    plt.grid(True, linestyle="--", alpha=0.5)
+    plt.legend(title="Delay Config")
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
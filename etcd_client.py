@@ -0,0 +1,200 @@
+"""
+Minimal asyncio client for the etcd v3 JSON gateway (HTTP/1.1, keep-alive).
+
+No third-party dependencies: each EtcdClient owns a small pool of persistent
+connections to one endpoint, so a workload pays the TCP connect once per
+connection instead of a `docker exec etcdctl` per op.
+
+    c = EtcdClient("http://127.0.0.1:23792", pool_size=8)
+    await c.put(b"k1", b"v1")
+    st = await c.status()          # leader, raftTerm, raftIndex, ...
+    await c.close()
+
+Keys and values are bytes; the gateway wants them base64 encoded.
+"""
+import asyncio
+import base64
+import json
+from urllib.parse import urlsplit
+
+
+class EtcdError(Exception):
+    """Non-2xx reply from the gateway, or a broken connection."""
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def unb64(text: str) -> bytes:
+    return base64.b64decode(text) if text else b""
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection (POST only)."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def _read_body(self, headers: dict) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    return b"".join(chunks)
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+        n = int(headers.get("content-length", 0))
+        return await self.reader.readexactly(n) if n else b""
+
+    async def post(self, path: str, body: bytes):
+        if self.writer is None:
+            await self.open()
+        self.writer.write(
+            b"POST %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\n"
+            b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n%s"
+            % (path.encode(), self.host.encode(), len(body), body))
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        data = await self._read_body(headers)
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+
+class EtcdClient:
+    """
+    Pooled client for one endpoint. Calls borrow a connection from the pool;
+    a connection that fails is dropped and the call is retried once on a
+    fresh one.
+    """
+
+    def __init__(self, endpoint: str, pool_size: int = 1, timeout_s: float = 30.0):
+        u = urlsplit(endpoint if "://" in endpoint else "http://" + endpoint)
+        self.endpoint = endpoint
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 2379
+        self.timeout_s = timeout_s
+        self._pool = asyncio.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put_nowait(HttpConnection(self.host, self.port))
+
+    async def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    async def call(self, path: str, payload: dict) -> dict:
+        return await self.call_raw(path, json.dumps(payload).encode())
+
+    async def call_raw(self, path: str, body: bytes) -> dict:
+        conn = await self._pool.get()
+        try:
+            for attempt in (0, 1):
+                try:
+                    status, data = await asyncio.wait_for(conn.post(path, body), self.timeout_s)
+                    break
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                    conn.close()
+                    if attempt:
+                        raise EtcdError(f"{self.endpoint}{path}: {e!r}") from e
+        finally:
+            self._pool.put_nowait(conn)
+        if status >= 300:
+            raise EtcdError(f"{self.endpoint}{path}: HTTP {status} {data[:200]!r}")
+        if not data:
+            return {}
+        try:
+            return json.loads(data)
+        except ValueError as e:                 # truncated or non-JSON gateway body
+            raise EtcdError(f"{self.endpoint}{path}: bad JSON body {data[:200]!r}") from e
+
+    # --- KV -------------------------------------------------------------
+    async def put(self, key: bytes, value: bytes) -> dict:
+        return await self.call_raw("/v3/kv/put", b'{"key":"%s","value":"%s"}'
+                                   % (b64(key).encode(), b64(value).encode()))
+
+    async def get(self, key: bytes, serializable: bool = False) -> dict:
+        return await self.call("/v3/kv/range", {"key": b64(key), "serializable": serializable})
+
+    async def range(self, key: bytes, range_end: bytes, limit: int = 0, serializable: bool = False) -> dict:
+        return await self.call("/v3/kv/range", {"key": b64(key), "range_end": b64(range_end), "limit": limit,
+                                                "serializable": serializable})
+
+    async def delete(self, key: bytes) -> dict:
+        return await self.call("/v3/kv/deleterange", {"key": b64(key)})
+
+    async def txn(self, compare: list, success: list, failure: list = ()) -> dict:
+        """Txn built from compare_* / request_* dicts below."""
+        return await self.call("/v3/kv/txn", {"compare": compare, "success": success, "failure": list(failure)})
+
+    @staticmethod
+    def compare_version(key: bytes, op: str, version: int) -> dict:
+        result = {"=": "EQUAL", ">": "GREATER", "<": "LESS", "!=": "NOT_EQUAL"}[op]
+        return {"key": b64(key), "target": "VERSION", "result": result, "version": str(version)}
+
+    @staticmethod
+    def request_put(key: bytes, value: bytes) -> dict:
+        return {"request_put": {"key": b64(key), "value": b64(value)}}
+
+    @staticmethod
+    def request_range(key: bytes) -> dict:
+        return {"request_range": {"key": b64(key)}}
+
+    # --- lease ------------------------------------------------------------
+    async def lease_grant(self, ttl_s: int) -> dict:
+        return await self.call("/v3/lease/grant", {"TTL": str(ttl_s)})
+
+    # --- cluster / maintenance -------------------------------------------
+    async def status(self) -> dict:
+        return await self.call("/v3/maintenance/status", {})
+
+    async def member_list(self) -> list:
+        return (await self.call("/v3/cluster/member/list", {})).get("members", [])
+
+    async def move_leader(self, target_id) -> dict:
+        return await self.call("/v3/maintenance/transfer-leadership", {"targetID": str(target_id)})
+
+
+async def find_leader(endpoints):
+    """
+    Ask every endpoint for its status; return (leader_endpoint, leader_id,
+    {endpoint: member_id}). leader_endpoint is None if nobody answered.
+    """
+    ids, leader = {}, None
+    for ep in endpoints:
+        c = EtcdClient(ep, timeout_s=3.0)
+        try:
+            st = await c.status()
+            ids[ep] = st.get("header", {}).get("member_id")
+            leader = leader or st.get("leader")
+        except EtcdError:
+            pass
+        finally:
+            await c.close()
+    for ep, mid in ids.items():
+        if mid is not None and mid == leader:
+            return ep, leader, ids
+    return None, leader, ids
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+In-process etcd workload driver (replaces the per-op `docker exec etcdctl`
++ `/usr/bin/time` loop of run_etcd_fsdelay.sh).
+
+N asyncio clients share a pool of keep-alive connections to the leader's
+JSON gateway and issue PUTs back-to-back. Each op is timed with
+time.perf_counter_ns(); the wall-clock start of each op is derived from one
+(time.time_ns, perf_counter_ns) pair taken at the start of the run.
+
+With --ramp the driver steps the number of closed-loop clients instead
+(ramp.py) and reports the saturation knee: the max sustainable throughput.
+
+With --workload the ops follow a YCSB-style mix instead (workload.py): put,
+get, serializable get, range, txn, delete and lease grant with uniform /
+zipfian / latest keys and a value-size distribution, drawn before the run.
+The keyspace is preloaded first (outside the measurement).
+
+With --rate the driver runs open-loop instead (see loadgen.py): ops are
+issued at a fixed or Poisson rate regardless of completions, and latency
+is reported from the intended start as well as from the actual send.
+
+With --until the run length adapts (converge.py): --ops is the budget and
+the run stops once e.g. p99's confidence interval is within 5%
+(--until p99=5%) after an automatically detected warmup, which is left out
+of the reported percentiles.
+
+Outputs in --out-dir (same names as the shell loop):
+  per_op_latency.csv      op,seconds,start_unix_ns
+                          (+ intended_unix_ns,queue_seconds,corrected_seconds when open-loop)
+  throughput_per_sec.csv  sec,ops            (binned by op start time, aggregate.py)
+  latency_per_sec.csv     sec,avg_latency_s,ops,ops_per_s,mean_ms,p50_ms,p90_ms,p99_ms,max_ms
+  latency_per_<w>.csv     same per --agg-widths interval other than 1 s
+  latency.hlog            per-second + cumulative HDR histograms (hdr_hist.py)
+                          (+ latency_corrected.hlog when open-loop)
+  latency_<op>.hlog       the same per op type, when the workload mixes several
+  per_op_type.csv         op,ok,fail,share,throughput,mean/p50/p90/p99/p999/max_ms per op type (--workload)
+  per_op.col/             columnar binary per-op records (oprec.py), appended while running;
+                          the op column holds each op's type
+  raft_status.csv         leader / term / raft indexes of every member, sampled during the run
+                          (--monitor-endpoints, raft_monitor.py)
+  ramp.csv                per-step concurrency, throughput, p50/p90/p99, Little's-law N (--ramp; the
+                          per-op files are per_op.col with phase c<N> per step, latency.hlog, per-sec CSVs)
+  convergence.csv         one row per second: ops, warmup, post-warmup percentiles and CI half-widths,
+                          converged; stop reason in the last row (--until)
+  run.json                run manifest for the catalog (catalog.py): workload options, the
+                          caller's --param key=value pairs (mode, delay_us, leader, ...), summary
+
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ops 1000 --concurrency 1 --out-dir results/x
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ops 60000 --rate 2000 --arrival poisson --out-dir results/y
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ops 20000 --concurrency 16 --workload ycsb-b --out-dir results/z
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ramp 1..512 --out-dir results/ramp
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ops 50000 --until p99=5%,tput=5 --out-dir results/a
+"""
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+
+import aggregate
+import catalog
+import converge
+import oprec
+import workload
+from etcd_client import EtcdClient, EtcdError
+from hdr_hist import IntervalRecorder, format_percentiles
+from oprec import ColumnWriter, DEFAULT_DIR, OP_TYPES, STATUS_OK, STATUS_ERR
+from raft_monitor import RaftMonitor
+import loadgen
+import ramp
+
+
+class OpLog:
+    """
+    Fixed-size per-op arrays indexed by op number (0-based). The run's time
+    origin is the moment the log is created. `op` is set to the workload
+    stream's op types (OP_TYPES codes) by run().
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.start_ns = array("q", bytes(8 * n))     # perf_counter_ns at send
+        self.lat_ns = array("q", bytes(8 * n))
+        self.ok = bytearray(n)
+        self.op = None
+        self.convergence = None
+        self.t0_wall_ns = time.time_ns()
+        self.t0_perf_ns = time.perf_counter_ns()
+        self.end_perf_ns = self.t0_perf_ns
+
+    def truncate(self, n: int):
+        """Keep the first n ops (an adaptive run stopped before its budget)."""
+        del self.start_ns[n:], self.lat_ns[n:], self.ok[n:]
+        if self.op is not None:
+            self.op = self.op[:n]
+        self.n = n
+
+    def wall_ns(self, i: int) -> int:
+        return self.t0_wall_ns + (self.start_ns[i] - self.t0_perf_ns)
+
+    def recorder(self, out_dir: str, name: str = "latency.hlog") -> IntervalRecorder:
+        return IntervalRecorder(os.path.join(out_dir, name), self.t0_perf_ns, self.t0_wall_ns)
+
+
+async def closed_loop(do, log: OpLog, concurrency: int, rec: IntervalRecorder, cols: ColumnWriter,
+                      type_recs: dict = None, stop=None):
+    """
+    `concurrency` workers, each with one outstanding op at a time; op i is
+    `await do(i)` and has type log.op[i]. type_recs: per-type recorders.
+    stop(): no new ops once it returns True (the log is cut to the ops issued).
+    """
+    next_op = iter(range(log.n))
+    issued = [log.n]
+    perf = time.perf_counter_ns
+    wall_off = log.t0_wall_ns - log.t0_perf_ns
+    ops = log.op                            # OP_TYPES codes = the .col's initial op labels
+
+    async def worker():
+        for i in next_op:
+            if stop is not None and stop():
+                issued[0] = min(issued[0], i)
+                break
+            t0 = perf()
+            try:
+                await do(i)
+                log.ok[i] = 1
+            except EtcdError:
+                pass
+            t1 = perf()
+            log.start_ns[i] = t0
+            log.lat_ns[i] = t1 - t0
+            if log.ok[i]:
+                rec.record(t1 - t0, t1)
+                if type_recs:
+                    type_recs[ops[i]].record(t1 - t0, t1)
+            cols.append(t0 + wall_off, t1 - t0, ops[i], status=STATUS_OK if log.ok[i] else STATUS_ERR)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    log.end_perf_ns = perf()
+    if issued[0] < log.n:
+        log.truncate(issued[0])
+
+
+def summarize(log: OpLog, hist) -> dict:
+    wall = (log.end_perf_ns - log.t0_perf_ns) / 1e9
+    ok = hist.total
+    p50, p95, p99 = hist.percentiles((50, 95, 99)) / 1e9
+    return {
+        "ok": ok, "fail": log.n - ok, "wall_s": wall,
+        "throughput": ok / wall if wall > 0 else 0.0,
+        "p50": p50, "p95": p95, "p99": p99,
+    }
+
+
+def write_per_sec(out_dir: str, starts_ns, lats_ns, ok, t0_perf_ns: int, widths=(1.0,)):
+    """Per-interval CSVs (aggregate.py), binned by op start time from the run start."""
+    aggregate.write_outputs(out_dir, np.frombuffer(starts_ns, dtype=np.int64), np.frombuffer(lats_ns, dtype=np.int64),
+                            ok=np.frombuffer(bytes(ok), dtype=np.uint8), t0_ns=t0_perf_ns, widths=widths)
+
+
+def write_outputs(log: OpLog, out_dir: str, widths=(1.0,), per_sec: bool = True):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "per_op_latency.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["op", "seconds", "start_unix_ns"])
+        for i in range(log.n):
+            w.writerow([i + 1, f"{log.lat_ns[i] / 1e9:.9f}" if log.ok[i] else "NaN", log.wall_ns(i)])
+    if per_sec:
+        write_per_sec(out_dir, log.start_ns, log.lat_ns, log.ok, log.t0_perf_ns, widths)
+
+
+def write_open_loop_outputs(log: loadgen.OpenLoopLog, out_dir: str, widths=(1.0,), per_sec: bool = True):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "per_op_latency.csv"), "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["op", "seconds", "start_unix_ns", "intended_unix_ns", "queue_seconds", "corrected_seconds"])
+        for i in range(log.n):
+            if log.ok[i]:
+                lat = (f"{log.service_ns(i) / 1e9:.9f}", f"{log.queue_ns(i) / 1e9:.9f}",
+                       f"{log.corrected_ns(i) / 1e9:.9f}")
+            else:
+                lat = ("NaN", "NaN", "NaN")
+            w.writerow([i + 1, lat[0], log.wall_ns(log.send_ns[i]), log.wall_ns(log.intended_ns[i]),
+                        lat[1], lat[2]])
+    if per_sec:
+        svc = np.frombuffer(log.done_ns, dtype=np.int64) - np.frombuffer(log.send_ns, dtype=np.int64)
+        write_per_sec(out_dir, log.send_ns, svc, log.ok, log.t0_perf_ns, widths)
+
+
+def per_type_rows(log) -> list:
+    """workload.per_type rows of a finished OpLog or open-loop log (service + corrected latency)."""
+    codes = np.frombuffer(log.op, dtype=np.uint8)
+    ok = np.frombuffer(bytes(log.ok), dtype=np.uint8).astype(bool)
+    wall = (log.end_perf_ns - log.t0_perf_ns) / 1e9
+    if isinstance(log, OpLog):
+        return workload.per_type(codes, np.frombuffer(log.lat_ns, dtype=np.int64), ok, wall)
+    done = np.frombuffer(log.done_ns, dtype=np.int64)
+    return workload.per_type(codes, done - np.frombuffer(log.send_ns, dtype=np.int64), ok, wall,
+                             corrected_ns=done - np.frombuffer(log.intended_ns, dtype=np.int64))
+
+
+def workload_spec(args) -> workload.WorkloadSpec:
+    """--workload, or the original sequential PUT loop with --value-size values."""
+    return args.workload or workload.WorkloadSpec(value_size=args.value_size)
+
+
+async def prepare(args, client: EtcdClient, n: int = None):
+    """Generate the op stream (args.ops or n ops) and preload the keyspace; returns (stream, do)."""
+    spec = workload_spec(args)
+    prefix = args.key_prefix.encode()
+    stream = workload.generate(spec, n or args.ops)
+    t = time.perf_counter()
+    n = await workload.preload(client.endpoint, spec, prefix)
+    if n:
+        print(f"[workload] preloaded {n} keys in {time.perf_counter() - t:.2f}s")
+    return stream, workload.bind(client, stream, spec, prefix)
+
+
+def type_recorders(stream, log, out_dir: str) -> dict:
+    """latency_<op>.hlog recorders by op code, when the stream mixes op types."""
+    codes = np.unique(stream.codes()).tolist()
+    if len(codes) < 2:
+        return {}
+    return {c: IntervalRecorder(os.path.join(out_dir, f"latency_{OP_TYPES[c]}.hlog"), log.t0_perf_ns, log.t0_wall_ns)
+            for c in codes}
+
+
+def start_convergence(args, log, rec: IntervalRecorder):
+    """converge.Convergence on the latency recorder if --until was given (log.convergence)."""
+    if not getattr(args, "until", None):
+        return None
+    log.convergence = converge.Convergence(args.until, rec.interval_ns).attach(rec)
+    return log.convergence
+
+
+def finish_convergence(log, out_dir: str):
+    conv = log.convergence
+    if conv is not None:
+        conv.finish()
+        converge.write_csv(out_dir, conv.rows)
+
+
+def converged_fields(log, out_dir: str) -> dict:
+    """Manifest summary of an adaptive run, with p50/p99/p99.9 of the ops after the warmup."""
+    conv = log.convergence
+    if conv is None:
+        return {}
+    s = conv.summary()
+    print(converge.format_summary(s))
+    h = conv.post_warmup()
+    if h.total:
+        p50, p99, p999 = h.percentiles((50, 99, 99.9)) / 1e6
+        s.update(p50_ms=float(p50), p99_ms=float(p99), p999_ms=float(p999))
+        print(f"  after warmup: n={h.total}  p50={p50:.3f}ms  p99={p99:.3f}ms  p99.9={p999:.3f}ms")
+    print(f"Saved convergence CSV    : {os.path.join(out_dir, converge.CONVERGE_CSV)}")
+    return s
+
+
+def start_monitor(args) -> Optional[RaftMonitor]:
+    """Raft-state sampler on the running loop, None without --monitor-endpoints or with interval 0."""
+    eps = [e for e in (getattr(args, "monitor_endpoints", None) or "").split(",") if e]
+    if not eps or not args.monitor_interval:
+        return None
+    return RaftMonitor(eps, args.out_dir, args.monitor_interval).start()
+
+
+async def run(args, client: EtcdClient = None):
+    """Closed-loop run; a caller-owned `client` (warm connections) is left open."""
+    os.makedirs(args.out_dir, exist_ok=True)
+    own = client is None
+    if own:
+        client = EtcdClient(args.endpoint, pool_size=args.concurrency)
+    try:
+        stream, do = await prepare(args, client)
+    except BaseException:
+        if own:
+            await client.close()
+        raise
+    log = OpLog(args.ops)
+    log.op = stream.op
+    cols = ColumnWriter(os.path.join(args.out_dir, DEFAULT_DIR), meta={"t0_unix_ns": log.t0_wall_ns})
+    rec = log.recorder(args.out_dir)
+    type_recs = type_recorders(stream, log, args.out_dir)
+    conv = start_convergence(args, log, rec)
+    mon = start_monitor(args)
+    try:
+        await closed_loop(do, log, args.concurrency, rec, cols, type_recs, conv.stop if conv else None)
+    finally:
+        if mon is not None:
+            await mon.stop()
+        if own:
+            await client.close()
+        cols.close()
+    for r in type_recs.values():
+        r.close(log.end_perf_ns)
+    hist = rec.close(log.end_perf_ns)
+    finish_convergence(log, args.out_dir)
+    return log, hist
+
+
+async def run_open_loop(args, client: EtcdClient = None):
+    os.makedirs(args.out_dir, exist_ok=True)
+    own = client is None
+    if own:
+        client = EtcdClient(args.endpoint, pool_size=args.max_outstanding)
+    try:
+        stream, do = await prepare(args, client)
+    except BaseException:
+        if own:
+            await client.close()
+        raise
+    log = loadgen.OpenLoopLog(args.ops)
+    log.op = ops = stream.op
+    cols = ColumnWriter(os.path.join(args.out_dir, DEFAULT_DIR), meta={"t0_unix_ns": log.t0_wall_ns})
+    rec = IntervalRecorder(os.path.join(args.out_dir, "latency.hlog"), log.t0_perf_ns, log.t0_wall_ns)
+    rec_cor = IntervalRecorder(os.path.join(args.out_dir, "latency_corrected.hlog"), log.t0_perf_ns, log.t0_wall_ns)
+    type_recs = type_recorders(stream, log, args.out_dir)
+    conv = start_convergence(args, log, rec)
+
+    def done(i):
+        if log.ok[i]:
+            rec.record(log.service_ns(i), log.done_ns[i])
+            rec_cor.record(log.corrected_ns(i), log.done_ns[i])
+            if type_recs:
+                type_recs[ops[i]].record(log.service_ns(i), log.done_ns[i])
+        cols.append(log.wall_ns(log.send_ns[i]), log.service_ns(i), ops[i],
+                    status=STATUS_OK if log.ok[i] else STATUS_ERR)
+
+    mon = start_monitor(args)
+    try:
+        await loadgen.open_loop(do, log, args.rate, args.arrival, args.max_outstanding,
+                                seed=args.seed, errors=(EtcdError,), on_done=done,
+                                stop=conv.stop if conv else None)
+    finally:
+        if mon is not None:
+            await mon.stop()
+        if own:
+            await client.close()
+        cols.close()
+    rec.close(log.end_perf_ns)
+    rec_cor.close(log.end_perf_ns)
+    for r in type_recs.values():
+        r.close(log.end_perf_ns)
+    finish_convergence(log, args.out_dir)
+    return log
+
+
+async def run_ramp(args, client: EtcdClient = None):
+    """Concurrency ramp (ramp.py) over a cycled op stream; returns (step rows, cumulative histogram)."""
+    cfg = ramp.config_from_args(args)
+    os.makedirs(args.out_dir, exist_ok=True)
+    own = client is None
+    if own:
+        client = EtcdClient(args.endpoint, pool_size=max(cfg.steps))
+    try:
+        stream, do = await prepare(args, client, max(args.ops, ramp.STREAM_OPS))
+    except BaseException:
+        if own:
+            await client.close()
+        raise
+    t0_wall, t0_perf = time.time_ns(), time.perf_counter_ns()
+    wall_off = t0_wall - t0_perf
+    cols = ColumnWriter(os.path.join(args.out_dir, DEFAULT_DIR), meta={"t0_unix_ns": t0_wall})
+    phases = [cols.code("phase", f"c{c}") for c in cfg.steps]
+    rec = IntervalRecorder(os.path.join(args.out_dir, "latency.hlog"), t0_perf, t0_wall)
+    ops = stream.op
+
+    def record(step, i, start, lat, ok):
+        if ok:
+            rec.record(lat, start + lat)
+        cols.append(start + wall_off, lat, ops[i], phases[step], status=STATUS_OK if ok else STATUS_ERR)
+
+    mon = start_monitor(args)
+    try:
+        rows = await ramp.ramp(do, stream.n, cfg, record, on_step=lambda r: print(ramp.format_step(r), flush=True),
+                               errors=(EtcdError,))
+    finally:
+        if mon is not None:
+            await mon.stop()
+        if own:
+            await client.close()
+        cols.close()
+    return rows, rec.close(time.perf_counter_ns())
+
+
+def ramp_main(args):
+    cfg = ramp.config_from_args(args)
+    print(f">>> Ramp: {args.workload.describe() if args.workload else 'PUT'} to {args.endpoint}, "
+          f"concurrency {','.join(map(str, cfg.steps))} (window {cfg.window_s:g}s, tol {cfg.tol:g})")
+    rows, hist = asyncio.run(run_ramp(args))
+    t = oprec.open_ops(os.path.join(args.out_dir, DEFAULT_DIR))
+    start, lat, ok = np.asarray(t["start_ns"]), np.asarray(t["latency_ns"]), t["status"] == STATUS_OK
+    t0 = t.meta["t0_unix_ns"]
+    aggregate.write_outputs(args.out_dir, start, lat, ok=ok, t0_ns=t0, widths=args.agg_widths)
+    s = ramp.summarize(rows, cfg.gain)
+    print()
+    print("Summary:")
+    print(ramp.format_summary(s))
+    print(f"Saved ramp CSV           : {ramp.write_csv(args.out_dir, rows)}")
+    wall = (int((start + lat).max()) - t0) / 1e9 if start.size else 0.0
+    n_ok = int(ok.sum())
+    write_manifest(args, dict({"ok": n_ok, "fail": int(len(t) - n_ok), "wall_s": wall,
+                               "throughput": n_ok / wall if wall > 0 else 0.0,
+                               "p50_ms": hist.percentile(50) / 1e6, "p99_ms": hist.percentile(99) / 1e6,
+                               "p999_ms": hist.percentile(99.9) / 1e6}, **s))
+    if n_ok == 0:
+        sys.exit(1)
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(description="Asyncio etcd workload over the v3 JSON gateway")
+    ap.add_argument("--endpoint", required=True, help="leader client URL reachable from this host")
+    ap.add_argument("--ops", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=1, help="concurrent clients (1 = like the shell loop)")
+    ap.add_argument("--key-prefix", default="k")
+    ap.add_argument("--value-size", type=int, default=8, help="value bytes of the default PUT workload")
+    ap.add_argument("--workload", type=workload.workload_arg,
+                    help="op mix / key / value distributions (workload.py): ycsb-a..ycsb-f, a .json file, "
+                         "or e.g. put=20,get=75,range=5,keys=zipfian,keyspace=100000 (default: sequential PUTs)")
+    ap.add_argument("--out-dir", required=True)
+    ap.add_argument("--rate", type=float, help="open-loop: target ops/s (omit for closed-loop)")
+    ap.add_argument("--arrival", choices=["constant", "poisson"], default="constant")
+    ap.add_argument("--max-outstanding", type=int, default=256,
+                    help="open-loop: max in-flight ops / pooled connections")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--agg-widths", type=aggregate.parse_widths, default=[1.0],
+                    help="per-interval CSV widths in seconds, e.g. 0.1,1,10")
+    ap.add_argument("--monitor-endpoints", default="",
+                    help="comma list of all members' client URLs: sample their raft status during the run")
+    ap.add_argument("--monitor-interval", type=float, default=0.2, help="raft status poll interval (s), 0 = off")
+    ap.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                    help="run parameter for the manifest, e.g. mode=delay delay_us=10000 leader=etcd2 (repeatable)")
+    ramp.add_arguments(ap)
+    converge.add_arguments(ap)
+    return ap
+
+
+def write_manifest(args, summary: dict):
+    params = {"kind": "etcd", "endpoint": args.endpoint, "ops": args.ops, "concurrency": args.concurrency,
+              "value_size": workload_spec(args).value_size}
+    if args.rate:
+        params.update(rate=args.rate, arrival=args.arrival, max_outstanding=args.max_outstanding)
+    if args.workload:
+        params.update(workload=args.workload.describe(), keys=args.workload.keys)
+    if args.ramp:
+        params.update(ramp=",".join(map(str, args.ramp)), concurrency=None)
+    if args.until:
+        params.update(until=args.until.describe())
+    catalog.write_manifest(args.out_dir, dict(params, **catalog.parse_params(args.param)), summary)
+
+
+def report_types(log, out_dir: str) -> dict:
+    """per_op_type.csv + printed table for mixed workloads; returns the manifest summary fields."""
+    rows = per_type_rows(log)
+    if len(rows) < 2:
+        return {}
+    print(workload.format_per_type(rows))
+    print(f"Saved per-op-type CSV    : {workload.write_per_type(out_dir, rows)}")
+    return workload.summary_fields(rows)
+
+
+def describe(args) -> str:
+    return f"{args.ops} x PUT" if args.workload is None else f"{args.ops} ops of {args.workload.describe()}"
+
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.ramp:
+        if args.rate:
+            ap.error("--ramp is closed-loop; drop --rate")
+        if args.until:
+            ap.error("--ramp has its own stop rule per step; drop --until")
+        try:
+            ramp.config_from_args(args)
+        except ValueError as e:
+            ap.error(str(e))
+        ramp_main(args)
+        return
+    if args.rate:
+        print(f">>> Workload: {describe(args)} to {args.endpoint} "
+              f"(open-loop {args.arrival} {args.rate:g} ops/s, max outstanding {args.max_outstanding})")
+        log = asyncio.run(run_open_loop(args))
+        write_open_loop_outputs(log, args.out_dir, args.agg_widths)
+        s = loadgen.summarize(log, args.rate)
+        print()
+        print("Summary:")
+        print(loadgen.format_summary(s))
+        print(f"Saved per-op latency CSV : {os.path.join(args.out_dir, 'per_op_latency.csv')}")
+        types = report_types(log, args.out_dir)
+        write_manifest(args, dict({"ok": s["ok"], "fail": s["fail"], "wall_s": s["wall_s"],
+                                   "throughput": s["throughput"], "p50_ms": s["service_p50"] * 1e3,
+                                   "p99_ms": s["service_p99"] * 1e3, "p999_ms": s["service_p99.9"] * 1e3,
+                                   "corrected_p99_ms": s["corrected_p99"] * 1e3}, **types,
+                                  **converged_fields(log, args.out_dir)))
+        if s["ok"] == 0:
+            sys.exit(1)
+        return
+
+    print(f">>> Workload: {describe(args)} to {args.endpoint} (concurrency={args.concurrency})")
+    log, hist = asyncio.run(run(args))
+    write_outputs(log, args.out_dir, args.agg_widths)
+    s = summarize(log, hist)
+    print()
+    print("Summary:")
+    print(f"  ok={s['ok']} fail={s['fail']}  wall={s['wall_s']:.3f}s  throughput={s['throughput']:.2f} ops/s")
+    print(f"  p50={s['p50']:.6f}s  p95={s['p95']:.6f}s  p99={s['p99']:.6f}s")
+    print("  " + format_percentiles(hist, (99.9, 99.99)))
+    print(f"Saved per-op latency CSV : {os.path.join(args.out_dir, 'per_op_latency.csv')}")
+    types = report_types(log, args.out_dir)
+    write_manifest(args, dict({"ok": s["ok"], "fail": s["fail"], "wall_s": s["wall_s"], "throughput": s["throughput"],
+                               "p50_ms": s["p50"] * 1e3, "p99_ms": s["p99"] * 1e3,
+                               "p999_ms": float(hist.percentile(99.9)) / 1e6}, **types, **converged_fields(log, args.out_dir)))
+    if s["ok"] == 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
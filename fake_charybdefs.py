@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Stand-in charybdefs RPC server (no FUSE).
+
+Implements the same Thrift service as charybdefs (set_fault, set_all_fault,
+clear_fault, clear_all_faults, get_methods) and just records the fault table,
+so charyb_fault.py and anything built on it can be exercised locally.
+
+    python3 fake_charybdefs.py --port 9090 [--rpc-delay-ms 2]
+
+From Python:
+    srv = FakeCharybdefs(port=19090).start()
+    ... CharybClient(port=19090) ...
+    srv.handler.faults   # current table
+    srv.stop()
+"""
+import argparse
+import socket
+import threading
+import time
+
+from charyb_fault import load_thrift, PROB_SCALE
+
+KNOWN_METHODS = [
+    "getattr", "readlink", "mknod", "mkdir", "unlink", "rmdir", "symlink", "rename", "link",
+    "chmod", "chown", "truncate", "open", "read", "write", "statfs", "flush", "release",
+    "fsync", "setxattr", "getxattr", "listxattr", "removexattr", "opendir", "readdir",
+    "releasedir", "fsyncdir", "access", "create", "ftruncate", "fgetattr", "lock", "bmap",
+    "ioctl", "poll", "write_buf", "read_buf", "flock", "fallocate", "fdatasync",
+]
+
+
+class FaultTableHandler:
+    """Thrift handler: keeps method -> fault parameters, plus a call log."""
+
+    def __init__(self, rpc_delay_s: float = 0.0):
+        self.rpc_delay_s = rpc_delay_s
+        self.faults = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _log(self, name, *args):
+        with self._lock:
+            self.calls.append((time.monotonic_ns(), name, args))
+        if self.rpc_delay_s:
+            time.sleep(self.rpc_delay_s)
+
+    def _entry(self, random, err_no, probability, regexp, kill_caller, delay_us, auto_delay):
+        return {
+            "random": random, "err_no": err_no, "probability": probability,
+            "prob_permil": probability * 1000 // PROB_SCALE, "regexp": regexp,
+            "kill_caller": kill_caller, "delay_us": delay_us, "auto_delay": auto_delay,
+        }
+
+    def set_fault(self, methods, random, err_no, probability, regexp, kill_caller, delay_us, auto_delay):
+        self._log("set_fault", methods, delay_us, probability, regexp)
+        e = self._entry(random, err_no, probability, regexp, kill_caller, delay_us, auto_delay)
+        with self._lock:
+            for m in methods:
+                self.faults[m] = dict(e)
+
+    def set_all_fault(self, random, err_no, probability, regexp, kill_caller, delay_us, auto_delay):
+        self._log("set_all_fault", delay_us, probability, regexp)
+        e = self._entry(random, err_no, probability, regexp, kill_caller, delay_us, auto_delay)
+        with self._lock:
+            for m in KNOWN_METHODS:
+                self.faults[m] = dict(e)
+
+    def clear_fault(self, method):
+        self._log("clear_fault", method)
+        with self._lock:
+            self.faults.pop(method, None)
+
+    def clear_all_faults(self):
+        self._log("clear_all_faults")
+        with self._lock:
+            self.faults.clear()
+
+    def get_methods(self):
+        return list(KNOWN_METHODS)
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class FakeCharybdefs:
+    """Threaded Thrift server around FaultTableHandler."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, rpc_delay_s: float = 0.0):
+        self.host = host
+        self.port = port or free_port(host)
+        self.handler = FaultTableHandler(rpc_delay_s)
+        self._server = None
+        self._thread = None
+
+    def _build(self):
+        t = load_thrift()
+        from thrift.server import TServer
+        transport = t["TSocket"].TServerSocket(host=self.host, port=self.port)
+        processor = t["server"].Processor(self.handler)
+        server = TServer.TThreadedServer(
+            processor, transport,
+            t["TTransport"].TBufferedTransportFactory(),
+            t["TBinaryProtocol"].TBinaryProtocolFactory(),
+            daemon=True,
+        )
+        return server, transport
+
+    def serve_forever(self):
+        self._server, _ = self._build()
+        self._server.serve()
+
+    def start(self, wait_s: float = 2.0):
+        self._server, transport = self._build()
+        self._transport = transport
+        self._thread = threading.Thread(target=self._server.serve, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + wait_s
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.2):
+                    break
+            except OSError:
+                time.sleep(0.02)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            try:
+                self._transport.close()
+            except Exception:
+                pass
+        self._server = None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stand-in charybdefs Thrift server (records faults, no FUSE)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", default=9090, type=int)
+    ap.add_argument("--rpc-delay-ms", default=0.0, type=float, help="artificial per-RPC service time")
+    args = ap.parse_args()
+
+    srv = FakeCharybdefs(args.host, args.port, args.rpc_delay_ms / 1000.0)
+    print(f"[fake-charybdefs] listening on {args.host}:{srv.port}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Stand-in etcd v3 JSON gateway for trying the Python workload tools locally.
+
+Serves the subset of the gateway that etcd_client.py uses on one port per
+"member"; all members share one in-memory KV and one leader. Writes can be
+given an artificial commit delay (and serialized, like a single WAL).
+
+    python3 fake_etcd.py --members 3 --base-port 23790 --write-delay-ms 1
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23790 --ops 1000 --out-dir /tmp/run
+"""
+import argparse
+import asyncio
+import base64
+import json
+
+
+def _u(text):
+    return base64.b64decode(text) if text else b""
+
+
+def _b(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+class FakeCluster:
+    """Shared state for all fake members."""
+
+    def __init__(self, members: int = 3, write_delay_s: float = 0.0, serialize_writes: bool = True):
+        self.kv = {}
+        self.revision = 1
+        self.raft_term = 2
+        self.raft_index = 10
+        self.member_ids = [str(0x1000 + i) for i in range(members)]
+        self.leader = 0
+        self.write_delay_s = write_delay_s
+        self.serialize_writes = serialize_writes
+        self.leases = {}
+        self._wal = None
+
+    def header(self, member):
+        return {"cluster_id": "4242", "member_id": self.member_ids[member],
+                "revision": str(self.revision), "raft_term": str(self.raft_term)}
+
+    async def _commit(self):
+        if self._wal is None:
+            self._wal = asyncio.Lock()
+        if self.write_delay_s:
+            if self.serialize_writes:
+                async with self._wal:
+                    await asyncio.sleep(self.write_delay_s)
+            else:
+                await asyncio.sleep(self.write_delay_s)
+        self.revision += 1
+        self.raft_index += 1
+
+    # --- handlers: (member, request dict) -> response dict ---------------
+    def _put(self, req):
+        """Apply a put at the current revision; kv entries are (value, mod_revision, create_revision, version)."""
+        key = _u(req.get("key"))
+        old = self.kv.get(key)
+        self.kv[key] = (_u(req.get("value")), self.revision, old[2] if old else self.revision, old[3] + 1 if old else 1)
+
+    async def kv_put(self, m, req):
+        await self._commit()
+        self._put(req)
+        return {"header": self.header(m)}
+
+    def _select(self, req):
+        key = _u(req.get("key"))
+        end = _u(req.get("range_end"))
+        if not end:
+            return [key] if key in self.kv else []
+        if end == b"\0":
+            return sorted(k for k in self.kv if k >= key)
+        return sorted(k for k in self.kv if key <= k < end)
+
+    async def kv_range(self, m, req):
+        if not req.get("serializable"):
+            await asyncio.sleep(0)          # linearizable read: read index round
+        return self._range(m, req)
+
+    def _range(self, m, req):
+        keys = self._select(req)
+        limit = int(req.get("limit") or 0)
+        if limit:
+            keys = keys[:limit]
+        kvs = [{"key": _b(k), "value": _b(self.kv[k][0]), "mod_revision": str(self.kv[k][1])} for k in keys]
+        out = {"header": self.header(m), "count": str(len(kvs))}
+        if kvs:
+            out["kvs"] = kvs
+        return out
+
+    async def kv_deleterange(self, m, req):
+        keys = self._select(req)
+        await self._commit()
+        for k in keys:
+            self.kv.pop(k, None)
+        return {"header": self.header(m), "deleted": str(len(keys))}
+
+    def _compare(self, c):
+        kv = self.kv.get(_u(c.get("key")))
+        target = c.get("target", "VERSION")
+        if target == "VALUE":
+            have, want = kv[0] if kv else b"", _u(c.get("value"))
+        else:
+            i, name = {"MOD": (1, "mod_revision"), "CREATE": (2, "create_revision"), "VERSION": (3, "version")}[target]
+            have, want = kv[i] if kv else 0, int(c.get(name) or 0)
+        return {"EQUAL": have == want, "GREATER": have > want, "LESS": have < want,
+                "NOT_EQUAL": have != want}[c.get("result", "EQUAL")]
+
+    async def kv_txn(self, m, req):
+        ok = all(self._compare(c) for c in req.get("compare", []))
+        ops = req.get("success" if ok else "failure", [])
+        if any("request_put" in o or "request_delete_range" in o for o in ops):
+            await self._commit()
+        responses = []
+        for o in ops:
+            if "request_put" in o:
+                self._put(o["request_put"])
+                responses.append({"response_put": {"header": self.header(m)}})
+            elif "request_delete_range" in o:
+                keys = self._select(o["request_delete_range"])
+                for k in keys:
+                    self.kv.pop(k, None)
+                responses.append({"response_delete_range": {"header": self.header(m), "deleted": str(len(keys))}})
+            elif "request_range" in o:
+                responses.append({"response_range": self._range(m, o["request_range"])})
+        return {"header": self.header(m), "succeeded": ok, "responses": responses}
+
+    async def lease_grant(self, m, req):
+        await self._commit()
+        lease_id = str(0x7000 + len(self.leases) + 1)
+        self.leases[lease_id] = int(req.get("TTL") or 0)
+        return {"header": self.header(m), "ID": lease_id, "TTL": str(self.leases[lease_id])}
+
+    async def status(self, m, req):
+        return {"header": self.header(m), "version": "3.6.2-fake", "dbSize": str(4096 + 64 * len(self.kv)),
+                "leader": self.member_ids[self.leader], "raftIndex": str(self.raft_index),
+                "raftTerm": str(self.raft_term), "raftAppliedIndex": str(self.raft_index)}
+
+    async def member_list(self, m, req):
+        return {"header": self.header(m),
+                "members": [{"ID": mid, "name": f"etcd{i}"} for i, mid in enumerate(self.member_ids)]}
+
+    async def transfer_leadership(self, m, req):
+        target = str(req.get("targetID"))
+        if target in self.member_ids:
+            self.leader = self.member_ids.index(target)
+            self.raft_term += 1
+        return {"header": self.header(m)}
+
+    ROUTES = {
+        "/v3/kv/put": kv_put,
+        "/v3/kv/range": kv_range,
+        "/v3/kv/deleterange": kv_deleterange,
+        "/v3/kv/txn": kv_txn,
+        "/v3/lease/grant": lease_grant,
+        "/v3/maintenance/status": status,
+        "/v3/cluster/member/list": member_list,
+        "/v3/maintenance/transfer-leadership": transfer_leadership,
+    }
+
+    async def handle(self, member, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                n = int(headers.get("content-length", 0))
+                body = await reader.readexactly(n) if n else b""
+                fn = self.ROUTES.get(path)
+                if fn is None:
+                    status, resp = 404, {"error": "not found", "code": 5}
+                else:
+                    try:
+                        status, resp = 200, await fn(self, member, json.loads(body or b"{}"))
+                    except Exception as e:   # malformed request
+                        status, resp = 400, {"error": str(e), "code": 3}
+                data = json.dumps(resp).encode()
+                writer.write(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                             % (status, len(data), data))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", base_port: int = 0):
+        """Start one listener per member; returns the list of endpoint URLs."""
+        self.servers, endpoints = [], []
+        for i in range(len(self.member_ids)):
+            srv = await asyncio.start_server(lambda r, w, i=i: self.handle(i, r, w), host,
+                                             base_port + i if base_port else 0)
+            self.servers.append(srv)
+            endpoints.append(f"http://{host}:{srv.sockets[0].getsockname()[1]}")
+        return endpoints
+
+    def close(self):
+        for srv in getattr(self, "servers", []):
+            srv.close()
+
+
+async def _amain(args):
+    cluster = FakeCluster(args.members, args.write_delay_ms / 1000.0, not args.parallel_writes)
+    eps = await cluster.serve(args.host, args.base_port)
+    print("[fake-etcd] endpoints:", ",".join(eps), flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stand-in etcd v3 JSON gateway (in-memory)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--base-port", type=int, default=23790)
+    ap.add_argument("--members", type=int, default=3)
+    ap.add_argument("--write-delay-ms", type=float, default=0.0)
+    ap.add_argument("--parallel-writes", action="store_true", help="do not serialize write delays")
+    args = ap.parse_args()
+    try:
+        asyncio.run(_amain(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
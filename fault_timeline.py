@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Time-scheduled fault injection on top of charyb_fault.CharybClient.
+
+A schedule is a list of Transition(t_s, plan): at monotonic offset t_s
+(seconds after start) the fault plan is replaced (plan=None clears all
+faults). Builders cover the usual shapes:
+
+  step    : delay on at --at, optionally off again at --until
+  ramp    : linear delay ramp from --from-us to --to-us in --step-s increments
+  square  : on/off square wave (--period, --duty) for --duration seconds
+  trace   : replay a recorded delay trace (CSV: t_s,delay_us[,prob_permil])
+
+Every transition that is actually applied is appended to
+<run_dir>/fault_events.csv (planned and actual offset, wall-clock ms,
+RPC time), which the plotting scripts use to draw fault boundaries.
+A transition that only changes the delay of the same methods is set over
+the previous fault (no clear in between, so there is no fault-free gap);
+a failed charybdefs RPC stops the timeline, is logged, and is raised again
+from join()/stop() (the CLI exits non-zero).
+
+    python3 fault_timeline.py --run-dir results/x step --at 40 --delay-us 100000 --until 80
+    python3 fault_timeline.py --run-dir results/x ramp --start 10 --end 70 --to-us 200000 --step-s 5
+    python3 fault_timeline.py --run-dir results/x square --period 20 --duty 0.5 --delay-us 100000 --duration 120
+    python3 fault_timeline.py --run-dir results/x trace recorded_delays.csv
+"""
+import argparse
+import csv
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from charyb_fault import (CharybClient, FaultSpec, DEFAULT_HOST, DEFAULT_PORT,
+                          SYNC_METHODS, WAL_REGEX, parse_methods)
+
+EVENTS_FILE = "fault_events.csv"
+EVENT_FIELDS = ["seq", "planned_s", "actual_s", "lag_us", "wall_ms", "mono_ns", "rpc_us",
+                "delay_us", "prob_permil", "methods", "regex"]
+SPIN_NS = 2_000_000          # busy-wait the last 2 ms before a transition
+
+
+@dataclass
+class Transition:
+    t_s: float
+    plan: Optional[List[FaultSpec]]      # None -> clear all faults
+
+    @property
+    def delay_us(self) -> int:
+        return max((f.delay_us for f in self.plan), default=0) if self.plan else 0
+
+    def method_sets(self):
+        """Methods each fault of the plan is installed on (None = all); a plan with the
+        same method sets replaces the previous one without a clear."""
+        return [tuple(sorted(f.methods)) if f.methods else None for f in self.plan or []]
+
+
+class TimelineError(RuntimeError):
+    """A transition could not be applied; the timeline stopped there."""
+
+
+def _plan(delay_us, methods, prob_permil, regex):
+    if delay_us <= 0 or prob_permil <= 0:
+        return None
+    return [FaultSpec(list(methods) if methods else None, int(delay_us), int(prob_permil), regex)]
+
+
+def step(at_s, delay_us, methods=SYNC_METHODS, prob_permil=1000, regex=WAL_REGEX, until_s=None):
+    sched = [Transition(0.0, None)] if at_s > 0 else []
+    sched.append(Transition(at_s, _plan(delay_us, methods, prob_permil, regex)))
+    if until_s is not None:
+        sched.append(Transition(until_s, None))
+    return sched
+
+
+def ramp(start_s, end_s, to_us, from_us=0, step_s=1.0, methods=SYNC_METHODS, prob_permil=1000,
+         regex=WAL_REGEX, hold_s=None):
+    """Linear ramp, discretized every step_s; optional clear at end_s + hold_s."""
+    if end_s <= start_s:
+        raise ValueError("ramp: end must be after start")
+    n = max(1, int(round((end_s - start_s) / step_s)))
+    sched = [Transition(0.0, None)] if start_s > 0 else []
+    for i in range(n + 1):
+        t = start_s + i * (end_s - start_s) / n
+        d = from_us + (to_us - from_us) * i / n
+        sched.append(Transition(t, _plan(int(round(d)), methods, prob_permil, regex)))
+    if hold_s is not None:
+        sched.append(Transition(end_s + hold_s, None))
+    return sched
+
+
+def square(period_s, delay_us, duration_s, duty=0.5, start_s=0.0, methods=SYNC_METHODS,
+           prob_permil=1000, regex=WAL_REGEX):
+    """On for duty*period, off for the rest, repeated until start_s + duration_s."""
+    if not 0 < duty < 1:
+        raise ValueError("square: duty must be in (0, 1)")
+    sched = [Transition(0.0, None)] if start_s > 0 else []
+    t = start_s
+    end = start_s + duration_s
+    while t < end:
+        sched.append(Transition(t, _plan(delay_us, methods, prob_permil, regex)))
+        sched.append(Transition(min(t + duty * period_s, end), None))
+        t += period_s
+    return sched
+
+
+def trace(path, methods=SYNC_METHODS, regex=WAL_REGEX, time_scale=1.0):
+    """
+    Replay a delay trace. CSV columns: t_s (or sec), delay_us [, prob_permil].
+    Consecutive rows with the same setting are merged.
+    """
+    sched, last = [], None
+    with open(path, newline="") as f:
+        rows = csv.DictReader(f)
+        for r in rows:
+            t = r.get("t_s", r.get("sec"))
+            if t in (None, ""):
+                raise ValueError(f"{path}:{rows.line_num}: trace row has no t_s (or sec) value")
+            if r.get("delay_us") in (None, ""):
+                raise ValueError(f"{path}:{rows.line_num}: trace row has no delay_us value")
+            t = float(t)
+            d = int(float(r["delay_us"]))
+            p = int(float(r.get("prob_permil") or 1000))
+            if (d, p) == last:
+                continue
+            last = (d, p)
+            sched.append(Transition(t * time_scale, _plan(d, methods, p, regex)))
+    sched.sort(key=lambda tr: tr.t_s)
+    return sched
+
+
+class FaultTimeline:
+    """
+    Runs a schedule in a background thread against one CharybClient.
+
+    Offsets are measured on time.monotonic_ns() from start(); the actual
+    application time of each transition is logged to <run_dir>/fault_events.csv.
+    """
+
+    def __init__(self, client: CharybClient, schedule: List[Transition], run_dir: str = ".",
+                 clear_on_stop: bool = True):
+        self.client = client
+        self.schedule = sorted(schedule, key=lambda tr: tr.t_s)
+        self.run_dir = run_dir
+        self.clear_on_stop = clear_on_stop
+        self.events = []
+        self.t0_ns = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.error = None
+
+    def _sleep_until(self, deadline_ns: int) -> bool:
+        while True:
+            remaining = deadline_ns - time.monotonic_ns()
+            if remaining <= 0:
+                return True
+            if remaining > SPIN_NS:
+                if self._stop.wait((remaining - SPIN_NS) / 1e9):
+                    return False
+            elif self._stop.is_set():
+                return False
+
+    def _log(self, w, f, seq, tr, rpc_ns):
+        now = time.monotonic_ns()
+        actual_s = (now - self.t0_ns) / 1e9
+        spec = tr.plan[0] if tr.plan else None
+        row = {
+            "seq": seq,
+            "planned_s": f"{tr.t_s:.6f}",
+            "actual_s": f"{actual_s:.6f}",
+            "lag_us": int((actual_s - tr.t_s) * 1e6),
+            "wall_ms": int(time.time() * 1000),
+            "mono_ns": now,
+            "rpc_us": rpc_ns // 1000,
+            "delay_us": tr.delay_us,
+            "prob_permil": spec.prob_permil if spec else 0,
+            "methods": ",".join(spec.methods or ["ALL"]) if spec else "",
+            "regex": spec.regex if spec else "",
+        }
+        w.writerow(row)
+        f.flush()
+        self.events.append(row)
+
+    def _run(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        with open(os.path.join(self.run_dir, EVENTS_FILE), "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=EVENT_FIELDS)
+            w.writeheader()
+            prev = None
+            for seq, tr in enumerate(self.schedule):
+                if not self._sleep_until(self.t0_ns + int(tr.t_s * 1e9)):
+                    break
+                try:
+                    if tr.plan is None:
+                        t = time.perf_counter_ns()
+                        self.client.clear()
+                        rpc_ns = time.perf_counter_ns() - t
+                    else:
+                        same = prev is not None and prev.method_sets() == tr.method_sets()
+                        rpc_ns = self.client.apply_plan(tr.plan, clear_first=not same)
+                except Exception as e:
+                    self.error = TimelineError(f"transition {seq} at t={tr.t_s:g}s "
+                                               f"(delay {tr.delay_us}us): {type(e).__name__}: {e}")
+                    print(f"[timeline] charybdefs error, timeline stopped: {self.error}", file=sys.stderr)
+                    return
+                prev = tr.plan and tr
+                self._log(w, f, seq, tr, rpc_ns)
+
+    def start(self, t0_ns: Optional[int] = None):
+        """Start the schedule; t0_ns lets several timelines share one origin."""
+        self.t0_ns = t0_ns if t0_ns is not None else time.monotonic_ns()
+        self._thread = threading.Thread(target=self._run, name="fault-timeline", daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the schedule; raises TimelineError if a transition failed."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.join()
+        finally:
+            if self.clear_on_stop:
+                try:
+                    self.client.clear()
+                except Exception:
+                    if self.error is None:      # otherwise keep the transition's error
+                        raise
+
+    @property
+    def duration_s(self) -> float:
+        return self.schedule[-1].t_s if self.schedule else 0.0
+
+
+# ===================== reading events (plots) =====================
+
+def read_events(path: str):
+    """Return the rows of a fault_events.csv as dicts with numeric fields."""
+    out = []
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            r["wall_ms"] = int(r["wall_ms"])
+            r["actual_s"] = float(r["actual_s"])
+            r["delay_us"] = int(r["delay_us"])
+            out.append(r)
+    return out
+
+
+def find_events(data_path: str) -> Optional[str]:
+    """
+    Locate the fault events belonging to a data file: fault_events.csv in the
+    same directory, or fault_events_<label>.csv next to <prefix>_<label>.csv.
+    """
+    d = os.path.dirname(data_path) or "."
+    cand = os.path.join(d, EVENTS_FILE)
+    if os.path.exists(cand):
+        return cand
+    stem = os.path.splitext(os.path.basename(data_path))[0]
+    for prefix in ("latency_data_", "per_op_latency_", "latency_per_sec_", "throughput_per_sec_", "latency_"):
+        if stem.startswith(prefix):
+            cand = os.path.join(d, f"fault_events_{stem[len(prefix):]}.csv")
+            if os.path.exists(cand):
+                return cand
+    return None
+
+
+def fault_boundaries(events, t0_ms: float):
+    """
+    Convert events to [(t_sec, kind)] relative to t0_ms, where kind is
+    'start' (0 -> delay), 'end' (delay -> 0) or 'change' (delay -> other delay).
+    """
+    out, prev = [], 0
+    for e in events:
+        d = e["delay_us"]
+        if d == prev:
+            continue
+        kind = "start" if prev == 0 else ("end" if d == 0 else "change")
+        out.append(((e["wall_ms"] - t0_ms) / 1000.0, kind))
+        prev = d
+    return out
+
+
+# ===================== CLI =====================
+
+def build_schedule(args):
+    methods = None if args.methods.strip().lower() == "all" else parse_methods(args.methods)
+    kw = dict(methods=methods, regex=args.regex)
+    if args.kind == "step":
+        return step(args.at, args.delay_us, prob_permil=args.prob_permil, until_s=args.until, **kw)
+    if args.kind == "ramp":
+        return ramp(args.start, args.end, args.to_us, from_us=args.from_us, step_s=args.step_s,
+                    prob_permil=args.prob_permil, hold_s=args.hold_s, **kw)
+    if args.kind == "square":
+        return square(args.period, args.delay_us, args.duration, duty=args.duty, start_s=args.start,
+                      prob_permil=args.prob_permil, **kw)
+    return trace(args.file, time_scale=args.time_scale, **kw)
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(description="Run a time-scheduled charybdefs fault timeline")
+    ap.add_argument("--host", default=DEFAULT_HOST)
+    ap.add_argument("--port", default=DEFAULT_PORT, type=int)
+    ap.add_argument("--run-dir", default=".", help=f"where {EVENTS_FILE} is written")
+    ap.add_argument("--methods", default=",".join(SYNC_METHODS), help="comma list, or 'all'")
+    ap.add_argument("--regex", default=WAL_REGEX)
+    ap.add_argument("--hold", action="store_true",
+                    help="after the last transition keep the fault until SIGINT/SIGTERM")
+    sp = ap.add_subparsers(dest="kind", required=True)
+
+    p = sp.add_parser("step")
+    p.add_argument("--at", type=float, required=True)
+    p.add_argument("--until", type=float)
+    p.add_argument("--delay-us", type=int, required=True)
+    p.add_argument("--prob-permil", type=int, default=1000)
+
+    p = sp.add_parser("ramp")
+    p.add_argument("--start", type=float, required=True)
+    p.add_argument("--end", type=float, required=True)
+    p.add_argument("--from-us", type=int, default=0)
+    p.add_argument("--to-us", type=int, required=True)
+    p.add_argument("--step-s", type=float, default=1.0)
+    p.add_argument("--hold-s", type=float, help="clear this many seconds after the ramp ends")
+    p.add_argument("--prob-permil", type=int, default=1000)
+
+    p = sp.add_parser("square")
+    p.add_argument("--period", type=float, required=True)
+    p.add_argument("--duty", type=float, default=0.5)
+    p.add_argument("--delay-us", type=int, required=True)
+    p.add_argument("--duration", type=float, required=True)
+    p.add_argument("--start", type=float, default=0.0)
+    p.add_argument("--prob-permil", type=int, default=1000)
+
+    p = sp.add_parser("trace")
+    p.add_argument("file")
+    p.add_argument("--time-scale", type=float, default=1.0)
+    return ap
+
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    try:
+        schedule = build_schedule(args)
+    except ValueError as e:
+        ap.error(str(e))
+
+    client = CharybClient(args.host, args.port)
+    tl = FaultTimeline(client, schedule, args.run_dir)
+    done = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: done.set())
+    signal.signal(signal.SIGINT, lambda *_: done.set())
+
+    print(f"[timeline] {len(schedule)} transitions over {tl.duration_s:.1f}s -> "
+          f"{os.path.join(args.run_dir, EVENTS_FILE)}", file=sys.stderr)
+    tl.start()
+    while tl._thread.is_alive() and not done.is_set():
+        done.wait(0.2)
+    if args.hold and tl.error is None:
+        done.wait()
+    failed = None
+    try:
+        tl.stop()
+    except Exception as e:              # TimelineError, or the final clear failed
+        failed = e
+    finally:
+        client.close()
+    for e in tl.events:
+        print(f"[timeline] t={e['actual_s']}s (planned {e['planned_s']}s, lag {e['lag_us']}us) "
+              f"delay={e['delay_us']}us", file=sys.stderr)
+    if failed is not None:
+        raise SystemExit(f"[timeline] failed: {failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+HDR-style log-bucketed latency histogram (NumPy array-backed).
+
+Values are integers (we record nanoseconds). Buckets follow the
+HdrHistogram layout: 2**k sub-buckets per power of two, so every recorded
+value is kept to `sigfig` significant decimal digits (default 3, i.e.
+<0.1% relative error) with a fixed, small counts array (about 34k int64 for
+1 ns .. 1 h). Percentile queries walk the counts once (O(buckets)),
+histograms merge by adding counts, and recording a batch is one bincount.
+
+IntervalRecorder writes a compact binary log: one histogram per interval
+(default 1 s) plus a cumulative histogram at close; read_log() reads it.
+
+    python3 hdr_hist.py summary results/*/latency.hlog            # merged percentiles
+    python3 hdr_hist.py from-csv per_op_latency.csv --column seconds --unit s -o latency.hlog
+"""
+import argparse
+import math
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+HIST_MAGIC = b"HDRH"
+HIST_HDR = struct.Struct("<4sBBxxqqQqqI")       # magic, ver, sigfig, lowest, highest, total, min, max, nnz
+LOG_MAGIC = b"HLOG"
+LOG_HDR = struct.Struct("<4sBxxxqqq")           # magic, ver, t0_wall_ns, t0_perf_ns, interval_ns
+REC_HDR = struct.Struct("<BxxxqqI")             # kind, start_ns, end_ns, payload length
+KIND_INTERVAL, KIND_CUMULATIVE = 0, 1
+
+DEFAULT_PERCENTILES = (50, 90, 95, 99, 99.9, 99.99)
+UNIT_NS = {"ns": 1, "us": 1_000, "ms": 1_000_000, "s": 1_000_000_000}
+
+
+class HdrHistogram:
+    def __init__(self, lowest: int = 1, highest: int = 3_600_000_000_000, sigfig: int = 3):
+        if not 1 <= sigfig <= 5:
+            raise ValueError("sigfig must be 1..5")
+        self.lowest, self.highest, self.sigfig = int(lowest), int(highest), int(sigfig)
+        self._unit_mag = int(math.floor(math.log2(self.lowest)))
+        sub_bits = int(math.ceil(math.log2(2 * 10 ** sigfig)))
+        self._half_mag = sub_bits - 1
+        self._half = 1 << self._half_mag
+        self._sub_mask = ((1 << sub_bits) - 1) << self._unit_mag
+        self.counts = np.zeros(self._index(self.highest) + 1, dtype=np.int64)
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._bounds = None
+
+    # --- indexing ---------------------------------------------------------
+    def _index(self, v: int) -> int:
+        bucket = (v | self._sub_mask).bit_length() - self._unit_mag - (self._half_mag + 1)
+        sub = v >> (bucket + self._unit_mag)
+        return ((bucket + 1) << self._half_mag) + (sub - self._half)
+
+    def index_of(self, values: np.ndarray) -> np.ndarray:
+        v = np.clip(np.asarray(values, dtype=np.int64), self.lowest, self.highest)
+        bitlen = np.frexp((v | self._sub_mask).astype(np.float64))[1].astype(np.int64)
+        bucket = bitlen - self._unit_mag - (self._half_mag + 1)
+        sub = v >> (bucket + self._unit_mag)
+        return ((bucket + 1) << self._half_mag) + (sub - self._half)
+
+    def bucket_bounds(self):
+        """(lowest, highest) equivalent value of every counts slot."""
+        if self._bounds is None:
+            idx = np.arange(self.counts.size, dtype=np.int64)
+            bucket = (idx >> self._half_mag) - 1
+            sub = (idx & (self._half - 1)) + self._half
+            first = bucket < 0
+            sub[first] -= self._half
+            bucket[first] = 0
+            lo = sub << (bucket + self._unit_mag)
+            width = np.left_shift(1, bucket + self._unit_mag)
+            self._bounds = (lo, lo + width - 1)
+        return self._bounds
+
+    # --- recording --------------------------------------------------------
+    def record(self, v: int, n: int = 1):
+        v = self.lowest if v < self.lowest else (self.highest if v > self.highest else int(v))
+        self.counts[self._index(v)] += n
+        self.total += n
+        if self.min is None or v < self.min:
+            self.min = v
+        if self.max is None or v > self.max:
+            self.max = v
+
+    def record_many(self, values):
+        v = np.asarray(values, dtype=np.int64)
+        if v.size == 0:
+            return
+        self.counts += np.bincount(self.index_of(v), minlength=self.counts.size)[: self.counts.size]
+        self.total += int(v.size)
+        lo, hi = int(max(v.min(), self.lowest)), int(min(v.max(), self.highest))
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total, self.min, self.max = 0, None, None
+
+    def compatible(self, other) -> bool:
+        return (self.lowest, self.highest, self.sigfig) == (other.lowest, other.highest, other.sigfig)
+
+    def merge(self, other: "HdrHistogram"):
+        if not self.compatible(other):
+            raise ValueError("cannot merge histograms with different lowest/highest/sigfig")
+        self.counts += other.counts
+        self.total += other.total
+        for attr, fn in (("min", min), ("max", max)):
+            o = getattr(other, attr)
+            if o is not None:
+                s = getattr(self, attr)
+                setattr(self, attr, o if s is None else fn(s, o))
+        return self
+
+    __iadd__ = merge
+
+    def copy(self) -> "HdrHistogram":
+        h = HdrHistogram(self.lowest, self.highest, self.sigfig)
+        h.merge(self)
+        return h
+
+    # --- queries ----------------------------------------------------------
+    def percentiles(self, qs=DEFAULT_PERCENTILES) -> np.ndarray:
+        """Values at percentiles qs (0..100), HdrHistogram convention (highest equivalent value)."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.total == 0:
+            return np.full(qs.shape, np.nan)
+        cum = np.cumsum(self.counts)
+        target = np.maximum(np.ceil(qs / 100.0 * self.total), 1).astype(np.int64)
+        idx = np.searchsorted(cum, target, side="left")
+        _, hi = self.bucket_bounds()
+        return np.minimum(hi[idx], self.max).astype(np.float64)
+
+    def percentile(self, q: float) -> float:
+        return float(self.percentiles([q])[0])
+
+    def mean(self) -> float:
+        if self.total == 0:
+            return float("nan")
+        lo, hi = self.bucket_bounds()
+        return float(np.dot(self.counts, (lo + hi) / 2.0) / self.total)
+
+    def cdf(self):
+        """(values, cumulative fraction) for the non-empty buckets."""
+        nz = np.nonzero(self.counts)[0]
+        _, hi = self.bucket_bounds()
+        return hi[nz].astype(np.float64), np.cumsum(self.counts[nz]) / max(self.total, 1)
+
+    # --- serialization ----------------------------------------------------
+    def to_bytes(self) -> bytes:
+        nz = np.nonzero(self.counts)[0]
+        body = nz.astype("<u4").tobytes() + self.counts[nz].astype("<u8").tobytes()
+        hdr = HIST_HDR.pack(HIST_MAGIC, 1, self.sigfig, self.lowest, self.highest, self.total,
+                            -1 if self.min is None else self.min, -1 if self.max is None else self.max, nz.size)
+        return hdr + zlib.compress(body, 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HdrHistogram":
+        magic, _ver, sigfig, lowest, highest, total, mn, mx, nnz = HIST_HDR.unpack_from(data)
+        if magic != HIST_MAGIC:
+            raise ValueError("not an HDR histogram blob")
+        h = cls(lowest, highest, sigfig)
+        body = zlib.decompress(data[HIST_HDR.size:])
+        idx = np.frombuffer(body, "<u4", nnz)
+        cnt = np.frombuffer(body, "<u8", nnz, offset=4 * nnz)
+        h.counts[idx] = cnt.astype(np.int64)
+        h.total = total
+        h.min = None if mn < 0 else mn
+        h.max = None if mx < 0 else mx
+        return h
+
+
+class IntervalRecorder:
+    """
+    Records values into per-interval histograms keyed by completion time
+    (perf_counter_ns) and appends each finished interval to a binary log.
+    The cumulative histogram is written at close(). on_interval(k, hist), if
+    set, sees every finished non-empty interval k before it is reset.
+    """
+
+    def __init__(self, path: str, t0_perf_ns: int, t0_wall_ns: int, interval_ns: int = 1_000_000_000,
+                 **hist_kw):
+        self.path = path
+        self.interval_ns = int(interval_ns)
+        self.t0_perf_ns = t0_perf_ns
+        self.current = HdrHistogram(**hist_kw)
+        self.cumulative = HdrHistogram(**hist_kw)
+        self._k = 0                                  # index of the current interval
+        self.on_interval = None
+        self._f = open(path, "wb") if path else None
+        if self._f:
+            self._f.write(LOG_HDR.pack(LOG_MAGIC, 1, t0_wall_ns, t0_perf_ns, self.interval_ns))
+
+    def _write(self, kind, start, end, hist):
+        if self._f:
+            blob = hist.to_bytes()
+            self._f.write(REC_HDR.pack(kind, start, end, len(blob)))
+            self._f.write(blob)
+
+    def _roll(self, k_now: int):
+        if self.current.total:
+            start = self.t0_perf_ns + self._k * self.interval_ns
+            self._write(KIND_INTERVAL, start, start + self.interval_ns, self.current)
+            if self.on_interval is not None:
+                self.on_interval(self._k, self.current)
+            self.cumulative.merge(self.current)
+            self.current.reset()
+        self._k = k_now
+
+    def record(self, value_ns: int, now_ns: int):
+        k = (now_ns - self.t0_perf_ns) // self.interval_ns
+        if k != self._k:
+            self._roll(k)
+        self.current.record(value_ns)
+
+    def record_many(self, values_ns, now_ns):
+        """Vectorized record(); now_ns must be ascending."""
+        values_ns = np.asarray(values_ns, dtype=np.int64)
+        ks = (np.asarray(now_ns, dtype=np.int64) - self.t0_perf_ns) // self.interval_ns
+        if ks.size == 0:
+            return
+        cuts = np.flatnonzero(np.diff(ks)) + 1
+        for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, ks.size]):
+            k = int(ks[lo])
+            if k != self._k:
+                self._roll(k)
+            self.current.record_many(values_ns[lo:hi])
+
+    def snapshot(self) -> HdrHistogram:
+        """Cumulative histogram including the open interval."""
+        return self.cumulative.copy().merge(self.current)
+
+    def close(self, end_ns: int) -> HdrHistogram:
+        self._roll(self._k + 1)
+        self._write(KIND_CUMULATIVE, self.t0_perf_ns, end_ns, self.cumulative)
+        if self._f:
+            self._f.close()
+            self._f = None
+        return self.cumulative
+
+
+def read_log(path: str) -> dict:
+    """{'t0_wall_ns', 't0_perf_ns', 'interval_ns', 'intervals': [(start, end, hist)], 'cumulative': hist}"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, _ver, t0_wall, t0_perf, interval = LOG_HDR.unpack_from(data)
+    if magic != LOG_MAGIC:
+        raise ValueError(f"{path}: not a histogram log")
+    out = {"t0_wall_ns": t0_wall, "t0_perf_ns": t0_perf, "interval_ns": interval,
+           "intervals": [], "cumulative": None}
+    pos = LOG_HDR.size
+    while pos + REC_HDR.size <= len(data):
+        kind, start, end, n = REC_HDR.unpack_from(data, pos)
+        pos += REC_HDR.size
+        if pos + n > len(data):
+            break                                        # truncated tail (run still writing)
+        h = HdrHistogram.from_bytes(data[pos:pos + n])
+        pos += n
+        if kind == KIND_CUMULATIVE:
+            out["cumulative"] = h
+        else:
+            out["intervals"].append((start, end, h))
+    if out["cumulative"] is None:
+        out["cumulative"] = merge_all(h for _, _, h in out["intervals"])
+    return out
+
+
+def merge_all(hists) -> HdrHistogram:
+    out = None
+    for h in hists:
+        out = h.copy() if out is None else out.merge(h)
+    return out if out is not None else HdrHistogram()
+
+
+def format_percentiles(h: HdrHistogram, qs=DEFAULT_PERCENTILES, unit: str = "s") -> str:
+    vals = h.percentiles(qs) / UNIT_NS[unit]
+    return "  ".join(f"p{q:g}={v:.6f}{unit}" for q, v in zip(qs, vals))
+
+
+def from_csv(path: str, column: str, unit: str, where=None) -> HdrHistogram:
+    import pandas as pd
+    h = HdrHistogram()
+    for chunk in pd.read_csv(path, chunksize=1_000_000):
+        if where:
+            k, v = where
+            chunk = chunk[chunk[k].astype(str) == v]
+        vals = pd.to_numeric(chunk[column], errors="coerce").dropna().to_numpy(dtype=np.float64)
+        h.record_many(np.rint(vals * UNIT_NS[unit]).astype(np.int64))
+    return h
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HDR latency histograms")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("summary", help="merge histogram logs and print percentiles")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--unit", default="s", choices=list(UNIT_NS))
+    p = sp.add_parser("from-csv", help="build a histogram from a CSV column")
+    p.add_argument("csv")
+    p.add_argument("--column", default="seconds")
+    p.add_argument("--unit", default="s", choices=list(UNIT_NS), help="unit of the column")
+    p.add_argument("--where", help="filter rows, e.g. phase=fault")
+    p.add_argument("--percentiles", default="50,95,99")
+    p.add_argument("-o", "--output", help="write a single-record histogram log")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "summary":
+        h = merge_all(read_log(p)["cumulative"] for p in args.logs)
+        print(f"  count={h.total}  mean={h.mean() / UNIT_NS[args.unit]:.6f}{args.unit}")
+        print("  " + format_percentiles(h, unit=args.unit))
+        return
+
+    where = tuple(args.where.split("=", 1)) if args.where else None
+    h = from_csv(args.csv, args.column, args.unit, where)
+    if args.output:
+        rec = IntervalRecorder(args.output, 0, 0)
+        rec.cumulative = h
+        rec.close(0)
+    qs = [float(q) for q in args.percentiles.split(",")]
+    if h.total == 0:
+        print("  " + "  ".join(f"p{q:g}=NaN" for q in qs))
+        sys.exit(0)
+    print("  " + format_percentiles(h, qs, unit=args.unit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Host-side 4 KB write+fsync benchmark on a (FUSE-mounted) file.
+
+Closed-loop (default) issues one op after the other, like the
+`docker exec ... dd conv=fsync` loop in run_io_benchmark.sh but without the
+exec cost. With --rate it runs open-loop (see loadgen.py): ops are started
+at a fixed or Poisson rate from a pool of I/O threads, and the latency
+from the intended start and the queueing delay are recorded too.
+
+Rows are appended to --out in the run_io_benchmark.sh format:
+  closed-loop: timestamp_ms,latency_ms,phase
+  open-loop  : timestamp_ms,latency_ms,intended_ms,queue_ms,corrected_latency_ms,phase
+and the latencies of the phase also go to <out>_<phase>.hlog (hdr_hist.py)
+and to the columnar per-op directory <out>.col (oprec.py, appended per phase).
+One --out file holds one layout: appending closed-loop rows to an open-loop
+file (or the reverse) is refused before the run starts.
+
+With --agent the closed-loop ops run in io_probe_agent.py instead of this
+process: an agent started once (in the benchmark container: docker:NAME or
+unix:SOCKET; local for this host) keeps the file open and times each
+write + sync (--sync fsync|fdatasync|odsync|osync|none, --prealloc,
+--pattern) with perf_counter_ns, streaming the records back in batches.
+--file is then the path as the agent sees it.
+
+With --workers it runs N concurrent streams instead (threads, or processes
+with --worker-mode process), each keeping --qd ops in flight (one I/O
+thread per slot) on the mounted path:
+  --offsets seq|random     block-aligned offsets within --file-size
+  --read-pct P             P% reads (pread/preadv), the rest writes
+  --engine pwrite|pwritev|mmap
+                           pwritev writes --iov blocks per op in one call
+                           (default 8; with pwritev --iov must be >= 2);
+                           mmap writes into a shared mapping and msyncs the
+                           range (the sync of that engine)
+  --files shared|per-worker
+                           one file for everybody, or <file>.w<k> each
+Ops are recorded per worker (node column of the .col, op = read/write)
+and merged; <out>_<phase>_workers.csv has per-worker throughput and
+percentiles. A list (--workers 1,2,4,8) runs one phase per count
+(<phase>_w<n>) and prints the scaling table (<out>_<phase>_scaling.csv):
+efficiency near 1 means the injected delay overlaps across streams,
+near 1/n means it is serialized (e.g. at the FUSE layer).
+
+With --until (closed-loop, open-loop and --agent; converge.py) --ops is the
+budget and the phase stops once the stop rule holds (with --agent the ops
+are sent in chunks of about 0.25 s and the rule is checked between them);
+the checks go to
+<out>_<phase>_convergence.csv and the percentiles printed after it exclude
+the detected warmup.
+
+    python3 io_bench.py --file /mnt/slowfs/test.dat --ops 500 --phase baseline --out latency_data.csv
+    python3 io_bench.py --file /mnt/slowfs/test.dat --ops 5000 --rate 1000 --arrival poisson --phase fault --out latency_data.csv
+    python3 io_bench.py --file /mnt/slowfs/test.dat --ops 20000 --until p99=5%,tput=5 --phase fault --out latency_data.csv
+    python3 io_bench.py --agent unix:/tmp/io_probe/agent.sock --file /data/test.dat --ops 5000 --sync fdatasync --out latency_data.csv
+    python3 io_bench.py --file /mnt/slowfs/test.dat --ops 2000 --workers 1,2,4,8 --qd 4 --offsets random \
+        --read-pct 30 --files per-worker --phase fault --out latency_data.csv
+"""
+import argparse
+import asyncio
+import csv
+import mmap
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+import converge
+import io_probe_agent
+import loadgen
+from hdr_hist import HdrHistogram, IntervalRecorder, format_percentiles
+from oprec import ColumnWriter, STATUS_OK, STATUS_ERR
+
+CLOSED_HEADER = "timestamp_ms,latency_ms,phase"
+OPEN_HEADER = "timestamp_ms,latency_ms,intended_ms,queue_ms,corrected_latency_ms,phase"
+AGENT_CHUNK_S = 0.25                # --until with --agent: ops per agent command ~ this long,
+AGENT_CHUNK_MIN, AGENT_CHUNK_MAX = 16, 65536     # so the stop rule is checked a few times a second
+MAX_WORKERS = 256                   # worker ids 0..255 go to the uint8 node column (oprec.py)
+
+
+def write_fsync(path: str, block: bytes):
+    """One op: open, write one block, fsync, close (what `dd conv=fsync` does)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, block)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def check_out(path: str, header: str):
+    """Refuse to append rows of one layout to a --out file that has the other header."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path) as f:
+        first = f.readline().strip()
+    if first != header:
+        mode = "open-loop (--rate)" if header == OPEN_HEADER else "closed-loop"
+        raise SystemExit(f"[io_bench] {path} has header {first!r}, but {mode} rows are {header!r}; "
+                         f"use another --out for this mode")
+
+
+def _open_out(path: str, header: str):
+    check_out(path, header)
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    f = open(path, "a")
+    if new:
+        f.write(header + "\n")
+    return f
+
+
+def hlog_path(args, suffix=""):
+    return f"{os.path.splitext(args.out)[0]}_{args.phase}{suffix}.hlog"
+
+
+def column_writer(args):
+    cols = ColumnWriter(os.path.splitext(args.out)[0] + ".col", append=True)
+    return cols, cols.code("op", "write_fsync"), cols.code("phase", args.phase)
+
+
+def start_convergence(args, rec: IntervalRecorder, start_perf_ns=None):
+    return converge.Convergence(args.until, rec.interval_ns).attach(rec, start_perf_ns) if args.until else None
+
+
+def report_convergence(args, conv):
+    """Stop reason, warmup and post-warmup percentiles; <out>_<phase>_convergence.csv."""
+    if conv is None:
+        return
+    conv.finish()
+    path = converge.write_csv(f"{os.path.splitext(args.out)[0]}_{args.phase}_convergence.csv", conv.rows)
+    print(converge.format_summary(conv.summary()))
+    post = conv.post_warmup()
+    if post.total:
+        print("  after warmup: " + format_percentiles(post, (50, 99, 99.9), unit="ms"))
+    print(f"  convergence: {path}")
+
+
+def run_closed(args, block):
+    cols, op, phase = column_writer(args)
+    t0_wall, t0_perf = time.time_ns(), time.perf_counter_ns()
+    rec = IntervalRecorder(hlog_path(args), t0_perf, t0_wall)
+    conv = start_convergence(args, rec)
+    rows = []
+    for _ in range(args.ops):
+        if conv is not None and conv.stop():
+            break
+        t0 = time.perf_counter_ns()
+        write_fsync(args.file, block)
+        t1 = time.perf_counter_ns()
+        rec.record(t1 - t0, t1)
+        cols.append(t0_wall + t0 - t0_perf, t1 - t0, op, phase)
+        rows.append(f"{(t0_wall + t0 - t0_perf) // 1_000_000},{(t1 - t0) / 1e6:.3f},{args.phase}\n")
+    end = time.perf_counter_ns()
+    wall = (end - t0_perf) / 1e9
+    hist = rec.close(end)
+    cols.close()
+    with _open_out(args.out, CLOSED_HEADER) as f:
+        f.writelines(rows)
+    print(f"  ops={hist.total} wall={wall:.3f}s throughput={hist.total / wall:.2f} ops/s")
+    print("  " + format_percentiles(hist, (50, 99, 99.9), unit="ms"))
+    report_convergence(args, conv)
+
+
+def run_agent_until(client, ops: int, conv, on_batch):
+    """
+    --until in agent mode: the agent runs a fixed number of ops per command,
+    so run short chunks (~AGENT_CHUNK_S at the last chunk's rate) and check
+    the stop rule between them. Returns (starts, lats) like ProbeClient.run.
+    """
+    starts, lats = array("q"), array("q")
+    total = {"ops": 0, "errors": 0, "wall_s": 0.0}
+    chunk = AGENT_CHUNK_MIN
+    while total["ops"] < ops and not conv.stop():
+        s, l = client.run(min(chunk, ops - total["ops"]), on_batch=on_batch)
+        starts.extend(s)
+        lats.extend(l)
+        for k in total:
+            total[k] += client.summary[k]
+        wall = client.summary["wall_s"]
+        rate = client.summary["ops"] / wall if wall > 0 else AGENT_CHUNK_MAX
+        chunk = int(min(max(rate * AGENT_CHUNK_S, AGENT_CHUNK_MIN), AGENT_CHUNK_MAX))
+    client.summary = total
+    return starts, lats
+
+
+def run_agent(args):
+    """Closed loop inside io_probe_agent.py; same outputs as run_closed."""
+    cols, op, phase = column_writer(args)
+    rows = []
+    with io_probe_agent.ProbeClient(args.agent, args.agent_path) as client:
+        client.open(args.file, **io_probe_agent.probe_kwargs(args))
+        t0_wall = time.time_ns()
+        rec = IntervalRecorder(hlog_path(args), t0_wall, t0_wall)
+        conv = start_convergence(args, rec, time.perf_counter_ns())
+
+        def batch(starts, lats):
+            for t0, lat in zip(starts, lats):
+                ok = lat >= 0
+                if ok:
+                    rec.record(lat, t0 + lat)
+                cols.append(t0, lat if ok else 0, op, phase, status=STATUS_OK if ok else STATUS_ERR)
+                if ok:
+                    rows.append(f"{t0 // 1_000_000},{lat / 1e6:.3f},{args.phase}\n")
+
+        if conv is None:
+            starts, lats = client.run(args.ops, on_batch=batch)
+        else:
+            starts, lats = run_agent_until(client, args.ops, conv, batch)
+        wall = client.summary["wall_s"]
+    end = (starts[-1] + max(lats[-1], 0)) if starts else t0_wall
+    hist = rec.close(end)
+    cols.close()
+    with _open_out(args.out, CLOSED_HEADER) as f:
+        f.writelines(rows)
+    print(f"  ops={hist.total} errors={client.summary['errors']} wall={wall:.3f}s "
+          f"throughput={hist.total / wall if wall > 0 else 0:.2f} ops/s  (agent {args.agent}, sync={args.sync})")
+    print("  " + format_percentiles(hist, (50, 99, 99.9), unit="ms"))
+    report_convergence(args, conv)
+
+
+def run_open(args, block):
+    pool = ThreadPoolExecutor(max_workers=args.max_outstanding)
+    cols, op_code, phase = column_writer(args)
+    log = loadgen.OpenLoopLog(args.ops)
+    rec = IntervalRecorder(hlog_path(args), log.t0_perf_ns, log.t0_wall_ns)
+    rec_cor = IntervalRecorder(hlog_path(args, "_corrected"), log.t0_perf_ns, log.t0_wall_ns)
+    conv = start_convergence(args, rec)
+
+    def done(i):
+        if log.ok[i]:
+            rec.record(log.service_ns(i), log.done_ns[i])
+            rec_cor.record(log.corrected_ns(i), log.done_ns[i])
+        cols.append(log.wall_ns(log.send_ns[i]), log.service_ns(i), op_code, phase,
+                    status=STATUS_OK if log.ok[i] else STATUS_ERR)
+
+    async def go():
+        loop = asyncio.get_running_loop()
+
+        async def op(i):
+            await loop.run_in_executor(pool, write_fsync, args.file, block)
+
+        await loadgen.open_loop(op, log, args.rate, args.arrival, args.max_outstanding,
+                                seed=args.seed, errors=(OSError,), on_done=done,
+                                stop=conv.stop if conv is not None else None)
+
+    try:
+        asyncio.run(go())
+    finally:
+        pool.shutdown()
+        cols.close()
+    rec.close(log.end_perf_ns)
+    rec_cor.close(log.end_perf_ns)
+    with _open_out(args.out, OPEN_HEADER) as f:
+        for i in range(log.n):
+            if not log.ok[i]:
+                continue
+            f.write(f"{log.wall_ns(log.send_ns[i]) // 1_000_000},{log.service_ns(i) / 1e6:.3f},"
+                    f"{log.wall_ns(log.intended_ns[i]) // 1_000_000},{log.queue_ns(i) / 1e6:.3f},"
+                    f"{log.corrected_ns(i) / 1e6:.3f},{args.phase}\n")
+    print(loadgen.format_summary(loadgen.summarize(log, args.rate)))
+    report_convergence(args, conv)
+
+
+# ===================== parallel streams (--workers) =====================
+
+@dataclass
+class MixSpec:
+    path: str
+    block_size: int = 4096
+    iov: int = 1
+    engine: str = "pwrite"
+    sync: str = "fsync"
+    read_pct: float = 0.0
+    offsets: str = "seq"
+    file_size: int = 64 << 20
+    files: str = "shared"
+    seed: int = 1
+
+    def target(self, worker: int) -> str:
+        return self.path if self.files == "shared" else f"{self.path}.w{worker}"
+
+    @property
+    def op_bytes(self) -> int:
+        return self.block_size * self.iov
+
+
+def prepare_files(spec: MixSpec, workers: int):
+    """Create the target file(s) at file_size so reads and random offsets hit written blocks."""
+    for path in sorted({spec.target(w) for w in range(workers)}):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < spec.file_size:
+                try:
+                    os.posix_fallocate(fd, 0, spec.file_size)
+                except OSError:
+                    os.ftruncate(fd, spec.file_size)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _stream(spec: MixSpec, fd, mm, slot: int, slots: int, ops: int, rng: random.Random, out: array):
+    """One I/O slot of a worker: `ops` ops, appending (start perf ns, latency ns, is_read, ok) to out."""
+    perf = time.perf_counter_ns
+    n_blocks = max(spec.file_size // spec.op_bytes, 1)
+    pos = slot * n_blocks // slots
+    sync = {"fsync": os.fsync, "fdatasync": getattr(os, "fdatasync", os.fsync)}.get(spec.sync)
+    if spec.engine == "mmap":
+        sync = None                                  # msync is the sync
+    block = b"\1" * spec.block_size
+    bufs = [bytearray(spec.block_size) for _ in range(spec.iov)]
+    size, gran = spec.op_bytes, mmap.ALLOCATIONGRANULARITY
+    for _ in range(ops):
+        if spec.offsets == "random":
+            off = rng.randrange(n_blocks) * size
+        else:
+            off = pos * size
+            pos = (pos + 1) % n_blocks
+        is_read = spec.read_pct > 0 and rng.random() * 100.0 < spec.read_pct
+        t0 = perf()
+        ok = 1
+        try:
+            if is_read:
+                if mm is not None:
+                    bytes(mm[off:off + size])
+                elif spec.iov > 1:
+                    os.preadv(fd, bufs, off)
+                else:
+                    os.pread(fd, spec.block_size, off)
+            else:
+                if mm is not None:
+                    mm[off:off + size] = block * spec.iov
+                    start = off - off % gran
+                    mm.flush(start, off + size - start)
+                elif spec.iov > 1:
+                    os.pwritev(fd, [block] * spec.iov, off)
+                else:
+                    os.pwrite(fd, block, off)
+                if sync is not None:
+                    sync(fd)
+        except OSError:
+            ok = 0
+        out.extend((t0, perf() - t0, int(is_read), ok))
+
+
+def run_worker(spec_d: dict, worker: int, workers: int, qd: int, ops: int, start_wall_ns: int):
+    """
+    One worker: qd I/O threads sharing one fd (and mapping) on its target.
+    Sequential slots start at evenly spaced offsets of their file. Waits
+    until start_wall_ns so process workers start together. Returns
+    (worker, records as int64 bytes with wall-clock starts).
+    """
+    spec = MixSpec(**spec_d)
+    flags = os.O_RDWR | {"odsync": os.O_DSYNC, "osync": os.O_SYNC}.get(spec.sync, 0)
+    fd = os.open(spec.target(worker), flags)
+    mm = mmap.mmap(fd, spec.file_size) if spec.engine == "mmap" else None
+    outs = [array("q") for _ in range(qd)]
+    rngs = [random.Random(spec.seed * 1_000_003 + worker * 1009 + k) for k in range(qd)]
+    shared = spec.files == "shared"
+    slots = workers * qd if shared else qd
+    threads = [threading.Thread(target=_stream, args=(spec, fd, mm, (worker * qd if shared else 0) + k, slots,
+                                                      ops // qd + (k < ops % qd), rngs[k], outs[k]))
+               for k in range(qd)]
+    wall_off = time.time_ns() - time.perf_counter_ns()
+    while time.time_ns() < start_wall_ns:
+        time.sleep(max(0.0, (start_wall_ns - time.time_ns()) / 1e9 - 0.001))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if mm is not None:
+        mm.close()
+    os.close(fd)
+    recs = np.concatenate([np.frombuffer(o, dtype=np.int64) for o in outs if len(o)] or [np.zeros(0, np.int64)])
+    recs = recs.reshape(-1, 4).copy()
+    recs[:, 0] += wall_off
+    return worker, recs.tobytes()
+
+
+def run_streams(spec: MixSpec, workers: int, qd: int, ops: int, processes: bool = False) -> np.ndarray:
+    """
+    All workers' records merged and sorted by start: int64 rows of
+    (start wall ns, latency ns, is_read, ok, worker).
+    """
+    prepare_files(spec, workers)
+    start = time.time_ns() + int(0.2e9 if processes else 0.02e9)
+    Pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with Pool(max_workers=workers) as pool:
+        futs = [pool.submit(run_worker, asdict(spec), w, workers, qd, ops, start) for w in range(workers)]
+        parts = []
+        for f in futs:
+            w, data = f.result()
+            r = np.frombuffer(data, dtype=np.int64).reshape(-1, 4)
+            parts.append(np.column_stack([r, np.full(len(r), w, dtype=np.int64)]))
+    recs = np.concatenate(parts) if parts else np.zeros((0, 5), np.int64)
+    return recs[np.argsort(recs[:, 0], kind="stable")]
+
+
+def _hist(lat_ns) -> HdrHistogram:
+    h = HdrHistogram()
+    h.record_many(lat_ns)
+    return h
+
+
+def stream_summary(recs: np.ndarray) -> dict:
+    ok = recs[:, 3] == 1
+    lat = recs[ok, 1]
+    wall = (int((recs[:, 0] + recs[:, 1]).max()) - int(recs[:, 0].min())) / 1e9 if len(recs) else 0.0
+    p50, p99, p999 = _hist(lat).percentiles((50, 99, 99.9)) / 1e6 if lat.size else (np.nan,) * 3
+    return {"ops": int(ok.sum()), "errors": int((~ok).sum()), "reads": int(recs[ok, 2].sum()),
+            "wall_s": wall, "throughput": ok.sum() / wall if wall > 0 else 0.0,
+            "p50_ms": p50, "p99_ms": p99, "p999_ms": p999,
+            "in_flight": lat.sum() / 1e9 / wall if wall > 0 else 0.0}
+
+
+def write_streams(args, phase_label: str, recs: np.ndarray) -> dict:
+    """Rows, .col (node = worker), merged hlog and the per-worker table of one phase."""
+    cols = ColumnWriter(os.path.splitext(args.out)[0] + ".col", append=True)
+    codes = np.array([cols.code("op", "write"), cols.code("op", "read")], dtype=np.uint8)
+    ok = recs[:, 3] == 1
+    cols.append_many(recs[:, 0], np.where(ok, recs[:, 1], 0), op=codes[recs[:, 2]],
+                     phase=cols.code("phase", phase_label), node=recs[:, 4].astype(np.uint8),
+                     status=np.where(ok, STATUS_OK, STATUS_ERR).astype(np.uint8))
+    cols.close()
+    with _open_out(args.out, CLOSED_HEADER) as f:
+        f.writelines(f"{t // 1_000_000},{lat / 1e6:.3f},{phase_label}\n"
+                     for t, lat in zip(recs[ok, 0].tolist(), recs[ok, 1].tolist()))
+    end = recs[ok, 0] + recs[ok, 1]
+    order = np.argsort(end, kind="stable")
+    t0 = int(recs[0, 0]) if len(recs) else time.time_ns()
+    rec = IntervalRecorder(f"{os.path.splitext(args.out)[0]}_{phase_label}.hlog", t0, t0)
+    rec.record_many(recs[ok, 1][order], end[order])
+    rec.close(int(end.max()) if end.size else t0)
+
+    table = os.path.splitext(args.out)[0] + f"_{phase_label}_workers.csv"
+    fields = ["worker", "ops", "errors", "reads", "wall_s", "throughput", "p50_ms", "p99_ms", "p999_ms"]
+    with open(table, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        w.writeheader()
+        for k in np.unique(recs[:, 4]).tolist():
+            w.writerow(dict(stream_summary(recs[recs[:, 4] == k]), worker=k))
+        w.writerow(dict(stream_summary(recs), worker="all"))
+    return stream_summary(recs)
+
+
+def run_parallel(args):
+    counts = [int(x) for x in str(args.workers).split(",") if x]
+    spec = MixSpec(args.file, args.block_size, args.iov, args.engine, args.sync, args.read_pct, args.offsets,
+                   args.file_size, args.files, args.seed)
+    rows = []
+    for n in counts:
+        label = args.phase if len(counts) == 1 else f"{args.phase}_w{n}"
+        recs = run_streams(spec, n, args.qd, args.ops, args.worker_mode == "process")
+        s = write_streams(args, label, recs)
+        s.update(workers=n, qd=args.qd, streams=n * args.qd, phase=label)
+        rows.append(s)
+        print(f"  {label}: workers={n} qd={args.qd} ops={s['ops']} errors={s['errors']} wall={s['wall_s']:.3f}s "
+              f"throughput={s['throughput']:.2f} ops/s  p50={s['p50_ms']:.3f}ms p99={s['p99_ms']:.3f}ms "
+              f"in-flight={s['in_flight']:.1f}")
+    if len(rows) > 1:
+        base = rows[0]
+        print(f"  {'streams':>8} {'ops/s':>10} {'speedup':>8} {'efficiency':>10} {'p99_ms':>9}")
+        for r in rows:
+            r["speedup"] = r["throughput"] / base["throughput"] if base["throughput"] else float("nan")
+            r["efficiency"] = r["speedup"] * base["streams"] / r["streams"]
+            print(f"  {r['streams']:>8} {r['throughput']:>10.1f} {r['speedup']:>8.2f} {r['efficiency']:>10.2f} "
+                  f"{r['p99_ms']:>9.3f}")
+        path = os.path.splitext(args.out)[0] + f"_{args.phase}_scaling.csv"
+        with open(path, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=["phase", "workers", "qd", "streams", "ops", "errors", "throughput",
+                                              "speedup", "efficiency", "p50_ms", "p99_ms", "p999_ms", "in_flight"],
+                               extrasaction="ignore")
+            w.writeheader()
+            w.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="4 KB write+fsync benchmark (closed- or open-loop)")
+    ap.add_argument("--file", required=True, help="target file, e.g. /mnt/slowfs/test.dat")
+    ap.add_argument("--ops", type=int, required=True)
+    ap.add_argument("--phase", default="baseline")
+    ap.add_argument("--out", required=True, help="CSV to append rows to")
+    ap.add_argument("--block-size", type=int, default=4096)
+    ap.add_argument("--rate", type=float, help="open-loop: target ops/s")
+    ap.add_argument("--arrival", choices=["constant", "poisson"], default="constant")
+    ap.add_argument("--max-outstanding", type=int, default=32, help="open-loop: I/O threads")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--agent", help="closed-loop ops in io_probe_agent.py: docker:CONTAINER, unix:SOCKET or local")
+    io_probe_agent.add_probe_args(ap)
+    g = ap.add_argument_group("parallel streams")
+    g.add_argument("--workers", help="concurrent workers, or a list (1,2,4,8) for a scaling run; --ops is per worker")
+    g.add_argument("--qd", type=int, default=1, help="ops in flight per worker (I/O threads)")
+    g.add_argument("--worker-mode", choices=["thread", "process"], default="thread")
+    g.add_argument("--offsets", choices=["seq", "random"], default="seq")
+    g.add_argument("--read-pct", type=float, default=0.0)
+    g.add_argument("--engine", choices=["pwrite", "pwritev", "mmap"], default="pwrite")
+    g.add_argument("--iov", type=int, help="blocks per op (pwritev / preadv); default 8 with --engine pwritev "
+                                            "(which needs >= 2), else 1")
+    g.add_argument("--files", choices=["shared", "per-worker"], default="shared")
+    g.add_argument("--file-size", type=io_probe_agent.parse_size, default=64 << 20, help="e.g. 64M")
+    converge.add_arguments(ap)
+    args = ap.parse_args(argv)
+    if args.until and args.workers:
+        ap.error("--until works with the closed-loop, open-loop and --agent modes, not --workers "
+                 "(the streams report only when they are done)")
+    if args.iov is None:
+        args.iov = 8 if args.engine == "pwritev" else 1
+    elif args.iov < 1 or (args.engine == "pwritev" and args.iov < 2):
+        ap.error(f"--iov {args.iov}: " + ("--engine pwritev needs at least 2 blocks per op"
+                                          if args.iov >= 1 else "must be >= 1"))
+    if args.workers:
+        try:
+            counts = [int(x) for x in str(args.workers).split(",") if x]
+        except ValueError:
+            ap.error(f"--workers {args.workers}: expected a count or a list like 1,2,4,8")
+        if not counts or any(not 1 <= n <= MAX_WORKERS for n in counts):
+            ap.error(f"--workers {args.workers}: each count must be 1..{MAX_WORKERS} "
+                     f"(the worker id is the uint8 node column of the .col)")
+
+    check_out(args.out, OPEN_HEADER if args.rate and not args.workers else CLOSED_HEADER)
+    block = b"\0" * args.block_size
+    print(f"[io_bench] phase={args.phase} ops={args.ops} file={args.file} "
+          + (f"{args.workers} worker(s) x qd {args.qd}, {args.engine} {args.offsets} read={args.read_pct:g}% "
+             f"files={args.files}" if args.workers else
+             f"open-loop {args.arrival} {args.rate:g} ops/s" if args.rate else "closed-loop")
+          + (f" via agent {args.agent}" if args.agent and not (args.rate or args.workers) else ""),
+          file=sys.stderr)
+    if args.workers:
+        run_parallel(args)
+    elif args.rate:
+        run_open(args, block)
+    elif args.agent:
+        try:
+            run_agent(args)
+        except io_probe_agent.ProbeError as e:
+            raise SystemExit(f"[io_bench] agent: {e}")
+    else:
+        run_closed(args, block)
+
+
+if __name__ == "__main__":
+    main()
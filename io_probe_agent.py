@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Persistent I/O probe: a small agent started once (inside the benchmark
+container, or on the host) that keeps the target file open and times
+write + sync loops with time.perf_counter_ns(), instead of one
+`docker exec dd conv=fsync` per op timed with `date +%s%3N` (which measures
+exec and process start-up at 1 ms resolution, not the 4 KB write+fsync).
+
+The agent side only needs the standard library (the container has no
+numpy). It is driven over a pipe (`agent`: stdin/stdout, e.g. through
+`docker exec -i`) or a Unix socket (`serve`), one session per connection:
+
+  controller -> agent   one JSON command per line
+      {"cmd": "open", "args": {"path": ..., "block_size": 4096, "sync": "fsync",
+                               "prealloc": 0, "pattern": "overwrite", "direct": false}}
+      {"cmd": "run", "ops": N, "batch": 1024}
+      {"cmd": "close"}   {"cmd": "quit"}
+  agent -> controller   frames: FRAME header (magic, kind, payload length) + payload
+      HELLO    JSON {pid, version, t0_wall_ns, t0_perf_ns}
+      RECORDS  n x RECORD (start perf_counter_ns, latency ns; -errno on a failed op)
+      DONE     JSON (reply to a command; the summary after a run)
+      ERROR    JSON {error}
+
+Sync primitives: fsync, fdatasync, odsync (file opened O_DSYNC; the write
+itself is timed), osync (O_SYNC), none. Patterns: overwrite (every op
+writes offset 0) or append (sequential blocks, wrapping at the
+preallocated size). --prealloc reserves the file up front
+(posix_fallocate, else zero-fill) so block allocation is not timed.
+
+    # inside the container (docker-compose-simple.yml mounts this repo at /probe)
+    python3 /probe/io_probe_agent.py serve --socket /run/io_probe/agent.sock
+    # host: the same ops, records streamed back (io_bench.py --agent uses ProbeClient)
+    python3 io_probe_agent.py probe --connect unix:/tmp/io_probe/agent.sock --file /data/test.dat --ops 1000
+    python3 io_probe_agent.py probe --connect docker:benchmark-runner --file /data/test.dat --ops 1000 --sync fdatasync
+    python3 io_probe_agent.py probe --connect local --file /mnt/slowfs/test.dat --ops 1000 --prealloc 64M
+"""
+import argparse
+import json
+import mmap
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+from array import array
+
+VERSION = 1
+MAGIC = b"IOPB"
+FRAME = struct.Struct("<4sBI")                  # magic, kind, payload bytes
+RECORD = struct.Struct("<qq")                   # start perf_counter_ns, latency ns (-errno on error)
+HELLO, RECORDS, DONE, ERROR = 0, 1, 2, 3
+SYNCS = ("fsync", "fdatasync", "odsync", "osync", "none")
+PATTERNS = ("overwrite", "append")
+DEFAULT_AGENT_PATH = "/probe/io_probe_agent.py"
+
+
+def parse_size(text) -> int:
+    """'4096', '4k', '64M', '1G' -> bytes."""
+    text = str(text).strip()
+    mult = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+# ===================== agent side (stdlib only) =====================
+
+class Probe:
+    """One open target file and the op loop over it."""
+
+    def __init__(self, path: str, block_size: int = 4096, sync: str = "fsync", prealloc: int = 0,
+                 pattern: str = "overwrite", direct: bool = False):
+        if sync not in SYNCS:
+            raise ValueError(f"sync must be one of {', '.join(SYNCS)}")
+        if pattern not in PATTERNS:
+            raise ValueError(f"pattern must be one of {', '.join(PATTERNS)}")
+        self.path = path
+        self.block_size = int(block_size)
+        self.sync = sync
+        self.prealloc = int(prealloc)
+        self.pattern = pattern
+        self.direct = direct
+        self.fd = None
+        self.offset = 0
+
+    def open(self) -> dict:
+        flags = os.O_WRONLY | os.O_CREAT
+        if self.sync == "odsync":
+            flags |= os.O_DSYNC
+        elif self.sync == "osync":
+            flags |= os.O_SYNC
+        if self.direct:
+            flags |= getattr(os, "O_DIRECT", 0)
+        self.fd = os.open(self.path, flags, 0o644)
+        # page-aligned buffer, so O_DIRECT works too
+        self.buf = mmap.mmap(-1, max(self.block_size, mmap.PAGESIZE))
+        self.block = memoryview(self.buf)[:self.block_size]
+        t = time.perf_counter_ns()
+        if self.prealloc:
+            try:
+                os.posix_fallocate(self.fd, 0, self.prealloc)
+            except (OSError, AttributeError):
+                zeros = memoryview(mmap.mmap(-1, 1 << 20))
+                for off in range(0, self.prealloc, 1 << 20):
+                    os.pwrite(self.fd, zeros[:min(1 << 20, self.prealloc - off)], off)
+            os.fsync(self.fd)
+        self.offset = 0
+        return {"path": self.path, "prealloc_s": (time.perf_counter_ns() - t) / 1e9}
+
+    def run(self, ops: int, emit, batch: int = 1024) -> dict:
+        """Run `ops` ops; emit(bytes) gets every `batch` records packed as RECORD."""
+        fd, block, bs = self.fd, self.block, self.block_size
+        sync = {"fsync": os.fsync, "fdatasync": getattr(os, "fdatasync", os.fsync)}.get(self.sync)
+        append = self.pattern == "append"
+        wrap = max(self.prealloc // bs, 1) * bs if self.prealloc else 0
+        perf, pwrite = time.perf_counter_ns, os.pwrite
+        recs = array("q")
+        off = self.offset
+        n_err = 0
+        t_begin = perf()
+        for _ in range(ops):
+            t0 = perf()
+            try:
+                pwrite(fd, block, off)
+                if sync is not None:
+                    sync(fd)
+                lat = perf() - t0
+            except OSError as e:
+                lat = -(e.errno or 1)
+                n_err += 1
+            recs.append(t0)
+            recs.append(lat)
+            if append:
+                off += bs
+                if wrap and off >= wrap:
+                    off = 0
+            if len(recs) >= 2 * batch:
+                emit(recs.tobytes())
+                del recs[:]
+        if recs:
+            emit(recs.tobytes())
+        self.offset = off
+        return {"ops": ops, "errors": n_err, "wall_s": (perf() - t_begin) / 1e9}
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def session(rfile, wfile):
+    """Serve one controller: JSON commands in, frames out."""
+    def send(kind, payload: bytes):
+        wfile.write(FRAME.pack(MAGIC, kind, len(payload)))
+        wfile.write(payload)
+        if kind != RECORDS:
+            wfile.flush()
+
+    def reply(kind, obj):
+        send(kind, json.dumps(obj).encode())
+
+    reply(HELLO, {"pid": os.getpid(), "version": VERSION, "t0_wall_ns": time.time_ns(),
+                  "t0_perf_ns": time.perf_counter_ns()})
+    probe = None
+    for line in rfile:
+        if not line.strip():
+            continue
+        try:
+            cmd = json.loads(line)
+            c = cmd.get("cmd")
+            if c == "open":
+                if probe is not None:
+                    probe.close()
+                probe = Probe(**cmd.get("args", {}))
+                reply(DONE, probe.open())
+            elif c == "run":
+                if probe is None:
+                    raise ValueError("run before open")
+                out = probe.run(int(cmd["ops"]), lambda b: send(RECORDS, b), int(cmd.get("batch", 1024)))
+                wfile.flush()
+                reply(DONE, out)
+            elif c == "close":
+                if probe is not None:
+                    probe.close()
+                    probe = None
+                reply(DONE, {})
+            elif c == "quit":
+                break
+            else:
+                raise ValueError(f"unknown command {c!r}")
+        except Exception as e:
+            reply(ERROR, {"error": repr(e)})
+    if probe is not None:
+        probe.close()
+
+
+def serve(sock_path: str):
+    """Accept controllers on a Unix socket, one session at a time, until killed."""
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+    os.makedirs(os.path.dirname(sock_path) or ".", exist_ok=True)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(sock_path)
+    os.chmod(sock_path, 0o666)              # the host-side controller is usually not root
+    srv.listen(1)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))     # run the finally below
+    print(f"[io_probe] listening on {sock_path}", file=sys.stderr)
+    try:
+        while True:
+            conn, _ = srv.accept()
+            with conn, conn.makefile("rb") as r, conn.makefile("wb") as w:
+                try:
+                    session(r, w)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+    finally:
+        srv.close()
+        os.unlink(sock_path)
+
+
+# ===================== controller side =====================
+
+class ProbeError(Exception):
+    """The agent reported an error, or the connection to it broke."""
+
+
+class ProbeClient:
+    """
+    Controller of one agent session. `target` is
+      local                 spawn the agent here (python3 io_probe_agent.py agent)
+      docker:CONTAINER      spawn it in a container (docker exec -i ... agent)
+      unix:PATH             connect to a running `serve`
+    """
+
+    def __init__(self, target: str = "local", agent_path: str = DEFAULT_AGENT_PATH, python: str = "python3"):
+        self.proc = self.sock = None
+        kind, _, arg = target.partition(":")
+        if kind == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(arg)
+            self.r, self.w = self.sock.makefile("rb"), self.sock.makefile("wb")
+        else:
+            if kind == "docker":
+                cmd = ["docker", "exec", "-i", arg, python, agent_path, "agent"]
+            elif kind == "local":
+                cmd = [sys.executable, os.path.abspath(__file__), "agent"]
+            else:
+                raise ValueError(f"unknown agent target: {target}")
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self.r, self.w = self.proc.stdout, self.proc.stdin
+        kind, hello = self._frame()
+        if kind != HELLO:
+            raise ProbeError(f"{target}: no HELLO from the agent")
+        self.hello = json.loads(hello)
+        self.wall_off = self.hello["t0_wall_ns"] - self.hello["t0_perf_ns"]
+
+    def _frame(self):
+        hdr = self.r.read(FRAME.size)
+        if len(hdr) < FRAME.size:
+            raise ProbeError("agent closed the connection")
+        magic, kind, n = FRAME.unpack(hdr)
+        if magic != MAGIC:
+            raise ProbeError(f"bad frame magic {magic!r}")
+        data = self.r.read(n)
+        if len(data) < n:
+            raise ProbeError("truncated frame")
+        return kind, data
+
+    def _cmd(self, obj: dict, on_records=None) -> dict:
+        self.w.write(json.dumps(obj).encode() + b"\n")
+        self.w.flush()
+        while True:
+            kind, data = self._frame()
+            if kind == RECORDS:
+                if on_records is not None:
+                    on_records(data)
+            elif kind == DONE:
+                return json.loads(data)
+            elif kind == ERROR:
+                raise ProbeError(json.loads(data)["error"])
+
+    def open(self, path: str, **kw) -> dict:
+        return self._cmd({"cmd": "open", "args": dict(kw, path=path)})
+
+    def run(self, ops: int, batch: int = 1024, on_batch=None):
+        """
+        Run `ops` ops on the open file. Returns (start_wall_ns, latency_ns)
+        as array('q'); latency < 0 is -errno of a failed op. on_batch(starts,
+        lats) is called for every streamed batch as it arrives.
+        """
+        starts, lats = array("q"), array("q")
+
+        def got(data):
+            recs = array("q")
+            recs.frombytes(data)
+            s, l = recs[0::2], recs[1::2]
+            for i in range(len(s)):
+                s[i] += self.wall_off
+            starts.extend(s)
+            lats.extend(l)
+            if on_batch is not None:
+                on_batch(s, l)
+
+        self.summary = self._cmd({"cmd": "run", "ops": ops, "batch": batch}, got)
+        return starts, lats
+
+    def close(self):
+        try:
+            self._cmd({"cmd": "close"})
+            self.w.write(b'{"cmd": "quit"}\n')
+            self.w.flush()
+        except (ProbeError, OSError):
+            pass
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        if self.sock is not None:
+            self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_probe_args(ap: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """Options of a probe run, shared with io_bench.py --agent."""
+    ap.add_argument("--sync", choices=SYNCS, default="fsync", help="sync primitive after each write")
+    ap.add_argument("--prealloc", type=parse_size, default=0, help="preallocate the file, e.g. 64M (0 = no)")
+    ap.add_argument("--pattern", choices=PATTERNS, default="overwrite")
+    ap.add_argument("--direct", action="store_true", help="O_DIRECT")
+    ap.add_argument("--agent-path", default=DEFAULT_AGENT_PATH, help="agent script inside the container")
+    return ap
+
+
+def probe_kwargs(args) -> dict:
+    return {"block_size": args.block_size, "sync": args.sync, "prealloc": args.prealloc,
+            "pattern": args.pattern, "direct": args.direct}
+
+
+# ===================== CLI =====================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Persistent write+sync probe agent and its controller")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    sp.add_parser("agent", help="serve one session on stdin/stdout")
+    p = sp.add_parser("serve", help="serve sessions on a Unix socket")
+    p.add_argument("--socket", required=True)
+    p = add_probe_args(sp.add_parser("probe", help="run ops through an agent and print percentiles"))
+    p.add_argument("--connect", default="local", help="local | docker:CONTAINER | unix:PATH")
+    p.add_argument("--file", required=True, help="target file as the agent sees it")
+    p.add_argument("--ops", type=int, default=1000)
+    p.add_argument("--block-size", type=parse_size, default=4096)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "agent":
+        session(sys.stdin.buffer, sys.stdout.buffer)
+    elif args.cmd == "serve":
+        serve(args.socket)
+    else:
+        from hdr_hist import HdrHistogram, format_percentiles
+        try:
+            with ProbeClient(args.connect, args.agent_path) as c:
+                c.open(args.file, **probe_kwargs(args))
+                _starts, lats = c.run(args.ops)
+        except ProbeError as e:
+            raise SystemExit(f"[io_probe] {e}")
+        h = HdrHistogram()
+        h.record_many([v for v in lats if v >= 0])
+        wall = c.summary["wall_s"]
+        print(f"  ops={h.total} errors={c.summary['errors']} wall={wall:.3f}s "
+              f"throughput={h.total / wall if wall > 0 else 0:.2f} ops/s  sync={args.sync}")
+        print("  " + format_percentiles(h, (50, 99, 99.9), unit="ms"))
+
+
+if __name__ == "__main__":
+    main()
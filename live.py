@@ -0,0 +1,481 @@
+"""
+Follow mode for the time-series plots: tail result files while a run is
+still writing them and redraw at a fixed rate.
+
+Every poll reads only the bytes (or .col rows) appended since the previous
+one, in bounded chunks, and folds them into per-second aggregates:
+
+  ops            completed ok ops per second (by op start time, as aggregate.py)
+  mean, max      latency in ms
+  p50, p90, p99  from a per-second log-bucket histogram (BUCKETS_PER_DECADE
+                 buckets per decade, ~3.6% relative error), computed only
+                 for seconds that changed since the last redraw
+
+Parsed rows are dropped after folding, so memory is a few KB per second
+of run time (or constant with window_s, which keeps only the last
+window_s seconds).
+
+Sources (analysis.detect_kind):
+  per_op.col/                  new rows of the memory-mapped columns
+  per_op_latency*.csv          needs start_unix_ns; latency from 'seconds'
+  latency_data*.csv            timestamp_ms, latency_ms
+  latency_x*ms.log             'timestamp_ms,latency_ms' lines
+  *_per_sec*.csv               per-second rows are taken as they are
+
+Time 0 is the run's t0_unix_ns (.col meta) or the first op start read; ops
+that started earlier go to second 0. A file that shrinks (rewritten) is
+read again from the start.
+
+    python3 throughput_vs_time.py --follow                        # the script's own patterns
+    python3 latency_vs_time.py --follow 'results/*/per_op.col' --window 600
+"""
+import math
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+import oprec
+from analysis import (LATENCY_METRICS, OPS_COLUMNS, TIME_COLUMNS, detect_kind, find_files,
+                      label_from_path)
+from fault_timeline import fault_boundaries, find_events, read_events
+
+CHUNK_BYTES = 4 << 20
+CHUNK_ROWS = 1 << 20
+BUCKETS_PER_DECADE = 32
+MIN_MS, MAX_MS = 1e-3, 1e6
+N_BUCKETS = int(round(math.log10(MAX_MS / MIN_MS) * BUCKETS_PER_DECADE)) + 2   # + under/overflow
+STATS = ("ops", "mean", "max", "p50", "p90", "p99")
+
+
+# ===================== tails =====================
+
+class TextTail:
+    """Complete new lines of a growing text file, in chunks of at most CHUNK_BYTES."""
+
+    def __init__(self, path: str, header: bool = True):
+        self.path = path
+        self.has_header = header
+        self.header: Optional[List[str]] = None
+        self.pos = 0
+        self._rest = b""
+        self.reset = False
+
+    def chunks(self) -> Iterator[List[str]]:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size < self.pos:                 # rewritten: start over
+            self.pos, self._rest, self.header, self.reset = 0, b"", None, True
+        if size == self.pos:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.pos)
+            while self.pos < size:
+                data = f.read(min(CHUNK_BYTES, size - self.pos))
+                if not data:
+                    break
+                self.pos += len(data)
+                data = self._rest + data
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    self._rest = data
+                    continue
+                self._rest = data[cut + 1:]
+                lines = data[:cut].decode("utf-8", "replace").splitlines()
+                if self.has_header and self.header is None and lines:
+                    self.header = [c.strip() for c in lines.pop(0).split(",")]
+                if lines:
+                    yield lines
+
+
+class ColTail:
+    """New rows of a per_op.col directory, as in-memory copies of at most CHUNK_ROWS rows."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.reset = False
+        self.table = None
+
+    def chunks(self) -> Iterator[Dict[str, np.ndarray]]:
+        if self.table is None:
+            if not oprec.is_opcol(self.path):
+                return
+            self.table = oprec.open_ops(self.path)
+        n = self.table.refresh()
+        if n < self.rows:
+            self.rows, self.reset = 0, True
+        while self.rows < n:
+            k = min(CHUNK_ROWS, n - self.rows)
+            sl = slice(self.rows, self.rows + k)
+            yield {c: np.array(self.table[c][sl]) for c in ("start_ns", "latency_ns", "status")}
+            self.rows += k
+
+
+# ===================== per-second aggregates =====================
+
+def bucket_of(lat_ms: np.ndarray) -> np.ndarray:
+    b = np.floor(np.log10(np.maximum(lat_ms, MIN_MS * 0.5) / MIN_MS) * BUCKETS_PER_DECADE).astype(np.int64) + 1
+    return np.clip(b, 0, N_BUCKETS - 1)
+
+
+def bucket_value(b: np.ndarray) -> np.ndarray:
+    """Geometric midpoint of bucket b (ms)."""
+    return MIN_MS * 10.0 ** ((np.asarray(b, dtype=np.float64) - 0.5) / BUCKETS_PER_DECADE)
+
+
+class SecondBins:
+    """
+    Per-second ops, latency sum/max and latency histogram, grown in place.
+    Second s lives at row s - base; with window_s, rows older than the
+    newest second - window_s + 1 are dropped. Percentiles are cached per
+    row and recomputed only for rows whose version changed.
+    """
+
+    def __init__(self, window_s: Optional[int] = None, capacity: int = 256):
+        self.window = window_s
+        self.base = 0
+        self.last = -1                      # newest second seen
+        self.rows: Dict[str, np.ndarray] = {
+            "n": np.zeros(capacity, dtype=np.int64),
+            "sum": np.zeros(capacity),
+            "max": np.full(capacity, np.nan),
+            "hist": np.zeros((capacity, N_BUCKETS), dtype=np.uint32),
+            "ver": np.zeros(capacity, dtype=np.int64),
+        }
+
+    @staticmethod
+    def _blank(a: np.ndarray):
+        a[...] = np.nan if a.dtype.kind == "f" else 0
+
+    def _fit(self, hi: int):
+        """Make room for second hi (sliding the window or growing)."""
+        cap = self.rows["n"].size
+        if hi - self.base < cap:
+            return
+        if self.window and hi - self.window + 1 > self.base:
+            shift = min(hi - self.window + 1 - self.base, cap)
+            for a in self.rows.values():
+                a[:cap - shift] = a[shift:]
+                self._blank(a[cap - shift:])
+            self.base += shift
+            if hi - self.base < cap:
+                return
+        new = max(cap * 2, hi - self.base + 1)
+        for k, a in self.rows.items():
+            b = np.empty((new,) + a.shape[1:], dtype=a.dtype)
+            self._blank(b)
+            b[:cap] = a
+            self.rows[k] = b
+
+    def add(self, sec: np.ndarray, lat_ms: np.ndarray):
+        """Fold ops (second index, latency ms; NaN = failed, not counted)."""
+        good = np.isfinite(lat_ms) & np.isfinite(sec)
+        sec, lat_ms = np.maximum(sec[good], 0).astype(np.int64), lat_ms[good]
+        if sec.size == 0:
+            return
+        self.last = max(self.last, int(sec.max()))
+        self._fit(self.last)
+        keep = sec >= self.base
+        rel, lat_ms = sec[keep] - self.base, lat_ms[keep]
+        if rel.size == 0:
+            return
+        r = self.rows
+        cap = r["n"].size
+        r["n"] += np.bincount(rel, minlength=cap)
+        r["sum"] += np.bincount(rel, weights=lat_ms, minlength=cap)
+        mx = np.full(cap, -np.inf)
+        np.maximum.at(mx, rel, lat_ms)
+        r["max"] = np.fmax(r["max"], np.where(np.isfinite(mx), mx, np.nan))
+        flat, cnt = np.unique(rel * N_BUCKETS + bucket_of(lat_ms), return_counts=True)
+        r["hist"].reshape(-1)[flat] += cnt.astype(np.uint32)
+        r["ver"][np.unique(rel)] += 1
+
+    def set(self, name: str, sec: np.ndarray, values: np.ndarray):
+        """Per-second values read as they are (per-second files)."""
+        sec = sec.astype(np.int64)
+        if sec.size == 0:
+            return
+        self.last = max(self.last, int(sec.max()))
+        if name not in self.rows:
+            self.rows[name] = np.full(self.rows["n"].size, np.nan)
+        self._fit(self.last)
+        keep = sec >= self.base
+        self.rows[name][sec[keep] - self.base] = values[keep]
+
+    def _percentile(self, q: float) -> np.ndarray:
+        r = self.rows
+        key, seen = f"q{q:g}", f"seen{q:g}"
+        if key not in r:
+            r[key] = np.full(r["n"].size, np.nan)
+            r[seen] = np.zeros(r["n"].size, dtype=np.int64)
+        todo = np.flatnonzero((r["ver"] != r[seen]) & (r["n"] > 0))
+        if todo.size:
+            cum = np.cumsum(r["hist"][todo], axis=1)
+            rank = np.maximum(np.ceil(q / 100.0 * r["n"][todo]), 1)
+            r[key][todo] = bucket_value((cum >= rank[:, None]).argmax(axis=1))
+            r[seen][todo] = r["ver"][todo]
+        return r[key]
+
+    def has(self, name: str) -> bool:
+        return name in self.rows
+
+    def series(self, stat: str):
+        """(t_sec, values) from the oldest kept second to the newest; empty latency seconds are NaN."""
+        r = self.rows
+        lo = max(self.last - self.window + 1 - self.base, 0) if self.window else 0
+        m = max(self.last - self.base + 1, 0)
+        if stat in r and stat not in ("n", "sum", "hist", "ver"):
+            v = r[stat]
+        elif stat == "ops":
+            v = r["n"].astype(np.float64)
+        elif stat == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                v = np.where(r["n"] > 0, r["sum"] / np.maximum(r["n"], 1), np.nan)
+        elif stat.startswith("p") and stat[1:].replace(".", "", 1).isdigit():
+            v = self._percentile(float(stat[1:]))
+        else:
+            raise ValueError(f"unknown stat {stat!r} (one of {', '.join(STATS)})")
+        return np.arange(self.base + lo, self.base + m), np.array(v[lo:m], dtype=np.float64)
+
+
+# ===================== one followed file =====================
+
+def _col_index(header: List[str], names) -> Optional[int]:
+    for n in names:
+        if n in header:
+            return header.index(n)
+    return None
+
+
+class LiveRun:
+    """One followed result file: tail + per-second aggregates."""
+
+    def __init__(self, path: str, window_s: Optional[int] = None, metrics=LATENCY_METRICS):
+        self.path = path
+        self.label = label_from_path(path)
+        self.kind = detect_kind(path)
+        self.metrics = list(metrics)
+        self.window = window_s
+        self.t0_ms: Optional[float] = None
+        self.rows = 0
+        self._events = (None, -1, [])
+        if self.kind == "col":
+            self.tail = ColTail(path)
+        else:
+            self.tail = TextTail(path, header=self.kind != "log")
+        self.bins = SecondBins(window_s)
+
+    def _sec(self, start_ms: np.ndarray) -> np.ndarray:
+        if self.t0_ms is None:
+            known = start_ms[np.isfinite(start_ms)]
+            if known.size == 0:
+                return np.zeros(0, dtype=np.int64)
+            self.t0_ms = float(known.min())
+        return np.floor((start_ms - self.t0_ms) / 1000.0)
+
+    def _restart(self):
+        self.tail.reset = False
+        self.t0_ms, self.rows = None, 0
+        self.bins = SecondBins(self.window)
+
+    def poll(self) -> int:
+        """Fold everything appended since the last poll; returns the number of new rows."""
+        new = 0
+        for chunk in self.tail.chunks():
+            if self.tail.reset:
+                self._restart()
+                new = 0
+            if self.kind == "col":
+                new += self._fold_col(chunk)
+            elif self.kind == "per_sec":
+                new += self._fold_per_sec(chunk)
+            else:
+                new += self._fold_lines(chunk)
+        self.rows += new
+        return new
+
+    def _fold_col(self, c) -> int:
+        if self.t0_ms is None:
+            t0 = self.tail.table.meta.get("t0_unix_ns")
+            if t0:
+                self.t0_ms = t0 / 1e6
+        lat = c["latency_ns"] / 1e6
+        lat[c["status"] != oprec.STATUS_OK] = np.nan
+        start = c["start_ns"] / 1e6
+        sec = self._sec(start)
+        if sec.size:
+            self.bins.add(sec, lat)
+        return lat.size
+
+    def _fold_lines(self, lines: List[str]) -> int:
+        if self.kind == "log":
+            ts, li, scale, ts_scale = 0, 1, 1.0, 1.0
+        else:
+            h = self.tail.header or []
+            ts = _col_index(h, ("start_unix_ns", "timestamp_ms"))
+            li = _col_index(h, ("seconds", "latency_ms"))
+            if ts is None or li is None:
+                raise ValueError(f"{self.path}: need start_unix_ns/timestamp_ms and seconds/latency_ms columns")
+            scale = 1e3 if h[li] == "seconds" else 1.0
+            ts_scale = 1e-6 if h[ts] == "start_unix_ns" else 1.0
+        start = np.full(len(lines), np.nan)
+        lat = np.full(len(lines), np.nan)
+        for i, line in enumerate(lines):
+            parts = line.split(",")
+            if len(parts) <= max(ts, li):
+                continue
+            try:
+                start[i] = float(parts[ts])
+                lat[i] = float(parts[li]) * scale
+            except ValueError:
+                continue
+        start *= ts_scale
+        sec = self._sec(start)
+        if sec.size:
+            ok = np.isfinite(sec)
+            self.bins.add(sec[ok], lat[ok])
+        return len(lines)
+
+    def _fold_per_sec(self, lines: List[str]) -> int:
+        h = self.tail.header or []
+        tcol = _col_index(h, TIME_COLUMNS)
+        if tcol is None:
+            raise ValueError(f"{self.path}: no time column (t_sec/sec/time/second)")
+        rows = [line.split(",") for line in lines]
+        sec = np.array([float(r[tcol]) if len(r) > tcol and r[tcol] else np.nan for r in rows])
+        for name, cands in (("ops_col", OPS_COLUMNS), ("lat_col", self.metrics)):
+            i = _col_index(h, cands)
+            if i is None and len(h) == 2:
+                i = 1 - tcol
+            if i is None:
+                continue
+            vals = np.array([_num(r[i]) if len(r) > i else np.nan for r in rows])
+            ok = np.isfinite(sec)
+            self.bins.set(name, sec[ok], vals[ok])
+        return len(lines)
+
+    def series(self, stat: str):
+        """(t_sec, values); per-second files answer every latency stat with their metric column."""
+        if self.kind == "per_sec":
+            name = "ops_col" if stat == "ops" else "lat_col"
+            if not self.bins.has(name):
+                return np.zeros(0), np.zeros(0)
+            return self.bins.series(name)
+        return self.bins.series(stat)
+
+    def fault_marks(self):
+        """Fault transitions from fault_events.csv, re-read only when it changed."""
+        if self.t0_ms is None or self.kind == "per_sec":
+            return []
+        ev = find_events(self.path)
+        if not ev:
+            return []
+        size = os.path.getsize(ev)
+        path, old, marks = self._events
+        if path != ev or size != old:
+            marks = fault_boundaries(read_events(ev), self.t0_ms)
+            self._events = (ev, size, marks)
+        return marks
+
+
+def _num(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def interpolate_gaps(v: np.ndarray) -> np.ndarray:
+    """Fill NaN seconds linearly (as analysis.fill_seconds(fill='interpolate'))."""
+    ok = np.isfinite(v)
+    if ok.all() or not ok.any():
+        return v
+    x = np.arange(v.size)
+    return np.interp(x, x[ok], v[ok])
+
+
+# ===================== live figure =====================
+
+def follow(patterns, stat: str = "ops", smooth_window: int = 1, smooth_how: str = "mean",
+           refresh_s: float = 1.0, window_s: Optional[int] = None, metrics=LATENCY_METRICS,
+           title: str = "", ylabel: str = "", legend_title: str = "", label=None,
+           marks: bool = False, mark_style=None, figsize=(14, 6)):
+    """
+    Plot `stat` per second for every file matching `patterns` and redraw
+    every refresh_s seconds. New matching files are picked up as they appear.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    from analysis import smooth
+    import pandas as pd
+
+    mark_style = mark_style or {"start": "--", "end": ":", "change": "-."}
+    fig, ax = plt.subplots(figsize=figsize)
+    runs: Dict[str, LiveRun] = {}
+    lines, vlines = {}, {}
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel("Time (seconds)")
+    ax.set_ylabel(ylabel)
+    ax.grid(True, linestyle="--", alpha=0.35)
+    status = ax.text(0.01, 0.99, "", transform=ax.transAxes, va="top", fontsize=9, alpha=0.7)
+
+    def tick(_frame):
+        t_start = time.perf_counter()
+        for path in find_files(*patterns):
+            if path not in runs:
+                runs[path] = LiveRun(path, window_s, metrics)
+        added = False
+        total = 0
+        for path, run in runs.items():
+            try:
+                run.poll()
+                t, v = run.series(stat)
+            except (OSError, ValueError) as e:
+                print(f"Skip {path}: {e}")
+                continue
+            total += run.rows
+            if t.size == 0:
+                continue
+            if stat != "ops":
+                v = interpolate_gaps(v)
+            if smooth_window > 1:
+                v = smooth(pd.Series(v), smooth_window, how=smooth_how).to_numpy()
+            if path not in lines:
+                lines[path], = ax.plot(t, v, linewidth=2, alpha=0.95,
+                                       label=label(run.label) if label else run.label)
+                added = True
+            else:
+                lines[path].set_data(t, v)
+            if marks:
+                ms = run.fault_marks()
+                if len(vlines.get(path, ())) != len(ms):
+                    for a in vlines.get(path, ()):
+                        a.remove()
+                    vlines[path] = [ax.axvline(ts, color=lines[path].get_color(), linestyle=mark_style[kind],
+                                               linewidth=1.2, alpha=0.8) for ts, kind in ms]
+        if added:
+            ax.legend(title=legend_title, frameon=True, loc="center left", bbox_to_anchor=(1.02, 0.5))
+            fig.tight_layout()
+        ax.relim()
+        ax.autoscale_view()
+        status.set_text(f"{len(runs)} file(s), {total:,} rows, "
+                        f"update {1e3 * (time.perf_counter() - t_start):.0f} ms  ({time.strftime('%H:%M:%S')})")
+        return list(lines.values())
+
+    tick(0)
+    # keep a reference, otherwise the animation is garbage-collected
+    fig._live_anim = FuncAnimation(fig, tick, interval=refresh_s * 1000, cache_frame_data=False)
+    plt.show()
+
+
+def add_follow_args(ap):
+    """--follow [PATTERN ...], --refresh, --window for the plotting scripts."""
+    ap.add_argument("--follow", nargs="*", metavar="PATTERN",
+                    help="tail the files while they grow (default: the script's own patterns)")
+    ap.add_argument("--refresh", type=float, default=1.0, help="seconds between redraws (follow mode)")
+    ap.add_argument("--window", type=int, help="keep only the last N seconds (follow mode)")
+    return ap
@@ -0,0 +1,176 @@
+"""
+Open-loop load generation shared by etcd_driver.py and io_bench.py.
+
+Ops are issued at a target rate (constant spacing or Poisson arrivals)
+from a precomputed schedule of intended start times, independent of how
+fast earlier ops complete. Every op records three timestamps on
+perf_counter_ns:
+
+  intended  when the schedule wanted the op to start
+  send      when it actually got a free slot (connection / I/O thread)
+  done      when it completed
+
+so latency can be reported from the intended start (corrected for
+coordinated omission), from the actual send (service time), and the
+queueing delay (send - intended) separately.
+"""
+import asyncio
+import random
+import time
+from array import array
+
+import numpy as np
+
+from hdr_hist import HdrHistogram
+
+SPIN_NS = 200_000                   # the last 0.2 ms before an op is due are polled, not slept
+
+
+def arrival_offsets(rate: float, n: int, kind: str = "constant", seed: int = 1) -> array:
+    """Intended start offsets in ns from t0 for n ops at `rate` ops/s."""
+    if rate <= 0:
+        raise ValueError("rate must be > 0")
+    out = array("q", bytes(8 * n))
+    gap = 1e9 / rate
+    if kind == "constant":
+        for i in range(n):
+            out[i] = int(i * gap)
+    elif kind == "poisson":
+        rnd = random.Random(seed)
+        t = 0.0
+        for i in range(n):
+            out[i] = int(t)
+            t += rnd.expovariate(1.0) * gap
+    else:
+        raise ValueError(f"unknown arrival kind: {kind}")
+    return out
+
+
+class OpenLoopLog:
+    """
+    Per-op timestamps for an open-loop run (perf_counter_ns). The schedule
+    origin is the moment the log is created, so create it right before
+    calling open_loop().
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.intended_ns = array("q", bytes(8 * n))
+        self.send_ns = array("q", bytes(8 * n))
+        self.done_ns = array("q", bytes(8 * n))
+        self.ok = bytearray(n)
+        self.convergence = None
+        self.t0_wall_ns = time.time_ns()
+        self.t0_perf_ns = time.perf_counter_ns()
+        self.end_perf_ns = self.t0_perf_ns
+
+    def truncate(self, n: int):
+        """Keep the first n ops (the run was stopped before its budget)."""
+        del self.intended_ns[n:], self.send_ns[n:], self.done_ns[n:], self.ok[n:]
+        if getattr(self, "op", None) is not None:
+            self.op = self.op[:n]
+        self.n = n
+
+    def service_ns(self, i):
+        return self.done_ns[i] - self.send_ns[i]
+
+    def corrected_ns(self, i):
+        return self.done_ns[i] - self.intended_ns[i]
+
+    def queue_ns(self, i):
+        return max(self.send_ns[i] - self.intended_ns[i], 0)
+
+    def wall_ns(self, perf_ns):
+        return self.t0_wall_ns + (perf_ns - self.t0_perf_ns)
+
+    def arrays(self):
+        """(ok mask, service, corrected, queue) as NumPy int64 ns arrays."""
+        ok = np.frombuffer(bytes(self.ok), dtype=np.uint8).astype(bool)
+        intended = np.frombuffer(self.intended_ns, dtype=np.int64)
+        send = np.frombuffer(self.send_ns, dtype=np.int64)
+        done = np.frombuffer(self.done_ns, dtype=np.int64)
+        return ok, (done - send)[ok], (done - intended)[ok], np.maximum(send - intended, 0)[ok]
+
+
+async def open_loop(op, log: OpenLoopLog, rate: float, kind: str = "constant",
+                    max_outstanding: int = 64, seed: int = 1, errors=(Exception,), on_done=None, stop=None):
+    """
+    Issue log.n calls of `await op(i)` at `rate` ops/s.
+
+    The dispatcher never waits for completions; at most `max_outstanding`
+    ops are in flight, the rest wait for a slot and that wait is counted as
+    queueing delay. If the dispatcher itself falls behind (schedule in the
+    past) ops are released immediately, keeping their original intended time;
+    an op is never released before it (so queueing delay is >= 0).
+    on_done(i), if given, is called after every op (check log.ok[i]).
+    Once stop() returns True no more ops are issued and the log is cut to
+    the ops issued so far.
+    """
+    offsets = arrival_offsets(rate, log.n, kind, seed)
+    slots = asyncio.Semaphore(max_outstanding)
+    perf = time.perf_counter_ns
+    pending = set()
+
+    async def one(i):
+        async with slots:
+            log.send_ns[i] = perf()
+            try:
+                await op(i)
+                log.ok[i] = 1
+            except errors:
+                pass
+            log.done_ns[i] = perf()
+            if on_done is not None:
+                on_done(i)
+
+    t0 = log.t0_perf_ns
+    issued = log.n
+    for i in range(log.n):
+        if stop is not None and stop():
+            issued = i
+            break
+        due = t0 + offsets[i]
+        log.intended_ns[i] = due
+        wait = due - perf()
+        if wait <= 0:
+            if i % 64 == 0:
+                await asyncio.sleep(0)      # let completions run when behind
+        while wait > 0:                     # never send before the intended time
+            # timer sleep while far ahead; the last 0.2 ms yield to the loop and
+            # re-check the clock (a timer may fire early at this resolution)
+            await asyncio.sleep((wait - SPIN_NS) / 1e9 if wait > SPIN_NS else 0)
+            wait = due - perf()
+        task = asyncio.ensure_future(one(i))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+    log.end_perf_ns = perf()
+    if issued < log.n:
+        log.truncate(issued)
+
+
+def summarize(log: OpenLoopLog, rate: float) -> dict:
+    """Percentiles of service / corrected / queueing time via HDR histograms (no sort)."""
+    ok, svc, cor, que = log.arrays()
+    wall = (log.end_perf_ns - log.t0_perf_ns) / 1e9
+    n_ok = int(ok.sum())
+    out = {"ok": n_ok, "fail": log.n - n_ok, "wall_s": wall,
+           "offered": rate, "throughput": n_ok / wall if wall > 0 else 0.0}
+    for name, vals in (("service", svc), ("corrected", cor), ("queue", que)):
+        h = HdrHistogram()
+        h.record_many(vals)
+        for q, v in zip((50, 99, 99.9), h.percentiles((50, 99, 99.9))):
+            out[f"{name}_p{q:g}"] = v / 1e9
+    return out
+
+
+def format_summary(s: dict) -> str:
+    lines = [
+        f"  ok={s['ok']} fail={s['fail']}  wall={s['wall_s']:.3f}s  "
+        f"offered={s['offered']:.1f} ops/s  achieved={s['throughput']:.2f} ops/s",
+    ]
+    for name in ("service", "corrected", "queue"):
+        lines.append(f"  {name:<9} p50={s[name + '_p50']:.6f}s  p99={s[name + '_p99']:.6f}s  "
+                     f"p99.9={s[name + '_p99.9']:.6f}s")
+    return "\n".join(lines)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Columnar binary per-op record format.
+
+A run's ops live in a directory (default name per_op.col) with one raw
+little-endian file per column plus a small meta.json header:
+
+  start_ns.i8    int64   wall-clock start of the op (unix ns)
+  latency_ns.i8  int64   latency in ns
+  op.u1          uint8   op type code     (labels in meta.json "labels.op")
+  phase.u1       uint8   phase code       (labels in meta.json "labels.phase")
+  node.u1        uint8   node / worker id
+  status.u1      uint8   0 = ok, 1 = error
+
+Writers append to every column file in batches, so a run can be read while
+it is still being written: the row count is the shortest column. Readers
+memory-map only the columns they touch (numpy.memmap, zero-copy).
+
+    python3 oprec.py convert per_op_latency.csv            # -> per_op.col next to it
+    python3 oprec.py convert latency_data_fs-delay-100ms.csv -o run.col
+    python3 oprec.py info results/x/per_op.col
+"""
+import argparse
+import json
+import os
+from array import array
+
+import numpy as np
+
+FORMAT = "fsdelay-opcol"
+VERSION = 1
+DEFAULT_DIR = "per_op.col"
+COLUMNS = {
+    "start_ns": ("i8", "q"),
+    "latency_ns": ("i8", "q"),
+    "op": ("u1", "B"),
+    "phase": ("u1", "B"),
+    "node": ("u1", "B"),
+    "status": ("u1", "B"),
+}
+OP_TYPES = ["put", "get", "get_serializable", "range", "txn", "delete", "lease", "write_fsync"]
+STATUS_OK, STATUS_ERR = 0, 1
+
+
+def _col_file(path, name):
+    return os.path.join(path, f"{name}.{COLUMNS[name][0]}")
+
+
+class ColumnWriter:
+    """
+    Append-only writer. Rows are buffered in array('q'/'B') and written to
+    all column files every `batch` rows (and on flush/close).
+    """
+
+    def __init__(self, path: str, batch: int = 4096, meta: dict = None, append: bool = False):
+        self.path = path
+        self.batch = batch
+        os.makedirs(path, exist_ok=True)
+        if append and is_opcol(path):
+            with open(os.path.join(path, "meta.json")) as f:
+                self.meta = json.load(f)
+        else:
+            append = False
+            self.meta = {"format": FORMAT, "version": VERSION,
+                         "columns": {k: v[0] for k, v in COLUMNS.items()},
+                         "labels": {"op": list(OP_TYPES), "phase": ["baseline"]}}
+        if meta:
+            self.meta.update(meta)
+        self._write_meta()
+        self._files = {k: open(_col_file(path, k), "ab" if append else "wb") for k in COLUMNS}
+        self._buf = {k: array(v[1]) for k, v in COLUMNS.items()}
+        self.rows = 0
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def code(self, kind: str, label: str) -> int:
+        """Code for a label of 'op' or 'phase', registering new labels in meta.json."""
+        labels = self.meta["labels"][kind]
+        if label not in labels:
+            if len(labels) >= 255:
+                raise ValueError(f"too many {kind} labels")
+            labels.append(label)
+            self._write_meta()
+        return labels.index(label)
+
+    def append(self, start_ns: int, latency_ns: int, op: int = 0, phase: int = 0, node: int = 0,
+               status: int = STATUS_OK):
+        b = self._buf
+        b["start_ns"].append(start_ns)
+        b["latency_ns"].append(latency_ns)
+        b["op"].append(op)
+        b["phase"].append(phase)
+        b["node"].append(node)
+        b["status"].append(status)
+        if len(b["start_ns"]) >= self.batch:
+            self.flush()
+
+    def append_many(self, start_ns, latency_ns, op=0, phase=0, node=0, status=STATUS_OK):
+        """Vectorized append; scalar op/phase/node/status are broadcast."""
+        self.flush()
+        n = len(start_ns)
+        cols = {"start_ns": start_ns, "latency_ns": latency_ns, "op": op, "phase": phase,
+                "node": node, "status": status}
+        for k, v in cols.items():
+            dt = np.dtype("<" + COLUMNS[k][0])
+            arr = np.broadcast_to(np.asarray(v, dtype=dt), (n,))
+            self._files[k].write(np.ascontiguousarray(arr).tobytes())
+        for f in self._files.values():
+            f.flush()
+        self.rows += n
+
+    def flush(self):
+        n = len(self._buf["start_ns"])
+        if not n:
+            return
+        for k, buf in self._buf.items():
+            self._files[k].write(buf.tobytes())
+            self._files[k].flush()
+            del buf[:]
+        self.rows += n
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpTable:
+    """
+    Read side: columns are numpy.memmap views created on first access and
+    limited to the rows present in every column.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT:
+            raise ValueError(f"{path}: not a {FORMAT} directory")
+        self._cols = {}
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Re-read the row count (for runs still being written)."""
+        sizes = []
+        for k in COLUMNS:
+            p = _col_file(self.path, k)
+            sizes.append(os.path.getsize(p) // np.dtype(COLUMNS[k][0]).itemsize if os.path.exists(p) else 0)
+        self.n = min(sizes)
+        self._cols.clear()
+        return self.n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._cols:
+            if self.n == 0:
+                self._cols[name] = np.zeros(0, dtype="<" + COLUMNS[name][0])
+            else:
+                self._cols[name] = np.memmap(_col_file(self.path, name), dtype="<" + COLUMNS[name][0],
+                                             mode="r", shape=(self.n,))
+        return self._cols[name]
+
+    def labels(self, kind: str):
+        return self.meta["labels"][kind]
+
+    def mask(self, kind: str, label: str) -> np.ndarray:
+        return self[kind] == self.labels(kind).index(label)
+
+    def ok_latency_s(self) -> np.ndarray:
+        return self["latency_ns"][self["status"] == STATUS_OK] / 1e9
+
+
+def open_ops(path: str) -> OpTable:
+    return OpTable(path)
+
+
+def is_opcol(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+
+# ===================== converters =====================
+
+def convert_csv(src: str, dst: str, chunksize: int = 1_000_000) -> int:
+    """
+    per_op_latency.csv (op,seconds[,start_unix_ns]) or latency_data.csv
+    (timestamp_ms,latency_ms[,...],phase) -> column directory.
+    """
+    import pandas as pd
+    w = ColumnWriter(dst)
+    clock_ns = 0                     # old shell files have no timestamps: use cumulative latency
+    for chunk in pd.read_csv(src, chunksize=chunksize):
+        if "seconds" in chunk.columns:
+            lat = pd.to_numeric(chunk["seconds"], errors="coerce").to_numpy(np.float64) * 1e9
+        elif "latency_ms" in chunk.columns:
+            lat = pd.to_numeric(chunk["latency_ms"], errors="coerce").to_numpy(np.float64) * 1e6
+        else:
+            raise ValueError(f"{src}: need a 'seconds' or 'latency_ms' column")
+        status = np.where(np.isnan(lat), STATUS_ERR, STATUS_OK).astype(np.uint8)
+        lat = np.nan_to_num(lat, nan=0.0).astype(np.int64)
+        if "start_unix_ns" in chunk.columns:
+            start = chunk["start_unix_ns"].to_numpy(np.int64)
+        elif "timestamp_ms" in chunk.columns:
+            start = chunk["timestamp_ms"].to_numpy(np.int64) * 1_000_000
+        else:
+            start = clock_ns + np.concatenate(([0], np.cumsum(lat)[:-1]))
+            clock_ns = int(start[-1] + lat[-1]) if len(lat) else clock_ns
+        phase = 0
+        if "phase" in chunk.columns:
+            uniq, inv = np.unique(chunk["phase"].astype(str).to_numpy(), return_inverse=True)
+            phase = np.array([w.code("phase", u) for u in uniq], dtype=np.uint8)[inv]
+        op = w.code("op", "write_fsync") if "latency_ms" in chunk.columns else w.code("op", "put")
+        w.append_many(start, lat, op=op, phase=phase, status=status)
+    w.close()
+    return w.rows
+
+
+def convert_log(src: str, dst: str) -> int:
+    """latency_x*ms.log lines 'timestamp_ms,latency_ms,...' -> column directory."""
+    w = ColumnWriter(dst)
+    op = w.code("op", "write_fsync")
+    with open(src) as f:
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) < 2 or not parts[0].isdigit():
+                continue
+            try:
+                lat = int(float(parts[1]) * 1e6)
+            except ValueError:
+                lat = 0
+            w.append(int(parts[0]) * 1_000_000, lat, op=op)
+    w.close()
+    return w.rows
+
+
+def convert(src: str, dst: str = None) -> str:
+    if dst is None:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        name = DEFAULT_DIR if stem == "per_op_latency" else f"{stem}.col"
+        dst = os.path.join(os.path.dirname(src) or ".", name)
+    rows = convert_log(src, dst) if src.endswith(".log") else convert_csv(src, dst)
+    print(f"{src} -> {dst} ({rows} rows)")
+    return dst
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Columnar binary per-op records")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("convert", help="convert per_op_latency.csv / latency_data*.csv / latency_x*.log")
+    p.add_argument("src", nargs="+")
+    p.add_argument("-o", "--output", help="output directory (only with a single input)")
+    p = sp.add_parser("info")
+    p.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "convert":
+        if args.output and len(args.src) > 1:
+            ap.error("-o needs a single input")
+        for src in args.src:
+            convert(src, args.output)
+    else:
+        t = open_ops(args.path)
+        lat = t.ok_latency_s()
+        print(f"{args.path}: {len(t)} rows, ok={lat.size}, columns={list(t.meta['columns'])}")
+        print(f"  phases={t.labels('phase')}  ops={t.labels('op')}")
+        if lat.size:
+            print(f"  latency min={lat.min():.6f}s max={lat.max():.6f}s mean={lat.mean():.6f}s")
+
+
+if __name__ == "__main__":
+    main()
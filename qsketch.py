@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+DDSketch: mergeable quantile sketch with a relative-error guarantee.
+
+Values (latency in ms) are counted in logarithmic buckets: bucket k holds
+values in (gamma**(k-1), gamma**k] with gamma = (1 + alpha) / (1 - alpha),
+and is reported as 2 * gamma**k / (gamma + 1). Every quantile the sketch
+returns is then within a relative error alpha of the exact value at that
+rank (nearest-rank, ceil(q * n)):
+
+    |x_hat(q) - x(q)| <= alpha * x(q)        for every q, including p99.99
+
+The counts are a dense NumPy array over the keys in use (about
+ln(max/min) / (2 * alpha) buckets: ~460 for 1 us .. 100 s at alpha = 1%),
+so memory does not depend on the number of values. If the key range ever
+exceeds max_bins the lowest buckets are collapsed into one; the guarantee
+then still holds for every quantile above the collapsed mass (the tail).
+Values <= 0 (and below MIN_VALUE) are counted separately as zeros.
+
+Sketches of the same alpha merge by adding counts, which is exact: the
+merge of the sketches of several runs equals the sketch of their
+concatenation. A run's sketch is built by streaming over its file in
+chunks and stored next to it (per_op_latency.csv -> per_op_latency.ddsk,
+per_op.col/ -> per_op.ddsk) together with the source's size and mtime; it
+is rebuilt when the source changes.
+
+    python3 qsketch.py build results/sweep_paper/*/per_op.col
+    python3 qsketch.py quantiles results/sweep_paper/*_10000us/per_op.col --merge
+    python3 qsketch.py merge results/sweep_paper/*_10000us/per_op.ddsk -o delay_10ms.ddsk
+"""
+import argparse
+import math
+import os
+import struct
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+
+import oprec
+
+MAGIC = b"DDSK"
+HDR = struct.Struct("<4sBxxxdiqqdddqiqq")   # magic, ver, alpha, max_bins, count, zeros, sum, min, max,
+                                           # offset, nbins, src_size, src_mtime_ns
+DEFAULT_ALPHA = 0.01
+DEFAULT_MAX_BINS = 4096
+MIN_VALUE = 1e-9
+CHUNK_ROWS = 1 << 20
+SUFFIX = ".ddsk"
+DEFAULT_QS = (50, 90, 99, 99.9, 99.99)
+
+
+class DDSketch:
+    def __init__(self, alpha: float = DEFAULT_ALPHA, max_bins: int = DEFAULT_MAX_BINS):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be in (0, 1)")
+        self.alpha, self.max_bins = float(alpha), int(max_bins)
+        self.gamma = (1 + self.alpha) / (1 - self.alpha)
+        self._lg = math.log(self.gamma)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0                 # key of counts[0]
+        self.count = 0
+        self.zeros = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.src = (-1, -1)             # (size, mtime_ns) of the file this sketch was built from
+
+    # --- keys ---------------------------------------------------------------
+    def key_of(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self._lg).astype(np.int64)
+
+    def value_of(self, keys) -> np.ndarray:
+        return 2.0 * np.power(self.gamma, np.asarray(keys, dtype=np.float64)) / (self.gamma + 1.0)
+
+    def _extend(self, lo: int, hi: int):
+        """Make the dense store cover keys lo..hi, collapsing the lowest keys if needed."""
+        if self.counts.size:
+            lo, hi = min(lo, self.offset), max(hi, self.offset + self.counts.size - 1)
+        if hi - lo + 1 > self.max_bins:
+            lo = hi - self.max_bins + 1
+        if self.counts.size and lo == self.offset and hi == self.offset + self.counts.size - 1:
+            return
+        new = np.zeros(hi - lo + 1, dtype=np.int64)
+        if self.counts.size:
+            keys = np.arange(self.offset, self.offset + self.counts.size)
+            np.add.at(new, np.maximum(keys, lo) - lo, self.counts)
+        self.counts, self.offset = new, lo
+
+    # --- recording ------------------------------------------------------------
+    def add_many(self, values):
+        v = np.asarray(values, dtype=np.float64)
+        v = v[np.isfinite(v)]
+        if v.size == 0:
+            return self
+        small = v <= MIN_VALUE
+        self.zeros += int(small.sum())
+        self.count += int(v.size)
+        self.sum += float(v.sum())
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+        v = v[~small]
+        if v.size:
+            keys = self.key_of(v)
+            self._extend(int(keys.min()), int(keys.max()))
+            rel = np.maximum(keys - self.offset, 0)          # collapsed keys land in the lowest bucket
+            self.counts += np.bincount(rel, minlength=self.counts.size)
+        return self
+
+    def add(self, value: float):
+        return self.add_many([value])
+
+    def compatible(self, other) -> bool:
+        return self.alpha == other.alpha
+
+    def merge(self, other: "DDSketch"):
+        if not self.compatible(other):
+            raise ValueError(f"cannot merge sketches with alpha {self.alpha} and {other.alpha}")
+        if other.counts.size:
+            self._extend(other.offset, other.offset + other.counts.size - 1)
+            keys = np.arange(other.offset, other.offset + other.counts.size)
+            np.add.at(self.counts, np.maximum(keys - self.offset, 0), other.counts)
+        self.count += other.count
+        self.zeros += other.zeros
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    __iadd__ = merge
+
+    def copy(self) -> "DDSketch":
+        s = DDSketch(self.alpha, self.max_bins)
+        return s.merge(self)
+
+    # --- queries --------------------------------------------------------------
+    def quantiles(self, qs=DEFAULT_QS) -> np.ndarray:
+        """Values at percentiles qs (0..100), nearest rank; exact min/max at the ends."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        rank = np.maximum(np.ceil(qs / 100.0 * self.count), 1).astype(np.int64)
+        cum = self.zeros + np.cumsum(self.counts)
+        idx = np.searchsorted(cum, rank, side="left")
+        out = self.value_of(self.offset + np.minimum(idx, max(self.counts.size - 1, 0)))
+        out = np.where(rank <= self.zeros, 0.0, out)
+        return np.clip(out, self.min, self.max)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else float("nan")
+
+    def cdf(self):
+        """(value, cumulative fraction) at the upper edge of every non-empty bucket."""
+        if self.count == 0:
+            return np.zeros(0), np.zeros(0)
+        nz = np.flatnonzero(self.counts)
+        xs = np.minimum(np.power(self.gamma, (self.offset + nz).astype(np.float64)), self.max)
+        ys = (self.zeros + np.cumsum(self.counts[nz])) / self.count
+        if self.zeros:
+            xs, ys = np.r_[max(self.min, 0.0), xs], np.r_[self.zeros / self.count, ys]
+        return xs, ys
+
+    def nbytes(self) -> int:
+        return self.counts.nbytes
+
+    # --- serialization --------------------------------------------------------
+    def to_bytes(self) -> bytes:
+        hdr = HDR.pack(MAGIC, 1, self.alpha, self.max_bins, self.count, self.zeros, self.sum,
+                       self.min, self.max, self.offset, self.counts.size, *self.src)
+        return hdr + zlib.compress(self.counts.astype("<i8").tobytes(), 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        (magic, _ver, alpha, max_bins, count, zeros, total, mn, mx, offset, nbins,
+         size, mtime) = HDR.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a DDSketch blob")
+        s = cls(alpha, max_bins)
+        s.counts = np.frombuffer(zlib.decompress(data[HDR.size:]), "<i8", nbins).astype(np.int64)
+        s.offset, s.count, s.zeros, s.sum, s.min, s.max = offset, count, zeros, total, mn, mx
+        s.src = (size, mtime)
+        return s
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DDSketch":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+# ===================== streaming over result files =====================
+
+def sketch_path(path: str) -> str:
+    """per_op_latency.csv -> per_op_latency.ddsk, per_op.col/ -> per_op.ddsk."""
+    return os.path.splitext(path.rstrip("/"))[0] + SUFFIX
+
+
+def _signature(path: str):
+    if oprec.is_opcol(path):
+        st = [os.stat(os.path.join(path, f)) for f in sorted(os.listdir(path))]
+        return sum(s.st_size for s in st), max(s.st_mtime_ns for s in st)
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def iter_latency_ms(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterable[np.ndarray]:
+    """Latencies (ms) of the ok ops of a result file, chunk by chunk."""
+    if oprec.is_opcol(path):
+        t = oprec.open_ops(path)
+        for i in range(0, len(t), chunk_rows):
+            lat = np.asarray(t["latency_ns"][i:i + chunk_rows]) / 1e6
+            yield lat[np.asarray(t["status"][i:i + chunk_rows]) == oprec.STATUS_OK]
+        return
+    if path.endswith(".log"):
+        buf = []
+        with open(path) as f:
+            for line in f:
+                parts = line.split(",")
+                if len(parts) >= 2 and parts[0].strip().isdigit():
+                    try:
+                        buf.append(float(parts[1]))
+                    except ValueError:
+                        pass
+                if len(buf) >= chunk_rows:
+                    yield np.array(buf)
+                    buf = []
+        if buf:
+            yield np.array(buf)
+        return
+    import pandas as pd
+    head = pd.read_csv(path, nrows=0).columns
+    col, scale = ("seconds", 1e3) if "seconds" in head else ("latency_ms", 1.0)
+    if col not in head:
+        raise ValueError(f"{path}: need a 'seconds' or 'latency_ms' column")
+    for chunk in pd.read_csv(path, usecols=[col], chunksize=chunk_rows):
+        yield pd.to_numeric(chunk[col], errors="coerce").to_numpy(np.float64) * scale
+
+
+def build(path: str, alpha: float = DEFAULT_ALPHA) -> DDSketch:
+    s = DDSketch(alpha)
+    for lat in iter_latency_ms(path):
+        s.add_many(lat)
+    s.src = _signature(path)
+    return s
+
+
+def sketch_for(path: str, alpha: float = DEFAULT_ALPHA, save: bool = True) -> DDSketch:
+    """The stored sketch of a run if it matches the source (size, mtime, alpha), else build it."""
+    sp = sketch_path(path)
+    sig = _signature(path)
+    if os.path.exists(sp):
+        try:
+            s = DDSketch.load(sp)
+            if s.src == sig and s.alpha == alpha:
+                return s
+        except (OSError, ValueError, struct.error, zlib.error):
+            pass
+    s = build(path, alpha)
+    if save:
+        try:
+            s.save(sp)
+        except OSError:
+            pass
+    return s
+
+
+def load_any(path: str, alpha: float = DEFAULT_ALPHA) -> DDSketch:
+    """A .ddsk file as is, or the sketch of a result file."""
+    if path.endswith(SUFFIX):
+        return DDSketch.load(path)
+    return sketch_for(path, alpha)
+
+
+def merge_all(sketches: Iterable[DDSketch], alpha: float = DEFAULT_ALPHA) -> DDSketch:
+    out: Optional[DDSketch] = None
+    for s in sketches:
+        out = s.copy() if out is None else out.merge(s)
+    return out if out is not None else DDSketch(alpha)
+
+
+def format_quantiles(s: DDSketch, qs=DEFAULT_QS) -> str:
+    return "  ".join(f"p{q:g}={v:.3f}ms" for q, v in zip(qs, s.quantiles(qs)))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mergeable latency quantile sketches (DDSketch)")
+    ap.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="relative accuracy (default 0.01)")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("build", help="write <run>.ddsk next to every result file")
+    p.add_argument("paths", nargs="+")
+    p = sp.add_parser("quantiles", help="print quantiles per file (or merged)")
+    p.add_argument("paths", nargs="+", help="result files, .col dirs or .ddsk files")
+    p.add_argument("--merge", action="store_true")
+    p.add_argument("--percentiles", default=",".join(f"{q:g}" for q in DEFAULT_QS))
+    p = sp.add_parser("merge", help="merge sketches into one .ddsk")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-o", "--output", required=True)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        for path in args.paths:
+            s = sketch_for(path, args.alpha)
+            print(f"{sketch_path(path)}: n={s.count} bins={s.counts.size}  {format_quantiles(s)}")
+    elif args.cmd == "quantiles":
+        qs = [float(q) for q in args.percentiles.split(",")]
+        sketches = [(p, load_any(p, args.alpha)) for p in args.paths]
+        if args.merge:
+            sketches = [(f"merged ({len(sketches)})", merge_all((s for _, s in sketches), args.alpha))]
+        for name, s in sketches:
+            print(f"{name}: n={s.count}  {format_quantiles(s, qs)}")
+    else:
+        s = merge_all((load_any(p, args.alpha) for p in args.paths), args.alpha)
+        s.save(args.output)
+        print(f"Saved {args.output}: n={s.count}  {format_quantiles(s)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Background raft-state sampler: polls /v3/maintenance/status on every
+endpoint at a fixed sub-second interval while the workload runs, so leader
+changes and elections caused by the injected WAL delay show up next to the
+per-op data instead of only being checked before the run.
+
+Each endpoint is polled by its own coroutine over one keep-alive connection
+(etcd_client.EtcdClient), on a shared tick grid: a member that answers
+slowly skips ticks instead of delaying the others. Every answer (or
+failure) becomes one row of <run_dir>/raft_status.csv:
+
+  wall_ns        wall-clock time the request was sent (unix ns)
+  member         endpoint index (0 = first endpoint, i.e. etcd0)
+  member_id      member id reported by the endpoint
+  leader         leader id as seen by that member (0 = no leader)
+  raft_term      raft term
+  raft_index     last raft log index of that member
+  applied_index  last applied index of that member
+  rtt_us         status round trip; the other fields are empty on a failure
+
+Derived leader transitions (leader_changes) are what the plots use:
+
+  leader     a different member became leader
+  term       the term went up with the same leader (re-election)
+  no_leader  a member reported no leader
+
+    python3 raft_monitor.py run --endpoints http://127.0.0.1:23790,http://127.0.0.1:23791,http://127.0.0.1:23792 \\
+        --run-dir results/x --interval 0.2          # until SIGINT/SIGTERM
+    python3 raft_monitor.py show results/x          # transitions + apply lag per member
+"""
+import argparse
+import asyncio
+import csv
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+from etcd_client import EtcdClient, EtcdError
+
+STATUS_FILE = "raft_status.csv"
+STATUS_FIELDS = ["wall_ns", "member", "member_id", "leader", "raft_term", "raft_index", "applied_index", "rtt_us"]
+DEFAULT_INTERVAL_S = 0.2
+
+
+class RaftMonitor:
+    """
+    Samples every endpoint's raft status until stop(). Runs as a task on
+    the caller's event loop (start/stop) or on its own thread and loop
+    (start_thread/stop_thread) for synchronous callers.
+    """
+
+    def __init__(self, endpoints: List[str], run_dir: str = ".", interval_s: float = DEFAULT_INTERVAL_S,
+                 timeout_s: float = 2.0):
+        self.endpoints = list(endpoints)
+        self.run_dir = run_dir
+        self.interval_ns = int(interval_s * 1e9)
+        self.timeout_s = timeout_s
+        self.samples = 0
+        self.failures = 0
+        self._stop = None
+        self._task = None
+        self._thread = None
+        self._file = None
+        self._writer = None
+
+    def _row(self, member, wall_ns, rtt_ns, st=None):
+        if st is None:
+            self.failures += 1
+            self._writer.writerow([wall_ns, member, "", "", "", "", "", rtt_ns // 1000])
+        else:
+            self._writer.writerow([wall_ns, member, st.get("header", {}).get("member_id", ""),
+                                   st.get("leader", "0"), st.get("raftTerm", ""), st.get("raftIndex", ""),
+                                   st.get("raftAppliedIndex", ""), rtt_ns // 1000])
+        self.samples += 1
+
+    async def _poll(self, member: int, client: EtcdClient, t0_perf: int, wall_off: int):
+        perf = time.perf_counter_ns
+        k = 0
+        while not self._stop.is_set():
+            t = perf()
+            try:
+                st = await client.status()
+            except (EtcdError, ValueError):
+                st = None
+            if not isinstance(st, dict):        # valid JSON, but not a status object
+                st = None
+            t1 = perf()
+            self._row(member, t + wall_off, t1 - t, st)
+            # next tick on the grid, skipping the ones a slow answer ran over
+            k = max(k + 1, (t1 - t0_perf) // self.interval_ns + 1)
+            try:
+                await asyncio.wait_for(self._stop.wait(), (t0_perf + k * self.interval_ns - perf()) / 1e9)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        clients = [EtcdClient(ep, pool_size=1, timeout_s=self.timeout_s) for ep in self.endpoints]
+        t0_perf = time.perf_counter_ns()
+        wall_off = time.time_ns() - t0_perf
+        try:
+            await asyncio.gather(*(self._poll(i, c, t0_perf, wall_off) for i, c in enumerate(clients)))
+        finally:
+            for c in clients:
+                await c.close()
+            self._file.close()
+
+    def start(self) -> "RaftMonitor":
+        """Start sampling on the running event loop."""
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._file = open(os.path.join(self.run_dir, STATUS_FILE), "w", newline="", buffering=1 << 16)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(STATUS_FIELDS)
+        self._stop = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+
+    def start_thread(self) -> "RaftMonitor":
+        """Start sampling on a background thread with its own event loop."""
+        import threading
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def body():
+            asyncio.set_event_loop(self._loop)
+            self._loop.call_soon(lambda: (self.start(), started.set()))
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=body, name="raft-monitor", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._thread = None
+
+
+# ===================== reading (analysis / plots) =====================
+
+def find_status(data_path: str) -> Optional[str]:
+    """raft_status.csv next to a result file or inside a run / .col directory."""
+    d = data_path if os.path.isdir(data_path) and not data_path.rstrip("/").endswith(".col") \
+        else os.path.dirname(data_path.rstrip("/")) or "."
+    cand = os.path.join(d, STATUS_FILE)
+    return cand if os.path.exists(cand) else None
+
+
+def read_status(path: str) -> List[dict]:
+    """Rows of a raft_status.csv in time order; failed polls have ok=False."""
+    out = []
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            ok = r["raft_term"] != ""
+            out.append({
+                "wall_ns": int(r["wall_ns"]), "member": int(r["member"]), "ok": ok,
+                "member_id": r["member_id"], "leader": r["leader"],
+                "raft_term": int(r["raft_term"]) if ok else -1,
+                "raft_index": int(r["raft_index"]) if ok else -1,
+                "applied_index": int(r["applied_index"]) if ok and r["applied_index"] else -1,
+                "rtt_us": int(r["rtt_us"]),
+            })
+    out.sort(key=lambda r: r["wall_ns"])
+    return out
+
+
+def leader_changes(rows: List[dict]) -> List[dict]:
+    """
+    Leader transitions as seen by the cluster: [{wall_ns, kind, term,
+    leader}] with leader as "etcd<member>" when the id is known. Answers
+    on an older term than the newest one seen, and "no leader" answers in
+    a term whose leader is already known, come from a lagging member and
+    are ignored.
+    """
+    names = {r["member_id"]: f"etcd{r['member']}" for r in rows if r["ok"] and r["member_id"]}
+    out, term, leader = [], None, None
+    for r in rows:
+        if not r["ok"] or (term is not None and r["raft_term"] < term):
+            continue
+        new = r["leader"] if r["leader"] not in ("", "0") else None
+        kind = None
+        if term is None:
+            pass
+        elif r["raft_term"] > term:
+            kind = "no_leader" if new is None else ("leader" if new != leader else "term")
+        elif new is not None and new != leader:
+            kind = "leader"
+        elif new is None:
+            continue
+        if kind:
+            out.append({"wall_ns": r["wall_ns"], "kind": kind, "term": r["raft_term"],
+                        "leader": names.get(new, new or "")})
+        term, leader = r["raft_term"], new
+    return out
+
+
+def raft_boundaries(rows: List[dict], t0_ms: float):
+    """Leader transitions as [(t_sec, kind)] relative to t0_ms (like fault_boundaries)."""
+    return [((c["wall_ns"] / 1e6 - t0_ms) / 1000.0, c["kind"]) for c in leader_changes(rows)]
+
+
+def apply_lag(rows: List[dict]) -> dict:
+    """Per member: (max raft_index - applied_index, max rtt_us, failed polls)."""
+    out = {}
+    for r in rows:
+        lag, rtt, fail = out.get(r["member"], (0, 0, 0))
+        if r["ok"]:
+            if r["applied_index"] >= 0:
+                lag = max(lag, r["raft_index"] - r["applied_index"])
+            rtt = max(rtt, r["rtt_us"])
+        else:
+            fail += 1
+        out[r["member"]] = (lag, rtt, fail)
+    return out
+
+
+# ===================== CLI =====================
+
+def cmd_run(args):
+    mon = RaftMonitor([e for e in args.endpoints.split(",") if e], args.run_dir, args.interval, args.timeout)
+
+    async def main():
+        done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, done.set)
+        mon.start()
+        if args.duration:
+            try:
+                await asyncio.wait_for(done.wait(), args.duration)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await done.wait()
+        await mon.stop()
+
+    print(f"[raft] sampling {len(mon.endpoints)} endpoint(s) every {args.interval:g}s -> "
+          f"{os.path.join(args.run_dir, STATUS_FILE)}", file=sys.stderr)
+    asyncio.run(main())
+    print(f"[raft] {mon.samples} samples, {mon.failures} failed", file=sys.stderr)
+
+
+def cmd_show(args):
+    path = args.path if args.path.endswith(".csv") else find_status(args.path)
+    if path is None:
+        raise SystemExit(f"No {STATUS_FILE} for {args.path}")
+    rows = read_status(path)
+    if not rows:
+        raise SystemExit(f"{path}: empty")
+    t0 = rows[0]["wall_ns"]
+    changes = leader_changes(rows)
+    print(f"{path}: {len(rows)} samples over {(rows[-1]['wall_ns'] - t0) / 1e9:.1f}s, "
+          f"{len(changes)} leader transition(s)")
+    for c in changes:
+        print(f"  t={(c['wall_ns'] - t0) / 1e9:8.3f}s  {c['kind']:<9}  term={c['term']}  leader={c['leader'] or '-'}")
+    for m, (lag, rtt, fail) in sorted(apply_lag(rows).items()):
+        print(f"  etcd{m}: max apply lag {lag}, max status rtt {rtt / 1000:.1f} ms, {fail} failed poll(s)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sample etcd raft status (leader, term, indexes) in the background")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    p = sp.add_parser("run", help="sample until SIGINT/SIGTERM (or --duration)")
+    p.add_argument("--endpoints", required=True, help="comma list of client URLs reachable from this host")
+    p.add_argument("--run-dir", default=".", help=f"where {STATUS_FILE} is written")
+    p.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_S, help="seconds between polls")
+    p.add_argument("--timeout", type=float, default=2.0, help="per-request timeout (s)")
+    p.add_argument("--duration", type=float, help="stop after this many seconds")
+    p.set_defaults(fn=cmd_run)
+    p = sp.add_parser("show", help="print leader transitions and per-member lag")
+    p.add_argument("path", help=f"run dir, result file or {STATUS_FILE}")
+    p.set_defaults(fn=cmd_show)
+    args = ap.parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Discrete-event simulator of a leader-based replicated log (etcd/raft-like)
+with pluggable per-node disk delays, for what-if questions that would
+otherwise need a Docker + FUSE run ("delay on a follower?", "5 nodes?").
+
+Model (one leader, no elections):
+
+  client -> leader   one-way client_rtt/2; closed-loop (--concurrency
+                     clients, next op on reply) or open-loop (--rate)
+  leader WAL         group commit: when the WAL is idle, every entry that
+                     has arrived (up to --max-batch) is written and synced
+                     as one batch; the batch is sent to all followers when
+                     the write starts (etcd sends a Ready's messages before
+                     persisting it)
+  follower WAL       the same group commit over the entries received;
+                     the ack leaves when the batch is durable
+  commit             quorum-th highest durable index (leader included);
+                     committed entries are applied in order (--apply-us
+                     each) and answered after client_rtt/2
+
+A WAL batch takes the sum of the node's disk models for that batch:
+  --fsync base sync cost (all nodes), --per-entry-us per entry, plus on
+  the --slow nodes --delay (always on) and/or --timeline (a
+  fault_timeline.py schedule, delay_us per matching call x --calls-per-sync,
+  applied with its prob_permil). Model specs:
+
+    100000 | const:US              constant
+    lognormal:MEDIAN_US:SIGMA      log-normal
+    exp:MEAN_US                    exponential
+    uniform:LO_US:HI_US            uniform
+    trace:PATH[@PHASE]             replay the recorded per-op latencies of a run
+                                   (e.g. io_bench latency_data.csv, write+fsync
+                                   per op) in order, from a seeded offset
+
+Events are (time, seq, kind, node, index) tuples on one heap and there is
+one event per message / WAL batch, not per op: ops are log indexes into
+preallocated arrays and each commit answers its range with one slice
+assignment, so throughput is bound by batches, not ops.
+
+Outputs in --out-dir, the formats of etcd_driver.py (plots, analysis.py,
+compare.py and changepoint.py read them unchanged):
+  per_op.col/  per_op_latency.csv  throughput_per_sec.csv  latency_per_sec.csv
+  latency.hlog  fault_events.csv (with --timeline)  sim.json (parameters + stats)
+  run.json (catalog manifest, kind=sim)
+
+    python3 raftsim.py --ops 200000 --concurrency 16 --fsync const:800 --slow leader --delay 100000 --out-dir sim/lead_100ms
+    python3 raftsim.py --ops 200000 --concurrency 16 --slow follower --delay 100000 --out-dir sim/follow_100ms
+    python3 raftsim.py --nodes 5 --ops 100000 --rate 2000 --slow leader \\
+        --timeline "step --at 20 --delay-us 50000 --until 40" --out-dir sim/step
+    python3 raftsim.py --ops 1000 --slow leader --delay 100000 --check results/<run>/per_op.col
+"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import shlex
+import sys
+import time
+from bisect import bisect_right
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import aggregate
+import catalog
+import fault_timeline
+import loadgen
+from hdr_hist import HdrHistogram, IntervalRecorder, format_percentiles
+from oprec import ColumnWriter, DEFAULT_DIR
+
+WAKE, WAL_DONE, APPEND, ACK = 0, 1, 2, 3
+SAMPLE_BLOCK = 65536
+
+
+# ===================== disk models =====================
+# sample(t, n) -> seconds one WAL batch of n entries started at sim time t takes
+
+class Constant:
+    def __init__(self, us: float):
+        self.s = us / 1e6
+
+    def sample(self, t, n):
+        return self.s
+
+
+class PerEntry:
+    def __init__(self, us: float):
+        self.s = us / 1e6
+
+    def sample(self, t, n):
+        return self.s * n
+
+
+class Random:
+    """Draws from a numpy generator in blocks of SAMPLE_BLOCK (seconds)."""
+
+    def __init__(self, draw, seed: int = 1):
+        self.draw = draw
+        self.rng = np.random.default_rng(seed)
+        self.buf, self.i = [], 0
+
+    def sample(self, t, n):
+        if self.i >= len(self.buf):
+            self.buf, self.i = (self.draw(self.rng, SAMPLE_BLOCK) / 1e6).tolist(), 0
+        self.i += 1
+        return self.buf[self.i - 1]
+
+
+class Trace:
+    """Recorded per-op latencies (seconds) replayed in order, wrapping around."""
+
+    def __init__(self, values_s, seed: int = 1):
+        self.values = [float(v) for v in values_s if v == v and v >= 0]
+        if not self.values:
+            raise ValueError("trace: no latencies")
+        self.i = int(np.random.default_rng(seed).integers(len(self.values)))
+
+    @classmethod
+    def from_file(cls, spec: str, seed: int = 1) -> "Trace":
+        """PATH[@PHASE]: any result file analysis.Run reads; only ops of PHASE if given."""
+        from analysis import Run
+        path, _, phase = spec.partition("@")
+        o = Run(path).ops()
+        lat = o["latency_ms"]
+        if phase:
+            labels = list(o["phase_labels"])
+            if phase not in labels:
+                raise ValueError(f"{path}: no phase {phase!r} (have {', '.join(labels)})")
+            lat = lat[o["phase"] == labels.index(phase)]
+        return cls(lat / 1000.0, seed)
+
+    def sample(self, t, n):
+        v = self.values[self.i]
+        self.i = (self.i + 1) % len(self.values)
+        return v
+
+
+class Scheduled:
+    """
+    Injected delay following a fault_timeline schedule: delay_us of the
+    transition in effect at t, per matching call, `calls` calls per sync,
+    each delayed with the transition's prob_permil.
+    """
+
+    def __init__(self, schedule, calls: int = 1, seed: int = 1):
+        self.schedule = sorted(schedule, key=lambda tr: tr.t_s)
+        self.times = [tr.t_s for tr in self.schedule]
+        self.calls = calls
+        self.rng = np.random.default_rng(seed)
+
+    def sample(self, t, n):
+        i = bisect_right(self.times, t) - 1
+        if i < 0 or not self.schedule[i].plan:
+            return 0.0
+        spec = self.schedule[i].plan[0]
+        hit = self.calls if spec.prob_permil >= 1000 else self.rng.binomial(self.calls, spec.prob_permil / 1000)
+        return hit * spec.delay_us / 1e6
+
+    def delay_us(self, t) -> int:
+        i = bisect_right(self.times, t) - 1
+        return self.schedule[i].delay_us if i >= 0 else 0
+
+
+class Disk:
+    """Sum of models: the time one WAL batch takes on one node."""
+
+    def __init__(self, models):
+        self.models = list(models)
+
+    def sample(self, t, n):
+        return sum(m.sample(t, n) for m in self.models)
+
+
+def parse_model(text: str, seed: int = 1):
+    kind, _, rest = text.partition(":")
+    if not rest:
+        return Constant(float(kind))
+    a = rest.split(":")
+    if kind == "const":
+        return Constant(float(a[0]))
+    if kind == "lognormal":
+        median, sigma = float(a[0]), float(a[1])
+        return Random(lambda r, k: r.lognormal(np.log(median), sigma, k), seed)
+    if kind == "exp":
+        mean = float(a[0])
+        return Random(lambda r, k: r.exponential(mean, k), seed)
+    if kind == "uniform":
+        lo, hi = float(a[0]), float(a[1])
+        return Random(lambda r, k: r.uniform(lo, hi, k), seed)
+    if kind == "trace":
+        return Trace.from_file(rest, seed)
+    raise ValueError(f"unknown disk model: {text}")
+
+
+def constant_delay_us(text: Optional[str]) -> Optional[float]:
+    """The delay of a constant model spec (0 without one), None for other models."""
+    if not text:
+        return 0
+    m = parse_model(text)
+    return round(m.s * 1e6, 3) if isinstance(m, Constant) else None
+
+
+def parse_timeline(text: str):
+    """fault_timeline.py schedule arguments, e.g. "step --at 20 --delay-us 100000 --until 60"."""
+    return fault_timeline.build_schedule(fault_timeline.build_parser().parse_args(shlex.split(text)))
+
+
+def slow_nodes(spec: str, nodes: int, leader: int) -> List[int]:
+    if spec == "leader":
+        return [leader]
+    if spec == "follower":
+        return [(leader + 1) % nodes]
+    if spec == "followers":
+        return [i for i in range(nodes) if i != leader]
+    if spec == "all":
+        return list(range(nodes))
+    if spec in ("", "none"):
+        return []
+    return sorted({int(x) for x in spec.split(",")})
+
+
+# ===================== simulator =====================
+
+@dataclass
+class SimConfig:
+    nodes: int = 3
+    leader: int = 2
+    ops: int = 10000
+    concurrency: int = 1
+    rate: Optional[float] = None
+    arrival: str = "constant"
+    client_rtt_us: float = 200.0
+    net_rtt_us: float = 200.0
+    net_jitter_us: float = 0.0           # mean of an exponential extra one-way delay per message
+    apply_us: float = 0.0
+    max_batch: int = 1000
+    seed: int = 1
+
+
+@dataclass
+class SimResult:
+    send_s: np.ndarray                   # client send (open-loop: intended start)
+    done_s: np.ndarray                   # reply received by the client
+    events: int
+    batches: List[int]                   # WAL batches per node
+    entries: List[int]                   # entries written per node
+    wall_s: float
+
+    @property
+    def latency_s(self) -> np.ndarray:
+        return self.done_s - self.send_s
+
+
+class RaftSim:
+    def __init__(self, cfg: SimConfig, disks: List[Disk]):
+        if len(disks) != cfg.nodes:
+            raise ValueError("one Disk per node")
+        if not 0 <= cfg.leader < cfg.nodes:
+            raise ValueError(f"leader {cfg.leader} not in 0..{cfg.nodes - 1}")
+        self.cfg = cfg
+        self.disks = disks
+
+    def run(self) -> SimResult:
+        cfg = self.cfg
+        n, N, L = cfg.ops, cfg.nodes, cfg.leader
+        ow_c, ow_n = cfg.client_rtt_us / 2e6, cfg.net_rtt_us / 2e6
+        apply_s, max_batch = cfg.apply_us / 1e6, cfg.max_batch
+        jitter = Random(lambda r, k: r.exponential(cfg.net_jitter_us, k), cfg.seed + 7) if cfg.net_jitter_us else None
+        followers = [i for i in range(N) if i != L]
+        quorum_pos = N - (N // 2 + 1)                # ascending position of the quorum-th highest
+
+        send = np.zeros(n)
+        arrive = np.zeros(n)
+        done = np.full(n, np.nan)
+        if cfg.rate:
+            send[:] = np.frombuffer(loadgen.arrival_offsets(cfg.rate, n, cfg.arrival, cfg.seed), dtype=np.int64) / 1e9
+            issued = n
+        else:
+            issued = min(cfg.concurrency, n)
+        arrive[:issued] = send[:issued] + ow_c
+
+        busy = [False] * N
+        written = [0] * N
+        recv = [0] * N
+        match = [0] * N                              # leader's view of each node's durable index
+        batches = [0] * N
+        commit, apply_free = 0, 0.0
+        heap = [(arrive[0], 0, WAKE, L, 0)] if n else []
+        seq = 1
+        events = 0
+        push, pop, search = heapq.heappush, heapq.heappop, np.searchsorted
+        disks = [d.sample for d in self.disks]
+        t_wall = time.perf_counter()
+
+        while heap and commit < n:
+            t, _, kind, node, val = pop(heap)
+            events += 1
+            if kind == WAL_DONE:
+                busy[node] = False
+                if node != L:
+                    seq += 1
+                    push(heap, (t + ow_n + (jitter.sample(t, 1) if jitter else 0.0), seq, ACK, node, val))
+                else:
+                    match[L] = val
+            elif kind == ACK:
+                if val > match[node]:
+                    match[node] = val
+            elif kind == APPEND:
+                if val > recv[node]:
+                    recv[node] = val
+
+            if kind == ACK or (kind == WAL_DONE and node == L):
+                c = sorted(match)[quorum_pos]
+                if c > commit:
+                    k = c - commit
+                    if apply_s:
+                        base = max(t, apply_free)
+                        done[commit:c] = base + apply_s * np.arange(1, k + 1) + ow_c
+                        apply_free = base + apply_s * k
+                    else:
+                        done[commit:c] = t + ow_c
+                    if not cfg.rate and issued < n:
+                        new = min(k, n - issued)
+                        send[issued:issued + new] = done[commit:commit + new]
+                        arrive[issued:issued + new] = send[issued:issued + new] + ow_c
+                        seq += 1
+                        push(heap, (arrive[issued], seq, WAKE, L, 0))
+                        issued += new
+                    commit = c
+
+            # start the next group commit on this node if its WAL is idle
+            if busy[node] or kind == ACK:
+                continue
+            if node == L:
+                avail = int(search(arrive[:issued], t, "right"))
+                if avail <= written[L]:
+                    if written[L] < issued:
+                        seq += 1
+                        push(heap, (arrive[written[L]], seq, WAKE, L, 0))
+                    continue
+            else:
+                avail = recv[node]
+                if avail <= written[node]:
+                    continue
+            hi = min(avail, written[node] + max_batch)
+            dur = disks[node](t, hi - written[node])
+            written[node] = hi
+            busy[node] = True
+            batches[node] += 1
+            seq += 1
+            push(heap, (t + dur, seq, WAL_DONE, node, hi))
+            if node == L:
+                for f in followers:
+                    seq += 1
+                    push(heap, (t + ow_n + (jitter.sample(t, 1) if jitter else 0.0), seq, APPEND, f, hi))
+
+        return SimResult(send, done, events, batches, list(written), time.perf_counter() - t_wall)
+
+
+# ===================== outputs =====================
+
+def write_outputs(res: SimResult, out_dir: str, t0_wall_ns: int, widths=(1.0,), node: int = 0,
+                  timeline: Scheduled = None, csv_out: bool = True, meta: dict = None):
+    os.makedirs(out_dir, exist_ok=True)
+    ok = np.isfinite(res.done_s)
+    start_ns = t0_wall_ns + np.round(res.send_s * 1e9).astype(np.int64)
+    lat_ns = np.where(ok, np.round(res.latency_s * 1e9), 0).astype(np.int64)
+
+    cols = ColumnWriter(os.path.join(out_dir, DEFAULT_DIR), meta={"t0_unix_ns": t0_wall_ns, "simulated": True})
+    phase = 0
+    if timeline is not None:
+        fault = cols.code("phase", "fault")
+        phase = np.where([timeline.delay_us(t) > 0 for t in res.send_s.tolist()], fault, 0).astype(np.uint8)
+    cols.append_many(start_ns, lat_ns, op=cols.code("op", "put"), phase=phase, node=node,
+                     status=np.where(ok, 0, 1).astype(np.uint8))
+    cols.close()
+
+    if csv_out:
+        with open(os.path.join(out_dir, "per_op_latency.csv"), "w") as f:
+            f.write("op,seconds,start_unix_ns\n")
+            secs = np.char.mod("%.9f", res.latency_s)
+            secs[~ok] = "NaN"
+            for lo in range(0, ok.size, 1 << 16):
+                hi = min(ok.size, lo + (1 << 16))
+                f.writelines(f"{i},{s},{t}\n" for i, s, t in
+                             zip(range(lo + 1, hi + 1), secs[lo:hi].tolist(), start_ns[lo:hi].tolist()))
+    aggregate.write_outputs(out_dir, start_ns, lat_ns, ok=ok, t0_ns=t0_wall_ns, widths=widths)
+
+    end_ns = start_ns + lat_ns
+    order = np.argsort(end_ns[ok], kind="stable")
+    rec = IntervalRecorder(os.path.join(out_dir, "latency.hlog"), t0_wall_ns, t0_wall_ns)
+    rec.record_many(lat_ns[ok][order], end_ns[ok][order])
+    hist = rec.close(int(end_ns[ok].max()) if ok.any() else t0_wall_ns)
+
+    if timeline is not None:
+        write_fault_events(os.path.join(out_dir, fault_timeline.EVENTS_FILE), timeline.schedule, t0_wall_ns)
+    with open(os.path.join(out_dir, "sim.json"), "w") as f:
+        json.dump(dict(meta or {}, events=res.events, batches=res.batches, entries=res.entries,
+                       sim_wall_s=res.wall_s), f, indent=1)
+    return hist
+
+
+def write_fault_events(path: str, schedule, t0_wall_ns: int):
+    """The schedule as if fault_timeline.py had applied it on time (no lag, no RPC)."""
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fault_timeline.EVENT_FIELDS)
+        w.writeheader()
+        for seq, tr in enumerate(schedule):
+            spec = tr.plan[0] if tr.plan else None
+            w.writerow({"seq": seq, "planned_s": f"{tr.t_s:.6f}", "actual_s": f"{tr.t_s:.6f}", "lag_us": 0,
+                        "wall_ms": (t0_wall_ns + int(tr.t_s * 1e9)) // 1_000_000, "mono_ns": int(tr.t_s * 1e9),
+                        "rpc_us": 0, "delay_us": tr.delay_us, "prob_permil": spec.prob_permil if spec else 0,
+                        "methods": ",".join(spec.methods or ["ALL"]) if spec else "",
+                        "regex": spec.regex if spec else ""})
+
+
+def summary_of(lat_ms: np.ndarray, span_s: float) -> dict:
+    lat_ms = lat_ms[np.isfinite(lat_ms)]
+    p50, p99, p999 = np.percentile(lat_ms, (50, 99, 99.9)) if lat_ms.size else (np.nan,) * 3
+    return {"ops": int(lat_ms.size), "throughput": lat_ms.size / span_s if span_s > 0 else 0.0,
+            "p50_ms": p50, "p99_ms": p99, "p999_ms": p999}
+
+
+def check_against(res: SimResult, path: str):
+    """Print simulated vs measured throughput and latency percentiles."""
+    from analysis import Run
+    o = Run(path).ops()
+    lat, start = o["latency_ms"], o["start_ms"]
+    fin = np.isfinite(lat) & np.isfinite(start)
+    span = (np.nanmax(start[fin] + lat[fin]) - np.nanmin(start[fin])) / 1000.0 if fin.any() else 0.0
+    real = summary_of(lat, span)
+    sim = summary_of(res.latency_s * 1000.0, float(np.nanmax(res.done_s) - res.send_s.min()))
+    print(f"{'':>12} {'simulated':>12} {'measured':>12} {'ratio':>7}")
+    for k, fmt in (("ops", "d"), ("throughput", ".1f"), ("p50_ms", ".3f"), ("p99_ms", ".3f"), ("p999_ms", ".3f")):
+        ratio = sim[k] / real[k] if real[k] else float("nan")
+        print(f"{k:>12} {sim[k]:>12{fmt}} {real[k]:>12{fmt}} {ratio:>7.2f}")
+
+
+# ===================== CLI =====================
+
+def build_disks(args) -> Tuple[List[Disk], Optional[Scheduled]]:
+    slow = slow_nodes(args.slow, args.nodes, args.leader)
+    timeline = Scheduled(parse_timeline(args.timeline), args.calls_per_sync, args.seed) if args.timeline else None
+    disks = []
+    for i in range(args.nodes):
+        seed = args.seed + 101 * i
+        models = [parse_model(args.fsync, seed)]
+        if args.per_entry_us:
+            models.append(PerEntry(args.per_entry_us))
+        if i in slow:
+            if args.delay:
+                models.append(parse_model(args.delay, seed + 1))
+            if timeline is not None:
+                models.append(Scheduled(timeline.schedule, args.calls_per_sync, seed + 2))
+        disks.append(Disk(models))
+    return disks, timeline
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Discrete-event simulation of a raft-replicated KV under disk delays")
+    ap.add_argument("--nodes", type=int, default=3)
+    ap.add_argument("--leader", type=int, help="leader node index (default: the last, i.e. etcd2 of 3)")
+    ap.add_argument("--ops", type=int, default=10000)
+    ap.add_argument("--concurrency", type=int, default=1, help="closed-loop clients")
+    ap.add_argument("--rate", type=float, help="open-loop: ops/s (omit for closed-loop)")
+    ap.add_argument("--arrival", choices=["constant", "poisson"], default="constant")
+    ap.add_argument("--client-rtt-us", type=float, default=200.0)
+    ap.add_argument("--net-rtt-us", type=float, default=200.0, help="leader <-> follower round trip")
+    ap.add_argument("--net-jitter-us", type=float, default=0.0, help="mean exponential extra one-way delay")
+    ap.add_argument("--fsync", default="const:1000", help="base WAL batch cost, all nodes (model spec)")
+    ap.add_argument("--per-entry-us", type=float, default=0.0)
+    ap.add_argument("--apply-us", type=float, default=0.0)
+    ap.add_argument("--max-batch", type=int, default=1000, help="entries per WAL batch at most")
+    ap.add_argument("--slow", default="leader",
+                    help="nodes that get --delay/--timeline: leader, follower, followers, all, none or 0,2,...")
+    ap.add_argument("--delay", help="always-on extra WAL batch delay on the slow nodes (model spec)")
+    ap.add_argument("--timeline", help='fault_timeline.py schedule, e.g. "step --at 20 --delay-us 100000 --until 60"')
+    ap.add_argument("--calls-per-sync", type=int, default=1,
+                    help="--timeline: delayed calls per WAL batch (e.g. 2 for write + fdatasync)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out-dir", help="write the per-op / per-second outputs here")
+    ap.add_argument("--agg-widths", type=aggregate.parse_widths, default=[1.0])
+    ap.add_argument("--no-csv", action="store_true", help="skip per_op_latency.csv (per_op.col is always written)")
+    ap.add_argument("--check", metavar="RUN", help="compare with a measured run (any file analysis.Run reads)")
+    args = ap.parse_args(argv)
+    if args.leader is None:
+        args.leader = args.nodes - 1
+
+    cfg = SimConfig(args.nodes, args.leader, args.ops, args.concurrency, args.rate, args.arrival,
+                    args.client_rtt_us, args.net_rtt_us, args.net_jitter_us, args.apply_us, args.max_batch, args.seed)
+    disks, timeline = build_disks(args)
+    res = RaftSim(cfg, disks).run()
+
+    lat = res.latency_s[np.isfinite(res.latency_s)]
+    span = float(np.nanmax(res.done_s) - res.send_s.min()) if lat.size else 0.0
+    h = HdrHistogram()
+    h.record_many(np.round(lat * 1e9).astype(np.int64))
+    print(f">>> Simulated {lat.size} ops on {cfg.nodes} nodes (leader etcd{cfg.leader}, slow: {args.slow}) "
+          f"in {res.wall_s:.2f}s wall ({lat.size / max(res.wall_s, 1e-9):,.0f} ops/s, {res.events} events)")
+    print(f"  sim time={span:.3f}s  throughput={lat.size / span if span else 0:.2f} ops/s  "
+          f"mean batch={res.entries[cfg.leader] / max(res.batches[cfg.leader], 1):.1f} entries")
+    print("  " + format_percentiles(h, (50, 95, 99, 99.9)))
+    if args.out_dir:
+        write_outputs(res, args.out_dir, time.time_ns(), args.agg_widths, node=cfg.leader, timeline=timeline,
+                      csv_out=not args.no_csv, meta={"config": asdict(cfg), "argv": sys.argv[1:] if argv is None else argv})
+        catalog.write_manifest(args.out_dir, {
+            "kind": "sim", "mode": "timeline" if args.timeline else ("delay" if args.delay else "baseline"),
+            "leader": f"etcd{cfg.leader}", "ops": cfg.ops, "concurrency": cfg.concurrency, "rate": cfg.rate,
+            "arrival": cfg.arrival if cfg.rate else None, "nodes": cfg.nodes, "slow": args.slow,
+            "delay": args.delay, "timeline": args.timeline, "fsync": args.fsync, "seed": cfg.seed,
+            "delay_us": constant_delay_us(args.delay)}, catalog.summarize_run(args.out_dir))
+        print(f"Saved simulated run      : {args.out_dir}")
+    if args.check:
+        check_against(res, args.check)
+
+
+if __name__ == "__main__":
+    main()
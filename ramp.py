@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Closed-loop concurrency ramp: find the saturation knee (etcd_driver.py --ramp).
+
+With one outstanding request a run only sees the latency-bound regime. A
+ramp steps the number of closed-loop clients (1, 2, 4 ... 512 by default)
+on one warm connection pool and holds every step until its throughput is
+stable:
+
+  * completions are counted in `window_s` windows by completion time;
+  * after `warmup_windows`, the step ends as soon as the last
+    `stable_windows` windows have a coefficient of variation of at most
+    tol + 1/sqrt(mean ops per window) (the counting noise of slow windows),
+    or after `max_step_s` (marked unstable);
+  * the step's throughput and p50/p90/p99 come from those last windows only.
+
+The knee is the last step whose throughput is at least (1 + gain) x the best
+step before it. The steps after it buy less than `gain` more throughput
+while p50 keeps growing. The knee's throughput is the max sustainable
+throughput. The ramp stops `stop_after` steps past the knee (0 = run every
+step).
+
+Little's law cross-check, per step: N = X * W, so throughput x mean latency
+should equal the step's concurrency (little_ratio ~ 1; well below 1 means
+time is lost in the client between ops). For the whole curve, the knee
+concurrency should be close to peak throughput x the unloaded latency
+(n_opt, the "bandwidth-delay product" of the cluster).
+
+Outputs (next to the driver's per_op.col, whose phase labels are c<N>):
+  ramp.csv          concurrency,duration_s,windows,stable,ok,fail,throughput,mean_ms,p50_ms,p90_ms,
+                    p99_ms,little_n,little_ratio
+  saturation.png    throughput and latency vs concurrency, latency vs throughput (plot)
+
+    python3 etcd_driver.py --endpoint http://127.0.0.1:23792 --ramp 1..512 --out-dir results/ramp_10ms
+    python3 ramp.py show results/ramp_10ms
+    python3 ramp.py plot results/ramp_10ms
+"""
+import argparse
+import asyncio
+import csv
+import math
+import os
+import time
+from array import array
+from dataclasses import dataclass, field, fields
+from typing import List
+
+import numpy as np
+
+RAMP_CSV = "ramp.csv"
+RAMP_PNG = "saturation.png"
+RAMP_FIELDS = ["concurrency", "duration_s", "windows", "stable", "ok", "fail", "throughput", "mean_ms",
+               "p50_ms", "p90_ms", "p99_ms", "little_n", "little_ratio"]
+STREAM_OPS = 1 << 18            # ops in the (cycled) workload stream of a ramp
+
+
+def parse_steps(text) -> List[int]:
+    """'1,2,4,16' or 'a..b' (powers of two from a to b), or a list."""
+    if isinstance(text, (list, tuple)):
+        steps = [int(x) for x in text]
+    elif ".." in text:
+        lo, hi = (int(x) for x in text.split(".."))
+        steps = []
+        c = max(lo, 1)
+        while c <= hi:
+            steps.append(c)
+            c *= 2
+    else:
+        steps = [int(x) for x in text.split(",") if x.strip()]
+    if not steps or min(steps) < 1 or steps != sorted(set(steps)):
+        raise ValueError(f"ramp steps must be increasing concurrencies >= 1: {text!r}")
+    return steps
+
+
+@dataclass
+class RampConfig:
+    steps: List[int] = field(default_factory=lambda: parse_steps("1..512"))
+    window_s: float = 1.0
+    warmup_windows: int = 1
+    stable_windows: int = 3
+    tol: float = 0.05               # max coefficient of variation of window throughput (+ counting noise)
+    max_step_s: float = 30.0
+    gain: float = 0.05              # a step must add this much throughput to move the knee
+    stop_after: int = 2             # steps past the knee before the ramp stops, 0 = all steps
+
+    def __post_init__(self):
+        if self.window_s <= 0 or self.warmup_windows < 0 or self.stable_windows < 1:
+            raise ValueError(f"ramp needs window_s > 0, warmup_windows >= 0 and stable_windows >= 1: {self}")
+        need = (self.warmup_windows + self.stable_windows) * self.window_s
+        if self.max_step_s < need:
+            raise ValueError(f"ramp max_step_s {self.max_step_s:g} is shorter than warmup + stable windows "
+                             f"({self.warmup_windows} + {self.stable_windows}) x {self.window_s:g}s = {need:g}s")
+
+    @classmethod
+    def parse(cls, value) -> "RampConfig":
+        """Steps ('1..512', '1,2,4', list) or a dict of RampConfig fields."""
+        if isinstance(value, dict):
+            d = dict(value)
+            if "steps" in d:
+                d["steps"] = parse_steps(d["steps"])
+            return cls(**d)
+        return cls(steps=parse_steps(value))
+
+    def argv(self) -> List[str]:
+        """etcd_driver options that reproduce this config."""
+        out = ["--ramp", ",".join(map(str, self.steps))]
+        for f in fields(self):
+            if f.name != "steps":
+                out += ["--ramp-" + f.name.replace("_", "-"), str(getattr(self, f.name))]
+        return out
+
+
+def add_arguments(ap: argparse.ArgumentParser):
+    g = ap.add_argument_group("concurrency ramp (ramp.py)")
+    d = RampConfig()
+    g.add_argument("--ramp", type=parse_steps, metavar="STEPS",
+                   help="closed-loop concurrency steps, e.g. 1..512 (powers of two) or 1,4,16,64")
+    g.add_argument("--ramp-window-s", type=float, default=d.window_s, help="throughput window (s)")
+    g.add_argument("--ramp-warmup-windows", type=int, default=d.warmup_windows)
+    g.add_argument("--ramp-stable-windows", type=int, default=d.stable_windows)
+    g.add_argument("--ramp-tol", type=float, default=d.tol, help="max coefficient of variation of a stable step")
+    g.add_argument("--ramp-max-step-s", type=float, default=d.max_step_s)
+    g.add_argument("--ramp-gain", type=float, default=d.gain, help="min relative throughput gain past the knee")
+    g.add_argument("--ramp-stop-after", type=int, default=d.stop_after,
+                   help="steps past the knee before stopping, 0 = all steps")
+
+
+def config_from_args(args) -> RampConfig:
+    return RampConfig(steps=args.ramp, **{f.name: getattr(args, "ramp_" + f.name)
+                                          for f in fields(RampConfig) if f.name != "steps"})
+
+
+# ----------------------------------------------------------------------
+# running
+# ----------------------------------------------------------------------
+
+def step_stats(conc: int, done_ns: np.ndarray, lat_ns: np.ndarray, ok: np.ndarray, t0: int, cfg: RampConfig,
+               n_windows: int, stable: bool, duration_s: float) -> dict:
+    """
+    Stats of the last stable_windows complete windows of one step (fewer
+    if the step ended early, e.g. on a failed worker; such a step is
+    never stable).
+    """
+    win = int(cfg.window_s * 1e9)
+    if n_windows < cfg.stable_windows:
+        stable = False
+    lo = t0 + max(n_windows - cfg.stable_windows, 0) * win
+    hi = t0 + n_windows * win
+    sel = (done_ns >= lo) & (done_ns < hi)
+    good = lat_ns[sel & ok]
+    span = (hi - lo) / 1e9
+    x = good.size / span if span > 0 else 0.0
+    row = {"concurrency": conc, "duration_s": round(duration_s, 3), "windows": n_windows, "stable": int(stable),
+           "ok": int(good.size), "fail": int((sel & ~ok).sum()), "throughput": x}
+    if good.size:
+        mean = float(good.mean()) / 1e6
+        p50, p90, p99 = (np.percentile(good, (50, 90, 99)) / 1e6).tolist()
+        row.update(mean_ms=mean, p50_ms=p50, p90_ms=p90, p99_ms=p99, little_n=x * mean / 1e3,
+                   little_ratio=x * mean / 1e3 / conc)
+    else:
+        row.update(mean_ms=math.nan, p50_ms=math.nan, p90_ms=math.nan, p99_ms=math.nan, little_n=0.0,
+                   little_ratio=0.0)
+    return row
+
+
+def is_stable(counts: np.ndarray, cfg: RampConfig) -> bool:
+    last = counts[-cfg.stable_windows:].astype(np.float64)
+    mean = last.mean()
+    if mean <= 0:
+        return False
+    return last.std() / mean <= cfg.tol + 1.0 / math.sqrt(mean)
+
+
+async def run_step(do, n_ops: int, first_op: int, conc: int, cfg: RampConfig, record, errors=(Exception,)):
+    """
+    `conc` workers issue `await do(i)` for i = first_op, first_op + 1, ...
+    (mod n_ops) until the step is stable; record(i, start_ns, latency_ns, ok)
+    is called for every op. Returns (stats row, next op number).
+    """
+    perf = time.perf_counter_ns
+    win = int(cfg.window_s * 1e9)
+    done_ns, lat_ns, oks = array("q"), array("q"), bytearray()
+    counter = [first_op]
+    stop = asyncio.Event()
+
+    async def worker():
+        while not stop.is_set():
+            i = counter[0] % n_ops
+            counter[0] += 1
+            t0 = perf()
+            try:
+                await do(i)
+                ok = 1
+            except errors:
+                ok = 0
+            t1 = perf()
+            done_ns.append(t1)
+            lat_ns.append(t1 - t0)
+            oks.append(ok)
+            record(i, t0, t1 - t0, ok)
+
+    t_start = perf()
+    tasks = [asyncio.ensure_future(worker()) for _ in range(conc)]
+    k, stable = 0, False
+    try:
+        while True:
+            k += 1
+            wait = t_start + k * win - perf()
+            if wait > 0:
+                await asyncio.sleep(wait / 1e9)
+            if k >= cfg.warmup_windows + cfg.stable_windows:
+                done = np.array(done_ns, dtype=np.int64)       # copies: the arrays keep growing
+                ok = np.frombuffer(bytes(oks), dtype=np.uint8)[: done.size].astype(bool)
+                w = (done[ok] - t_start) // win
+                counts = np.bincount(w[w < k], minlength=k)
+                if is_stable(counts, cfg):
+                    stable = True
+                    break
+            if k * cfg.window_s >= cfg.max_step_s:
+                break
+            if any(t.done() for t in tasks):            # a worker died: surface its exception
+                break
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+    row = step_stats(conc, np.frombuffer(done_ns, dtype=np.int64), np.frombuffer(lat_ns, dtype=np.int64),
+                     np.frombuffer(bytes(oks), dtype=np.uint8).astype(bool), t_start, cfg, k, stable,
+                     (perf() - t_start) / 1e9)
+    return row, counter[0]
+
+
+def knee_index(rows: List[dict], gain: float = 0.05) -> int:
+    """Last step that beat the best earlier throughput by a factor of at least (1 + gain)."""
+    knee = 0
+    for i in range(1, len(rows)):
+        if rows[i]["throughput"] >= rows[knee]["throughput"] * (1 + gain):
+            knee = i
+    return knee
+
+
+def past_knee(rows: List[dict], gain: float = 0.05) -> int:
+    """Steps after the knee that added < gain throughput while p50 grew by > gain."""
+    knee = knee_index(rows, gain)
+    k = rows[knee]
+    return sum(1 for r in rows[knee + 1:] if r["p50_ms"] > k["p50_ms"] * (1 + gain))
+
+
+async def ramp(do, n_ops: int, cfg: RampConfig, record, on_step=None, errors=(Exception,)) -> List[dict]:
+    """Run the steps of `cfg` in order; record(step, i, start_ns, latency_ns, ok) per op."""
+    rows, next_op = [], 0
+    for step, conc in enumerate(cfg.steps):
+        row, next_op = await run_step(do, n_ops, next_op, conc, cfg,
+                                      lambda i, t0, lat, ok, step=step: record(step, i, t0, lat, ok), errors)
+        rows.append(row)
+        if on_step is not None:
+            on_step(row)
+        if cfg.stop_after and past_knee(rows, cfg.gain) >= cfg.stop_after:
+            break
+    return rows
+
+
+# ----------------------------------------------------------------------
+# results
+# ----------------------------------------------------------------------
+
+def summarize(rows: List[dict], gain: float = 0.05) -> dict:
+    """Knee, max sustainable and peak throughput, Little's-law cross-check."""
+    if not rows:
+        return {}
+    knee = knee_index(rows, gain)
+    k = rows[knee]
+    peak = max(rows, key=lambda r: r["throughput"])
+    w_min = min((r["mean_ms"] for r in rows if r["mean_ms"] == r["mean_ms"]), default=math.nan)
+    return {"knee_concurrency": k["concurrency"], "max_sustainable_tput": k["throughput"],
+            "knee_p50_ms": k["p50_ms"], "knee_p99_ms": k["p99_ms"], "knee_reached": int(past_knee(rows, gain) > 0),
+            "peak_tput": peak["throughput"], "peak_concurrency": peak["concurrency"],
+            "knee_little_ratio": k["little_ratio"], "n_opt": peak["throughput"] * w_min / 1e3,
+            "unstable_steps": sum(1 for r in rows if not r["stable"])}
+
+
+def format_step(r: dict) -> str:
+    return (f"[ramp] c={r['concurrency']:<4} {r['duration_s']:6.1f}s {'stable  ' if r['stable'] else 'UNSTABLE'}"
+            f" tput={r['throughput']:9.1f}/s  p50={r['p50_ms']:8.3f}ms  p99={r['p99_ms']:8.3f}ms"
+            f"  X*W={r['little_n']:7.2f} ({r['little_ratio']:.2f} of N)")
+
+
+def format_summary(s: dict) -> str:
+    knee = "" if s["knee_reached"] else "  (no knee within the steps: saturation not reached)"
+    return (f"  knee: concurrency {s['knee_concurrency']}  max sustainable {s['max_sustainable_tput']:.1f} ops/s  "
+            f"p50={s['knee_p50_ms']:.3f}ms p99={s['knee_p99_ms']:.3f}ms{knee}\n"
+            f"  peak: {s['peak_tput']:.1f} ops/s at concurrency {s['peak_concurrency']}\n"
+            f"  Little's law: X*W/N at the knee = {s['knee_little_ratio']:.2f}; "
+            f"peak X * unloaded W = {s['n_opt']:.1f} clients (knee at {s['knee_concurrency']})")
+
+
+def write_csv(out_dir: str, rows: List[dict]) -> str:
+    path = os.path.join(out_dir, RAMP_CSV)
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=RAMP_FIELDS)
+        w.writeheader()
+        for r in rows:
+            w.writerow({k: f"{v:.6f}" if isinstance(v, float) else v for k, v in r.items()})
+    return path
+
+
+def read_csv(path: str) -> List[dict]:
+    if os.path.isdir(path):
+        path = os.path.join(path, RAMP_CSV)
+    with open(path, newline="") as f:
+        return [{k: (int(v) if k in ("concurrency", "windows", "stable", "ok", "fail") else float(v))
+                 for k, v in r.items()} for r in csv.DictReader(f)]
+
+
+def plot(out_dir: str, rows: List[dict], summary: dict = None, title: str = "") -> str:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    summary = summary or summarize(rows)
+    c = [r["concurrency"] for r in rows]
+    x = [r["throughput"] for r in rows]
+    fig, (a1, a2) = plt.subplots(1, 2, figsize=(13, 4.5))
+    a1.plot(c, x, "o-", label="throughput")
+    a1.set_xscale("log", base=2)
+    a1.set_xlabel("Concurrent clients"); a1.set_ylabel("Throughput (ops/sec)")
+    a1.axvline(summary["knee_concurrency"], color="tab:red", linestyle=":", label="knee")
+    b1 = a1.twinx()
+    for q, style in (("p50_ms", "s--"), ("p99_ms", "^--")):
+        b1.plot(c, [r[q] for r in rows], style, alpha=0.7, label=q[:-3])
+    b1.set_ylabel("Latency (ms)")
+    h1, l1 = a1.get_legend_handles_labels()
+    h2, l2 = b1.get_legend_handles_labels()
+    a1.legend(h1 + h2, l1 + l2, loc="upper left")
+    for q, style in (("p50_ms", "o-"), ("p99_ms", "s-")):
+        a2.plot(x, [r[q] for r in rows], style, label=q[:-3])
+    for r in rows:
+        a2.annotate(str(r["concurrency"]), (r["throughput"], r["p99_ms"]), fontsize=7,
+                    textcoords="offset points", xytext=(3, 3))
+    a2.axvline(summary["max_sustainable_tput"], color="tab:red", linestyle=":", label="max sustainable")
+    a2.set_xlabel("Throughput (ops/sec)"); a2.set_ylabel("Latency (ms)"); a2.set_yscale("log"); a2.legend()
+    for a in (a1, a2):
+        a.grid(True, linestyle="--", alpha=0.35)
+    if title:
+        fig.suptitle(title)
+    fig.tight_layout()
+    path = os.path.join(out_dir, RAMP_PNG)
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Saturation knee of a concurrency ramp (ramp.csv)")
+    ap.add_argument("cmd", choices=["show", "plot"])
+    ap.add_argument("run_dirs", nargs="+", help="run directories (or ramp.csv files)")
+    ap.add_argument("--gain", type=float, default=RampConfig().gain)
+    args = ap.parse_args(argv)
+    for d in args.run_dirs:
+        rows = read_csv(d)
+        s = summarize(rows, args.gain)
+        print(f"== {d}")
+        for r in rows:
+            print(format_step(r))
+        print(format_summary(s))
+        if args.cmd == "plot":
+            out = d if os.path.isdir(d) else os.path.dirname(d) or "."
+            print("Saved:", plot(out, rows, s, title=os.path.basename(os.path.abspath(out))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Headless batch rendering of the standard figures for every run of a sweep.
+
+Figures (per run, and one overlay of all runs per kind):
+  per_op       latency of every op in order              (min/max per pixel column)
+  cdf          latency ECDF                              (LTTB)
+  throughput   ops per second                            (min/max per pixel column;
+                                                          per-run: detected onset / recovery)
+  latency      p50 / p99 / max per second (overlay: p99)  (min/max per pixel column)
+
+Per-run throughput and latency figures also mark leader transitions from
+raft_status.csv (raft_monitor.py) when the run has one.
+
+Dense series are reduced to what the figure can show before plotting, so
+the time spent in matplotlib depends on the figure's pixel width, not on
+the number of ops:
+
+  minmax_downsample  first/last point plus the min and max of every pixel
+                     column, in x order (spikes are never dropped)
+  lttb               Largest-Triangle-Three-Buckets, for curves without
+                     spikes that matter (ECDF)
+
+Runs are rendered in a process pool with the Agg backend: first one task
+per run (parses the run once, warming the analysis cache), then one task
+per overlay, which reads the cached arrays.
+
+    python3 render.py 'results/sweep_paper/*/per_op.col' --out figures
+    python3 render.py 'per_op_latency_*.csv' --kinds cdf,per_op --format png,svg --jobs 8
+
+Output: <out>/<run label>/<kind>.<fmt> and <out>/all_<kind>.<fmt>.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+import numpy as np
+
+KINDS = ("per_op", "cdf", "throughput", "latency")
+MARK_STYLE = {"start": "--", "end": ":", "change": "-."}
+RAFT_STYLE = {"leader": "-", "term": "--", "no_leader": ":"}
+
+
+# ===================== downsampling =====================
+
+def minmax_downsample(x, y, n_px: int):
+    """
+    Reduce (x, y) to at most 2 * n_px + 2 points: the first and last point
+    and, for every one of n_px equal-width x columns, the points with the
+    smallest and largest y. x must be ascending; NaN points are dropped.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    if x.size <= 2 * n_px + 2:
+        return x, y
+    span = max(x[-1] - x[0], np.finfo(np.float64).tiny)
+    col = np.minimum(((x - x[0]) / span * n_px).astype(np.int64), n_px - 1)
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    seg = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, y.size]))
+    idx = np.arange(y.size)
+    first_min = np.minimum.reduceat(np.where(y == np.minimum.reduceat(y, starts)[seg], idx, y.size), starts)
+    first_max = np.minimum.reduceat(np.where(y == np.maximum.reduceat(y, starts)[seg], idx, y.size), starts)
+    sel = np.unique(np.concatenate(([0, y.size - 1], first_min, first_max)))
+    return x[sel], y[sel]
+
+
+def lttb(x, y, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets: keep n_out points (first and last
+    included) that preserve the visual shape. x must be ascending; NaN
+    points are dropped.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)      # n_out - 2 inner buckets
+    nxt = np.r_[edges[1:], n]
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = x[hi:nxt[i + 1]].mean(), y[hi:nxt[i + 1]].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return x[out], y[out]
+
+
+def pixel_width(fig_or_size, dpi: float = 100.0) -> int:
+    """Width in pixels of a figure or a (w, h) figsize in inches."""
+    if hasattr(fig_or_size, "get_size_inches"):
+        return int(fig_or_size.get_size_inches()[0] * fig_or_size.dpi)
+    return int(fig_or_size[0] * dpi)
+
+
+# ===================== figures =====================
+
+def _label(run):
+    from analysis import to_ms_label
+    return to_ms_label(run.label)
+
+
+def draw_raft_marks(ax, run):
+    """Leader transitions (raft_status.csv) as thin grey lines, labelled once."""
+    for i, (t, kind) in enumerate(run.raft_marks()):
+        ax.axvline(t, color="0.4", linestyle=RAFT_STYLE[kind], linewidth=0.8, alpha=0.7,
+                   label="leader change" if i == 0 else None)
+
+
+def draw_per_op(ax, runs, n_px):
+    for run in runs:
+        lat = run.ops()["latency_ms"]
+        x, y = minmax_downsample(np.arange(1, lat.size + 1), lat, n_px)
+        ax.plot(x, y, linewidth=1.2, alpha=0.9, label=_label(run))
+    ax.set_title("Latency per Operation")
+    ax.set_xlabel("Operation #")
+    ax.set_ylabel("Latency (ms)")
+
+
+def draw_cdf(ax, runs, n_px):
+    for run in runs:
+        xs, ys = run.ecdf()
+        if xs.size == 0:
+            continue
+        x, y = lttb(xs, ys, n_px)
+        ax.plot(x, y, linewidth=1.8, alpha=0.95, label=_label(run))
+    ax.set_title("Latency CDF")
+    ax.set_xlabel("Latency (ms)")
+    ax.set_ylabel("CDF (fraction ≤ x)")
+
+
+def draw_throughput(ax, runs, n_px):
+    for run in runs:
+        df = run.per_sec_ops()
+        x, y = minmax_downsample(df["t_sec"] - df["t_sec"].min(), df["ops"], n_px)
+        line, = ax.plot(x, y, linewidth=1.6, alpha=0.95, label=_label(run))
+        for t, kind in run.fault_marks():
+            ax.axvline(t, color=line.get_color(), linestyle=MARK_STYLE[kind], linewidth=1.0, alpha=0.8)
+        if len(runs) == 1:
+            import changepoint
+            ch = changepoint.analyze(df["t_sec"] - df["t_sec"].min(), df["ops"], "throughput", changepoint.run_marks(run))
+            changepoint.annotate(ax, ch, color=line.get_color())
+            draw_raft_marks(ax, run)
+    ax.set_title("Throughput vs Time")
+    ax.set_xlabel("Time (seconds)")
+    ax.set_ylabel("Throughput (ops/sec)")
+
+
+def draw_latency(ax, runs, n_px):
+    stats = ("p99",) if len(runs) > 1 else ("p50", "p99", "max")
+    for run in runs:
+        for stat in stats:
+            df = run.per_sec_latency(stat=stat, metrics=[f"{stat}_ms"])
+            x, y = minmax_downsample(df["t_sec"] - df["t_sec"].min(), df["lat"], n_px)
+            name = _label(run) if len(runs) > 1 else stat
+            ax.plot(x, y, linewidth=1.4, alpha=0.95, label=name)
+        if len(runs) == 1:
+            draw_raft_marks(ax, run)
+    ax.set_title("Latency vs Time" + (" (p99)" if len(runs) > 1 else ""))
+    ax.set_xlabel("Time (seconds)")
+    ax.set_ylabel("Latency (ms)")
+
+
+DRAW = {"per_op": draw_per_op, "cdf": draw_cdf, "throughput": draw_throughput, "latency": draw_latency}
+PER_SEC_KINDS = ("throughput", "latency")
+
+
+def render(paths: List[str], kinds, out_base: str, formats, figsize, dpi) -> List[str]:
+    """
+    Draw each kind for the runs in `paths` to <out_base><kind>.<fmt>.
+    Runs in a pool worker; returns the files written.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from analysis import Run
+
+    runs = [Run(p) for p in paths]
+    written = []
+    for kind in kinds:
+        use = [r for r in runs if kind in PER_SEC_KINDS or r.kind != "per_sec"]
+        if not use:
+            continue
+        fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+        try:
+            DRAW[kind](ax, use, pixel_width(fig))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skip {kind} {out_base}: {e}", file=sys.stderr)
+            plt.close(fig)
+            continue
+        ax.grid(True, linestyle="--", alpha=0.35)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(frameon=True, fontsize=8, loc="best" if len(use) < 12 else "center left",
+                      bbox_to_anchor=None if len(use) < 12 else (1.02, 0.5))
+        fig.tight_layout()
+        for fmt in formats:
+            path = f"{out_base}{kind}.{fmt}"
+            fig.savefig(path)
+            written.append(path)
+        plt.close(fig)
+    return written
+
+
+def render_all(paths: List[str], out_dir: str, kinds=KINDS, formats=("png",), figsize=(14, 6), dpi=100,
+               jobs: int = None, overlay: bool = True, per_run: bool = True) -> List[str]:
+    from analysis import label_from_path
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        phases = []
+        if per_run:
+            tasks = []
+            for p in paths:
+                d = os.path.join(out_dir, label_from_path(p))
+                os.makedirs(d, exist_ok=True)
+                tasks.append(([p], os.path.join(d, "")))
+            phases.append(tasks)
+        if overlay and len(paths) > 1:
+            phases.append([(paths, os.path.join(out_dir, "all_"), kind) for kind in kinds])
+        for tasks in phases:
+            futs = {}
+            for t in tasks:
+                ks = (t[2],) if len(t) == 3 else kinds
+                futs[pool.submit(render, t[0], ks, t[1], formats, figsize, dpi)] = t[1]
+            for fut in as_completed(futs):
+                try:
+                    written += fut.result()
+                except Exception as e:
+                    print(f"Skip {futs[fut]}: {e!r}", file=sys.stderr)
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render all figures for many runs in parallel (headless)")
+    ap.add_argument("patterns", nargs="+", help="result files / .col dirs (glob patterns)")
+    ap.add_argument("--out", default="figures")
+    ap.add_argument("--kinds", default=",".join(KINDS), help=f"comma list of {', '.join(KINDS)}")
+    ap.add_argument("--format", default="png", help="png, svg or both (png,svg)")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--width", type=float, default=14.0, help="figure width in inches")
+    ap.add_argument("--height", type=float, default=6.0)
+    ap.add_argument("--dpi", type=int, default=100)
+    ap.add_argument("--no-overlay", action="store_true", help="per-run figures only")
+    ap.add_argument("--overlay-only", action="store_true", help="only the all-runs figures")
+    args = ap.parse_args(argv)
+
+    from analysis import find_files
+    paths = find_files(*args.patterns)
+    if not paths:
+        raise SystemExit(f"No files match: {' '.join(args.patterns)}")
+    kinds = [k for k in args.kinds.split(",") if k]
+    bad = set(kinds) - set(KINDS)
+    if bad:
+        ap.error(f"unknown kind(s): {', '.join(sorted(bad))}")
+    t0 = time.perf_counter()
+    written = render_all(paths, args.out, kinds, [f for f in args.format.split(",") if f],
+                         (args.width, args.height), args.dpi, args.jobs,
+                         overlay=not args.no_overlay, per_run=not args.overlay_only)
+    print(f"Rendered {len(written)} file(s) for {len(paths)} run(s) into {args.out}/ "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,16 @@ set -euo pipefail
 
 # ===== CONFIG DEFAULTS =====
 OPS="${OPS:-200}"                         # number of put ops
-MODE="${1:-baseline}"                     # baseline | delay
-LEADER_TARGET="${LEADER_TARGET:-etcd2}"   # we want etcd2 as leader (the slow WAL)
+MODE="${1:-baseline}"                     # baseline | delay | timeline
+# MODE=delay across several nodes (topology.py): a preset (slow-follower, slow-followers,
+# slow-leader-follower, ...) or e.g. "followers=x1" / "etcd0=10000,etcd1=50000,etcd2=100000";
+# "x<scale>" entries are multiples of WAL_DELAY_US. Needs a charybdefs per slow node (CHARYB_PORTS)
+FAULT_TOPOLOGY="${FAULT_TOPOLOGY:-}"
+if [[ -n "$FAULT_TOPOLOGY" ]]; then
+  LEADER_TARGET="${LEADER_TARGET:-}"      # roles follow whichever node is leader
+else
+  LEADER_TARGET="${LEADER_TARGET:-etcd2}" # we want etcd2 as leader (the slow WAL)
+fi
 WAL_DELAY_US="${WAL_DELAY_US:-0}"         # e.g. 0, 100000, 300000, 750000
 RESULTS_DIR="${RESULTS_DIR:-results}"
 OUT_PREFIX="${OUT_PREFIX:-etcd_fsdelay}"
@@ -15,11 +23,52 @@ ETCDCTL="${ETCDCTL:-/usr/local/bin/etcdctl}"
 ETCD_CONTAINER="${ETCD_CONTAINER:-etcd0}" # container to exec etcdctl from
 ENDPOINTS="${ENDPOINTS:-http://etcd0:2379,http://etcd1:2379,http://etcd2:2379}"
 PYTHON="${PYTHON:-python3}"
-CHARYB="${CHARYB:-./charyb_fault.py}"
+# helper scripts live next to this script, so it can be run from any directory
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+# Workload driver: "python" = in-process asyncio client (etcd_driver.py, ns timing),
+#                  "shell"  = one docker exec etcdctl per op (10 ms resolution)
+DRIVER="${DRIVER:-python}"
+DRIVER_PY="${DRIVER_PY:-$SCRIPT_DIR/etcd_driver.py}"
+CONCURRENCY="${CONCURRENCY:-1}"
+# Op mix for the python driver (workload.py): ycsb-a..ycsb-f or e.g.
+# "put=20,get=75,range=5,keys=zipfian,keyspace=100000"; empty = sequential PUTs
+WORKLOAD="${WORKLOAD:-}"
+# Closed-loop concurrency ramp instead of OPS x CONCURRENCY (ramp.py), e.g. "1..512";
+# writes ramp.csv and reports the saturation knee / max sustainable throughput
+RAMP="${RAMP:-}"
+# Adaptive run length for the python driver (converge.py), e.g. "p99=5%,tput=5":
+# OPS becomes the budget, the run stops once the rule holds (convergence.csv)
+UNTIL="${UNTIL:-}"
+# Interval widths (s) for the per-interval CSVs; 1 s is always written (aggregate.py)
+AGG_WIDTHS="${AGG_WIDTHS:-1}"
+# Client URLs of etcd0..2 as published on the host (docker-compose-etcd.yml ports)
+HOST_ENDPOINTS="${HOST_ENDPOINTS:-http://127.0.0.1:23790,http://127.0.0.1:23791,http://127.0.0.1:23792}"
+CHARYB="${CHARYB:-$SCRIPT_DIR/charyb_fault.py}"
+TIMELINE="${TIMELINE:-$SCRIPT_DIR/fault_timeline.py}"
+# Raft status (leader/term/indexes) of every member sampled during the workload
+# into <run_dir>/raft_status.csv (raft_monitor.py); 0 = off
+RAFT_MONITOR="${RAFT_MONITOR:-$SCRIPT_DIR/raft_monitor.py}"
+RAFT_INTERVAL="${RAFT_INTERVAL:-0.2}"
+# Host disk/CPU/IO-pressure counters and charybdefs + etcd container process stats
+# sampled at SYSMON_HZ into <run_dir>/sysmon.bin (sysmon.py); 0 = off
+SYSMON="${SYSMON:-$SCRIPT_DIR/sysmon.py}"
+SYSMON_HZ="${SYSMON_HZ:-20}"
+# Every run dir gets a run.json manifest, indexed into this SQLite catalog (catalog.py)
+CATALOG="${CATALOG:-$SCRIPT_DIR/catalog.py}"
+CATALOG_DB="${CATALOG_DB:-${RESULTS_DIR}/catalog.sqlite}"
+# DRIVER=shell: percentiles + latency.hlog from the per-op CSV (hdr_hist.py)
+HDR_HIST="${HDR_HIST:-$SCRIPT_DIR/hdr_hist.py}"
+# DRIVER=shell: per-second / AGG_WIDTHS CSVs from the per-op CSV
+AGGREGATE="${AGGREGATE:-$SCRIPT_DIR/aggregate.py}"
+# MODE=timeline: fault_timeline.py schedule args, e.g. "step --at 20 --delay-us 100000 --until 60"
+FAULT_TIMELINE="${FAULT_TIMELINE:-}"
 
 # charybdefs control (your daemon listens here)
 CHARYB_HOST="${CHARYB_HOST:-127.0.0.1}"
 CHARYB_PORT="${CHARYB_PORT:-9090}"
+# charybdefs per slow node for FAULT_TOPOLOGY: node=port or node=host:port, comma separated
+CHARYB_PORTS="${CHARYB_PORTS:-etcd2=${CHARYB_PORT}}"
+TOPOLOGY="${TOPOLOGY:-$SCRIPT_DIR/topology.py}"
 
 # Methods and regex to hit etcd WAL on the slow node (matches your working setup)
 WAL_METHODS="${WAL_METHODS:-open,create,write,write_buf,fsync,fdatasync,fsyncdir,flush}"
@@ -33,7 +82,12 @@ mkdir -p "$RESULTS_DIR"
 echo "Target leader   : ${LEADER_TARGET:-'(current)'}"
 echo "Mode            : $MODE"
 echo "Ops             : $OPS"
+[[ -n "$WORKLOAD" ]] && echo "Workload        : $WORKLOAD"
+[[ -n "$RAMP" ]] && echo "Ramp            : $RAMP"
+[[ -n "$UNTIL" ]] && echo "Until           : $UNTIL (budget $OPS ops)"
 [[ "$MODE" == "delay" ]] && echo "WAL delay (us)  : $WAL_DELAY_US"
+[[ -n "$FAULT_TOPOLOGY" ]] && echo "Fault topology  : $FAULT_TOPOLOGY ($CHARYB_PORTS)"
+[[ "$MODE" == "timeline" ]] && echo "Fault timeline  : $FAULT_TIMELINE"
 echo "Endpoints       : $ENDPOINTS"
 echo
 
@@ -55,6 +109,14 @@ name_to_endpoint() {
   esac
 }
 
+name_to_host_endpoint() {
+  local idx="${1#etcd}"
+  local eps
+  IFS=',' read -r -a eps <<< "$HOST_ENDPOINTS"
+  [[ "$idx" =~ ^[0-9]+$ && -n "${eps[$idx]:-}" ]] || { echo ""; return 1; }
+  echo "${eps[$idx]}"
+}
+
 # Parse leader from *table* output (robust; no JSON)
 get_leader_name_from_table() {
   docker exec "$ETCD_CONTAINER" "$ETCDCTL" --endpoints="$ENDPOINTS" endpoint status -w table \
@@ -120,7 +182,10 @@ ensure_leader_target() {
 }
 
 inject_or_clear() {
-  if [[ "$MODE" == "baseline" ]]; then
+  if [[ -n "$FAULT_TOPOLOGY" ]]; then
+    inject_or_clear_topology; return
+  fi
+  if [[ "$MODE" == "baseline" || "$MODE" == "timeline" ]]; then
     echo "Charybdefs: clear faults"
     "$PYTHON" "$CHARYB" clear --host "$CHARYB_HOST" --port "$CHARYB_PORT"
   else
@@ -134,8 +199,33 @@ inject_or_clear() {
   fi
 }
 
+# All slow nodes at once (topology.py applies every node's plan concurrently);
+# what was applied goes to fault_topology.json in the run dir
+topo_record="${RESULTS_DIR}/.fault_topology.json"
+inject_or_clear_topology() {
+  rm -f "$topo_record"
+  if [[ "$MODE" == "delay" ]]; then
+    echo "Charybdefs: topology $FAULT_TOPOLOGY"
+    "$PYTHON" "$TOPOLOGY" apply "$FAULT_TOPOLOGY" --charyb "$CHARYB_PORTS" --host "$CHARYB_HOST" \
+      --endpoints "$HOST_ENDPOINTS" --delay-us "$WAL_DELAY_US" \
+      --methods "$WAL_METHODS" --regex "$WAL_REGEX" --record "$topo_record"
+  else
+    echo "Charybdefs: clear faults on all slow nodes"
+    "$PYTHON" "$TOPOLOGY" clear --charyb "$CHARYB_PORTS" --host "$CHARYB_HOST"
+  fi
+}
+
+clear_faults() {
+  if [[ -n "$FAULT_TOPOLOGY" ]]; then
+    "$PYTHON" "$TOPOLOGY" clear --charyb "$CHARYB_PORTS" --host "$CHARYB_HOST"
+  else
+    "$PYTHON" "$CHARYB" clear --host "$CHARYB_HOST" --port "$CHARYB_PORT"
+  fi
+}
+
 verify_delay() {
   [[ "$VERIFY_DELAY" != "1" || "$MODE" != "delay" ]] && return 0
+  [[ -n "$FAULT_TOPOLOGY" ]] && return 0   # per-node delays: see fault_topology.json
   # host-side quick check on etcd2's WAL path (your slow FUSE mount)
   "$PYTHON" - <<PY
 import os,time
@@ -153,26 +243,113 @@ run_workload() {
   leader_ep="$(name_to_endpoint "$leader_name")"
 
   ts="$(date +%Y%m%d_%H%M%S)"
-  label="${OUT_PREFIX}_${MODE}_${leader_name}_$(printf '%dus' "$WAL_DELAY_US")"
+  if [[ "$MODE" == "timeline" ]]; then
+    label="${OUT_PREFIX}_${MODE}_${leader_name}"
+  else
+    label="${OUT_PREFIX}_${MODE}_${leader_name}_$(printf '%dus' "$WAL_DELAY_US")"
+  fi
   run_dir="${RESULTS_DIR}/${ts}_${label}"
   mkdir -p "$run_dir"
+  [[ -f "$topo_record" ]] && mv "$topo_record" "${run_dir}/fault_topology.json"
 
   raw_csv="${run_dir}/per_op_latency.csv"
   thr_csv="${run_dir}/throughput_per_sec.csv"
   lat_csv="${run_dir}/latency_per_sec.csv"
 
-  : > "$raw_csv"; echo "op,seconds" >> "$raw_csv"
+  tl_pid=""
+  if [[ "$MODE" == "timeline" ]]; then
+    [[ -z "$FAULT_TIMELINE" ]] && { echo "ERROR: MODE=timeline needs FAULT_TIMELINE"; exit 1; }
+    # shellcheck disable=SC2086
+    "$PYTHON" "$TIMELINE" --host "$CHARYB_HOST" --port "$CHARYB_PORT" --run-dir "$run_dir" \
+      --methods "$WAL_METHODS" --regex "$WAL_REGEX" --hold $FAULT_TIMELINE &
+    tl_pid=$!
+  fi
+
+  rm_pid=""
+  if [[ "$RAFT_INTERVAL" != "0" ]]; then
+    "$PYTHON" "$RAFT_MONITOR" run --endpoints "$HOST_ENDPOINTS" --run-dir "$run_dir" \
+      --interval "$RAFT_INTERVAL" &
+    rm_pid=$!
+  fi
+
+  sm_pid=""
+  if [[ "$SYSMON_HZ" != "0" ]]; then
+    "$PYTHON" "$SYSMON" run --run-dir "$run_dir" --hz "$SYSMON_HZ" --comm charybdefs \
+      --container etcd0,etcd1,etcd2 &
+    sm_pid=$!
+  fi
+
+  run_params=(--param "mode=$MODE" --param "leader=$leader_name" --param "delay_us=$WAL_DELAY_US"
+              --param "methods=$WAL_METHODS" --param "regex=$WAL_REGEX" --param "driver=$DRIVER"
+              --param "prefix=$OUT_PREFIX")
+  [[ "$MODE" == "timeline" ]] && run_params+=(--param "timeline=$FAULT_TIMELINE")
+  [[ -n "$FAULT_TOPOLOGY" ]] && run_params+=(--param "topology=$FAULT_TOPOLOGY")
+  # the driver exits 1 when no op succeeded (a stalled cluster): keep going so the
+  # background samplers are stopped and the fault is cleared, then exit with its status
+  if [[ "$DRIVER" == "python" ]]; then
+    "$PYTHON" "$DRIVER_PY" --endpoint "$(name_to_host_endpoint "$leader_name")" \
+      --ops "$OPS" --concurrency "$CONCURRENCY" --agg-widths "$AGG_WIDTHS" --out-dir "$run_dir" \
+      ${WORKLOAD:+--workload "$WORKLOAD"} ${RAMP:+--ramp "$RAMP"} \
+      ${UNTIL:+--until "$UNTIL"} "${run_params[@]}" || workload_rc=$?
+  else
+    run_shell_loop
+    "$PYTHON" "$CATALOG" manifest "$run_dir" --kind etcd --summarize "${run_params[@]}" \
+      --param "ops=$OPS" --param "concurrency=1" || true
+  fi
+  stop_background
+  [[ "$workload_rc" != "0" ]] && echo "WARNING: workload driver exited with status $workload_rc" >&2
+
+  echo "Saved throughput/s CSV   : $thr_csv"
+  echo "Saved latency/s CSV      : $lat_csv"
+  "$PYTHON" "$CATALOG" --db "$CATALOG_DB" index "$RESULTS_DIR" || true
+  echo ">>> END workload"
+}
+
+# Stop the fault timeline (--hold: it clears its fault on SIGTERM), the raft
+# monitor and sysmon so their files are finalized; also run from the EXIT trap.
+stop_background() {
+  if [[ -n "$tl_pid" ]]; then
+    kill -TERM "$tl_pid" 2>/dev/null || true
+    wait "$tl_pid" || echo "WARNING: fault timeline failed, faults were not (all) applied (see [timeline] above)" >&2
+    echo "Saved fault events CSV   : ${run_dir}/fault_events.csv"
+    tl_pid=""
+  fi
+  if [[ -n "$rm_pid" ]]; then
+    kill -TERM "$rm_pid" 2>/dev/null || true
+    wait "$rm_pid" || true
+    "$PYTHON" "$RAFT_MONITOR" show "$run_dir" || true
+    rm_pid=""
+  fi
+  if [[ -n "$sm_pid" ]]; then
+    kill -TERM "$sm_pid" 2>/dev/null || true
+    wait "$sm_pid" || true
+    echo "Saved system metrics     : ${run_dir}/sysmon.bin"
+    sm_pid=""
+  fi
+}
+
+on_exit() {
+  stop_background
+  if [[ "$faults_applied" == "1" ]]; then
+    echo "Aborted: clearing the injected fault" >&2
+    clear_faults || true
+  fi
+}
+
+run_shell_loop() {
+  : > "$raw_csv"; echo "op,seconds,start_unix_ns" >> "$raw_csv"
 
   echo ">>> Workload: ${OPS} x PUT to ${leader_name} (${leader_ep})"
   start_ns=$(date +%s%N)
   ok=0; fail=0
   for i in $(seq 1 "$OPS"); do
     tf="$run_dir/t.$$"
+    t_start=$(date +%s%N)
     if /usr/bin/time -f '%e' -o "$tf" \
         docker exec "$ETCD_CONTAINER" "$ETCDCTL" --endpoints="$leader_ep" put "k$i" "v$i" >/dev/null 2>&1; then
-      ok=$((ok+1)); printf '%d,%s\n' "$i" "$(cat "$tf")" >> "$raw_csv"
+      ok=$((ok+1)); printf '%d,%s,%s\n' "$i" "$(cat "$tf")" "$t_start" >> "$raw_csv"
     else
-      fail=$((fail+1)); printf '%d,NaN\n' "$i" >> "$raw_csv"
+      fail=$((fail+1)); printf '%d,NaN,%s\n' "$i" "$t_start" >> "$raw_csv"
     fi
     rm -f "$tf"
   done
@@ -180,64 +357,31 @@ run_workload() {
   wall_s=$(awk -v s="$start_ns" -v e="$end_ns" 'BEGIN{printf "%.3f", (e-s)/1e9}')
 
   thr=$(awk -v ops="$ok" -v t="$wall_s" 'BEGIN{ if (t>0) printf "%.2f", ops/t; else print "0.00"}')
-  p50=$(awk -F, 'NR>1&&$2!="NaN"{print $2}' "$raw_csv" | sort -n | awk '{a[NR]=$1} END{if(NR){i=int(0.50*NR+0.5); if(i<1)i=1; print a[i]} else print "NaN"}')
-  p95=$(awk -F, 'NR>1&&$2!="NaN"{print $2}' "$raw_csv" | sort -n | awk '{a[NR]=$1} END{if(NR){i=int(0.95*NR+0.5); if(i<1)i=1; print a[i]} else print "NaN"}')
-  p99=$(awk -F, 'NR>1&&$2!="NaN"{print $2}' "$raw_csv" | sort -n | awk '{a[NR]=$1} END{if(NR){i=int(0.99*NR+0.5); if(i<1)i=1; print a[i]} else print "NaN"}')
 
   echo
   echo "Summary:"
   echo "  ok=$ok fail=$fail  wall=${wall_s}s  throughput=${thr} ops/s"
-  echo "  p50=${p50}s  p95=${p95}s  p99=${p99}s"
+  # percentiles from an HDR histogram (one pass, no sort); also saved as latency.hlog
+  "$PYTHON" "$HDR_HIST" from-csv "$raw_csv" --column seconds --unit s \
+    --percentiles 50,95,99 -o "${run_dir}/latency.hlog"
   echo "Saved per-op latency CSV : $raw_csv"
 
-  # Aggregate per second into two more CSVs
-  "$PYTHON" - "$raw_csv" "$thr_csv" "$lat_csv" <<'PY'
-import sys, csv, math
-from statistics import mean
-
-raw, thr_out, lat_out = sys.argv[1:4]
-rows = []
-with open(raw, newline='') as f:
-    rd = csv.DictReader(f)
-    for r in rd:
-        try:
-            s = float(r['seconds'])
-            if not (s == s):  # skip NaN
-                continue
-        except Exception:
-            continue
-        rows.append(s)
-
-bins = {}  # sec bucket -> latencies
-elapsed = 0.0
-for s in rows:
-    elapsed += s
-    sec = int(math.floor(elapsed))
-    bins.setdefault(sec, []).append(s)
-
-with open(thr_out, 'w', newline='') as f:
-    w=csv.writer(f); w.writerow(['sec','ops'])
-    for sec in sorted(bins):
-        w.writerow([sec, len(bins[sec])])
-
-with open(lat_out, 'w', newline='') as f:
-    w=csv.writer(f); w.writerow(['sec','avg_latency_s'])
-    for sec in sorted(bins):
-        b = bins[sec]
-        w.writerow([sec, mean(b) if b else 'NaN'])
-PY
-
-  echo "Saved throughput/s CSV   : $thr_csv"
-  echo "Saved latency/s CSV      : $lat_csv"
-  echo ">>> END workload"
+  # Per-second (and AGG_WIDTHS) CSVs, binned by each op's real start time
+  "$PYTHON" "$AGGREGATE" "$raw_csv" --widths "$AGG_WIDTHS" --out-dir "$run_dir" >/dev/null
 }
 
 # ===== MAIN ==============================================================
+tl_pid=""; rm_pid=""; sm_pid=""; run_dir=""
+faults_applied=0; workload_rc=0
+trap on_exit EXIT
 echo "== Cluster =="
 print_health; echo
 ensure_leader_target "$LEADER_TARGET"
 print_health; echo
+[[ "$MODE" == "delay" ]] && faults_applied=1
 inject_or_clear
 verify_delay
 run_workload
-[[ "$MODE" == "delay" ]] && "$PYTHON" "$CHARYB" clear --host "$CHARYB_HOST" --port "$CHARYB_PORT" || true
+[[ "$MODE" == "delay" ]] && clear_faults || true
+faults_applied=0
+exit "$workload_rc"
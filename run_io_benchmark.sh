@@ -17,17 +17,53 @@ MOUNT_POINT="/mnt/slowfs"
 REAL_DATA_DIR="/tmp/io_test_data_real"
 DOCKER_COMPOSE_FILE="docker-compose-simple.yml"
 FAULT_INJECTOR_SCRIPT="charyb_fault.py"
+FAULT_TIMELINE_SCRIPT="fault_timeline.py"
+# Optional: instead of the fixed baseline->fault switch, run 2*<operations_count> ops
+# while fault_timeline.py plays this schedule, e.g. "square --period 20 --delay-us 100000 --duration 120"
+FAULT_TIMELINE="${FAULT_TIMELINE:-}"
+# Optional open-loop mode: issue ops at RATE ops/s (ARRIVAL=constant|poisson) with io_bench.py
+# directly on the host-side mount instead of one `docker exec dd` per op
+RATE="${RATE:-}"
+ARRIVAL="${ARRIVAL:-constant}"
+MAX_OUTSTANDING="${MAX_OUTSTANDING:-32}"
+IO_BENCH_SCRIPT="io_bench.py"
+# Closed-loop ops: "agent" = io_probe_agent.py started once in the container (ns timing, file
+# kept open), "dd" = one `docker exec dd conv=fsync` per op timed with `date` (old behaviour)
+PROBE="${PROBE:-agent}"
+PROBE_SYNC="${PROBE_SYNC:-fsync}"           # fsync | fdatasync | odsync | osync | none
+PROBE_PREALLOC="${PROBE_PREALLOC:-0}"       # e.g. 64M (preallocated before timing)
+# Adaptive run length for io_bench.py (converge.py), e.g. "p99=5%,tput=5": <operations_count>
+# becomes the budget of each phase (agent and open-loop modes; not PROBE=dd)
+UNTIL="${UNTIL:-}"
+if [ -n "$UNTIL" ] && [ -z "$RATE" ] && [ "$PROBE" != "agent" ]; then
+  echo "[ERROR] UNTIL needs PROBE=agent or RATE (the dd loop is not checked while it runs)"; exit 1
+fi
+if [ -n "$UNTIL" ] && [ -n "$FAULT_TIMELINE" ]; then
+  echo "[ERROR] UNTIL would stop the run before FAULT_TIMELINE has played; use one of them"; exit 1
+fi
+export IO_PROBE_DIR="${IO_PROBE_DIR:-/tmp/io_probe}"   # host side of the agent's socket dir
+# Host disk/CPU/IO-pressure and charybdefs/container counters during the run (sysmon.py); 0 = off
+SYSMON_HZ="${SYSMON_HZ:-20}"
+CATALOG_DB="${CATALOG_DB:-results/catalog.sqlite}"   # run.json of this run is indexed here (catalog.py)
 OUTDIR="io_bench_results/$(date +%Y%m%d_%H%M%S)_${LABEL}"
 mkdir -p "$OUTDIR"
 RAW_LOG="$OUTDIR/latency_data.csv"
 
+SYSMON_PID=""
+
 # --- Cleanup function ---
 cleanup() {
   echo -e "\n[CLEANUP] Cleaning up all processes and mounts..."
+  if [ -n "$SYSMON_PID" ]; then
+    kill -TERM "$SYSMON_PID" 2>/dev/null || true
+    wait "$SYSMON_PID" 2>/dev/null || true
+    SYSMON_PID=""
+  fi
   docker compose -f "$DOCKER_COMPOSE_FILE" down --volumes --remove-orphans > /dev/null 2>&1 || true
   sudo pkill -f charybdefs || true
   sleep 2
   sudo umount -l "$MOUNT_POINT" > /dev/null 2>&1 || true
+  sudo rm -f "$IO_PROBE_DIR/agent.sock"
   sudo rm -rf "${REAL_DATA_DIR:?}"/*
   sudo rm -rf "${MOUNT_POINT:?}"/*
   echo "[CLEANUP] Done."
@@ -53,67 +89,122 @@ echo "[SETUP] CharybdeFS mounted successfully."
 
 echo "[SETUP] Starting benchmark container..."
 docker compose -f "$DOCKER_COMPOSE_FILE" up -d
-docker exec benchmark-runner apt-get -qq update && docker exec benchmark-runner apt-get -qq install -y coreutils > /dev/null
+docker exec benchmark-runner apt-get -qq update && docker exec benchmark-runner apt-get -qq install -y coreutils python3-minimal > /dev/null
 echo "[SETUP] Container ready."
 
+if [ "$PROBE" = "agent" ]; then
+  echo "[SETUP] Starting the I/O probe agent in the container..."
+  mkdir -p "$IO_PROBE_DIR"
+  docker exec -d benchmark-runner python3 /probe/io_probe_agent.py serve --socket /run/io_probe/agent.sock
+  for _ in $(seq 1 50); do [ -S "$IO_PROBE_DIR/agent.sock" ] && break; sleep 0.1; done
+  [ -S "$IO_PROBE_DIR/agent.sock" ] || { echo "[ERROR] I/O probe agent did not start"; exit 1; }
+fi
+
+if [ "$SYSMON_HZ" != "0" ]; then
+  python3 sysmon.py run --run-dir "$OUTDIR" --hz "$SYSMON_HZ" --comm charybdefs --container benchmark-runner &
+  SYSMON_PID=$!
+fi
+
 # --- Benchmark ---
 echo "[INFO] Label       : $LABEL"
 echo "[INFO] Delay       : ${DELAY_MS}ms"
 echo "[INFO] Total Ops   : $TOTAL_OPS"
+[ -n "$UNTIL" ] && echo "[INFO] Until       : $UNTIL (budget per phase)"
 echo "[INFO] Output File : $RAW_LOG"
 
-# Write CSV header
-echo "timestamp_ms,latency_ms,phase" > "$RAW_LOG"
+# Write CSV header (io_bench.py writes its own, wider one in open-loop mode)
+[ -z "$RATE" ] && echo "timestamp_ms,latency_ms,phase" > "$RAW_LOG"
 
-# --- PHASE 1: BASELINE (NO FAULT) ---
-echo -e "\n--- PHASE 1: Running Baseline Benchmark (No Fault) ---"
-python3 "$FAULT_INJECTOR_SCRIPT" --clear > /dev/null
-for (( i=1; i<=TOTAL_OPS; i++ )); do
+run_op() {
+  local phase=$1
   START_MS=$(date +%s%3N)
   docker exec benchmark-runner dd if=/dev/zero of=/data/test.dat bs=4k count=1 conv=fsync >/dev/null 2>&1
   END_MS=$(date +%s%3N)
   LATENCY=$((END_MS - START_MS))
-  echo "$START_MS,$LATENCY,baseline" >> "$RAW_LOG"
-done
+  echo "$START_MS,$LATENCY,$phase" >> "$RAW_LOG"
+}
+
+write_manifest() {
+  local probe="$PROBE"
+  [ -n "$RATE" ] && probe="open-loop"
+  python3 catalog.py manifest "$OUTDIR" --kind io --summarize --param "mode=$1" --param "delay_us=$((DELAY_MS * 1000))" \
+    --param "ops=$TOTAL_OPS" --param "probe=$probe" --param "sync=$PROBE_SYNC" \
+    ${RATE:+--param "rate=$RATE" --param "arrival=$ARRIVAL"} ${FAULT_TIMELINE:+--param "timeline=$FAULT_TIMELINE"} \
+    ${UNTIL:+--param "until=$UNTIL"} || true
+  python3 catalog.py --db "$CATALOG_DB" index io_bench_results || true
+}
+
+run_phase() {
+  local phase=$1 count=${2:-$TOTAL_OPS}
+  if [ -n "$RATE" ]; then
+    python3 "$IO_BENCH_SCRIPT" --file "$MOUNT_POINT/test.dat" --ops "$count" --phase "$phase" \
+      --out "$RAW_LOG" --rate "$RATE" --arrival "$ARRIVAL" --max-outstanding "$MAX_OUTSTANDING" \
+      ${UNTIL:+--until "$UNTIL"}
+  elif [ "$PROBE" = "agent" ]; then
+    python3 "$IO_BENCH_SCRIPT" --agent "unix:$IO_PROBE_DIR/agent.sock" --file /data/test.dat \
+      --ops "$count" --phase "$phase" --out "$RAW_LOG" --sync "$PROBE_SYNC" --prealloc "$PROBE_PREALLOC" \
+      ${UNTIL:+--until "$UNTIL"}
+  else
+    for (( i=1; i<=count; i++ )); do
+      run_op "$phase"
+    done
+  fi
+}
+
+if [ -n "$FAULT_TIMELINE" ]; then
+  # --- SINGLE RUN WITH A FAULT TIMELINE ---
+  echo -e "\n--- Running Benchmark under fault timeline: $FAULT_TIMELINE ---"
+  python3 "$FAULT_INJECTOR_SCRIPT" --clear > /dev/null
+  # shellcheck disable=SC2086
+  python3 "$FAULT_TIMELINE_SCRIPT" --run-dir "$OUTDIR" --methods fsync,fdatasync,fsyncdir --regex "" \
+    --hold $FAULT_TIMELINE &
+  TL_PID=$!
+  run_phase timeline $((2 * TOTAL_OPS))
+  kill -TERM "$TL_PID" 2>/dev/null || true
+  wait "$TL_PID" || true
+  write_manifest timeline
+  echo -e "\n[SUCCESS] Experiment complete. Raw data: $RAW_LOG, fault transitions: $OUTDIR/fault_events.csv"
+  exit 0
+fi
+
+# --- PHASE 1: BASELINE (NO FAULT) ---
+echo -e "\n--- PHASE 1: Running Baseline Benchmark (No Fault) ---"
+python3 "$FAULT_INJECTOR_SCRIPT" --clear > /dev/null
+run_phase baseline
 
 # --- PHASE 2: WITH FAULT ---
 echo -e "\n--- PHASE 2: Injecting ${DELAY_MS}ms sync-delay Fault and Continuing Benchmark ---"
 DELAY_US=$((DELAY_MS * 1000))
 python3 "$FAULT_INJECTOR_SCRIPT" --sync-delay "$DELAY_US" > /dev/null
-for (( i=1; i<=TOTAL_OPS; i++ )); do
-  START_MS=$(date +%s%3N)
-  docker exec benchmark-runner dd if=/dev/zero of=/data/test.dat bs=4k count=1 conv=fsync >/dev/null 2>&1
-  END_MS=$(date +%s%3N)
-  LATENCY=$((END_MS - START_MS))
-  echo "$START_MS,$LATENCY,fault" >> "$RAW_LOG"
-done
+run_phase fault
 
 # --- Final analysis ---
 analyze_phase() {
     local phase=$1
     local data_file=$2
 
-    # Extract latency values for the given phase
-    LATENCIES=$(grep ",${phase}$" "$data_file" | cut -d',' -f2)
+    # Count and total latency of the phase in one pass
+    read -r COUNT TOTAL_TIME < <(awk -F, -v p="$phase" '$NF==p {n++; s+=$2} END {print n+0, s+0}' "$data_file")
 
-    if [ -z "$LATENCIES" ]; then
+    if [ "$COUNT" -eq 0 ]; then
         echo "No data for phase '$phase'."
         return
     fi
 
-    SORTED_LAT=$(echo "$LATENCIES" | sort -n)
-    COUNT=$(echo "$SORTED_LAT" | wc -l)
-    TOTAL_TIME=$(echo "$LATENCIES" | awk '{s+=$1} END {print s}')
     THROUGHPUT=$(awk -v count="$COUNT" -v time="$TOTAL_TIME" 'BEGIN {if (time > 0) printf "%.2f", count / (time / 1000); else print "N/A"}')
 
-    P50=$(echo "$SORTED_LAT" | awk -v c=$COUNT 'NR==int(c*0.50+0.5)')
-    P99=$(echo "$SORTED_LAT" | awk -v c=$COUNT 'NR==int(c*0.99+0.5)')
-
     echo "  - Throughput : $THROUGHPUT ops/sec"
-    echo "  - Latency p50: $P50 ms"
-    echo "  - Latency p99: $P99 ms"
+    # p50/p99 from an HDR histogram instead of a full sort
+    echo "  - Latency   :$(python3 hdr_hist.py from-csv "$data_file" --column latency_ms --unit ms \
+        --where "phase=$phase" --percentiles 50,99)"
 }
 
+if [ -n "$SYSMON_PID" ]; then
+  kill -TERM "$SYSMON_PID" 2>/dev/null || true
+  wait "$SYSMON_PID" || true
+  SYSMON_PID=""
+fi
+
 echo -e "\n\n================================================="
 echo "           EXPERIMENT RESULT SUMMARY"
 echo "================================================="
@@ -121,5 +212,12 @@ echo -e "\n### BASELINE RESULTS (NO FAULT) ###"
 analyze_phase "baseline" "$RAW_LOG"
 echo -e "\n### RESULTS WITH ${DELAY_MS}MS SYNC DELAY ###"
 analyze_phase "fault" "$RAW_LOG"
+echo -e "\n### BASELINE vs FAULT (bootstrap 95% CI) ###"
+python3 compare.py "$RAW_LOG" --by-phase --out "$OUTDIR/compare.csv" || true
+if [ -f "$OUTDIR/sysmon.bin" ]; then
+  echo -e "\n### SYSTEM METRICS vs P99 ###"
+  python3 sysmon.py join "$RAW_LOG" --out "$OUTDIR/sysmon_join.csv" --top 8 || true
+fi
+write_manifest delay
 echo -e "\n================================================="
 echo -e "\n[SUCCESS] Experiment complete. Raw data saved to: $RAW_LOG"
@@ -0,0 +1,717 @@
+#!/usr/bin/env python3
+"""
+Resumable delay sweep over a warm etcd cluster.
+
+Replaces the README's `for d in ...; do ./run_etcd_fsdelay.sh delay; done`:
+one process keeps the etcd connections and the charybdefs RPC connection
+open for the whole sweep, checks (and only if needed re-forces) the leader
+before each point, and measures points back to back. Finished runs are
+handed to a process pool for aggregation (aggregate.py) and plotting while
+the next point is measured.
+
+Progress is kept in <sweep dir>/manifest.json (rewritten atomically after
+every state change). Running the same spec again resumes: measured points
+that were not analysed yet are re-queued for analysis, and pending or failed
+points are measured. A point interrupted mid-measurement is measured again.
+Each analysed point also gets a run.json (catalog.py) with its sweep
+parameters and summary, and the sweep is indexed into
+<results_dir>/catalog.sqlite at the end.
+
+With --instances (clusters/instances.json from cluster.py) the points are
+spread over K independent etcd+charybdefs instances: each instance is driven
+by its own process holding that instance's warm connections, and takes the
+next pending point as soon as it is free. Without it the spec's endpoints,
+charyb_host/charyb_port and verify_path form the single instance.
+
+Spec (JSON; only "delays_us" is required):
+  {
+    "name": "paper", "delays_us": [1000, 5000, 10000, 25000, 50000, 75000, 100000],
+    "baseline": true, "repetitions": 5, "ops": 1000,
+    "methods": "open,create,write,write_buf,fsync,fdatasync,fsyncdir,flush",
+    "regex": "(^|.*/)member/wal/.*", "prob_permil": 1000,
+    "leader_target": "etcd2", "endpoints": ["http://127.0.0.1:23790", "...23791", "...23792"],
+    "concurrency": 1, "rate": null, "arrival": "constant", "max_outstanding": 256,
+    "charyb_host": "127.0.0.1", "charyb_port": 9090, "inject": true,
+    "settle_s": 0.5, "agg_widths": [1], "plots": true, "workers": 2, "raft_interval_s": 0.2,
+    "verify_path": "/mnt/slowfs/etcd2/member/wal/_probe",
+    "workload": "ycsb-b", "ramp": null, "topology": null, "charyb_ports": null,
+    "until": null
+  }
+
+"workload" (optional) is an etcd_driver --workload mix (workload.py): a preset,
+an inline "put=20,get=80,keys=zipfian" list or a JSON object; without it every
+point is the sequential PUT loop. Mixed points also get per_op_type.csv and
+per-type p50/p99 in their summary.
+
+"ramp" (optional) replaces the fixed-size run of every point by a closed-loop
+concurrency ramp (ramp.py): concurrency steps ("1..512", a list) or an object
+of RampConfig fields ({"steps": "1..256", "window_s": 2, "tol": 0.05}). Each
+point then gets ramp.csv, saturation.png and knee_concurrency /
+max_sustainable_tput in its summary; the sweep adds sweep_saturation.png.
+
+"topology" (optional) spreads the fault over several nodes (topology.py): a
+preset ("slow-follower", "slow-followers", ...), an inline list or an object
+mapping nodes / roles to a delay; "x<scale>" entries are multiples of the
+point's delay_us, so the sweep still walks the delays. Roles are resolved
+from the leader at every point and all nodes get their fault at the same
+moment; each point records fault_topology.json. Every node that can be hit
+needs its own charybdefs: "charyb_ports" ({"etcd0": 9092, ...}) for the
+single instance, or cluster.py plan --slow-nodes. Set "leader_target" to null
+to let the roles follow whichever node is leader.
+
+"until" (optional) makes the run length adaptive (converge.py): a stop rule
+("p99=5%,tput=5", or an object of StopRule settings); "ops" is then the
+budget of every point. Each point gets convergence.csv, its p50/p99/p99.9
+exclude the detected warmup, and the summary has converged, warmup_s and
+ops_to_converge, so points of different length stay comparable.
+
+    python3 sweep.py sweep_paper.json                 # run or resume
+    python3 sweep.py sweep_paper.json --status
+    python3 sweep.py sweep_paper.json --restart       # discard progress, start over
+    python3 sweep.py sweep_paper.json --instances clusters/instances.json
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+import aggregate
+import catalog
+import compare
+import converge
+import etcd_driver
+import oprec
+import qsketch
+import raft_monitor
+import ramp
+import render
+import topology
+import workload
+from charyb_fault import CharybClient, FaultSpec, DEFAULT_HOST, DEFAULT_PORT, WAL_REGEX, parse_methods
+from cluster import Instance, default_instance, load_instances
+from converge import StopRule
+from etcd_client import EtcdClient, EtcdError, find_leader
+from hdr_hist import read_log
+from ramp import RampConfig
+from topology import Topology
+
+MANIFEST = "manifest.json"
+DEFAULT_METHODS = "open,create,write,write_buf,fsync,fdatasync,fsyncdir,flush"
+DEFAULT_ENDPOINTS = ["http://127.0.0.1:23790", "http://127.0.0.1:23791", "http://127.0.0.1:23792"]
+# fields that change what is measured; the others (plots, workers, ...) may differ on resume
+MEASURE_FIELDS = ("delays_us", "baseline", "repetitions", "ops", "methods", "regex", "prob_permil",
+                  "leader_target", "concurrency", "rate", "arrival", "max_outstanding", "value_size", "inject")
+SUMMARY_FIELDS = ["key", "rep", "delay_us", "instance", "run_dir", "ok", "fail", "wall_s", "throughput",
+                  "p50_ms", "p99_ms", "p999_ms", "leader_changes", "measure_s", "knee_concurrency",
+                  "max_sustainable_tput", "converged", "warmup_s", "ops_to_converge"]
+
+
+@dataclass
+class SweepSpec:
+    delays_us: List[int]
+    name: str = "sweep"
+    baseline: bool = True
+    repetitions: int = 1
+    ops: int = 1000
+    methods: str = DEFAULT_METHODS
+    regex: str = WAL_REGEX
+    prob_permil: int = 1000
+    leader_target: Optional[str] = "etcd2"
+    endpoints: List[str] = field(default_factory=lambda: list(DEFAULT_ENDPOINTS))
+    concurrency: int = 1
+    rate: Optional[float] = None
+    arrival: str = "constant"
+    max_outstanding: int = 256
+    value_size: int = 8
+    charyb_host: str = DEFAULT_HOST
+    charyb_port: int = DEFAULT_PORT
+    inject: bool = True
+    settle_s: float = 0.5
+    agg_widths: List[float] = field(default_factory=lambda: [1.0])
+    plots: bool = True
+    workers: int = 2
+    verify_path: Optional[str] = None
+    results_dir: str = "results"
+    raft_interval_s: float = 0.2          # raft status sampling of all members during a point, 0 = off
+    workload: Optional[object] = None     # etcd_driver --workload: preset / inline mix str, or JSON object
+    ramp: Optional[object] = None         # concurrency ramp per point: steps, or ramp.RampConfig fields
+    topology: Optional[object] = None     # per-node faults (topology.py): preset / inline str, or JSON object
+    charyb_ports: Optional[dict] = None   # {node: charybdefs port} of the single instance (default: etcd2 only)
+    until: Optional[object] = None        # adaptive run length (converge.py): inline rule str, or JSON object
+
+    @classmethod
+    def load(cls, path: str) -> "SweepSpec":
+        with open(path) as f:
+            d = json.load(f)
+        if isinstance(d.get("methods"), list):
+            d["methods"] = ",".join(d["methods"])
+        spec = cls(**d)
+        if spec.workload:
+            workload_spec(spec)           # fail on a bad mix / ramp before any point runs
+        if spec.ramp:
+            spec.ramp_config()
+            if spec.rate:
+                raise ValueError(f"{path}: a ramp is closed-loop, drop 'rate'")
+        if spec.topology:
+            spec.fault_topology()
+        if spec.until:
+            spec.stop_rule()
+            if spec.ramp:
+                raise ValueError(f"{path}: a ramp sets its own step length, drop 'until'")
+        return spec
+
+    def stop_rule(self) -> Optional[StopRule]:
+        return StopRule.parse(self.until) if self.until else None
+
+    def fault_topology(self) -> Optional[Topology]:
+        return topology.parse_topology(self.topology) if self.topology else None
+
+    def ramp_config(self) -> Optional[RampConfig]:
+        return RampConfig.parse(self.ramp) if self.ramp else None
+
+    def pool_size(self) -> int:
+        """Connections of the warm client: enough for the largest number of in-flight ops."""
+        if self.ramp:
+            return max(self.ramp_config().steps)
+        return self.max_outstanding if self.rate else self.concurrency
+
+    def digest(self) -> str:
+        d = {k: getattr(self, k) for k in MEASURE_FIELDS}
+        for k in ("workload", "ramp", "topology", "until"):    # only when set, so digests of older sweeps do not change
+            if getattr(self, k):
+                d[k] = getattr(self, k)
+        return hashlib.sha1(json.dumps(d, sort_keys=True).encode()).hexdigest()[:12]
+
+    def points(self):
+        """(key, rep, delay_us) in measurement order: repetitions outermost, so drift spreads over delays."""
+        delays = ([0] if self.baseline and 0 not in self.delays_us else []) + list(self.delays_us)
+        leader = self.leader_target or "leader"
+        out = []
+        for rep in range(self.repetitions):
+            for d in delays:
+                mode = "baseline" if d == 0 else "delay"
+                out.append((f"r{rep:02d}_{mode}_{leader}_{int(d)}us", rep, int(d)))
+        return out
+
+    def plan(self, delay_us: int) -> List[FaultSpec]:
+        if delay_us <= 0:
+            return []
+        methods = None if self.methods.strip().lower() == "all" else parse_methods(self.methods)
+        return [FaultSpec(methods, int(delay_us), self.prob_permil, self.regex)]
+
+    def node_plans(self, leader: Optional[str], delay_us: int) -> dict:
+        """{node: plan} of the topology for this point's delay and the current leader."""
+        return self.fault_topology().resolve(leader, delay_us, methods=self.methods, regex=self.regex,
+                                             prob_permil=self.prob_permil)
+
+
+class Manifest:
+    """Per-point state: pending -> measuring -> measured -> done (or failed)."""
+
+    def __init__(self, path: str, data: dict):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def open(cls, sweep_dir: str, spec: SweepSpec, restart: bool = False) -> "Manifest":
+        path = os.path.join(sweep_dir, MANIFEST)
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                data = json.load(f)
+            if data["spec_digest"] != spec.digest():
+                raise SystemExit(f"{path}: spec changed since this sweep started (use --restart or another name)")
+        else:
+            data = {"spec": asdict(spec), "spec_digest": spec.digest(), "created_unix": time.time(), "points": {}}
+        for key, rep, d in spec.points():
+            data["points"].setdefault(key, {"rep": rep, "delay_us": d, "state": "pending"})
+        m = cls(path, data)
+        for p in m.data["points"].values():
+            if p["state"] == "measuring":           # interrupted mid-run: measure again
+                p["state"] = "pending"
+        m.save()
+        return m
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def update(self, key: str, **kw):
+        self.data["points"][key].update(kw)
+        self.save()
+
+    def keys(self, *states):
+        return [k for k, p in self.data["points"].items() if p["state"] in states]
+
+    def counts(self) -> dict:
+        out = {}
+        for p in self.data["points"].values():
+            out[p["state"]] = out.get(p["state"], 0) + 1
+        return out
+
+
+# ===================== analysis (runs in the process pool) =====================
+
+def analyze_point(run_dir: str, widths, plots: bool, params: dict = None, ramp_gain: float = None) -> dict:
+    """
+    Per-interval CSVs from per_op.col, summary numbers from latency.hlog
+    (after the warmup if the point has convergence.csv), knee of ramp.csv
+    if the point was a ramp, run.json for the catalog, optional summary.png
+    (+ saturation.png).
+    """
+    t = oprec.open_ops(os.path.join(run_dir, oprec.DEFAULT_DIR))
+    start, lat, ok = np.asarray(t["start_ns"]), np.asarray(t["latency_ns"]), t["status"] == oprec.STATUS_OK
+    t0 = t.meta.get("t0_unix_ns", int(start.min()) if start.size else 0)
+    aggregate.write_outputs(run_dir, start, lat, ok=ok, t0_ns=t0, widths=widths)
+    hlog = read_log(os.path.join(run_dir, "latency.hlog"))
+    hist = hlog["cumulative"]
+    conv = None
+    if os.path.exists(os.path.join(run_dir, converge.CONVERGE_CSV)):
+        conv = converge.summarize(converge.read_csv(run_dir))
+        hist = converge.post_warmup(hlog, conv["warmup_s"])
+    n_ok = int(ok.sum())
+    wall = (int((start + lat).max()) - t0) / 1e9 if start.size else 0.0
+    p50, p99, p999 = hist.percentiles((50, 99, 99.9)) / 1e6
+    out = {"ok": n_ok, "fail": int(len(t) - n_ok), "wall_s": wall,
+           "throughput": n_ok / wall if wall > 0 else 0.0,
+           "p50_ms": float(p50), "p99_ms": float(p99), "p999_ms": float(p999)}
+    if conv:
+        out.update(conv)
+    qsketch.sketch_for(os.path.join(run_dir, oprec.DEFAULT_DIR))     # per_op.ddsk, for merged CDFs
+    rows = workload.report(os.path.join(run_dir, oprec.DEFAULT_DIR))
+    if len(rows) > 1:
+        workload.write_per_type(run_dir, rows)
+        out.update(workload.summary_fields(rows))
+    steps = None
+    if os.path.exists(os.path.join(run_dir, ramp.RAMP_CSV)):
+        steps = ramp.read_csv(run_dir)
+        out.update(ramp.summarize(steps, ramp_gain if ramp_gain is not None else RampConfig().gain))
+    st = raft_monitor.find_status(run_dir)
+    if st:
+        out["leader_changes"] = len(raft_monitor.leader_changes(raft_monitor.read_status(st)))
+    catalog.write_manifest(run_dir, params, out)
+    if plots:
+        plot_point(run_dir, start, lat, ok, t0)
+        if steps:
+            ramp.plot(run_dir, steps, title=os.path.basename(run_dir))
+    return out
+
+
+def point_params(spec: SweepSpec, p: dict) -> dict:
+    """Manifest parameters of one sweep point."""
+    wl = workload_spec(spec) if spec.workload else None
+    rc = spec.ramp_config()
+    return {"kind": "etcd", "mode": "baseline" if p["delay_us"] == 0 else "delay", "delay_us": p["delay_us"],
+            "leader": spec.leader_target or "leader", "methods": spec.methods, "regex": spec.regex,
+            "prob_permil": spec.prob_permil, "ops": spec.ops, "concurrency": None if rc else spec.concurrency,
+            "ramp": ",".join(map(str, rc.steps)) if rc else None, "rate": spec.rate,
+            "arrival": spec.arrival if spec.rate else None, "value_size": wl.value_size if wl else spec.value_size,
+            "sweep": spec.name, "rep": p["rep"], "instance": p.get("instance", ""),
+            "workload": wl.describe() if wl else None, "keys": wl.keys if wl else None,
+            "topology": spec.fault_topology().describe() if spec.topology else None,
+            "until": spec.stop_rule().describe() if spec.until else None}
+
+
+def workload_text(spec: SweepSpec) -> str:
+    return spec.workload if isinstance(spec.workload, str) else json.dumps(spec.workload)
+
+
+def workload_spec(spec: SweepSpec) -> workload.WorkloadSpec:
+    return workload.parse_spec(workload_text(spec))
+
+
+def plot_point(run_dir, start, lat, ok, t0):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    agg = aggregate.aggregate(start, lat, 1.0, t0, ok)
+    fig, (a1, a2, a3) = plt.subplots(1, 3, figsize=(16, 4.5))
+    a1.plot(agg["t_s"], agg["ops_per_s"], linewidth=1.5)
+    a1.set_xlabel("Time (seconds)"); a1.set_ylabel("Throughput (ops/sec)")
+    for q in ("p50", "p99", "max"):
+        a2.plot(agg["t_s"], agg[q] / 1e6, linewidth=1.2, label=q)
+    a2.set_xlabel("Time (seconds)"); a2.set_ylabel("Latency (ms)"); a2.legend()
+    xs = np.sort(lat[ok]) / 1e6
+    a3.plot(*render.lttb(xs, np.arange(1, xs.size + 1) / max(xs.size, 1), render.pixel_width(fig) // 3),
+            linewidth=1.5)
+    a3.set_xlabel("Latency (ms)"); a3.set_ylabel("CDF")
+    for a in (a1, a2, a3):
+        a.grid(True, linestyle="--", alpha=0.35)
+    fig.suptitle(os.path.basename(run_dir))
+    fig.tight_layout()
+    fig.savefig(os.path.join(run_dir, "summary.png"), dpi=100)
+    plt.close(fig)
+
+
+def write_sweep_summary(sweep_dir: str, rows: List[dict], plots: bool):
+    path = os.path.join(sweep_dir, "sweep_summary.csv")
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    if plots and rows:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        delays = sorted({r["delay_us"] for r in rows})
+        fig, (a1, a2) = plt.subplots(1, 2, figsize=(13, 4.5))
+        for metric, style in (("p50_ms", "o-"), ("p99_ms", "s-"), ("p999_ms", "^-")):
+            vals = [[r[metric] for r in rows if r["delay_us"] == d] for d in delays]
+            med = [float(np.median(v)) for v in vals]
+            err = [[m - min(v) for m, v in zip(med, vals)], [max(v) - m for m, v in zip(med, vals)]]
+            a1.errorbar([d / 1000 for d in delays], med, yerr=err, fmt=style, capsize=3, label=metric[:-3])
+        thr = [[r["throughput"] for r in rows if r["delay_us"] == d] for d in delays]
+        a2.errorbar([d / 1000 for d in delays], [float(np.median(v)) for v in thr], fmt="o-", capsize=3,
+                    yerr=[[float(np.median(v)) - min(v) for v in thr], [max(v) - float(np.median(v)) for v in thr]])
+        a1.set_xlabel("Injected WAL delay (ms)"); a1.set_ylabel("Latency (ms)"); a1.legend()
+        a2.set_xlabel("Injected WAL delay (ms)"); a2.set_ylabel("Throughput (ops/sec)")
+        for a in (a1, a2):
+            a.grid(True, linestyle="--", alpha=0.35)
+        fig.tight_layout()
+        fig.savefig(os.path.join(sweep_dir, "sweep_summary.png"), dpi=100)
+        plt.close(fig)
+        if any(r.get("max_sustainable_tput") is not None for r in rows):
+            plot_saturation(sweep_dir, rows)
+    return path
+
+
+def plot_saturation(sweep_dir: str, rows: List[dict]):
+    """Max sustainable throughput vs delay, and the first repetition's saturation curve per delay."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    rows = [r for r in rows if r.get("max_sustainable_tput") is not None]
+    delays = sorted({r["delay_us"] for r in rows})
+    fig, (a1, a2) = plt.subplots(1, 2, figsize=(13, 4.5))
+    vals = [[r["max_sustainable_tput"] for r in rows if r["delay_us"] == d] for d in delays]
+    med = [float(np.median(v)) for v in vals]
+    a1.errorbar([d / 1000 for d in delays], med, fmt="o-", capsize=3,
+                yerr=[[m - min(v) for m, v in zip(med, vals)], [max(v) - m for m, v in zip(med, vals)]])
+    for d, m in zip(delays, med):
+        knees = sorted({r["knee_concurrency"] for r in rows if r["delay_us"] == d})
+        a1.annotate("N=" + "/".join(map(str, knees)), (d / 1000, m), fontsize=7, textcoords="offset points",
+                    xytext=(3, 3))
+    a1.set_xlabel("Injected WAL delay (ms)"); a1.set_ylabel("Max sustainable throughput (ops/sec)")
+    for d in delays:
+        r = min((r for r in rows if r["delay_us"] == d), key=lambda r: r["rep"])
+        steps = ramp.read_csv(r["run_dir"])
+        a2.plot([x["throughput"] for x in steps], [x["p99_ms"] for x in steps], "o-", markersize=3,
+                label=f"{d / 1000:g} ms")
+    a2.set_xlabel("Throughput (ops/sec)"); a2.set_ylabel("p99 latency (ms)"); a2.set_yscale("log")
+    a2.legend(title="WAL delay", fontsize=8)
+    for a in (a1, a2):
+        a.grid(True, linestyle="--", alpha=0.35)
+    fig.tight_layout()
+    fig.savefig(os.path.join(sweep_dir, "sweep_saturation.png"), dpi=100)
+    plt.close(fig)
+
+
+# ===================== measurement =====================
+
+async def ensure_leader(inst: Instance, target: Optional[str], tries: int = 6) -> str:
+    """Leader endpoint of an instance, moved to `target` if set (move-leader, then docker restart)."""
+    for attempt in range(tries):
+        leader_ep, _lid, ids = await find_leader(inst.endpoints)
+        if not target:
+            if leader_ep:
+                return leader_ep
+        else:
+            want = inst.endpoint_of(target)
+            if leader_ep == want:
+                return want
+            print(f"[sweep {inst.tag}] leader is {leader_ep}, moving to {target}")
+            if leader_ep and ids.get(want):
+                c = EtcdClient(leader_ep, timeout_s=5.0)
+                try:
+                    await c.move_leader(ids[want])
+                    await asyncio.sleep(1)
+                    continue
+                except EtcdError as e:
+                    print(f"[sweep {inst.tag}] move-leader failed: {e}")
+                finally:
+                    await c.close()
+            if leader_ep and shutil.which("docker"):
+                subprocess.run(["docker", "restart", inst.container_of(leader_ep)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        await asyncio.sleep(2)
+    leader_ep, _lid, _ids = await find_leader(inst.endpoints)
+    if not leader_ep:
+        raise EtcdError(f"{inst.tag}: no etcd leader reachable")
+    print(f"[sweep {inst.tag}] WARN: could not force leader to {target}; using {leader_ep}")
+    return leader_ep
+
+
+def verify(path: str, delay_us: int):
+    t = time.perf_counter()
+    with open(path, "wb") as f:
+        f.write(b"x" * 4096)
+        os.fsync(f.fileno())
+    os.remove(path)
+    print(f"[verify] host WAL fsync elapsed ~{time.perf_counter() - t:.3f}s (inj≈{delay_us / 1e6:.3f}s)")
+
+
+def driver_args(spec: SweepSpec, endpoint: str, run_dir: str, rep: int, monitor=()):
+    argv = ["--endpoint", endpoint, "--ops", str(spec.ops), "--concurrency", str(spec.concurrency),
+            "--value-size", str(spec.value_size), "--out-dir", run_dir, "--key-prefix", f"sweep/r{rep}/k",
+            "--max-outstanding", str(spec.max_outstanding), "--arrival", spec.arrival,
+            "--monitor-endpoints", ",".join(monitor), "--monitor-interval", str(spec.raft_interval_s)]
+    if spec.rate:
+        argv += ["--rate", str(spec.rate)]
+    if spec.workload:
+        argv += ["--workload", workload_text(spec)]
+    if spec.ramp:
+        argv += spec.ramp_config().argv()
+    if spec.until:
+        argv += spec.stop_rule().argv()
+    return etcd_driver.build_parser().parse_args(argv)
+
+
+# ===================== per-instance measurement process =====================
+# Every instance is driven by its own single-worker process. The event loop,
+# the etcd connection pool and the charybdefs connection live in _WARM and
+# survive from one point to the next.
+
+_WARM = {}
+
+
+def measure_point(spec_d: dict, inst_d: dict, rep: int, delay_us: int, run_dir: str) -> dict:
+    loop = _WARM.get("loop")
+    if loop is None:
+        loop = _WARM["loop"] = asyncio.new_event_loop()
+    return loop.run_until_complete(_measure(SweepSpec(**spec_d), Instance(**inst_d), rep, delay_us, run_dir))
+
+
+async def _measure(spec: SweepSpec, inst: Instance, rep: int, delay_us: int, run_dir: str) -> dict:
+    w = _WARM
+    ep, _lid, _ids = await find_leader(inst.endpoints)
+    if w.get("leader") is None or ep != w["leader"]:
+        w["leader"] = await ensure_leader(inst, spec.leader_target)
+        if w.get("client") is not None:
+            await w["client"].close()
+        w["client"] = EtcdClient(w["leader"], pool_size=spec.pool_size())
+    charyb = charybs = None
+    try:
+        # inside the try: a partially applied fault is cleared on the way out
+        if spec.inject and spec.topology:
+            charybs = w.get("charybs")
+            if charybs is None:
+                charybs = w["charybs"] = {n: CharybClient(h, p) for n, (h, p) in inst.charyb_targets().items()}
+            leader = inst.node_of(w["leader"])
+            try:
+                rec = topology.apply(charybs, spec.node_plans(leader, delay_us), leader)
+            except RuntimeError as e:
+                if hasattr(e, "record"):
+                    topology.write_record(run_dir, e.record, spec.fault_topology(), delay_us)
+                raise
+            topology.write_record(run_dir, rec, spec.fault_topology(), delay_us)
+        elif spec.inject:
+            charyb = w.get("charyb")
+            if charyb is None:
+                charyb = w["charyb"] = CharybClient(inst.charyb_host, inst.charyb_port)
+            charyb.apply_plan(spec.plan(delay_us))
+        if spec.settle_s:
+            await asyncio.sleep(spec.settle_s)
+        if inst.verify_path and delay_us and charybs is None:
+            verify(inst.verify_path, delay_us)
+        args = driver_args(spec, w["leader"], run_dir, rep, inst.endpoints)
+        t0 = time.perf_counter()
+        if spec.ramp:
+            steps, _hist = await etcd_driver.run_ramp(args, w["client"])
+            ramp.write_csv(run_dir, steps)
+        elif spec.rate:
+            log = await etcd_driver.run_open_loop(args, w["client"])
+            etcd_driver.write_open_loop_outputs(log, run_dir, per_sec=False)
+        else:
+            log, _hist = await etcd_driver.run(args, w["client"])
+            etcd_driver.write_outputs(log, run_dir, per_sec=False)
+        return {"leader": w["leader"], "measure_s": time.perf_counter() - t0}
+    finally:
+        failing = sys.exc_info()[0] is not None
+        try:
+            if charyb is not None and delay_us:
+                charyb.clear()
+            if charybs is not None:
+                topology.clear(charybs)
+        except Exception:
+            if not failing:                     # don't hide the error that got us here
+                raise
+
+
+def close_instance() -> str:
+    """Clear faults and drop the warm connections of this worker process."""
+    out = ""
+    charyb = _WARM.pop("charyb", None)
+    if charyb is not None:
+        try:
+            charyb.clear()
+        except Exception:
+            pass
+        out = charyb.timing_summary()
+        charyb.close()
+    for node, c in _WARM.pop("charybs", {}).items():
+        try:
+            c.clear()
+        except Exception:
+            pass
+        out = "; ".join(filter(None, [out, f"{node}: {c.timing_summary()}"]))
+        c.close()
+    client = _WARM.pop("client", None)
+    if client is not None:
+        _WARM["loop"].run_until_complete(client.close())
+    _WARM.pop("leader", None)
+    return out
+
+
+# ===================== scheduler =====================
+
+async def run_sweep(spec: SweepSpec, sweep_dir: str, restart: bool = False, instances: List[Instance] = None):
+    os.makedirs(sweep_dir, exist_ok=True)
+    manifest = Manifest.open(sweep_dir, spec, restart)
+    if not instances:
+        instances = [default_instance(spec.endpoints, spec.charyb_host, spec.charyb_port, spec.verify_path,
+                                      spec.charyb_ports)]
+    if spec.topology and spec.inject:
+        need = spec.fault_topology().required_nodes()
+        for inst in instances:
+            missing = sorted(set(need) - set(inst.slow_nodes))
+            if missing:
+                raise SystemExit(f"[sweep {inst.tag}] topology {spec.fault_topology().describe()} needs a "
+                                 f"charybdefs on {', '.join(missing)} (charyb_ports / cluster.py --slow-nodes)")
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=max(1, spec.workers))
+    drivers = [ProcessPoolExecutor(max_workers=1) for _ in instances]
+    pending_analysis = set()
+    t_start = time.perf_counter()
+    busy_s = [0.0] * len(instances)
+
+    def submit(key):
+        p = manifest.data["points"][key]
+        fut = loop.run_in_executor(pool, analyze_point, p["run_dir"], spec.agg_widths, spec.plots,
+                                   point_params(spec, p), spec.ramp_config().gain if spec.ramp else None)
+
+        def done(f, key=key):
+            pending_analysis.discard(f)
+            try:
+                manifest.update(key, state="done", summary=f.result())
+            except Exception as e:
+                manifest.update(key, state="failed", error=f"analysis: {e!r}")
+                print(f"[sweep] {key}: analysis failed: {e!r}", file=sys.stderr)
+        fut.add_done_callback(done)
+        pending_analysis.add(fut)
+
+    for key in manifest.keys("measured"):
+        submit(key)
+
+    todo = manifest.keys("pending", "failed")
+    total = len(todo)
+    print(f"[sweep] {sweep_dir}: {total} point(s) to measure on {len(instances)} instance(s), {manifest.counts()}")
+    spec_d = asdict(spec)
+
+    async def instance_loop(i: int, inst: Instance):
+        inst_d = asdict(inst)
+        strikes = 0
+        while todo:
+            key = todo.pop(0)
+            p = manifest.data["points"][key]
+            run_dir = os.path.join(sweep_dir, key)
+            manifest.update(key, state="measuring", run_dir=run_dir, instance=inst.tag, started_unix=time.time())
+            print(f"[sweep {inst.tag}] ({total - len(todo)}/{total}) {key}")
+            try:
+                res = await loop.run_in_executor(drivers[i], measure_point, spec_d, inst_d, p["rep"],
+                                                 p["delay_us"], run_dir)
+            except Exception as e:
+                manifest.update(key, state="failed", error=repr(e))
+                print(f"[sweep {inst.tag}] {key}: {e!r}", file=sys.stderr)
+                strikes += 1
+                if strikes >= 3:
+                    print(f"[sweep {inst.tag}] 3 failures in a row, instance retired", file=sys.stderr)
+                    return
+                continue
+            strikes = 0
+            busy_s[i] += res["measure_s"]
+            manifest.update(key, state="measured", **res)
+            submit(key)
+
+    try:
+        await asyncio.gather(*(instance_loop(i, inst) for i, inst in enumerate(instances)))
+        if pending_analysis:
+            await asyncio.gather(*list(pending_analysis), return_exceptions=True)
+        rows = []
+        for key, p in manifest.data["points"].items():
+            if p["state"] == "done":
+                rows.append({"key": key, "rep": p["rep"], "delay_us": p["delay_us"], "run_dir": p["run_dir"],
+                             "instance": p.get("instance", ""), "measure_s": round(p.get("measure_s", 0.0), 3),
+                             **p["summary"]})
+        if rows:
+            path = await loop.run_in_executor(pool, write_sweep_summary, sweep_dir, rows, spec.plots)
+            print(f"Saved sweep summary     : {path}")
+            counts = await loop.run_in_executor(pool, catalog.index_runs, [sweep_dir],
+                                                os.path.join(spec.results_dir, "catalog.sqlite"))
+            print(f"Indexed runs            : +{counts['added']} ~{counts['updated']} "
+                  f"({os.path.join(spec.results_dir, 'catalog.sqlite')})")
+            try:
+                path = await loop.run_in_executor(pool, compare.compare_sweep, sweep_dir)
+                if path:
+                    print(f"Saved bootstrap compare : {path}")
+            except Exception as e:
+                print(f"[sweep] compare failed: {e!r}", file=sys.stderr)
+    finally:
+        for inst, ex in zip(instances, drivers):
+            try:
+                rpc = ex.submit(close_instance).result(timeout=30)
+                if rpc:
+                    print(f"[sweep {inst.tag}] charybdefs RPCs: {rpc}")
+            except Exception:
+                pass
+            ex.shutdown(wait=True, cancel_futures=True)
+        pool.shutdown(wait=True, cancel_futures=True)
+    wall = time.perf_counter() - t_start
+    per = "  ".join(f"{inst.tag}={b:.1f}s" for inst, b in zip(instances, busy_s))
+    print(f"[sweep] {manifest.counts()}  wall={wall:.1f}s  measuring: {per}  "
+          f"(sum {sum(busy_s):.1f}s, {sum(busy_s) / wall if wall > 0 else 0:.2f}x parallel)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Resumable WAL-delay sweep on a warm etcd cluster")
+    ap.add_argument("spec", help="sweep spec JSON")
+    ap.add_argument("--sweep-dir", help="default: <results_dir>/sweep_<name>")
+    ap.add_argument("--restart", action="store_true", help="discard the manifest and start over")
+    ap.add_argument("--status", action="store_true", help="print progress and exit")
+    ap.add_argument("--instances", help="instances.json from cluster.py: run points on all of them concurrently")
+    args = ap.parse_args(argv)
+
+    spec = SweepSpec.load(args.spec)
+    sweep_dir = args.sweep_dir or os.path.join(spec.results_dir, f"sweep_{spec.name}")
+    if args.status:
+        path = os.path.join(sweep_dir, MANIFEST)
+        if not os.path.exists(path):
+            print(f"{sweep_dir}: not started ({len(spec.points())} points)")
+            return
+        with open(path) as f:
+            data = json.load(f)
+        for key, p in data["points"].items():
+            extra = p.get("error", "") or (f"p99={p['summary']['p99_ms']:.3f}ms" if "summary" in p else "")
+            print(f"  {key:<40} {p.get('instance', ''):<4} {p['state']:<10} {extra}")
+        return
+    try:
+        insts = load_instances(args.instances) if args.instances else None
+        asyncio.run(run_sweep(spec, sweep_dir, args.restart, insts))
+    except KeyboardInterrupt:
+        print(f"\n[sweep] interrupted; run the same command again to resume ({sweep_dir})", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
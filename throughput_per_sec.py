@@ -1,9 +1,12 @@
-import glob, os, re
-import pandas as pd
+import argparse
 import matplotlib.pyplot as plt
 
+import live
+from analysis import Run, find_files, smooth, to_ms_label
+
 # ==================== Konfigurasi ====================
 FILE_PATTERN = "throughput_per_sec_*.csv"  # contoh: throughput_per_sec_1000us.csv
+# atau query katalog (catalog.py), mis. "catalog:mode=delay leader=etcd2 delay_ms>=10"
 SMOOTH_WINDOW_SEC = 3                      # rolling window (detik) untuk smoothing
 FIGSIZE = (14, 6)
 TITLE = "Throughput vs Time (Delay Injection)"
@@ -11,78 +14,52 @@ X_LABEL = "Time (seconds)"
 Y_LABEL = "Throughput (ops/sec)"
 # ======================================================
 
-def to_ms_label(text: str) -> str:
-    """
-    Cari pola '<angka><unit>' di text dan konversi ke 'X ms'.
-    Unit didukung: us/µs, ms, s. Jika tidak ketemu, kembalikan text asli.
-    """
-    m = re.search(r'(?i)(\d+(?:\.\d+)?)\s*(µs|us|ms|s)\b', text)
-    if not m:
-        return text
-    val = float(m.group(1))
-    unit = m.group(2).lower()
-
-    if unit in ('µs', 'us'):
-        ms = val / 1000.0
-    elif unit == 'ms':
-        ms = val
-    elif unit == 's':
-        ms = val * 1000.0
-    else:
-        return text
-
-    # format rapi: tanpa .0 jika bilangan bulat, 2–3 desimal jika perlu
-    if abs(ms - round(ms)) < 1e-9:
-        return f"{int(round(ms))} ms"
-    elif ms < 1:
-        s = f"{ms:.3f}"
-    else:
-        s = f"{ms:.2f}"
-    s = s.rstrip('0').rstrip('.')
-    return f"{s} ms"
-
-def load_throughput_csv(path: str):
-    df = pd.read_csv(path)
-    # cek kolom waktu
-    if "sec" not in df.columns:
-        raise ValueError(f"{path}: kolom 'sec' tidak ada.")
-    if "ops" not in df.columns:
-        raise ValueError(f"{path}: kolom 'ops' tidak ada.")
+def load_throughput(run: Run):
+    # kolom sec/ops dideteksi dan detik kosong diisi 0 oleh analysis.Run
+    df = run.per_sec_ops()
 
     # normalisasi waktu agar mulai dari 0
-    df["sec"] = df["sec"].astype(int) - df["sec"].min()
-    df["ops"] = df["ops"].astype(float)
+    df["sec"] = df["t_sec"] - df["t_sec"].min()
 
     # smoothing rolling mean
-    df["ops_smooth"] = df["ops"].rolling(
-        window=SMOOTH_WINDOW_SEC, center=True, min_periods=1
-    ).mean()
+    df["ops_smooth"] = smooth(df["ops"], SMOOTH_WINDOW_SEC)
 
     # label dari nama file → konversi ke ms
-    raw_label = os.path.splitext(os.path.basename(path))[0].replace("throughput_per_sec_", "")
-    label = to_ms_label(raw_label)
-    return df, label
+    return df, to_ms_label(run.label)
+
+def main(argv=None):
+    args = live.add_follow_args(argparse.ArgumentParser(description=TITLE)).parse_args(argv)
+
+    # mode follow: tail file yang masih ditulis (hanya byte baru yang dibaca)
+    if args.follow is not None:
+        live.follow(args.follow or [FILE_PATTERN], stat="ops", smooth_window=SMOOTH_WINDOW_SEC,
+                    refresh_s=args.refresh, window_s=args.window, title=TITLE, ylabel=Y_LABEL,
+                    legend_title="Delay (ms)", label=to_ms_label, figsize=FIGSIZE)
+        return
+
+    # Ambil semua file
+    files = find_files(FILE_PATTERN)
+    if not files:
+        raise SystemExit(f"Tidak ada file cocok pola: {FILE_PATTERN}")
 
-# Ambil semua file
-files = sorted(glob.glob(FILE_PATTERN))
-if not files:
-    raise SystemExit(f"Tidak ada file cocok pola: {FILE_PATTERN}")
+    plt.figure(figsize=FIGSIZE)
 
-plt.figure(figsize=FIGSIZE)
+    for path in files:
+        try:
+            df, label = load_throughput(Run(path))
+            plt.plot(df["sec"], df["ops_smooth"], linewidth=2, alpha=0.95, label=label)
+        except Exception as e:
+            print(f"Skip {path}: {e}")
 
-for path in files:
-    try:
-        df, label = load_throughput_csv(path)
-        plt.plot(df["sec"], df["ops_smooth"], linewidth=2, alpha=0.95, label=label)
-    except Exception as e:
-        print(f"Skip {path}: {e}")
+    # Estetika & keterbacaan
+    plt.title(TITLE, fontsize=16)
+    plt.xlabel(X_LABEL)
+    plt.ylabel(Y_LABEL)
+    plt.grid(True, linestyle="--", alpha=0.35)
+    # legend di luar area plot
+    plt.legend(title="Delay (ms)", frameon=True, loc="center left", bbox_to_anchor=(1.02, 0.5))
+    plt.tight_layout()
+    plt.show()
 
-# Estetika & keterbacaan
-plt.title(TITLE, fontsize=16)
-plt.xlabel(X_LABEL)
-plt.ylabel(Y_LABEL)
-plt.grid(True, linestyle="--", alpha=0.35)
-# legend di luar area plot
-plt.legend(title="Delay (ms)", frameon=True, loc="center left", bbox_to_anchor=(1.02, 0.5))
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
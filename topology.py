@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Multi-node fault topologies: a charybdefs delay plan per etcd node.
+
+The single slow node of docker-compose-etcd.yml (etcd2, forced to be the
+leader) only covers "slow leader". A topology assigns a delay to any node
+or role, so a slow follower, two slow nodes out of three and a different
+delay per node can be measured on the same cluster. Every node whose data
+dir is behind its own charybdefs mount (cluster.py --slow-nodes) has its
+own RPC port.
+
+Targets, weakest first (a more specific target overrides a weaker one):
+  all                   every node
+  leader, followers     resolved at run time from the current leader
+  follower0, follower1  the followers in node-name order
+  etcd0, etcd1, etcd2   one node by name
+
+Values:
+  50000                 delay in us
+  "x0.5"                multiple of the base delay (the sweep point's delay_us / --delay-us)
+  {"delay_us": 50000, "methods": "fsync,fdatasync", "regex": "...", "prob_permil": 500}
+  {"scale": 2.0, ...}   same, relative to the base delay
+  [{...FaultSpec...}]   an explicit charybdefs plan for that node
+
+A topology is a preset name, a JSON object / file, or an inline list:
+  slow-follower                         one follower at the base delay
+  followers=x1,leader=0                 both followers slow (the leader's quorum is slow)
+  etcd0=10000,etcd1=50000,etcd2=100000  different delay per node
+
+The plans of all nodes are applied concurrently: one thread per node, held at
+a barrier until every connection is open, so all slow nodes start their
+delay together. What was applied (leader, per-node plan, RPC times and the
+start/done skew across nodes) is written to <run_dir>/fault_topology.json.
+
+    python3 topology.py show followers=x1 --leader etcd2 --delay-us 50000
+    python3 topology.py apply slow-follower --delay-us 50000 \\
+        --charyb etcd0=9092,etcd1=9091,etcd2=9090 --endpoints http://127.0.0.1:23790,...
+    python3 topology.py clear --charyb etcd0=9092,etcd1=9091,etcd2=9090
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from charyb_fault import CharybClient, FaultSpec, DEFAULT_HOST, SYNC_METHODS, WAL_REGEX, parse_methods
+from cluster import NODES
+from etcd_client import find_leader
+
+TOPOLOGY_FILE = "fault_topology.json"
+_FOLLOWER_N = re.compile(r"follower(\d+)$")
+
+PRESETS = {
+    "slow-leader": {"leader": "x1"},
+    "slow-follower": {"follower0": "x1"},
+    "slow-followers": {"followers": "x1"},
+    "slow-leader-follower": {"leader": "x1", "follower0": "x1"},
+    "slow-all": {"all": "x1"},
+}
+
+
+def _rank(target: str) -> int:
+    if target == "all":
+        return 0
+    if target in ("leader", "followers"):
+        return 1
+    return 2 if _FOLLOWER_N.match(target) else 3
+
+
+def _entry(target: str, value) -> dict:
+    """Normalise one topology value to {"delay_us"|"scale"|"faults", ...}."""
+    if isinstance(value, bool):
+        raise ValueError(f"topology: {target}: expected a delay, got {value!r}")
+    if isinstance(value, (int, float)):
+        return {"delay_us": int(value)}
+    if isinstance(value, str):
+        v = value.strip()
+        try:
+            if v[:1] in ("x", "*"):
+                return {"scale": float(v[1:])}
+            return {"delay_us": int(float(v))}
+        except ValueError:
+            raise ValueError(f"topology: {target}: expected a delay in us or x<scale>, got {value!r}") from None
+    if isinstance(value, list):
+        return {"faults": [fault_dict(FaultSpec.from_dict(d)) for d in value]}
+    if isinstance(value, dict):
+        d = dict(value)
+        unknown = set(d) - {"delay_us", "scale", "methods", "regex", "prob_permil"}
+        if unknown or ("delay_us" in d) == ("scale" in d):
+            raise ValueError(f"topology: {target}: need exactly one of delay_us / scale "
+                             f"(and optionally methods, regex, prob_permil), got {sorted(value)}")
+        if isinstance(d.get("methods"), list):
+            d["methods"] = ",".join(d["methods"])
+        return d
+    raise ValueError(f"topology: {target}: cannot use {value!r}")
+
+
+def fault_dict(f: FaultSpec) -> dict:
+    """FaultSpec as a JSON-friendly dict without default-valued flags."""
+    d = {"methods": f.methods, "delay_us": f.delay_us, "prob_permil": f.prob_permil, "regex": f.regex}
+    for k in ("err_no", "random", "kill_caller", "auto_delay"):
+        if getattr(f, k):
+            d[k] = getattr(f, k)
+    return d
+
+
+@dataclass
+class Topology:
+    entries: Dict[str, dict]               # target -> normalised entry (see _entry)
+
+    @property
+    def uses_roles(self) -> bool:
+        """True if the leader has to be known to resolve it."""
+        return any(_rank(t) in (1, 2) for t in self.entries)
+
+    def describe(self) -> str:
+        """Inline form when every entry is a bare delay / scale, JSON otherwise."""
+        order = sorted(self.entries, key=lambda t: (_rank(t), t))
+        parts = []
+        for t in order:
+            e = self.entries[t]
+            if set(e) == {"delay_us"}:
+                parts.append(f"{t}={e['delay_us']}")
+            elif set(e) == {"scale"}:
+                parts.append(f"{t}=x{e['scale']:g}")
+            else:
+                return json.dumps({t: self.entries[t] for t in order}, sort_keys=True)
+        return ",".join(parts)
+
+    def required_nodes(self, nodes: Sequence[str] = NODES) -> List[str]:
+        """Nodes that may get a fault and therefore need a charybdefs."""
+        if any(_rank(t) < 3 for t, e in self.entries.items() if not _is_zero(e)):
+            return list(nodes)
+        return sorted(t for t, e in self.entries.items() if not _is_zero(e))
+
+    def resolve(self, leader: Optional[str], base_delay_us: int = 0, nodes: Sequence[str] = NODES,
+                methods=SYNC_METHODS, regex: str = WAL_REGEX, prob_permil: int = 1000) -> Dict[str, List[FaultSpec]]:
+        """{node: plan} for every node ([] = no fault), given the current leader."""
+        nodes = list(nodes)
+        if self.uses_roles and leader not in nodes:
+            raise ValueError(f"topology {self.describe()}: needs the leader, got {leader!r}")
+        followers = sorted(n for n in nodes if n != leader)
+        chosen = {}
+        for target in sorted(self.entries, key=_rank):
+            if target == "all":
+                hit = nodes
+            elif target == "leader":
+                hit = [leader]
+            elif target == "followers":
+                hit = followers
+            elif _FOLLOWER_N.match(target):
+                i = int(_FOLLOWER_N.match(target).group(1))
+                if i >= len(followers):
+                    raise ValueError(f"topology: {target}: only {len(followers)} followers")
+                hit = [followers[i]]
+            elif target in nodes:
+                hit = [target]
+            else:
+                raise ValueError(f"topology: unknown node {target!r} (nodes: {', '.join(nodes)})")
+            for n in hit:
+                chosen[n] = self.entries[target]
+        return {n: _plan(chosen.get(n), base_delay_us, methods, regex, prob_permil) for n in nodes}
+
+
+def _is_zero(e: dict) -> bool:
+    if "faults" in e:
+        return not e["faults"]
+    return e.get("delay_us", 1) <= 0 or e.get("scale", 1) <= 0 or e.get("prob_permil", 1) <= 0
+
+
+def _plan(e: Optional[dict], base_delay_us, methods, regex, prob_permil) -> List[FaultSpec]:
+    if e is None:
+        return []
+    if "faults" in e:
+        return [FaultSpec.from_dict(d) for d in e["faults"]]
+    delay = e["delay_us"] if "delay_us" in e else int(round(e["scale"] * base_delay_us))
+    prob = int(e.get("prob_permil", prob_permil))
+    if delay <= 0 or prob <= 0:
+        return []
+    m = e.get("methods", methods)
+    if isinstance(m, str):
+        m = None if m.strip().lower() == "all" else parse_methods(m)
+    return [FaultSpec(list(m) if m else None, int(delay), prob, e.get("regex", regex))]
+
+
+def parse_topology(value) -> Topology:
+    """Preset name, JSON text / file, inline target=value list, or an already parsed object."""
+    if isinstance(value, Topology):
+        return value
+    if isinstance(value, dict):
+        d = value
+    else:
+        text = value.strip()
+        if text in PRESETS:
+            d = PRESETS[text]
+        elif text.startswith("{"):
+            d = json.loads(text)
+        elif text.endswith(".json") or os.path.isfile(text):
+            with open(text) as f:
+                d = json.load(f)
+        else:
+            d = {}
+            for part in filter(None, (p.strip() for p in text.split(","))):
+                k, sep, v = part.partition("=")
+                if not sep:
+                    raise ValueError(f"topology: expected target=delay, got {part!r}")
+                d[k.strip()] = v.strip()
+    if not d:
+        raise ValueError("topology: empty")
+    for t in d:
+        if _rank(t) == 3 and not re.match(r"[A-Za-z][\w-]*$", t):
+            raise ValueError(f"topology: bad target {t!r}")
+    return Topology({t: _entry(t, v) for t, v in d.items()})
+
+
+def topology_arg(text: str) -> Topology:
+    """argparse type for --topology."""
+    try:
+        return parse_topology(text)
+    except (ValueError, OSError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_charyb(text: str, host: str = DEFAULT_HOST) -> Dict[str, tuple]:
+    """'etcd0=9092,etcd2=10.0.0.5:9090' -> {node: (host, port)}."""
+    out = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        node, sep, addr = part.partition("=")
+        if not sep:
+            raise ValueError(f"charybdefs: expected node=port or node=host:port, got {part!r}")
+        h, _, p = addr.rpartition(":")
+        out[node.strip()] = (h or host, int(p))
+    return out
+
+
+async def leader_node(endpoints: Sequence[str], nodes: Sequence[str] = NODES) -> Optional[str]:
+    """Name of the current leader (endpoints are in node order), None if there is none."""
+    ep, _lid, _ids = await find_leader(endpoints)
+    return nodes[list(endpoints).index(ep)] if ep else None
+
+
+# ===================== concurrent apply =====================
+
+def apply(clients: Dict[str, CharybClient], plans: Dict[str, List[FaultSpec]], leader: Optional[str] = None,
+          timeout_s: float = 30.0) -> dict:
+    """
+    Apply every node's plan at the same moment. Each node gets a thread that
+    connects first and then waits at a shared barrier, so connection setup
+    does not stagger the start. Nodes without a client must have an empty
+    plan. Returns the record written by write_record(). If a node fails or
+    the barrier times out, raises RuntimeError; its .record holds a row per
+    node, with an "error" and no times for the nodes that did not apply.
+    """
+    missing = [n for n, p in plans.items() if p and n not in clients]
+    if missing:
+        raise ValueError(f"topology: no charybdefs for {', '.join(missing)}")
+    nodes = [n for n in plans if n in clients]
+    if not nodes:
+        return {"leader": leader, "nodes": [], "start_skew_us": 0, "done_skew_us": 0}
+    barrier = threading.Barrier(len(nodes))
+    rows, errors = {}, {}
+
+    def worker(node):
+        c = clients[node]
+        try:
+            if not c.connected:
+                c.connect()
+            barrier.wait(timeout_s)
+            start = time.monotonic_ns()
+            wall_ms = int(time.time() * 1000)
+            rpc_ns = c.apply_plan(plans[node])
+            rows[node] = {"node": node, "role": "leader" if node == leader else ("follower" if leader else ""),
+                          "delay_us": max((f.delay_us for f in plans[node]), default=0),
+                          "plan": [fault_dict(f) for f in plans[node]], "wall_ms": wall_ms,
+                          "start_ns": start, "done_ns": start + rpc_ns, "rpc_us": rpc_ns // 1000}
+        except threading.BrokenBarrierError:
+            errors.setdefault(node, f"barrier broken after {timeout_s:g}s (a node failed or timed out)")
+        except Exception as e:
+            errors[node] = repr(e)
+            barrier.abort()
+
+    threads = [threading.Thread(target=worker, args=(n,), name=f"topology-{n}", daemon=True) for n in nodes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out = []
+    for n in nodes:
+        r = rows.get(n)
+        if r is None:
+            errors.setdefault(n, "no result")
+            r = {"node": n, "role": "leader" if n == leader else ("follower" if leader else ""),
+                 "delay_us": max((f.delay_us for f in plans[n]), default=0),
+                 "plan": [fault_dict(f) for f in plans[n]], "wall_ms": None,
+                 "start_ns": None, "done_ns": None, "rpc_us": None, "error": errors[n]}
+        out.append(r)
+    starts = [r["start_ns"] for r in rows.values()]
+    dones = [r["done_ns"] for r in rows.values()]
+    record = {"leader": leader, "nodes": out,
+              "start_skew_us": (max(starts) - min(starts)) // 1000 if rows else 0,
+              "done_skew_us": (max(dones) - min(dones)) // 1000 if rows else 0}
+    if errors:
+        e = RuntimeError("topology: " + "; ".join(f"{n}: {m}" for n, m in errors.items()))
+        e.record = record
+        raise e
+    return record
+
+
+def clear(clients: Dict[str, CharybClient], timeout_s: float = 30.0) -> dict:
+    """Clear the faults of every node, concurrently."""
+    return apply(clients, {n: [] for n in clients}, timeout_s=timeout_s)
+
+
+def write_record(run_dir: str, record: dict, topology: Topology, base_delay_us: int = 0) -> str:
+    """<run_dir>/fault_topology.json (run_dir may also be the .json path itself)."""
+    path = run_dir if run_dir.endswith(".json") else os.path.join(run_dir, TOPOLOGY_FILE)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    out = {"topology": topology.describe(), "base_delay_us": base_delay_us, **record}
+    with open(path, "w") as f:
+        json.dump(out, f, indent=1)
+    return path
+
+
+def format_plans(plans: Dict[str, List[FaultSpec]], leader: Optional[str] = None) -> str:
+    lines = []
+    for n, plan in plans.items():
+        role = " (leader)" if n == leader else ""
+        what = "; ".join(f.describe() for f in plan) if plan else "no fault"
+        lines.append(f"  {n + role:<16} {what}")
+    return "\n".join(lines)
+
+
+def format_record(record: dict) -> str:
+    lines = [f"  {r['node']:<6} {r['role'] or '-':<8} delay={r['delay_us']}us "
+             + (f"FAILED: {r['error']}" if r.get("error") else f"rpc={r['rpc_us']}us")
+             for r in record["nodes"]]
+    lines.append(f"  skew: start {record['start_skew_us']}us, done {record['done_skew_us']}us")
+    return "\n".join(lines)
+
+
+# ===================== CLI =====================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Per-node charybdefs fault topologies")
+    sp = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("show", "apply", "clear"):
+        p = sp.add_parser(name)
+        if name != "clear":
+            p.add_argument("topology", type=topology_arg, help="preset, JSON, or target=delay list")
+            p.add_argument("--delay-us", type=int, default=0, help="base delay for x<scale> entries")
+            p.add_argument("--methods", default=",".join(SYNC_METHODS), help="comma list, or 'all'")
+            p.add_argument("--regex", default=WAL_REGEX)
+            p.add_argument("--prob-permil", type=int, default=1000)
+            p.add_argument("--leader", help="leader node name (default: asked from --endpoints)")
+        if name != "show":
+            p.add_argument("--charyb", required=True, help="node=port or node=host:port, comma separated")
+            p.add_argument("--host", default=DEFAULT_HOST, help="charybdefs host for entries without one")
+        if name == "apply":
+            p.add_argument("--endpoints", default="http://127.0.0.1:23790,http://127.0.0.1:23791,"
+                                                  "http://127.0.0.1:23792", help="host URLs of etcd0..2")
+            p.add_argument("--record", help=f"write the applied topology here (a run dir gets {TOPOLOGY_FILE})")
+    args = ap.parse_args(argv)
+
+    clients = {}
+    if args.cmd != "show":
+        clients = {n: CharybClient(h, p) for n, (h, p) in parse_charyb(args.charyb, args.host).items()}
+    try:
+        if args.cmd == "clear":
+            rec = clear(clients)
+            print(f"[topology] cleared {', '.join(clients)} (skew {rec['done_skew_us']}us)")
+            return
+        leader = args.leader
+        if leader is None and args.topology.uses_roles:
+            if args.cmd == "show":
+                ap.error("show: --leader is needed to resolve roles")
+            leader = asyncio.run(leader_node(args.endpoints.split(",")))
+        plans = args.topology.resolve(leader, args.delay_us, methods=args.methods, regex=args.regex,
+                                      prob_permil=args.prob_permil)
+        print(f"[topology] {args.topology.describe()}  leader={leader or '?'} base={args.delay_us}us")
+        print(format_plans(plans, leader))
+        if args.cmd == "show":
+            return
+        plans = {n: p for n, p in plans.items() if p or n in clients}
+        rec = apply(clients, plans, leader)
+        print(format_record(rec))
+        if args.record:
+            write_record(args.record, rec, args.topology, args.delay_us)
+    except (ValueError, RuntimeError) as e:
+        rec = getattr(e, "record", None)
+        if rec is not None:
+            print(format_record(rec))
+            if args.record:
+                write_record(args.record, rec, args.topology, args.delay_us)
+        print(f"[topology] {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        for c in clients.values():
+            c.close()
+
+
+if __name__ == "__main__":
+    main()
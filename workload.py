@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+YCSB-style etcd workload mixes for etcd_driver.py (--workload).
+
+A spec gives the op mix (weights of put / get / get_serializable / range /
+txn / delete / lease), the key distribution over a fixed keyspace and the
+value-size distribution. The whole op stream -- op type, key index and
+value size of every op -- is drawn before the run in vectorized NumPy
+batches from one seeded generator, so the hot path only indexes arrays.
+
+Ops (what one op of each type sends to the JSON gateway):
+  put               Put key
+  get               Range key (linearizable: ReadIndex round through the leader)
+  get_serializable  Range key, serializable (served by the member, no raft round)
+  range             Range from key to the end of the key prefix, limit range_limit
+  txn               Txn If(version(key) > 0) Then(Put key) Else(Range key)
+  delete            DeleteRange key
+  lease             LeaseGrant ttl (a raft proposal without a KV write)
+
+Key distributions (keys are <prefix><index+1>, like the original PUT loop):
+  sequential  op i uses key i (every op a new key; the original workload)
+  uniform     uniform over [0, keyspace)
+  zipfian     zipf(theta) over keyspace, hot keys scattered by a fixed permutation
+  latest      puts insert new keys past the keyspace; the other ops pick keys
+              zipf-distributed backwards from the newest insert
+
+Value sizes: const (value_size), uniform [value_min, value_max],
+lognormal (median value_size, value_sigma, clipped to [value_min, value_max]).
+
+Spec forms accepted by --workload / parse_spec():
+  ycsb-a .. ycsb-f                                  presets (below)
+  put=20,get=70,range=5,txn=5,keys=zipfian,keyspace=100000,values=lognormal,value_size=512
+  '{"mix": {"put": 20, "get": 80}, "keys": "uniform"}'   JSON text, or a path to a .json file
+
+    python3 workload.py show ycsb-b --ops 100000
+    python3 workload.py report results/x/per_op.col
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from array import array
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict
+
+import numpy as np
+
+import oprec
+from etcd_client import EtcdClient
+from oprec import OP_TYPES
+
+MIX_OPS = ("put", "get", "get_serializable", "range", "txn", "delete", "lease")
+KEY_DISTS = ("sequential", "uniform", "zipfian", "latest")
+VALUE_DISTS = ("const", "uniform", "lognormal")
+BATCH = 1 << 16                 # ops drawn per NumPy batch
+PRELOAD_TXN_OPS = 128           # puts per preload txn (etcd --max-txn-ops default)
+PRELOAD_CONCURRENCY = 16
+PER_TYPE_CSV = "per_op_type.csv"
+
+# YCSB core workloads mapped onto etcd ops: update/insert -> put,
+# read -> get, scan -> range, read-modify-write -> txn
+PRESETS = {
+    "ycsb-a": {"mix": {"put": 50, "get": 50}, "keys": "zipfian"},
+    "ycsb-b": {"mix": {"put": 5, "get": 95}, "keys": "zipfian"},
+    "ycsb-c": {"mix": {"get": 100}, "keys": "zipfian"},
+    "ycsb-d": {"mix": {"put": 5, "get": 95}, "keys": "latest"},
+    "ycsb-e": {"mix": {"put": 5, "range": 95}, "keys": "zipfian"},
+    "ycsb-f": {"mix": {"get": 50, "txn": 50}, "keys": "zipfian"},
+}
+
+
+@dataclass
+class WorkloadSpec:
+    mix: Dict[str, float] = field(default_factory=lambda: {"put": 1.0})
+    keys: str = "sequential"
+    keyspace: int = 10000
+    theta: float = 0.99                 # zipf exponent (zipfian, latest)
+    values: str = "const"
+    value_size: int = 8                 # const size / lognormal median
+    value_min: int = 1
+    value_max: int = 4096
+    value_sigma: float = 1.0
+    range_limit: int = 100
+    lease_ttl_s: int = 60
+    preload: bool = True                # write the keyspace before the run (not for sequential)
+    seed: int = 1
+
+    def __post_init__(self):
+        self.mix = {k: float(v) for k, v in self.mix.items() if float(v) > 0}
+        bad = [k for k in self.mix if k not in MIX_OPS]
+        if bad or not self.mix:
+            raise ValueError(f"workload mix needs positive weights of {', '.join(MIX_OPS)}; got {bad or 'none'}")
+        if self.keys not in KEY_DISTS:
+            raise ValueError(f"unknown key distribution {self.keys!r} (one of {', '.join(KEY_DISTS)})")
+        if self.values not in VALUE_DISTS:
+            raise ValueError(f"unknown value distribution {self.values!r} (one of {', '.join(VALUE_DISTS)})")
+        if self.keyspace < 1 or self.theta < 0 or not 1 <= self.value_min <= self.value_max:
+            raise ValueError("workload needs keyspace >= 1, theta >= 0 and 1 <= value_min <= value_max")
+
+    @property
+    def ops(self):
+        return list(self.mix)
+
+    def describe(self) -> str:
+        """Canonical inline form (what parse_spec reads back), for manifests and logs."""
+        total = sum(self.mix.values())
+        parts = [f"{k}={100 * v / total:g}" for k, v in self.mix.items()]
+        default = WorkloadSpec()
+        for f in fields(self):
+            v = getattr(self, f.name)
+            if f.name != "mix" and v != getattr(default, f.name):
+                parts.append(f"{f.name}={str(v).lower() if isinstance(v, bool) else v}")
+        return ",".join(parts)
+
+
+def _convert(name: str, text: str):
+    kind = {f.name: f.type for f in fields(WorkloadSpec)}.get(name)
+    if kind is None:
+        raise ValueError(f"unknown workload setting {name!r}")
+    if kind is bool:
+        return text.lower() in ("1", "true", "yes", "on")
+    return kind(text)
+
+
+def parse_spec(text: str, **defaults) -> WorkloadSpec:
+    """Preset name, JSON file / text, or comma list of op=weight and setting=value."""
+    text = text.strip()
+    if text in PRESETS:
+        d = json.loads(json.dumps(PRESETS[text]))
+    elif text.startswith("{"):
+        d = json.loads(text)
+    elif text.endswith(".json") or os.path.isfile(text):
+        with open(text) as f:
+            d = json.load(f)
+    else:
+        d = {"mix": {}}
+        for part in filter(None, (p.strip() for p in text.split(","))):
+            k, sep, v = part.partition("=")
+            if not sep:
+                raise ValueError(f"workload: expected key=value, got {part!r}")
+            k = k.strip()
+            if k in MIX_OPS:
+                d["mix"][k] = float(v)
+            elif k == "preset":
+                d = dict(json.loads(json.dumps(PRESETS[v.strip()])), **{x: y for x, y in d.items() if x != "mix"})
+            else:
+                d[k] = _convert(k, v.strip())
+        if not d["mix"]:
+            d.pop("mix")
+    return WorkloadSpec(**dict(defaults, **d))
+
+
+def workload_arg(text: str) -> WorkloadSpec:
+    """argparse type for --workload."""
+    try:
+        return parse_spec(text)
+    except (ValueError, KeyError, TypeError, OSError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+# ----------------------------------------------------------------------
+# stream generation
+# ----------------------------------------------------------------------
+
+def zipf_cdf(n: int, theta: float) -> np.ndarray:
+    """CDF over ranks 0..n-1 with P(rank r) ~ 1 / (r + 1) ** theta."""
+    w = np.arange(1, n + 1, dtype=np.float64) ** -theta
+    cdf = np.cumsum(w)
+    return cdf / cdf[-1]
+
+
+class Stream:
+    """
+    Precomputed ops: op (oprec OP_TYPES code), key (index; the key is
+    <prefix><key+1>) and size (value bytes), as compact arrays that index
+    to plain ints.
+    """
+
+    def __init__(self, op: np.ndarray, key: np.ndarray, size: np.ndarray):
+        self.n = len(op)
+        self.op = array("B", op.astype(np.uint8).tobytes())
+        self.key = array("q", key.astype(np.int64).tobytes())
+        self.size = array("q", size.astype(np.int64).tobytes())
+        self.sizes = np.unique(size).tolist()
+
+    def codes(self) -> np.ndarray:
+        return np.frombuffer(self.op, dtype=np.uint8)
+
+    def keys_touched(self) -> int:
+        return int(np.unique(np.frombuffer(self.key, dtype=np.int64)).size)
+
+
+def generate(spec: WorkloadSpec, n: int, batch: int = BATCH) -> Stream:
+    """Draw n ops of `spec` in batches; the same spec and n always give the same stream."""
+    rng = np.random.default_rng(spec.seed)
+    names = spec.ops
+    codes = np.array([OP_TYPES.index(k) for k in names], dtype=np.uint8)
+    weights = np.array([spec.mix[k] for k in names])
+    op_cdf = np.cumsum(weights) / weights.sum()
+    put = OP_TYPES.index("put")
+    zcdf = zipf_cdf(spec.keyspace, spec.theta) if spec.keys in ("zipfian", "latest") else None
+    perm = rng.permutation(spec.keyspace) if spec.keys == "zipfian" else None
+    inserted = spec.keyspace            # latest: keys [0, inserted) exist
+
+    op = np.empty(n, dtype=np.uint8)
+    key = np.empty(n, dtype=np.int64)
+    size = np.empty(n, dtype=np.int64)
+    for lo in range(0, n, batch):
+        hi = min(n, lo + batch)
+        m = hi - lo
+        op[lo:hi] = codes[np.minimum(np.searchsorted(op_cdf, rng.random(m), side="right"), len(codes) - 1)]
+        if spec.keys == "sequential":
+            key[lo:hi] = np.arange(lo, hi)
+        elif spec.keys == "uniform":
+            key[lo:hi] = rng.integers(0, spec.keyspace, m)
+        elif spec.keys == "zipfian":
+            key[lo:hi] = perm[np.searchsorted(zcdf, rng.random(m))]
+        else:
+            ins = op[lo:hi] == put
+            newest = inserted + np.cumsum(ins) - ins          # keys existing before each op
+            back = np.searchsorted(zcdf, rng.random(m))
+            key[lo:hi] = np.where(ins, newest, np.maximum(newest - 1 - back, 0))
+            inserted += int(ins.sum())
+        if spec.values == "const":
+            size[lo:hi] = spec.value_size
+        elif spec.values == "uniform":
+            size[lo:hi] = rng.integers(spec.value_min, spec.value_max + 1, m)
+        else:
+            s = rng.lognormal(np.log(spec.value_size), spec.value_sigma, m)
+            size[lo:hi] = np.clip(np.rint(s), spec.value_min, spec.value_max)
+    return Stream(op, key, size)
+
+
+# ----------------------------------------------------------------------
+# execution against etcd
+# ----------------------------------------------------------------------
+
+def prefix_end(prefix: bytes) -> bytes:
+    """etcd range_end covering every key that starts with `prefix`."""
+    p = bytearray(prefix)
+    while p:
+        if p[-1] < 0xFF:
+            p[-1] += 1
+            return bytes(p)
+        p.pop()
+    return b"\0"
+
+
+def bind(client: EtcdClient, stream: Stream, spec: WorkloadSpec, prefix: bytes):
+    """`await do(i)` issues op i of the stream."""
+    op, key, size = stream.op, stream.key, stream.size
+    values = {s: b"v" * s for s in stream.sizes}
+    end = prefix_end(prefix)
+
+    async def put(i):
+        await client.put(b"%s%d" % (prefix, key[i] + 1), values[size[i]])
+
+    async def get(i):
+        await client.get(b"%s%d" % (prefix, key[i] + 1))
+
+    async def get_serializable(i):
+        await client.get(b"%s%d" % (prefix, key[i] + 1), serializable=True)
+
+    async def range_(i):
+        await client.range(b"%s%d" % (prefix, key[i] + 1), end, limit=spec.range_limit)
+
+    async def txn(i):
+        k = b"%s%d" % (prefix, key[i] + 1)
+        await client.txn([client.compare_version(k, ">", 0)], [client.request_put(k, values[size[i]])],
+                         [client.request_range(k)])
+
+    async def delete(i):
+        await client.delete(b"%s%d" % (prefix, key[i] + 1))
+
+    async def lease(i):
+        await client.lease_grant(spec.lease_ttl_s)
+
+    fns = [None] * len(OP_TYPES)
+    for name, fn in (("put", put), ("get", get), ("get_serializable", get_serializable), ("range", range_),
+                     ("txn", txn), ("delete", delete), ("lease", lease)):
+        fns[OP_TYPES.index(name)] = fn
+
+    async def do(i):
+        await fns[op[i]](i)
+
+    return do
+
+
+async def preload(endpoint: str, spec: WorkloadSpec, prefix: bytes, concurrency: int = PRELOAD_CONCURRENCY) -> int:
+    """Write keys 1..keyspace (value_size bytes) in txns of PRELOAD_TXN_OPS puts; returns keys written."""
+    if spec.keys == "sequential" or not spec.preload:
+        return 0
+    client = EtcdClient(endpoint, pool_size=concurrency)
+    value = b"v" * spec.value_size
+    batches = iter(range(0, spec.keyspace, PRELOAD_TXN_OPS))
+
+    async def worker():
+        for lo in batches:
+            hi = min(spec.keyspace, lo + PRELOAD_TXN_OPS)
+            await client.txn([], [client.request_put(b"%s%d" % (prefix, k + 1), value) for k in range(lo, hi)])
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await client.close()
+    return spec.keyspace
+
+
+# ----------------------------------------------------------------------
+# per-op-type results
+# ----------------------------------------------------------------------
+
+def per_type(codes: np.ndarray, lat_ns: np.ndarray, ok: np.ndarray, wall_s: float, corrected_ns=None,
+             labels=OP_TYPES):
+    """One row per op type present: counts, share, throughput and latency percentiles in ms."""
+    rows = []
+    n = max(len(codes), 1)
+    for c in np.unique(codes):
+        sel = codes == c
+        good = sel & ok
+        lat = lat_ns[good] / 1e6
+        row = {"op": labels[c] if c < len(labels) else str(c), "ok": int(good.sum()),
+               "fail": int(sel.sum() - good.sum()), "share": float(sel.sum() / n),
+               "throughput": float(good.sum() / wall_s) if wall_s > 0 else 0.0}
+        if lat.size:
+            p50, p90, p99, p999 = np.percentile(lat, (50, 90, 99, 99.9)).tolist()
+            row.update(mean_ms=float(lat.mean()), p50_ms=p50, p90_ms=p90, p99_ms=p99, p999_ms=p999,
+                       max_ms=float(lat.max()))
+            if corrected_ns is not None:
+                row["corrected_p99_ms"] = float(np.percentile(corrected_ns[good] / 1e6, 99))
+        rows.append(row)
+    return rows
+
+
+def write_per_type(out_dir: str, rows) -> str:
+    path = os.path.join(out_dir, PER_TYPE_CSV)
+    cols = ["op", "ok", "fail", "share", "throughput", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "p999_ms",
+            "max_ms"] + (["corrected_p99_ms"] if any("corrected_p99_ms" in r for r in rows) else [])
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(cols)
+        for r in rows:
+            w.writerow([_cell(r.get(c)) for c in cols])
+    return path
+
+
+def _cell(v):
+    if v is None:
+        return ""
+    return f"{v:.6f}" if isinstance(v, float) else v
+
+
+def format_per_type(rows) -> str:
+    lines = [f"  {'op':<17}{'ok':>9}{'fail':>6}{'share':>8}{'ops/s':>10}{'p50_ms':>10}{'p99_ms':>10}{'p99.9_ms':>10}"]
+    for r in rows:
+        lines.append(f"  {r['op']:<17}{r['ok']:>9}{r['fail']:>6}{100 * r['share']:>7.1f}%{r['throughput']:>10.1f}"
+                     f"{r.get('p50_ms', float('nan')):>10.3f}{r.get('p99_ms', float('nan')):>10.3f}"
+                     f"{r.get('p999_ms', float('nan')):>10.3f}")
+    return "\n".join(lines)
+
+
+def summary_fields(rows) -> dict:
+    """Manifest summary entries p50_ms_<op> / p99_ms_<op> / share_<op>."""
+    out = {}
+    for r in rows:
+        out[f"share_{r['op']}"] = round(r["share"], 6)
+        if "p99_ms" in r:
+            out[f"p50_ms_{r['op']}"] = r["p50_ms"]
+            out[f"p99_ms_{r['op']}"] = r["p99_ms"]
+    return out
+
+
+def report(path: str):
+    """Per-op-type rows of an existing per_op.col."""
+    t = oprec.open_ops(path)
+    start = np.asarray(t["start_ns"], dtype=np.int64)
+    lat = np.asarray(t["latency_ns"], dtype=np.int64)
+    wall = ((start + lat).max() - start.min()) / 1e9 if len(t) else 0.0
+    return per_type(np.asarray(t["op"]).astype(np.int64), lat, np.asarray(t["status"]) == oprec.STATUS_OK, wall,
+                    labels=t.labels("op"))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="etcd workload mixes: preview a spec or report per-op-type latency")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("show", help="generate a spec's stream and print its make-up")
+    p.add_argument("spec", type=workload_arg)
+    p.add_argument("--ops", type=int, default=100000)
+    p = sub.add_parser("report", help="per-op-type latency table of a per_op.col")
+    p.add_argument("col")
+    p.add_argument("--out-dir", help=f"also write {PER_TYPE_CSV} here")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "show":
+        spec = args.spec
+        print("spec:", spec.describe())
+        print(json.dumps(asdict(spec), indent=1))
+        t = time.perf_counter()
+        s = generate(spec, args.ops)
+        dt = time.perf_counter() - t
+        codes = s.codes()
+        print(f"{s.n} ops generated in {dt * 1e3:.1f} ms ({dt / max(s.n, 1) * 1e9:.0f} ns/op), "
+              f"{s.keys_touched()} distinct keys")
+        for c in np.unique(codes):
+            print(f"  {OP_TYPES[c]:<17}{100 * np.mean(codes == c):6.2f}%")
+        sizes = np.frombuffer(s.size, dtype=np.int64)
+        print(f"  value bytes: mean {sizes.mean():.1f}  p50 {np.median(sizes):.0f}  p99 {np.percentile(sizes, 99):.0f}"
+              f"  max {sizes.max()}")
+        return
+    rows = report(args.col)
+    print(format_per_type(rows))
+    if args.out_dir:
+        print("Saved:", write_per_type(args.out_dir, rows))
+
+
+if __name__ == "__main__":
+    main()